@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+标准答案CSV解析的微基准：比较逐行解析(clean_data + parse_time)与按列向量化解析的耗时。
+不连接数据库，只测量从CSV到可写入数据的解析阶段。
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import InsertStandAnswerToDb as importer  # noqa: E402
+from GenerateSyntheticData import write_answer_csv  # noqa: E402
+
+
+def bench_row_parser(csv_path, encoding):
+    rows = 0
+    with open(csv_path, 'r', encoding=encoding, errors='replace') as f:
+        reader = csv.DictReader(f, fieldnames=importer.ANSWER_COLUMNS)
+        next(reader)
+        for row in reader:
+            importer.row_to_values(importer.clean_data(row))
+            rows += 1
+    return rows
+
+
+def bench_columnar_parser(csv_path, encoding, chunk_size):
+    rows = 0
+    for frame, bad_count in importer.iter_answer_frames(csv_path, encoding, chunk_size):
+        rows += len(frame) + bad_count
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="标准答案解析微基准")
+    parser.add_argument('--rows', type=int, default=1000000, help='合成标准答案的行数')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='按列解析时每块的行数')
+    parser.add_argument('--csv', help='使用已有的CSV文件而不生成合成数据')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    csv_path = args.csv
+    if not csv_path:
+        fd, csv_path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        print(f"生成 {args.rows} 行合成标准答案...")
+        write_answer_csv(csv_path, args.rows, datetime(2025, 7, 2, 14, 51, 20))
+    encoding = 'GBK'
+
+    try:
+        results = []
+        for name, func in (
+            ('row', lambda: bench_row_parser(csv_path, encoding)),
+            ('columnar', lambda: bench_columnar_parser(csv_path, encoding, args.chunk_size)),
+        ):
+            start = time.perf_counter()
+            rows = func()
+            elapsed = time.perf_counter() - start
+            results.append((name, rows, elapsed))
+            print(f"{name:>9}: {rows} 行, {elapsed:.2f} 秒, {rows / elapsed:.0f} 行/秒")
+        print(f"加速比: {results[0][2] / results[1][2]:.1f}x")
+    finally:
+        if not args.csv:
+            os.remove(csv_path)
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+导出格式基准：比较数据明细导出为 xlsx（openpyxl / 流式 xlsxwriter）、parquet、csv、arrow 的耗时和文件大小。
+
+把 public.details 重复复制到 --rows 指定的各个行数，写入独立的基准模式后逐一导出，不改动 public 下的表。
+需要先在界面中查询过一次（生成 public.details）。
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from sqlalchemy import text  # noqa: E402
+
+from ExportResultToExcel import (create_db_engine, export_details, export_table_columnar,  # noqa: E402
+                                 get_db_config)
+
+# (名称, 文件后缀, 导出函数)；xlsx 两种写法即 ExportResultToExcel.py 默认和 --stream 时的写法
+FORMATS = [
+    ('xlsx', '.xlsx', lambda conn, table, path, chunk: export_details(conn, path, False, chunk, table=table)),
+    ('xlsx-stream', '.xlsx', lambda conn, table, path, chunk: export_details(conn, path, True, chunk, table=table)),
+    ('parquet', '.parquet',
+     lambda conn, table, path, chunk: export_table_columnar(conn.connection.dbapi_connection, table, path, 'parquet')),
+    ('csv', '.csv',
+     lambda conn, table, path, chunk: export_table_columnar(conn.connection.dbapi_connection, table, path, 'csv')),
+    ('arrow', '.arrow',
+     lambda conn, table, path, chunk: export_table_columnar(conn.connection.dbapi_connection, table, path, 'arrow')),
+]
+
+
+def build_details(conn, bench_schema, rows):
+    """把 public.details 循环复制到 rows 行"""
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {bench_schema} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {bench_schema}"))
+    source_rows = conn.execute(text("SELECT COUNT(*) FROM public.details")).scalar()
+    if not source_rows:
+        raise RuntimeError("public.details 为空，请先查询一次")
+    conn.execute(text(f"""
+        CREATE TABLE {bench_schema}.details AS
+        SELECT d.* FROM generate_series(1, :copies) k, public.details d
+        LIMIT :rows
+    """), {'copies': -(-rows // source_rows), 'rows': rows})
+    conn.commit()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="数据明细导出格式基准")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='数据明细的行数，可指定多个')
+    parser.add_argument('--formats', nargs='+', choices=[name for name, _, _ in FORMATS],
+                        default=[name for name, _, _ in FORMATS], help='参与比较的格式')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='xlsx-stream 每次从服务端游标读取的行数')
+    parser.add_argument('--bench-schema', default='bench_export', help='基准数据所在模式，运行前会被重建')
+    parser.add_argument('--keep', action='store_true', help='保留基准模式和导出的文件')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    engine = create_db_engine(get_db_config(args), 1)
+    workdir = tempfile.mkdtemp(prefix='bench_export_')
+    table = f"{args.bench_schema}.details"
+    results = []
+    try:
+        with engine.connect() as conn:
+            for rows in args.rows:
+                build_details(conn, args.bench_schema, rows)
+                for name, suffix, export in FORMATS:
+                    if name not in args.formats:
+                        continue
+                    path = os.path.join(workdir, f"details_{rows}_{name}{suffix}")
+                    start = time.perf_counter()
+                    exported = export(conn, table, path, args.chunk_size)
+                    elapsed = time.perf_counter() - start
+                    conn.rollback()
+                    results.append((rows, name, elapsed, os.path.getsize(path) / 1024 / 1024, exported))
+                    print(f"{rows} 行 {name}: {elapsed:.2f} 秒")
+
+        print(f"{'行数':>10}{'格式':>14}{'耗时(秒)':>12}{'行/秒':>12}{'大小(MB)':>12}{'相对xlsx':>10}")
+        for rows, name, elapsed, size, exported in results:
+            baseline = next((r[2] for r in results if r[0] == rows and r[1] == 'xlsx'), None)
+            ratio = f"{baseline / elapsed:.1f}x" if baseline else '-'
+            print(f"{rows:>10}{name:>14}{elapsed:>12.2f}{exported / elapsed:>12.0f}{size:>12.2f}{ratio:>10}")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {args.bench_schema} CASCADE"))
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"导出的文件保存在 {workdir}")
+        engine.dispose()
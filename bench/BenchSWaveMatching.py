@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+S波窗口匹配基准：比较原先每个窗口四次 LATERAL 扫描、单次范围连接聚合和现在 waveInfoTables.sql 中
+每个窗口一次 LATERAL 聚合的耗时，并校验结果一致。
+
+把所选模式下的报警表和 public.stand_answer 按时间平移复制 --scale 份到独立的基准模式，
+在其中分别执行三种写法，不改动 public 下的统计结果表。需要先在界面中查询过一次（生成 public.stand_answer）。
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from CreateAlarmIndexes import INDEX_SPECS, get_db_config, index_sql  # noqa: E402
+
+# 改写前 waveInfoTables.sql 中的 S_matched_details
+LATERAL_SQL = """
+SELECT
+    stand.id,
+    stand.send_time,
+    stand.next_send_time,
+    s_min.jk_time AS first_jk_time,
+    s_min.rcv_jktime AS first_rcv_jktime,
+    gal80.jk_time AS gal80_jk_time,
+    gal80.rcv_jktime AS gal80_rcv_jktime,
+    gal120.jk_time AS gal120_jk_time,
+    gal120.rcv_jktime AS gal120_rcv_jktime,
+    s_min.sta_code,
+    s_min.device_code,
+    peak_info.wave_peak
+FROM
+    {bench}.stand_answer stand
+    LEFT JOIN LATERAL (
+        SELECT jk_time, rcv_jktime, sta_code, device_code
+        FROM {bench}.station_s_wave_alarm s
+        WHERE s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+        ORDER BY jk_time ASC
+        LIMIT 1
+    ) s_min ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jk_time, rcv_jktime
+        FROM {bench}.station_s_wave_alarm s
+        WHERE s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            AND x_acc_value >= 80
+        ORDER BY jk_time ASC
+        LIMIT 1
+    ) gal80 ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jk_time, rcv_jktime
+        FROM {bench}.station_s_wave_alarm s
+        WHERE s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            AND x_acc_value >= 120
+        ORDER BY jk_time ASC
+        LIMIT 1
+    ) gal120 ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT ROUND(MAX(x_acc_value)::NUMERIC, 3) AS wave_peak
+        FROM {bench}.station_s_wave_alarm s
+        WHERE s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+    ) peak_info ON TRUE
+WHERE
+    stand.actual_peak >= 40
+ORDER BY stand.id
+"""
+
+# 范围连接后按窗口 GROUP BY 的单次聚合写法（对照用，未采用）
+SINGLE_PASS_SQL = """
+SELECT
+    stand.id,
+    stand.send_time,
+    stand.next_send_time,
+    MIN(s.jk_time) AS first_jk_time,
+    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time))[1] AS first_rcv_jktime,
+    MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 80) AS gal80_jk_time,
+    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+    MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 120) AS gal120_jk_time,
+    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 120))[1] AS gal120_rcv_jktime,
+    (ARRAY_AGG(s.sta_code ORDER BY s.jk_time))[1] AS sta_code,
+    (ARRAY_AGG(s.device_code ORDER BY s.jk_time))[1] AS device_code,
+    ROUND(MAX(s.x_acc_value)::NUMERIC, 3) AS wave_peak
+FROM
+    {bench}.stand_answer stand
+    LEFT JOIN {bench}.station_s_wave_alarm s ON s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+WHERE
+    stand.actual_peak >= 40
+GROUP BY
+    stand.id,
+    stand.send_time,
+    stand.next_send_time
+ORDER BY stand.id
+"""
+
+# 现在 waveInfoTables.sql 中的 S_matched_details：每个窗口一次 LATERAL 聚合，并用本次测试的时间段限定报警范围
+SHIPPED_SQL = """
+SELECT
+    stand.id,
+    stand.send_time,
+    stand.next_send_time,
+    s_agg.*
+FROM
+    {bench}.stand_answer stand
+    LEFT JOIN LATERAL (
+        SELECT
+            MIN(s.jk_time) AS first_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time))[1] AS first_rcv_jktime,
+            MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 80) AS gal80_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+            MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 120) AS gal120_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 120))[1] AS gal120_rcv_jktime,
+            (ARRAY_AGG(s.sta_code ORDER BY s.jk_time))[1] AS sta_code,
+            (ARRAY_AGG(s.device_code ORDER BY s.jk_time))[1] AS device_code,
+            ROUND(MAX(s.x_acc_value)::NUMERIC, 3) AS wave_peak
+        FROM {bench}.station_s_wave_alarm s
+        WHERE
+            s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            AND s.jk_time BETWEEN (SELECT MIN(send_time) FROM {bench}.stand_answer) AND (SELECT MAX(next_send_time) FROM {bench}.stand_answer)
+    ) s_agg ON TRUE
+WHERE
+    stand.actual_peak >= 40
+ORDER BY stand.id
+"""
+
+VARIANTS = [
+    ('lateral', '四次LATERAL', LATERAL_SQL),
+    ('single_pass', '范围连接聚合', SINGLE_PASS_SQL),
+    ('shipped', 'LATERAL聚合', SHIPPED_SQL),
+]
+
+
+def build_scaled_schema(cursor, source_schema, bench_schema, scale):
+    """按时间平移复制 scale 份标准答案和S波报警，每份之间留出一天间隔，窗口互不重叠"""
+    cursor.execute(f"DROP SCHEMA IF EXISTS {bench_schema} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {bench_schema}")
+    cursor.execute(f"""
+        SELECT
+            LEAST(MIN(a.send_time), (SELECT MIN(jk_time) FROM {source_schema}.station_s_wave_alarm)),
+            GREATEST(MAX(a.next_send_time), (SELECT MAX(jk_time) FROM {source_schema}.station_s_wave_alarm)),
+            MAX(a.id)
+        FROM public.stand_answer a
+    """)
+    first, last, max_id = cursor.fetchone()
+    shift = (last - first) + timedelta(days=1)
+    cursor.execute(f"""
+        CREATE TABLE {bench_schema}.stand_answer AS
+        SELECT
+            a.id + k * %(max_id)s AS id,
+            a.send_time + k * %(shift)s AS send_time,
+            a.next_send_time + k * %(shift)s AS next_send_time,
+            a.actual_peak
+        FROM public.stand_answer a, generate_series(0, %(scale)s - 1) k
+    """, {'max_id': max_id, 'shift': shift, 'scale': scale})
+    cursor.execute(f"""
+        CREATE TABLE {bench_schema}.station_s_wave_alarm AS
+        SELECT
+            s.station_s_wave_alarm_id || '-' || k AS station_s_wave_alarm_id,
+            s.earth_id || '-' || k AS earth_id,
+            s.sta_code,
+            s.device_code,
+            s.jk_time + k * %(shift)s AS jk_time,
+            s.rcv_jktime + k * %(shift)s AS rcv_jktime,
+            s.x_acc_value
+        FROM {source_schema}.station_s_wave_alarm s, generate_series(0, %(scale)s - 1) k
+    """, {'shift': shift, 'scale': scale})
+    cursor.execute(f"ANALYZE {bench_schema}.stand_answer")
+    cursor.execute(f"ANALYZE {bench_schema}.station_s_wave_alarm")
+    cursor.execute(f"SELECT (SELECT COUNT(*) FROM {bench_schema}.stand_answer), "
+                   f"(SELECT COUNT(*) FROM {bench_schema}.station_s_wave_alarm)")
+    return cursor.fetchone()
+
+
+def time_query(cursor, name, sql, bench_schema):
+    cursor.execute(f"DROP TABLE IF EXISTS {bench_schema}.result_{name}")
+    start = time.perf_counter()
+    cursor.execute(f"CREATE TABLE {bench_schema}.result_{name} AS " + sql.format(bench=bench_schema))
+    elapsed = time.perf_counter() - start
+    cursor.execute(f"SELECT md5(COALESCE(string_agg(r::text, '|' ORDER BY r.id), '')), COUNT(*) "
+                   f"FROM {bench_schema}.result_{name} r")
+    return elapsed, cursor.fetchone()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="S波窗口匹配基准")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='报警表所在模式')
+    parser.add_argument('--scale', type=int, default=100, help='数据放大倍数')
+    parser.add_argument('--bench-schema', default='bench_s_matching', help='基准数据所在模式，运行前会被重建')
+    parser.add_argument('--with-indexes', action='store_true', help='在基准表上创建 CreateAlarmIndexes.py 中的S波索引')
+    parser.add_argument('--keep', action='store_true', help='保留基准模式，不在结束时删除')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    conn = psycopg2.connect(**get_db_config(args))
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        answers, alarms = build_scaled_schema(cursor, args.schema, args.bench_schema, args.scale)
+        print(f"放大 {args.scale} 倍: 标准答案 {answers} 行, S波报警 {alarms} 行")
+        if args.with_indexes:
+            for table, suffix, columns, include, predicate in INDEX_SPECS:
+                if table == 'station_s_wave_alarm' and not suffix.startswith('earth_id'):
+                    cursor.execute(index_sql(args.bench_schema, table, f"idx_{table}_{suffix}", columns,
+                                             include, predicate, False, conn.server_version >= 110000))
+            cursor.execute(f"ANALYZE {args.bench_schema}.station_s_wave_alarm")
+            print("已创建S波匹配索引")
+
+        results = [(label, *time_query(cursor, name, sql, args.bench_schema)) for name, label, sql in VARIANTS]
+        lateral_time = results[0][1]
+        print(f"{'写法':<12}{'耗时(秒)':>12}{'行数':>10}{'加速比':>10}")
+        for label, elapsed, digest in results:
+            print(f"{label:<12}{elapsed:>12.3f}{digest[1]:>10}{lateral_time / elapsed:>10.2f}")
+        print(f"结果一致: {'是' if len({digest for _, _, digest in results}) == 1 else '否'}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {args.bench_schema} CASCADE")
+        cursor.close()
+        conn.close()
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+生成用于性能测试的合成数据。
+标准答案CSV与 StandardAnswersFile.csv 格式一致（GBK编码，时间字段前后带制表符）。
+指定 --schema 时同时在数据库中生成与之匹配的 station_p_wave_alarm 和 station_s_wave_alarm，
+其中包含干扰波误报和漏报（窗口内没有报警）的波形。报警行在数据库端按波形参数展开，
+抖动由 hashtext(种子, 波形, 序号) 决定，同一种子生成的数据相同。
+--history-days 在测试开始前的若干天内再均匀生成历史波形的报警（不写入标准答案），模拟保存了数月历史的报警表。
+"""
+import argparse
+import csv
+import io
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from SqlPipeline import get_db_config  # noqa: E402
+
+ANSWER_HEADER = [
+    '试验序号', '波形编号', '台站名称', '台站长名称', '开始时间', '发送时间', '持续时长(S)', '结束时间',
+    '地震类型', '多台震中距分类', '实际震源深度', '实际震级', '实际震中距', '实际震源纬度', '实际震源经度',
+    '实际峰值', 'P波初至位置', 'P波初至时间', 'S波一报位置', 'S波一报时间', 'S波一报峰值',
+    'S波二报位置', 'S波二报时间', 'S波二报峰值', 'S波三报位置', 'S波三报时间', 'S波三报峰值', '方位角'
+]
+
+# 每个波形之间的发送间隔和持续时长（秒），与样例文件一致
+WAVE_INTERVAL = 120
+WAVE_DURATION = 100
+
+
+def format_time(value):
+    return '\t' + value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] + '\t'
+
+
+def wave_plan(waves, start, interference_ratio, seed):
+    """生成每个波形的基础参数，供标准答案和报警数据共用"""
+    rng = random.Random(seed)
+    for i in range(waves):
+        send_time = start + timedelta(seconds=i * WAVE_INTERVAL, milliseconds=49)
+        peak = round(rng.uniform(5, 300), 4)
+        yield {
+            'index': i,
+            'send_time': send_time,
+            'interference': rng.random() < interference_ratio,
+            'magnitude': round(rng.uniform(3.5, 7.0), 1),
+            'distance': round(rng.uniform(10, 150), 3),
+            'latitude': round(rng.uniform(34.5, 40.0), 3),
+            'longitude': round(rng.uniform(138.0, 142.0), 3),
+            'depth': rng.randint(5, 90),
+            'peak': peak,
+            'p_offset': rng.uniform(30, 60),
+            'azimuth': round(rng.uniform(0, 360), 4),
+        }
+
+
+def answer_row(wave, test_base=8000):
+    send_time = wave['send_time']
+    start_time = send_time - timedelta(milliseconds=49)
+    p_time = send_time + timedelta(seconds=wave['p_offset'])
+    peak = wave['peak']
+    s_fields = [''] * 9
+    for level, threshold in enumerate((40, 80, 120)):
+        if peak >= threshold:
+            s_time = p_time + timedelta(seconds=2 + 3 * level)
+            s_fields[level * 3:level * 3 + 3] = [
+                int(wave['p_offset'] * 200) + 600 * (level + 1), format_time(s_time), threshold
+            ]
+    return [
+        test_base + wave['index'] + 1,
+        f"{test_base + wave['index'] + 1}1",
+        '3HF',
+        'BY3HFQST',
+        format_time(start_time),
+        format_time(send_time),
+        f'{WAVE_DURATION}.0',
+        format_time(send_time + timedelta(seconds=WAVE_DURATION, milliseconds=6)),
+        '干扰波' if wave['interference'] else '地震波',
+        'SE100',
+        wave['depth'],
+        wave['magnitude'],
+        wave['distance'],
+        wave['latitude'],
+        wave['longitude'],
+        peak,
+        int(wave['p_offset'] * 200),
+        format_time(p_time),
+        *s_fields,
+        wave['azimuth'],
+    ]
+
+
+def write_answer_csv(path, waves, start, interference_ratio=0.05, seed=0):
+    """写出包含 waves 个波形的标准答案CSV，返回写出的行数"""
+    with open(path, 'w', encoding='gbk', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ANSWER_HEADER)
+        for wave in wave_plan(waves, start, interference_ratio, seed):
+            writer.writerow(answer_row(wave))
+    return waves
+
+
+P_ALARM_DDL = """
+CREATE TABLE {schema}.station_p_wave_alarm (
+    station_p_wave_alarm_id varchar NOT NULL,
+    earth_time timestamp without time zone,
+    p_arrive_time timestamp without time zone,
+    jk_time timestamp without time zone,
+    rcv_jktime timestamp without time zone,
+    earth_id varchar,
+    receive_time timestamp without time zone,
+    sta_code varchar,
+    device_code varchar,
+    source_longitude double precision,
+    source_latitude double precision,
+    source_deep double precision,
+    alarm_time timestamp without time zone,
+    s_time timestamp without time zone,
+    x_acc_value double precision,
+    y_acc_value double precision,
+    z_acc_value double precision,
+    epi_dist double precision,
+    alarm_level smallint,
+    azi_angle double precision,
+    earthquake_level double precision,
+    report_num integer
+)
+"""
+
+S_ALARM_DDL = """
+CREATE TABLE {schema}.station_s_wave_alarm (
+    station_s_wave_alarm_id varchar NOT NULL,
+    alarm_level smallint,
+    earth_id varchar,
+    sta_code varchar,
+    device_code varchar,
+    alarm_time timestamp without time zone,
+    receive_time timestamp without time zone,
+    jk_time timestamp without time zone,
+    rcv_jktime timestamp without time zone,
+    x_acc_value double precision,
+    y_acc_value double precision,
+    z_acc_value double precision,
+    earthquake_level double precision,
+    source_longitude double precision,
+    source_latitude double precision,
+    source_deep double precision,
+    report_num integer
+)
+"""
+
+# 波形参数临时表，kind: E 地震波有报警，I 干扰波误报（只有P波报警），N 漏报或干扰波未触发（没有报警）
+PLAN_DDL = """
+CREATE TEMP TABLE synthetic_wave_plan (
+    idx integer,
+    send_time timestamp,
+    p_time timestamp,
+    kind char(1),
+    peak double precision,
+    magnitude double precision,
+    distance double precision,
+    latitude double precision,
+    longitude double precision,
+    depth double precision,
+    azimuth double precision
+)
+"""
+
+# 每条报警的到时在上一条的基础上加 0~49ms 抖动，所有报警都落在波形的持续时长内
+P_ALARM_SQL = """
+INSERT INTO {schema}.station_p_wave_alarm
+SELECT
+    'p_ALARM-' || to_char(a.jk_time, 'YYYYMMDD-HH24MISSMS') || '-' || lpad((w.idx::bigint * %(p_reports)s + k - 1)::text, 10, '0'),
+    w.p_time - make_interval(secs => w.distance / 6.0),
+    w.p_time,
+    a.jk_time,
+    a.jk_time + interval '3 millisecond',
+    to_char(w.p_time, 'YYYYMMDDHH24MISS'),
+    NULL,
+    'BY3HFQST',
+    'GL3HFQSB',
+    w.longitude + (abs(hashtext(%(seed)s || ':plon:' || w.idx)) %% 100 - 50) / 1000.0,
+    w.latitude + (abs(hashtext(%(seed)s || ':plat:' || w.idx)) %% 100 - 50) / 1000.0,
+    w.depth,
+    a.jk_time + interval '3 millisecond',
+    w.p_time + make_interval(secs => w.distance / 8.0),
+    a.acc,
+    a.acc,
+    a.acc / 2,
+    w.distance,
+    0,
+    w.azimuth,
+    CASE WHEN w.kind = 'I' THEN 3.0 + k * 0.05 ELSE w.magnitude + (k - 1) * 0.02 END,
+    k
+FROM
+    synthetic_wave_plan w
+    CROSS JOIN generate_series(1, %(p_reports)s) k
+    CROSS JOIN LATERAL (
+        SELECT
+            w.p_time + make_interval(secs => 2 + (k - 1) * %(p_step)s
+                + (abs(hashtext(%(seed)s || ':p:' || w.idx || ':' || k)) %% 50) / 1000.0) AS jk_time,
+            CASE WHEN w.kind = 'I' THEN 1.0 + k * 0.1 ELSE GREATEST(w.peak, 1.0) * 0.05 * k / %(p_reports)s END AS acc
+    ) a
+WHERE
+    w.kind IN ('E', 'I')
+"""
+
+# S波从40gal开始上报，加速度逐报增大到实际峰值，峰值不足40gal的波形没有S波报警
+S_ALARM_SQL = """
+INSERT INTO {schema}.station_s_wave_alarm
+SELECT
+    's_ALARM-' || to_char(a.jk_time, 'YYYYMMDD-HH24MISSMS') || '-' || lpad((w.idx::bigint * %(s_reports)s + k - 1)::text, 10, '0'),
+    CASE WHEN a.acc >= 120 THEN 3 WHEN a.acc >= 80 THEN 2 ELSE 1 END,
+    to_char(w.p_time + interval '2 second', 'YYYYMMDDHH24MISS'),
+    'BY3HFQST',
+    'GL3HFQSB',
+    a.jk_time + interval '2 millisecond',
+    NULL,
+    a.jk_time,
+    a.jk_time + interval '2 millisecond',
+    a.acc,
+    a.acc,
+    a.acc / 2,
+    0,
+    NULL,
+    NULL,
+    NULL,
+    k
+FROM
+    synthetic_wave_plan w
+    CROSS JOIN generate_series(1, %(s_reports)s) k
+    CROSS JOIN LATERAL (
+        SELECT
+            w.p_time + make_interval(secs => 2 + (k - 1) * %(s_step)s
+                + (abs(hashtext(%(seed)s || ':s:' || w.idx || ':' || k)) %% 50) / 1000.0) AS jk_time,
+            40.0 + (w.peak - 40.0) * (k - 1) / GREATEST(%(s_reports)s - 1, 1) + 0.01 AS acc
+    ) a
+WHERE
+    w.kind = 'E'
+    AND w.peak >= 40
+"""
+
+
+def plan_rows(waves, start, interference_ratio, missing_ratio, false_alarm_ratio, seed):
+    """按波形参数生成临时表的行，漏报和误报用单独的随机序列，不影响标准答案CSV的内容"""
+    rng = random.Random(seed + 1)
+    for wave in wave_plan(waves, start, interference_ratio, seed):
+        if wave['interference']:
+            kind = 'I' if rng.random() < false_alarm_ratio else 'N'
+        else:
+            kind = 'N' if rng.random() < missing_ratio else 'E'
+        p_time = wave['send_time'] + timedelta(seconds=wave['p_offset'])
+        yield (wave['index'], wave['send_time'], p_time, kind, wave['peak'], wave['magnitude'], wave['distance'],
+               wave['latitude'], wave['longitude'], wave['depth'], wave['azimuth'])
+
+
+def history_plan_rows(history_waves, history_days, start, first_index, seed):
+    """测试开始前 history_days 天内均匀分布的历史地震波，只生成报警，不在标准答案窗口内"""
+    history_start = start - timedelta(days=history_days)
+    step = history_days * 86400 / max(history_waves, 1)
+    for wave in wave_plan(history_waves, history_start, 0, seed + 2):
+        send_time = history_start + timedelta(seconds=wave['index'] * step)
+        p_time = send_time + timedelta(seconds=wave['p_offset'])
+        yield (first_index + wave['index'], send_time, p_time, 'E', wave['peak'], wave['magnitude'], wave['distance'],
+               wave['latitude'], wave['longitude'], wave['depth'], wave['azimuth'])
+
+
+def copy_plan(cursor, rows, chunk_size=100000):
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write('\t'.join(str(value) for value in row) + '\n')
+        count += 1
+        if count % chunk_size == 0:
+            buffer.seek(0)
+            cursor.copy_expert("COPY synthetic_wave_plan FROM STDIN", buffer)
+            buffer = io.StringIO()
+    buffer.seek(0)
+    cursor.copy_expert("COPY synthetic_wave_plan FROM STDIN", buffer)
+
+
+def reports_per_wave(waves, alarms):
+    """把目标报警总数平均分到每个波形，P波约占六成"""
+    total = max(2, round(alarms / max(waves, 1)))
+    p_reports = max(1, math.ceil(total * 0.6))
+    return p_reports, max(1, total - p_reports)
+
+
+def write_alarm_tables(cursor, schema, waves, start, alarms, interference_ratio=0.05, missing_ratio=0.02,
+                       false_alarm_ratio=0.5, seed=0, history_waves=0, history_days=0):
+    """在 schema 下重建两张报警表并写入与标准答案匹配的报警，返回 (P波报警行数, S波报警行数)
+
+    history_waves 大于 0 时另外写入测试开始前 history_days 天内的历史报警，每个历史波形的报警条数与测试波形相同
+    """
+    p_reports, s_reports = reports_per_wave(waves, alarms)
+    # 报警集中在P波到时之后、波形结束之前（p_offset 最大60秒，持续时长100秒）
+    available = WAVE_DURATION - 60 - 3
+    params = {
+        'seed': str(seed),
+        'p_reports': p_reports,
+        's_reports': s_reports,
+        'p_step': min(1.0, available / p_reports),
+        's_step': min(0.2, available / s_reports),
+    }
+    cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    cursor.execute(f"DROP TABLE IF EXISTS {schema}.station_p_wave_alarm")
+    cursor.execute(f"DROP TABLE IF EXISTS {schema}.station_s_wave_alarm")
+    cursor.execute(P_ALARM_DDL.format(schema=schema))
+    cursor.execute(S_ALARM_DDL.format(schema=schema))
+    cursor.execute("DROP TABLE IF EXISTS pg_temp.synthetic_wave_plan")
+    cursor.execute(PLAN_DDL)
+    copy_plan(cursor, plan_rows(waves, start, interference_ratio, missing_ratio, false_alarm_ratio, seed))
+    if history_waves > 0 and history_days > 0:
+        copy_plan(cursor, history_plan_rows(history_waves, history_days, start, waves, seed))
+    cursor.execute(P_ALARM_SQL.format(schema=schema), params)
+    p_count = cursor.rowcount
+    cursor.execute(S_ALARM_SQL.format(schema=schema), params)
+    s_count = cursor.rowcount
+    # 主键在写入后再建，比逐行维护索引快
+    cursor.execute(f"ALTER TABLE {schema}.station_p_wave_alarm ADD PRIMARY KEY (station_p_wave_alarm_id)")
+    cursor.execute(f"ALTER TABLE {schema}.station_s_wave_alarm ADD PRIMARY KEY (station_s_wave_alarm_id)")
+    cursor.execute("DROP TABLE pg_temp.synthetic_wave_plan")
+    cursor.execute(f"ANALYZE {schema}.station_p_wave_alarm")
+    cursor.execute(f"ANALYZE {schema}.station_s_wave_alarm")
+    return p_count, s_count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="生成合成的标准答案CSV和报警表")
+    parser.add_argument('--answer-csv', default='SyntheticAnswers.csv', help='标准答案CSV输出路径')
+    parser.add_argument('--waves', type=int, default=1000, help='波形数量')
+    parser.add_argument('--start', default='2025-07-02 14:51:20', help='第一个波形的开始时间')
+    parser.add_argument('--interference-ratio', type=float, default=0.05, help='干扰波比例')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--schema', help='生成报警表的模式，不指定则只生成标准答案CSV（该模式下的报警表会被重建）')
+    parser.add_argument('--alarms', type=int, default=10000, help='P波和S波报警的目标总行数')
+    parser.add_argument('--missing-ratio', type=float, default=0.02, help='地震波中没有任何报警（漏报）的比例')
+    parser.add_argument('--false-alarm-ratio', type=float, default=0.5, help='干扰波中产生P波误报的比例')
+    parser.add_argument('--history-days', type=int, default=0, help='在测试开始前的该天数内生成历史报警（不在标准答案窗口内）')
+    parser.add_argument('--history-waves', type=int, default=0, help='历史地震波数量，报警条数按测试波形的每波条数计算')
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    start = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S')
+    count = write_answer_csv(args.answer_csv, args.waves, start, args.interference_ratio, args.seed)
+    print(f"已生成 {count} 行标准答案: {args.answer_csv}")
+    if args.schema:
+        conn = psycopg2.connect(**get_db_config(args))
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                p_count, s_count = write_alarm_tables(cursor, args.schema, args.waves, start, args.alarms,
+                                                      args.interference_ratio, args.missing_ratio,
+                                                      args.false_alarm_ratio, args.seed,
+                                                      args.history_waves, args.history_days)
+            print(f"已在模式 {args.schema} 下生成 P波报警 {p_count} 行, S波报警 {s_count} 行")
+        finally:
+            conn.close()
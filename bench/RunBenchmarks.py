@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+端到端基准：生成合成数据后依次计时导入标准答案、全量统计SQL和导出，结果追加到CSV，便于跨版本比较。
+
+每个规模（波形数:报警数）都会重建 --schema 下的报警表，并覆盖 public 下的标准答案和统计结果表，
+请在专用的测试库上运行。结果文件中记录当前 git 提交，同一规模的历史结果会在结束时一并列出。
+"""
+import argparse
+import csv
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import psycopg2
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from CreateAlarmIndexes import INDEX_SPECS, index_sql  # noqa: E402
+from GenerateSyntheticData import write_alarm_tables, write_answer_csv  # noqa: E402
+from SqlPipeline import QUERY_STAGES, get_db_config, query_stages, run_stages, stage_seconds  # noqa: E402
+
+# SqlPipeline.QUERY_STAGES 中各阶段计入的结果列，统计汇总和统计表合计为 summary_s
+STAGE_COLUMNS = {
+    '标准答案匹配': 'wave_info_s',
+    '对比结果': 'compare_s',
+    '统计汇总': 'summary_s',
+    '统计表': 'summary_s',
+    '数据明细': 'details_s',
+}
+
+RESULT_COLUMNS = [
+    'run_at', 'commit', 'label', 'waves', 'p_alarms', 's_alarms', 'indexes', 'server_version',
+    'generate_s', 'import_s', 'pipeline_s', *dict.fromkeys(STAGE_COLUMNS.values()), 'export_s', 'failed_statements',
+]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def parse_scale(text):
+    waves, alarms = text.split(':')
+    return int(waves), int(alarms)
+
+
+def db_args(db_config):
+    args = []
+    for key in ('host', 'port', 'dbname', 'user', 'password'):
+        args += [f'--{key}', str(db_config[key])]
+    return args
+
+
+def run_script(name, args, workdir):
+    """在 workdir 中运行 scripts 下的脚本，日志和导出文件都留在 workdir，返回耗时（秒）"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, name), *args], cwd=workdir,
+                            capture_output=True, text=True, encoding='utf-8', errors='replace')
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+        raise RuntimeError(f"{name} 执行失败，退出码 {result.returncode}")
+    return elapsed
+
+
+def create_indexes(cursor, schema, supports_include):
+    for table, suffix, columns, include, predicate in INDEX_SPECS:
+        cursor.execute(index_sql(schema, table, f"idx_{table}_{suffix}", columns, include, predicate, False,
+                                 supports_include))
+        cursor.execute(f"ANALYZE {schema}.{table}")
+
+
+def bench_scale(conn, db_config, args, waves, alarms, workdir):
+    row = {'waves': waves, 'indexes': args.with_indexes, 'server_version': conn.server_version}
+    start_time = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S')
+    csv_path = os.path.join(workdir, 'SyntheticAnswers.csv')
+
+    start = time.perf_counter()
+    write_answer_csv(csv_path, waves, start_time, args.interference_ratio, args.seed)
+    with conn.cursor() as cursor:
+        row['p_alarms'], row['s_alarms'] = write_alarm_tables(
+            cursor, args.schema, waves, start_time, alarms, args.interference_ratio, args.missing_ratio,
+            args.false_alarm_ratio, args.seed)
+        if args.with_indexes:
+            create_indexes(cursor, args.schema, conn.server_version >= 110000)
+    row['generate_s'] = time.perf_counter() - start
+    print(f"  生成数据: 波形 {waves}, P波报警 {row['p_alarms']}, S波报警 {row['s_alarms']}, "
+          f"{row['generate_s']:.2f} 秒")
+
+    row['import_s'] = run_script('InsertStandAnswerToDb.py', [csv_path, *db_args(db_config)], workdir)
+    print(f"  导入标准答案: {row['import_s']:.2f} 秒")
+
+    # 统计SQL可重复多次，取总耗时中位数那一次的分阶段耗时
+    runs = []
+    for _ in range(args.repeat):
+        records = run_stages(conn, args.schema, query_stages())
+        totals = stage_seconds(records)
+        runs.append((sum(totals.values()), totals, sum(1 for record in records if not record['ok'])))
+    runs.sort(key=lambda run: run[0])
+    pipeline_s, totals, failed = runs[(len(runs) - 1) // 2]
+    row['pipeline_s'] = pipeline_s
+    for stage, _ in QUERY_STAGES:
+        column = STAGE_COLUMNS[stage]
+        row[column] = row.get(column, 0) + totals.get(stage, 0)
+    row['failed_statements'] = failed
+    print(f"  统计SQL: {pipeline_s:.2f} 秒（中位数，共 {args.repeat} 次），失败语句 {failed} 条")
+
+    export_args = db_args(db_config) + (['--stream'] if args.stream_export else [])
+    row['export_s'] = run_script('ExportResultToExcel.py', export_args, workdir)
+    print(f"  导出: {row['export_s']:.2f} 秒")
+    return row
+
+
+def append_results(path, rows):
+    exists = os.path.exists(path)
+    with open(path, 'a', encoding='utf-8-sig' if not exists else 'utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        if not exists:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({key: f"{value:.3f}" if isinstance(value, float) else value for key, value in row.items()})
+
+
+def print_history(path, scales):
+    """列出结果文件中与本次相同规模的历史记录"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        history = [row for row in csv.DictReader(f)
+                   if (int(row['waves']), int(row['p_alarms']) + int(row['s_alarms'])) in scales]
+    print(f"{'时间':<20}{'提交':<10}{'标签':<12}{'波形':>9}{'报警':>10}{'索引':>6}"
+          f"{'导入':>9}{'统计SQL':>9}{'导出':>9}")
+    for row in history:
+        print(f"{row['run_at']:<20}{row['commit']:<10}{row['label']:<12}{row['waves']:>9}"
+              f"{int(row['p_alarms']) + int(row['s_alarms']):>10}{row['indexes']:>6}"
+              f"{float(row['import_s']):>9.2f}{float(row['pipeline_s']):>9.2f}{float(row['export_s']):>9.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="导入、统计SQL和导出的端到端基准")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--scales', nargs='+', default=['1000:10000'],
+                        help='一个或多个 波形数:报警总数，例如 1000:10000 100000:5000000')
+    parser.add_argument('--schema', default='bench_synthetic', help='合成报警表所在模式，每个规模都会重建')
+    parser.add_argument('--with-indexes', action='store_true', help='生成数据后创建 CreateAlarmIndexes.py 中的索引')
+    parser.add_argument('--repeat', type=int, default=1, help='统计SQL的重复次数')
+    parser.add_argument('--stream-export', action='store_true', help='导出时使用 --stream 流式导出明细')
+    parser.add_argument('--results', default='benchmark_results.csv', help='结果追加写入的CSV文件')
+    parser.add_argument('--label', default='', help='写入结果的备注，例如机器名或参数说明')
+    parser.add_argument('--start', default='2025-07-02 14:51:20', help='第一个波形的开始时间')
+    parser.add_argument('--interference-ratio', type=float, default=0.05, help='干扰波比例')
+    parser.add_argument('--missing-ratio', type=float, default=0.02, help='地震波中没有任何报警（漏报）的比例')
+    parser.add_argument('--false-alarm-ratio', type=float, default=0.5, help='干扰波中产生P波误报的比例')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--keep', action='store_true', help='保留合成报警表和导入导出的工作目录')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db_config = get_db_config(args)
+    conn = psycopg2.connect(**db_config)
+    conn.autocommit = True
+    run_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    commit = git_commit()
+    rows = []
+    try:
+        for scale in args.scales:
+            waves, alarms = parse_scale(scale)
+            print(f"规模 {waves}:{alarms}")
+            workdir = tempfile.mkdtemp(prefix='stat_bench_')
+            try:
+                row = bench_scale(conn, db_config, args, waves, alarms, workdir)
+            finally:
+                if args.keep:
+                    print(f"  工作目录: {workdir}")
+                else:
+                    shutil.rmtree(workdir, ignore_errors=True)
+            row.update({'run_at': run_at, 'commit': commit, 'label': args.label})
+            rows.append(row)
+        append_results(args.results, rows)
+        print(f"结果已追加到 {args.results}")
+        print_history(args.results, {(row['waves'], row['p_alarms'] + row['s_alarms']) for row in rows})
+    finally:
+        if not args.keep:
+            with conn.cursor() as cursor:
+                cursor.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.close()
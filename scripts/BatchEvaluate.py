@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+多模式批量评估
+
+同一份标准答案对多个区域中心的报警模式（每个模式一套 station_p_wave_alarm / station_s_wave_alarm）评分，
+各模式在各自的连接上同时执行统计SQL，最后把各模式的统计表合并成一个对比工作簿。
+
+界面和 SqlPipeline.py 一次只评估一个模式，统计表写入 public 下的固定表名，两次评估不能同时进行。这里：
+  1. 标准答案表的预处理（计算 next_send_time）只与标准答案有关，先在一个连接上执行一次；
+     否则各模式的事务都要对 public.standanswer_p_wave_alarm 加排他锁，只能依次执行
+  2. 其余语句按事务模式改写：中间表、统计表和数据明细都建为会话临时表，各连接互不干扰；
+     全部成功后发布到该模式的结果模式 <--result-prefix><模式>，失败时回滚，结果模式保持上次的结果
+  3. 各模式的统计表读出后写入 多模式对比_<时间>.xlsx：“对比汇总”页每个统计量一行、每个模式一列，
+     其后每张统计表一页（首列为模式），“运行情况”页为各模式的耗时和失败的语句数
+public 下的统计表、运行缓存和水位线均不受影响。
+"""
+import argparse
+import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import psycopg2
+
+from SqlPipeline import PUBLISHED_TABLES, SQL_DIR, get_db_config, query_stages, run_stages, transactional_stages
+
+logger = logging.getLogger(__name__)
+
+# 只写标准答案表本身的语句，与被评估的模式无关，批量评估前执行一次
+SHARED_STATEMENT = re.compile(r'^\s*(?:ALTER\s+TABLE|UPDATE)\s+public\.standanswer_p_wave_alarm\b', re.I | re.M)
+
+SCHEMA_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
+
+STAT_TABLES = [table.lower() for table in PUBLISHED_TABLES if table != 'details']
+
+# 对比汇总中用于区分同一张表中各行的列，其余列各作为一个统计量
+ROW_KEY_COLUMNS = ['项目', '指标', '区间']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多模式批量评估")
+    parser.add_argument('schemas', nargs='+', help='报警表所在的模式，可指定多个')
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--workers', type=int, default=0, help='同时评估的模式数，0 表示全部同时评估')
+    parser.add_argument('--result-prefix', default='batch_',
+                        help='结果模式名的前缀，各模式的统计表和数据明细发布到 <前缀><模式> 下')
+    parser.add_argument('--output', help='对比工作簿的文件名，默认为 多模式对比_<时间>.xlsx')
+    parser.add_argument('--history-dir', help='把评估成功的各模式的结果保存到该运行历史目录（见 RunHistory.py）')
+    parser.add_argument('--sql-dir', default=SQL_DIR, help='SQL文件所在目录')
+    return parser.parse_args()
+
+
+def split_shared(stages):
+    """拆出只写标准答案表的语句，返回 (共用语句, 其余各阶段)"""
+    shared = []
+    result = []
+    for name, statements in stages:
+        result.append((name, [statement for statement in statements if not SHARED_STATEMENT.search(statement)]))
+        shared += [statement for statement in statements if SHARED_STATEMENT.search(statement)]
+    return shared, result
+
+
+def check_schemas(cursor, schemas, prefix):
+    """模式名须为小写标识符、报警表齐全，且与结果模式不重名"""
+    for schema in schemas:
+        if not SCHEMA_NAME.match(schema):
+            raise ValueError(f"模式名 {schema} 须由小写字母、数字和下划线组成")
+        if schema.startswith(prefix) or schema == 'public':
+            raise ValueError(f"模式 {schema} 不能作为被评估的模式")
+        cursor.execute("SELECT to_regclass(%s), to_regclass(%s)",
+                       (f'{schema}.station_p_wave_alarm', f'{schema}.station_s_wave_alarm'))
+        if None in cursor.fetchone():
+            raise ValueError(f"模式 {schema} 中缺少 station_p_wave_alarm 或 station_s_wave_alarm")
+    if len(set(schemas)) != len(schemas):
+        raise ValueError("模式重复")
+
+
+def evaluate_schema(db_config, schema, target, stages):
+    """在单独的连接上评估一个模式，返回运行情况"""
+    threading.current_thread().name = schema
+    start = time.perf_counter()
+    conn = psycopg2.connect(**db_config)
+    try:
+        records = run_stages(conn, schema, stages, transactional=True)
+    finally:
+        conn.close()
+    failed = [record for record in records if not record['ok']]
+    elapsed = time.perf_counter() - start
+    if failed:
+        logger.error("评估失败，%s 保持上次的结果，耗时 %.2f 秒", target, elapsed)
+    else:
+        logger.info("评估完成，结果已发布到 %s，耗时 %.2f 秒", target, elapsed)
+    return {
+        '模式': schema,
+        '结果模式': target,
+        '状态': '失败' if failed else '成功',
+        '耗时(秒)': round(elapsed, 2),
+        '语句数': len(records),
+        '失败语句数': len(failed),
+        '错误': failed[0]['error'] if failed else '',
+    }
+
+
+def read_results(cursor, schema, target):
+    """读出结果模式下的各统计表，首列为模式"""
+    tables = {}
+    for table in STAT_TABLES:
+        cursor.execute(f"SELECT * FROM {target}.{table}")
+        frame = pd.DataFrame(cursor.fetchall(), columns=[column.name for column in cursor.description], dtype=object)
+        frame.insert(0, '模式', schema)
+        tables[table] = frame
+    return tables
+
+
+def comparison_sheet(results, schemas):
+    """每个统计量一行、每个模式一列"""
+    rows = {}
+    for schema in schemas:
+        for table in STAT_TABLES:
+            frame = results[schema][table]
+            keys = [column for column in ROW_KEY_COLUMNS if column in frame.columns]
+            for record in frame.to_dict('records'):
+                item = ' / '.join(str(record[key]) for key in keys)
+                for column, value in record.items():
+                    if column in keys or column in ('模式', '序号'):
+                        continue
+                    rows.setdefault((item, column), {})[schema] = value
+    return pd.DataFrame([{'项目': item, '统计量': column, **values} for (item, column), values in rows.items()],
+                        columns=['项目', '统计量'] + schemas)
+
+
+def write_workbook(filename, results, schemas, runs):
+    from ExportResultToExcel import autofit_column_width, format_datetime_columns, set_worksheet_font
+
+    sheets = [('对比汇总', comparison_sheet(results, schemas))]
+    for table in STAT_TABLES:
+        frame = pd.concat([results[schema][table] for schema in schemas], ignore_index=True)
+        sheets.append((table[:31], format_datetime_columns(frame)))
+    sheets.append(('运行情况', pd.DataFrame(runs)))
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        for sheet_name, frame in sheets:
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+            ws = writer.sheets[sheet_name]
+            autofit_column_width(ws, frame)
+            set_worksheet_font(ws, frame)
+
+
+def main(args):
+    db_config = get_db_config(args)
+    schemas = [schema.lower() for schema in args.schemas]
+    targets = {schema: args.result_prefix + schema for schema in schemas}
+    shared, stages = split_shared(query_stages(args.sql_dir))
+
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            check_schemas(cursor, schemas, args.result_prefix)
+            start = time.perf_counter()
+            for statement in shared:
+                cursor.execute(statement)
+            for target in targets.values():
+                cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {target}")
+        conn.commit()
+        logger.info("标准答案预处理完成，耗时 %.2f 秒", time.perf_counter() - start)
+
+        workers = len(schemas) if args.workers <= 0 else min(args.workers, len(schemas))
+        logger.info("评估 %d 个模式: %s，%d 个连接同时执行", len(schemas), ', '.join(schemas), workers)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(evaluate_schema, db_config, schema, targets[schema],
+                                       transactional_stages(stages, targets[schema]))
+                       for schema in schemas]
+            runs = [future.result() for future in futures]
+        logger.info("全部模式评估结束，耗时 %.2f 秒", time.perf_counter() - start)
+
+        if args.history_dir:
+            from RunHistory import save_run
+            for run in runs:
+                if run['状态'] == '成功':
+                    save_run(conn, args.history_dir, run['结果模式'], run['模式'], sql_dir=args.sql_dir)
+
+        # 失败的模式若已有上次的结果仍然列出，运行情况中标明
+        results = {}
+        with conn.cursor() as cursor:
+            for run in runs:
+                schema = run['模式']
+                cursor.execute("SELECT to_regclass(%s)", (f"{run['结果模式']}.{STAT_TABLES[-1]}",))
+                if cursor.fetchone()[0] is None:
+                    logger.warning("%s 没有可用的结果，不列入对比", run['结果模式'])
+                    continue
+                results[schema] = read_results(cursor, schema, run['结果模式'])
+        conn.rollback()
+    finally:
+        conn.close()
+
+    compared = [schema for schema in schemas if schema in results]
+    if compared:
+        filename = args.output or f"多模式对比_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        write_workbook(filename, results, compared, runs)
+        logger.info("对比工作簿已写入 %s", filename)
+    return all(run['状态'] == '成功' for run in runs)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s',
+        handlers=[
+            logging.FileHandler('batch_evaluate.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        sys.exit(0 if main(parse_args()) else 1)
+    except (psycopg2.Error, OSError, ValueError) as e:
+        logger.error("批量评估出错: %s", str(e).strip())
+        sys.exit(1)
@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+检查并创建报警表上窗口匹配所需的索引
+
+waveInfoTables.sql 按 jk_time 落在标准答案窗口内匹配报警（S波在每个窗口的聚合中按 x_acc_value 阈值取首报），
+idMatchedTables.sql 按 earth_id 分组取最早 jk_time。报警表没有这些列上的索引时，
+每个窗口都会顺序扫描整张报警表。本脚本检查所选模式下缺失的索引并创建，
+前后分别对匹配查询做 EXPLAIN，输出代价对比。
+"""
+import argparse
+import configparser
+import json
+import logging
+import os
+import sys
+import time
+
+import psycopg2
+
+# 配置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('create_index.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# (表名, 索引名后缀, 索引列, INCLUDE列, 部分索引条件)
+# S波的80/120gal首报在窗口聚合内用 FILTER 得出，由 jk_time 索引 INCLUDE 的 x_acc_value 覆盖
+INDEX_SPECS = [
+    ('station_p_wave_alarm', 'jk_time', 'jk_time',
+     'rcv_jktime, sta_code, device_code, source_longitude, source_latitude, epi_dist, azi_angle, earthquake_level',
+     None),
+    ('station_p_wave_alarm', 'earth_id_jk_time', 'earth_id, jk_time', 'rcv_jktime', None),
+    ('station_s_wave_alarm', 'jk_time', 'jk_time', 'rcv_jktime, sta_code, device_code, x_acc_value', None),
+    ('station_s_wave_alarm', 'earth_id_jk_time', 'earth_id, jk_time', 'rcv_jktime, x_acc_value', None),
+]
+
+# 早期版本为逐阈值查找S波首报创建的部分索引，匹配查询已不再使用，只增加报警写入的开销
+OBSOLETE_INDEXES = [
+    'idx_station_s_wave_alarm_jk_time_80gal',
+    'idx_station_s_wave_alarm_jk_time_120gal',
+]
+
+# 与 waveInfoTables.sql 中 P_matched_details、S_matched_details 相同形状的匹配查询，用于 EXPLAIN 代价对比；
+# {schema} 为报警表所在模式
+WINDOW_PROBES = [
+    ('P波窗口首报', """
+        SELECT stand.id, p_min.*
+        FROM public.stand_answer stand
+            LEFT JOIN LATERAL (
+                SELECT jk_time, rcv_jktime, sta_code, device_code, source_longitude, source_latitude,
+                    epi_dist, azi_angle, earthquake_level
+                FROM {schema}.station_p_wave_alarm p
+                WHERE p.jk_time BETWEEN stand.send_time AND stand.next_send_time
+                    AND p.jk_time BETWEEN (SELECT MIN(send_time) FROM public.stand_answer)
+                        AND (SELECT MAX(next_send_time) FROM public.stand_answer)
+                ORDER BY jk_time ASC
+                LIMIT 1
+            ) p_min ON TRUE"""),
+    ('S波窗口聚合', """
+        SELECT stand.id, s_agg.*
+        FROM public.stand_answer stand
+            LEFT JOIN LATERAL (
+                SELECT
+                    MIN(s.jk_time) AS first_jk_time,
+                    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time))[1] AS first_rcv_jktime,
+                    MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 80) AS gal80_jk_time,
+                    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+                    MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 120) AS gal120_jk_time,
+                    (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 120))[1] AS gal120_rcv_jktime,
+                    (ARRAY_AGG(s.sta_code ORDER BY s.jk_time))[1] AS sta_code,
+                    (ARRAY_AGG(s.device_code ORDER BY s.jk_time))[1] AS device_code,
+                    ROUND(MAX(s.x_acc_value)::NUMERIC, 3) AS wave_peak
+                FROM {schema}.station_s_wave_alarm s
+                WHERE s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+                    AND s.jk_time BETWEEN (SELECT MIN(send_time) FROM public.stand_answer)
+                        AND (SELECT MAX(next_send_time) FROM public.stand_answer)
+            ) s_agg ON TRUE
+        WHERE stand.actual_peak >= 40"""),
+]
+
+# 与 idMatchedTables.sql 中 stat_refresh_id_matched 相同形状的查询：P波 DISTINCT ON，S波按 earth_id 一次聚合。
+# 全量刷新处理全部 earth_id；增量刷新只处理新报警所属的 earth_id（stat_changed_earth_id），这里取最近写入的100条报警的 earth_id
+P_EARTH_ID_SQL = """
+        SELECT DISTINCT ON (p.earth_id)
+            p.earth_id, p.jk_time, p.rcv_jktime
+        FROM {schema}.station_p_wave_alarm p
+        WHERE TRUE{changed}
+        ORDER BY p.earth_id, p.jk_time"""
+
+S_EARTH_ID_SQL = """
+        SELECT
+            earth_id,
+            MIN(jk_time) AS jk_time,
+            (ARRAY_AGG(rcv_jktime ORDER BY jk_time))[1] AS rcv_jktime,
+            MIN(jk_time) FILTER (WHERE x_acc_value >= 80) AS gal80_jk_time,
+            (ARRAY_AGG(rcv_jktime ORDER BY jk_time) FILTER (WHERE x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+            MIN(jk_time) FILTER (WHERE x_acc_value >= 120) AS gal120_jk_time,
+            (ARRAY_AGG(rcv_jktime ORDER BY jk_time) FILTER (WHERE x_acc_value >= 120))[1] AS gal120_rcv_jktime
+        FROM {schema}.station_s_wave_alarm
+        WHERE TRUE{changed}
+        GROUP BY earth_id"""
+
+CHANGED_EARTH_ID = """
+            AND earth_id IN (SELECT earth_id FROM {schema}.%s ORDER BY jk_time DESC NULLS LAST LIMIT 100)"""
+
+EARTH_ID_PROBES = [
+    ('P波按earth_id首报（全量）', P_EARTH_ID_SQL.replace('{changed}', '')),
+    ('S波按earth_id聚合（全量）', S_EARTH_ID_SQL.replace('{changed}', '')),
+    ('P波按earth_id首报（增量）', P_EARTH_ID_SQL.replace('{changed}', CHANGED_EARTH_ID % 'station_p_wave_alarm')),
+    ('S波按earth_id聚合（增量）', S_EARTH_ID_SQL.replace('{changed}', CHANGED_EARTH_ID % 'station_s_wave_alarm')),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="检查并创建报警表匹配索引")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='报警表所在模式')
+    parser.add_argument('--check-only', action='store_true', help='只检查缺失和多余的索引及查询代价，不创建也不删除')
+    parser.add_argument('--no-concurrently', action='store_true',
+                        help='不使用 CONCURRENTLY（建索引期间会阻塞写入，但速度更快）')
+    return parser.parse_args()
+
+def load_config():
+    # 优先当前工作目录
+    config_path = os.path.join(os.getcwd(), 'config.ini')
+    if not os.path.exists(config_path):
+        # 兼容未打包时
+        config_path = os.path.join(os.path.dirname(sys.argv[0]), 'config.ini')
+    if not os.path.exists(config_path):
+        raise FileNotFoundError("config.ini 未找到")
+    try:
+        config = configparser.ConfigParser()
+        config.read(config_path, encoding='utf-8')
+        if 'database' not in config:
+            logger.error("配置文件中缺少 [database] 部分")
+            raise KeyError("缺少 [database] 部分")
+        db = config['database']
+        db_config = {
+            'host': db.get('host', 'localhost'),
+            'port': db.getint('port', 5432),
+            'dbname': db.get('dbname'),
+            'user': db.get('user'),
+            'password': db.get('password')
+        }
+        missing = [key for key in ['dbname', 'user'] if not db_config[key]]
+        if missing:
+            logger.error("配置文件中缺少必要的数据库信息: %s", ", ".join(missing))
+            raise ValueError("缺少必要的数据库配置")
+        logger.info("已成功加载数据库配置")
+        return db_config
+    except Exception as e:
+        logger.error("加载配置文件时出错: %s", str(e))
+        raise
+
+def get_db_config(args):
+    if args.host and args.port and args.dbname and args.user and args.password:
+        return {
+            'host': args.host,
+            'port': args.port,
+            'dbname': args.dbname,
+            'user': args.user,
+            'password': args.password
+        }
+    return load_config()
+
+def table_kind(cursor, schema, table):
+    """返回表的 relkind（r 普通表，p 分区表），表不存在时返回 None"""
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relname = %s
+    """, (schema, table))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def index_state(cursor, schema, index_name):
+    """返回索引是否有效，索引不存在时返回 None"""
+    cursor.execute("""
+        SELECT i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND c.relname = %s
+    """, (schema, index_name))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def index_sql(schema, table, index_name, columns, include, predicate, concurrently, supports_include):
+    sql = f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {index_name} ON {schema}.{table} ({columns})"
+    if include and supports_include:
+        sql += f" INCLUDE ({include})"
+    if predicate:
+        sql += f" WHERE {predicate}"
+    return sql
+
+def explain_cost(cursor, sql):
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    indexes = set()
+
+    def walk(node):
+        if 'Index Name' in node:
+            indexes.add(node['Index Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(root)
+    return root['Total Cost'], sorted(indexes)
+
+def collect_costs(cursor, probes, schema):
+    costs = {}
+    for name, sql in probes:
+        try:
+            costs[name] = explain_cost(cursor, sql.format(schema=schema))
+        except Exception as e:
+            logger.warning("EXPLAIN %s 失败: %s", name, str(e).splitlines()[0])
+    return costs
+
+def main(args):
+    schema = args.schema
+    try:
+        db_config = get_db_config(args)
+    except Exception as e:
+        logger.error(f"数据库配置加载失败: {e}")
+        return False
+
+    try:
+        conn = psycopg2.connect(**db_config)
+    except Exception as e:
+        logger.error(f"数据库连接失败: {e}")
+        return False
+    # CREATE INDEX CONCURRENTLY 不能在事务块中执行
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    try:
+        tables = sorted({spec[0] for spec in INDEX_SPECS})
+        kinds = {}
+        for table in tables:
+            kinds[table] = table_kind(cursor, schema, table)
+            if kinds[table] is None:
+                logger.error("模式 %s 中不存在表 %s", schema, table)
+                return False
+            cursor.execute(f"ANALYZE {schema}.{table}")
+
+        # 标准答案窗口表由查询生成，未查询过时只对比 earth_id 分组查询
+        cursor.execute("SELECT to_regclass('public.stand_answer') IS NOT NULL")
+        probes = (WINDOW_PROBES if cursor.fetchone()[0] else []) + EARTH_ID_PROBES
+        if len(probes) == len(EARTH_ID_PROBES):
+            logger.warning("public.stand_answer 不存在，跳过窗口匹配查询的代价对比")
+        before = collect_costs(cursor, probes, schema)
+
+        supports_include = conn.server_version >= 110000
+        if not supports_include:
+            logger.warning("数据库版本低于 11，不支持 INCLUDE，将创建普通索引")
+
+        missing = []
+        for table, suffix, columns, include, predicate in INDEX_SPECS:
+            index_name = f"idx_{table}_{suffix}"
+            state = index_state(cursor, schema, index_name)
+            if state is True:
+                logger.info("索引 %s.%s 已存在", schema, index_name)
+                continue
+            if state is False:
+                logger.warning("索引 %s.%s 无效（上次并发创建中断），将重建", schema, index_name)
+            else:
+                logger.info("缺少索引 %s.%s", schema, index_name)
+            missing.append((table, index_name, columns, include, predicate, state))
+
+        obsolete = [name for name in OBSOLETE_INDEXES if index_state(cursor, schema, name) is not None]
+        for index_name in obsolete:
+            logger.info("索引 %s.%s 已不被匹配查询使用", schema, index_name)
+
+        if args.check_only:
+            logger.info("共缺少 %d 个索引、多余 %d 个索引（仅检查模式，未创建或删除）", len(missing), len(obsolete))
+        else:
+            for index_name in obsolete:
+                concurrently = not args.no_concurrently and kinds['station_s_wave_alarm'] != 'p'
+                try:
+                    cursor.execute(f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {schema}.{index_name}")
+                    logger.info("删除索引 %s.%s 完成", schema, index_name)
+                except Exception as e:
+                    logger.error("删除索引 %s.%s 失败: %s", schema, index_name, str(e).splitlines()[0])
+            for table, index_name, columns, include, predicate, state in missing:
+                # 分区表不支持 CONCURRENTLY
+                concurrently = not args.no_concurrently and kinds[table] != 'p'
+                try:
+                    if state is False:
+                        cursor.execute(
+                            f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {schema}.{index_name}")
+                    sql = index_sql(schema, table, index_name, columns, include, predicate,
+                                    concurrently, supports_include)
+                    start = time.time()
+                    cursor.execute(sql)
+                    logger.info("创建索引 %s.%s 完成，耗时 %.2f 秒", schema, index_name, time.time() - start)
+                except Exception as e:
+                    logger.error("创建索引 %s.%s 失败: %s", schema, index_name, str(e).splitlines()[0])
+            for table in tables:
+                cursor.execute(f"ANALYZE {schema}.{table}")
+
+        after = collect_costs(cursor, probes, schema)
+        logger.info("=== 匹配查询 EXPLAIN 代价对比 ===")
+        for name, _ in probes:
+            if name not in before or name not in after:
+                continue
+            cost_before, _ = before[name]
+            cost_after, used = after[name]
+            ratio = cost_before / cost_after if cost_after > 0 else float('inf')
+            logger.info("%s: %.2f -> %.2f (%.1f 倍)，使用索引: %s", name, cost_before, cost_after,
+                        ratio, ", ".join(used) if used else "无")
+        return True
+    except Exception as e:
+        logger.error("致命错误: %s", str(e))
+        return False
+    finally:
+        cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    if main(parse_args()):
+        logger.info("=== 索引检查完成 ===")
+        sys.exit(0)
+    else:
+        logger.error("=== 索引检查失败，请查看日志 ===")
+        sys.exit(1)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+比较两次运行报告（sql_profile_*.json 或 .csv），找出变慢的语句和执行计划的变化
+
+报告由界面在 config.ini 的 [profiling] 开启后写入程序目录。语句按 (阶段, 首行内容, 出现次数) 对应，
+SQL 文件中间插入或删除语句后其余语句仍能对上。两份报告都带执行计划时，比较计划中的节点类型、
+表名和索引名，报警表变大后从索引扫描退化为顺序扫描之类的变化会标记出来。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+
+def load_report(path):
+    """读取运行报告，返回 (概要信息, 语句列表)"""
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            statements = [
+                {
+                    'stage': row['stage'],
+                    'index': int(row['index']),
+                    'label': row['label'],
+                    'elapsed_ms': int(row['elapsed_ms']),
+                    'rows': int(row['rows']),
+                    'ok': row['ok'] == 'true',
+                    'error': row['error'],
+                }
+                for row in csv.DictReader(f)
+            ]
+        return {'started_at': os.path.basename(path)}, statements
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report, report.get('statements', [])
+
+
+def statement_key(statements):
+    """为每条语句生成 (阶段, 首行内容, 第几次出现) 作为对应关系"""
+    seen = {}
+    keyed = {}
+    for statement in statements:
+        base = (statement['stage'], statement['label'])
+        seen[base] = seen.get(base, 0) + 1
+        keyed[base + (seen[base],)] = statement
+    return keyed
+
+
+def plan_signature(node):
+    """按先序遍历列出计划节点，例如 'Hash Join > Seq Scan on station_p_wave_alarm > Hash'"""
+    if not node:
+        return ''
+    text = node.get('Node Type', '')
+    if node.get('Relation Name'):
+        text += f" on {node['Relation Name']}"
+    if node.get('Index Name'):
+        text += f" using {node['Index Name']}"
+    children = [plan_signature(child) for child in node.get('Plans', [])]
+    return ' > '.join([text] + children)
+
+
+def compare(base_statements, new_statements, threshold, min_ms):
+    base_keyed = statement_key(base_statements)
+    new_keyed = statement_key(new_statements)
+    rows = []
+    for key in list(base_keyed) + [k for k in new_keyed if k not in base_keyed]:
+        base = base_keyed.get(key)
+        new = new_keyed.get(key)
+        flags = []
+        if base is None:
+            flags.append('新增')
+        elif new is None:
+            flags.append('缺失')
+        else:
+            if not new['ok'] and base['ok']:
+                flags.append('失败')
+            slower = new['elapsed_ms'] >= base['elapsed_ms'] * threshold
+            if slower and new['elapsed_ms'] - base['elapsed_ms'] >= min_ms:
+                flags.append('变慢')
+            base_plan = plan_signature(base.get('plan', {}).get('Plan'))
+            new_plan = plan_signature(new.get('plan', {}).get('Plan'))
+            if base_plan and new_plan and base_plan != new_plan:
+                flags.append('计划变化')
+        rows.append({
+            'stage': key[0],
+            'label': key[1],
+            'base_ms': base['elapsed_ms'] if base else None,
+            'new_ms': new['elapsed_ms'] if new else None,
+            'base_rows': base['rows'] if base else None,
+            'new_rows': new['rows'] if new else None,
+            'flags': flags,
+            'base_plan': plan_signature(base.get('plan', {}).get('Plan')) if base else '',
+            'new_plan': plan_signature(new.get('plan', {}).get('Plan')) if new else '',
+        })
+    return rows
+
+
+def format_ratio(row):
+    if row['base_ms'] is None or row['new_ms'] is None:
+        return '-'
+    return f"{row['new_ms'] / max(row['base_ms'], 1):.2f}"
+
+
+def print_rows(rows, show_all):
+    print(f"{'阶段':<24}{'语句':<48}{'基准ms':>10}{'本次ms':>10}{'倍数':>8}{'基准行数':>10}{'本次行数':>10}  标记")
+    for row in rows:
+        if not show_all and not row['flags']:
+            continue
+        print(f"{row['stage']:<24}{row['label'][:46]:<48}"
+              f"{'-' if row['base_ms'] is None else row['base_ms']:>10}"
+              f"{'-' if row['new_ms'] is None else row['new_ms']:>10}"
+              f"{format_ratio(row):>8}"
+              f"{'-' if row['base_rows'] is None else row['base_rows']:>10}"
+              f"{'-' if row['new_rows'] is None else row['new_rows']:>10}"
+              f"  {','.join(row['flags'])}")
+        if '计划变化' in row['flags']:
+            print(f"    基准计划: {row['base_plan']}")
+            print(f"    本次计划: {row['new_plan']}")
+
+
+def write_csv(rows, path):
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['stage', 'label', 'base_ms', 'new_ms', 'ratio', 'base_rows', 'new_rows', 'flags',
+                         'base_plan', 'new_plan'])
+        for row in rows:
+            writer.writerow([row['stage'], row['label'], row['base_ms'], row['new_ms'], format_ratio(row),
+                             row['base_rows'], row['new_rows'], ','.join(row['flags']),
+                             row['base_plan'], row['new_plan']])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="比较两次SQL运行报告")
+    parser.add_argument('base', help='基准运行报告（sql_profile_*.json 或 .csv）')
+    parser.add_argument('new', help='本次运行报告')
+    parser.add_argument('--threshold', type=float, default=1.5, help='耗时达到基准的多少倍视为变慢')
+    parser.add_argument('--min-ms', type=int, default=100, help='耗时增加不足该毫秒数的语句不标记为变慢')
+    parser.add_argument('--all', action='store_true', help='列出全部语句，而不只是有标记的语句')
+    parser.add_argument('--csv', help='将比较结果另存为CSV')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='有语句变慢、失败或计划变化时以退出码1结束')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    base_info, base_statements = load_report(args.base)
+    new_info, new_statements = load_report(args.new)
+    rows = compare(base_statements, new_statements, args.threshold, args.min_ms)
+
+    base_total = sum(s['elapsed_ms'] for s in base_statements)
+    new_total = sum(s['elapsed_ms'] for s in new_statements)
+    print(f"基准: {base_info.get('started_at')}  语句 {len(base_statements)} 条, 合计 {base_total} ms")
+    print(f"本次: {new_info.get('started_at')}  语句 {len(new_statements)} 条, 合计 {new_total} ms")
+    print_rows(rows, args.all)
+    if args.csv:
+        write_csv(rows, args.csv)
+        print(f"比较结果已写入 {args.csv}")
+
+    regressions = [row for row in rows if {'变慢', '失败', '计划变化'} & set(row['flags'])]
+    print(f"变慢/失败/计划变化的语句: {len(regressions)} 条")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
@@ -3,12 +3,18 @@ import pandas as pd
 from sqlalchemy import create_engine, text
 import argparse
 import configparser
+import glob
 import os
+import shutil
 import sys
+import tempfile
+import time
 from datetime import datetime
 from openpyxl.utils import get_column_letter
 from openpyxl.styles import Font
 import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 # 配置日志
 logging.basicConfig(
@@ -21,14 +27,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def parse_args():
+EXPORT_FORMATS = ('xlsx', 'parquet', 'csv', 'arrow')
+FILE_SUFFIXES = {'parquet': '.parquet', 'csv': '.csv', 'arrow': '.arrow'}
+# parquet/arrow 每次解析的 CSV 字节数，同时决定 parquet 行组的大小
+COLUMNAR_BLOCK_SIZE = 16 * 1024 * 1024
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="导出统计表到Excel")
     parser.add_argument('--host', help='数据库主机')
     parser.add_argument('--port', type=int, help='数据库端口')
     parser.add_argument('--dbname', help='数据库名')
     parser.add_argument('--user', help='数据库用户名')
     parser.add_argument('--password', help='数据库密码')
-    return parser.parse_args()
+    parser.add_argument('--stream', action='store_true',
+                        help='流式导出数据明细：服务端游标分块读取，常量内存写入xlsx')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='流式导出时每次读取的行数')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='并行查询统计表的连接数，数据明细另占一个连接')
+    parser.add_argument('--cache-dir', help='导出成功后将两个工作簿另存一份到该目录（运行缓存），并删除该目录中以前导出的 统计结果_*.xlsx / 数据明细_*.xlsx')
+    parser.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=['xlsx'],
+                        help='导出格式，可同时指定多个：xlsx 为两个工作簿；parquet、csv、arrow 为每张表一个文件，'
+                             '写入 导出数据_<时间> 目录，先于 xlsx 完成')
+    return parser.parse_args(argv)
 
 def load_config():
     # 优先当前工作目录
@@ -82,7 +102,7 @@ def format_datetime_columns(df):
 def autofit_column_width(worksheet, df):
     for i, col in enumerate(df.columns, 1):
         max_length = max(
-            df[col].astype(str).map(len).max() if not df[col].isnull().all() else 0,
+            df[col].dropna().astype(str).map(len).max() if not df[col].isnull().all() else 0,
             len(str(col))
         )
         worksheet.column_dimensions[get_column_letter(i)].width = max_length + 2
@@ -97,14 +117,269 @@ def set_worksheet_font(worksheet, df, font_name="等线", font_size=11):
         for cell in row:
             cell.font = font
 
-if __name__ == "__main__":
-    args = parse_args()
+# xlsx单个sheet的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+def format_cell_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+def export_details_streaming(raw_conn, filename, chunk_size, font_name="等线", font_size=11, table='public.details'):
+    """
+    流式导出 public.details：服务端游标按块读取，xlsxwriter 常量内存模式逐行写入。
+    字体作为工作簿默认样式只设置一次，列宽取写入过程中的最大长度，内存占用与总行数无关。
+    raw_conn 为 psycopg2 连接，游标在其当前事务（快照）内读取，由调用方负责关闭连接。
+    """
+    import xlsxwriter
+
+    # 命名游标即服务端游标，数据按 chunk_size 分批从服务器取回
+    cursor = raw_conn.cursor(name='details_export_cursor')
+    cursor.itersize = chunk_size
+    cursor.execute(f'SELECT * FROM {table}')
+    rows = cursor.fetchmany(chunk_size)
+    columns = [desc[0] for desc in cursor.description]
+
+    workbook = xlsxwriter.Workbook(filename, {
+        'constant_memory': True,
+        'default_format_properties': {'font_name': font_name, 'font_size': font_size},
+    })
+    col_widths = [len(str(col)) for col in columns]
+    sheets = []
+
+    def add_sheet():
+        name = 'details' if not sheets else f'details_{len(sheets) + 1}'
+        ws = workbook.add_worksheet(name)
+        ws.write_row(0, 0, columns)
+        sheets.append(ws)
+        return ws
+
+    ws = add_sheet()
+    row_idx = 1
+    total = 0
+    while rows:
+        for row in rows:
+            if row_idx >= EXCEL_MAX_ROWS:
+                ws = add_sheet()
+                row_idx = 1
+            values = [format_cell_value(v) for v in row]
+            ws.write_row(row_idx, 0, values)
+            for i, v in enumerate(values):
+                if v is not None:
+                    col_widths[i] = max(col_widths[i], len(str(v)))
+            row_idx += 1
+        total += len(rows)
+        logger.info(f"public.details 已写入 {total} 行")
+        rows = cursor.fetchmany(chunk_size)
+    cursor.close()
+
+    # 常量内存模式下列信息在关闭工作簿时才写出，因此可在写完数据后设置列宽
+    for ws in sheets:
+        for i, width in enumerate(col_widths):
+            ws.set_column(i, i, width + 2)
+    workbook.close()
+    return total
+
+
+def arrow_schema(description):
+    """按列的 PostgreSQL 类型 OID 生成 Arrow schema，时间列保留为时间戳类型；numeric 转为 float64，未列出的类型按文本保存"""
+    import pyarrow as pa
+
+    types = {
+        16: pa.bool_(),
+        20: pa.int64(),
+        21: pa.int16(),
+        23: pa.int32(),
+        700: pa.float32(),
+        701: pa.float64(),
+        1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp('us'),
+        1184: pa.timestamp('us', tz='UTC'),
+    }
+    return pa.schema([pa.field(desc[0], types.get(desc[1], pa.string())) for desc in description])
+
+def export_table_columnar(raw_conn, table, filename, fmt):
+    """
+    把一张表导出为 parquet / arrow / csv 文件，返回行数。
+    数据均由服务端 COPY TO STDOUT 生成 CSV：csv 格式直接写入文件；parquet 和 arrow 先写入临时文件，
+    再由 pyarrow 按列类型分块解析后逐块写出，不在 Python 中逐值转换，内存占用与总行数无关。
+    raw_conn 为 psycopg2 连接，在其当前事务（快照）内读取
+    """
+    copy_sql = f"COPY (SELECT * FROM {table}) TO STDOUT WITH (FORMAT csv{', HEADER' if fmt == 'csv' else ''})"
+    with raw_conn.cursor() as cursor:
+        if fmt == 'csv':
+            with open(filename, 'wb') as f:
+                cursor.copy_expert(copy_sql, f)
+            return cursor.rowcount
+
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        import pyarrow.parquet as pq
+
+        cursor.execute(f'SELECT * FROM {table} LIMIT 0')
+        schema = arrow_schema(cursor.description)
+        with tempfile.TemporaryFile() as buffer:
+            cursor.copy_expert(copy_sql, buffer)
+            buffer.seek(0)
+            # COPY 的 CSV 中 NULL 为不带引号的空值，空字符串带引号，布尔值为 t/f
+            reader = pa_csv.open_csv(
+                buffer,
+                read_options=pa_csv.ReadOptions(column_names=schema.names, block_size=COLUMNAR_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types=schema, null_values=[''], strings_can_be_null=True,
+                    quoted_strings_can_be_null=False, true_values=['t'], false_values=['f']))
+            if fmt == 'parquet':
+                writer = pq.ParquetWriter(filename, schema, compression='zstd')
+            else:
+                writer = pa.ipc.new_file(filename, schema)
+            total = 0
+            try:
+                for batch in reader:
+                    writer.write_batch(batch)
+                    total += batch.num_rows
+            finally:
+                writer.close()
+    return total
+
+def export_columnar(connections, tables, export_dir, formats):
+    """各表按每种格式各写一个文件，统计表和数据明细在共享快照的连接上并行导出，返回是否全部成功"""
+    os.makedirs(export_dir, exist_ok=True)
+    conn_pool = queue.Queue()
+    for conn in connections:
+        conn_pool.put(conn)
+
+    def export_one(table, fmt):
+        conn = conn_pool.get()
+        try:
+            filename = os.path.join(export_dir, table.split('.')[-1] + FILE_SUFFIXES[fmt])
+            return export_table_columnar(conn.connection.dbapi_connection, table, filename, fmt)
+        finally:
+            conn_pool.put(conn)
+
+    failed = False
+    with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+        futures = [(table, fmt, executor.submit(export_one, table, fmt)) for fmt in formats for table in tables]
+        for table, fmt, future in futures:
+            try:
+                row_count = future.result()
+                logger.info(f"导出表 {table} 为 {fmt} 成功，共 {row_count} 行")
+            except Exception as e:
+                logger.error(f"导出表 {table} 为 {fmt} 失败: {e}")
+                failed = True
+    return not failed
+
+def open_snapshot_connections(engine, count):
+    """
+    打开 count 个连接并让它们共享同一个 REPEATABLE READ 快照：
+    第一个连接导出快照，其余连接导入，保证并行读取的各表来自同一时刻的数据
+    """
+    leader = engine.connect().execution_options(isolation_level='REPEATABLE READ')
+    connections = [leader]
     try:
-        db_config = get_db_config(args)
-    except Exception as e:
-        logger.error(f"数据库配置加载失败: {e}")
-        sys.exit(1)
+        snapshot_id = leader.execute(text("SELECT pg_export_snapshot()")).scalar()
+        for _ in range(count - 1):
+            conn = engine.connect().execution_options(isolation_level='REPEATABLE READ')
+            connections.append(conn)
+            conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+    except Exception:
+        close_connections(connections)
+        raise
+    logger.info(f"已打开 {count} 个共享快照 {snapshot_id} 的连接")
+    return connections
+
+def close_connections(connections):
+    for conn in connections:
+        try:
+            conn.rollback()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"关闭连接时出错: {e}")
+
+def read_table(conn_pool, table):
+    conn = conn_pool.get()
+    try:
+        return pd.read_sql_query(text(f'SELECT * FROM {table}'), conn)
+    finally:
+        conn_pool.put(conn)
+
+def export_details(conn, filename, stream, chunk_size, table='public.details'):
+    """导出 public.details 到单独的 Excel 文件，返回行数"""
+    if stream:
+        return export_details_streaming(conn.connection.dbapi_connection, filename, chunk_size, table=table)
+    df_details = pd.read_sql_query(text(f'SELECT * FROM {table}'), conn)
+    df_details = format_datetime_columns(df_details)
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        df_details.to_excel(writer, sheet_name='details', index=False)
+        ws = writer.sheets['details']
+        autofit_column_width(ws, df_details)
+        set_worksheet_font(ws, df_details)  # 设置字体
+    return len(df_details)
+
+def export_workbooks(connections, table_names, stat_filename, details_filename, stream, chunk_size):
+    """导出统计结果和数据明细两个工作簿，最后一个连接专用于数据明细，返回是否全部成功"""
+    details_conn = connections[-1]
+    conn_pool = queue.Queue()
+    for conn in connections[:-1]:
+        conn_pool.put(conn)
 
+    stat_failed = False
+    details_failed = False
+    with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+        # 数据明细单独占用一个连接，与统计表查询同时进行
+        details_future = executor.submit(export_details, details_conn, details_filename,
+                                         stream, chunk_size)
+        table_futures = [(table, executor.submit(read_table, conn_pool, table)) for table in table_names]
+
+        # 按原顺序写入sheet，写入某张表时其余表仍在后台查询
+        try:
+            with pd.ExcelWriter(stat_filename, engine='openpyxl') as writer:
+                for table, future in table_futures:
+                    try:
+                        df = future.result()
+                        df = format_datetime_columns(df)
+                        if not df.empty:
+                            sheet_name = str(df.iloc[0, 0])[:31]
+                        else:
+                            sheet_name = table.split('.')[-1]
+                        df.to_excel(writer, sheet_name=sheet_name, index=False)
+                        ws = writer.sheets[sheet_name]
+                        autofit_column_width(ws, df)
+                        set_worksheet_font(ws, df)  # 设置字体
+                        logger.info(f"导出表 {table} 成功")
+                    except Exception as e:
+                        logger.error(f"导出表 {table} 失败: {e}")
+
+            logger.info("统计结果导出完成！")
+        except Exception as e:
+            logger.error(f"统计结果导出失败: {e}")
+            stat_failed = True
+
+        try:
+            row_count = details_future.result()
+            if stream:
+                logger.info(f"public.details 流式导出完成，共 {row_count} 行！")
+            else:
+                logger.info("public.details 导出完成！")
+        except Exception as e:
+            logger.error(f"导出表 public.details 失败: {e}")
+            details_failed = True
+    return not (stat_failed or details_failed)
+
+def create_db_engine(db_config, workers, pre_ping=False):
+    # 连接池大小固定为 统计表连接数 + 明细连接，不允许溢出；常驻进程中连接可能被服务端断开，取出时先检测
+    return create_engine(
+        f"postgresql+psycopg2://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}",
+        pool_size=workers + 1,
+        max_overflow=0,
+        pool_pre_ping=pre_ping
+    )
+
+def main(args, engine=None):
+    """
+    导出统计结果和数据明细，成功返回 True。
+    engine 由常驻进程 StatWorker.py 传入时复用其中已建立的连接，导出结束后不释放
+    """
     now_str = datetime.now().strftime("%Y%m%d_%H%M%S")
     stat_filename = f"统计结果_{now_str}.xlsx"
     details_filename = f"数据明细_{now_str}.xlsx"
@@ -123,56 +398,69 @@ if __name__ == "__main__":
         'public.s_40gal_judge_time',
         'public.s_80gal_judge_time',
         'public.s_120gal_judge_time',
-        'public.s_peak_deviation'
+        'public.s_peak_deviation',
+        'public.latency_percentiles',
+        'public.latency_histogram'
     ]
 
-    # 使用 SQLAlchemy 创建 engine
-    engine = create_engine(
-        f"postgresql+psycopg2://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}"
-    )
+    workers = max(1, args.workers)
+    own_engine = engine is None
+    if own_engine:
+        try:
+            db_config = get_db_config(args)
+        except Exception as e:
+            logger.error(f"数据库配置加载失败: {e}")
+            return False
+        engine = create_db_engine(db_config, workers)
 
     try:
-        with engine.connect() as conn:
-            logger.info("正在连接数据库...")
-            conn.execute(text("SELECT 1"))
-            logger.info("数据库连接成功！")
+        if own_engine:
+            with engine.connect() as conn:
+                logger.info("正在连接数据库...")
+                conn.execute(text("SELECT 1"))
+                logger.info("数据库连接成功！")
+        connections = open_snapshot_connections(engine, workers + 1)
     except Exception as e:
         logger.error(f"数据库连接失败: {e}")
-        sys.exit(1)
+        return False
 
+    columnar_formats = [fmt for fmt in args.format if fmt != 'xlsx']
+    export_ok = True
     try:
-        with pd.ExcelWriter(stat_filename, engine='openpyxl') as writer:
-            for table in table_names:
-                try:
-                    df = pd.read_sql_query(f'SELECT * FROM {table}', engine)
-                    df = format_datetime_columns(df)
-                    if not df.empty:
-                        sheet_name = str(df.iloc[0, 0])[:31]
-                    else:
-                        sheet_name = table.split('.')[-1]
-                    df.to_excel(writer, sheet_name=sheet_name, index=False)
-                    ws = writer.sheets[sheet_name]
-                    autofit_column_width(ws, df)
-                    set_worksheet_font(ws, df)  # 设置字体
-                    logger.info(f"导出表 {table} 成功")
-                except Exception as e:
-                    logger.error(f"导出表 {table} 失败: {e}")
-
-        logger.info("统计结果导出完成！")
-    except Exception as e:
-        logger.error(f"统计结果导出失败: {e}")
+        # 列式文件写得快，先于工作簿完成，下游分析不必等待 openpyxl 生成工作簿
+        if columnar_formats:
+            export_dir = f"导出数据_{now_str}"
+            start_time = time.perf_counter()
+            export_ok = export_columnar(connections, table_names + ['public.details'], export_dir, columnar_formats)
+            logger.info(f"{'/'.join(columnar_formats)} 文件已写入 {export_dir}，耗时 {time.perf_counter() - start_time:.2f} 秒")
+        if 'xlsx' in args.format:
+            start_time = time.perf_counter()
+            export_ok = export_workbooks(connections, table_names, stat_filename, details_filename,
+                                         args.stream, args.chunk_size) and export_ok
+            logger.info(f"工作簿导出耗时 {time.perf_counter() - start_time:.2f} 秒")
+    finally:
+        close_connections(connections)
+        if own_engine:
+            engine.dispose()
+
+    if not export_ok:
+        return False
+
+    if args.cache_dir and 'xlsx' in args.format:
+        # 运行缓存只保留最近一次导出的工作簿；只删除以前导出的工作簿，目录中的其他文件和子目录不动
+        try:
+            os.makedirs(args.cache_dir, exist_ok=True)
+            for pattern in ('统计结果_*.xlsx', '数据明细_*.xlsx'):
+                for old_file in glob.glob(os.path.join(glob.escape(args.cache_dir), pattern)):
+                    if os.path.isfile(old_file):
+                        os.remove(old_file)
+            for filename in (stat_filename, details_filename):
+                shutil.copy2(filename, args.cache_dir)
+            logger.info(f"工作簿已保存到运行缓存目录 {args.cache_dir}")
+        except OSError as e:
+            logger.warning(f"保存到运行缓存目录失败: {e}")
+    return True
+
+if __name__ == "__main__":
+    if not main(parse_args()):
         sys.exit(1)
-    
-    # 导出 public.details 到单独的 Excel 文件
-    try:
-        df_details = pd.read_sql_query('SELECT * FROM public.details', engine)
-        df_details = format_datetime_columns(df_details)
-        with pd.ExcelWriter(details_filename, engine='openpyxl') as writer:
-            df_details.to_excel(writer, sheet_name='details', index=False)
-            ws = writer.sheets['details']
-            autofit_column_width(ws, df_details)
-            set_worksheet_font(ws, df_details)  # 设置字体
-        logger.info("public.details 导出完成！")
-    except Exception as e:
-        logger.error(f"导出表 public.details 失败: {e}")
-        sys.exit(1)
\ No newline at end of file
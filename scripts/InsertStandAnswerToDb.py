@@ -1,5 +1,9 @@
 import csv
+import hashlib
+import io
+import multiprocessing
 import psycopg2
+from psycopg2.extras import execute_values
 import chardet
 import logging
 import time
@@ -8,6 +12,9 @@ import configparser
 import sys
 from datetime import datetime
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 
 # 配置日志
 logging.basicConfig(
@@ -21,15 +28,26 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="导入标准答案CSV到数据库")
-    parser.add_argument('csv_path', help='CSV文件路径')
+    parser.add_argument('csv_paths', nargs='+', metavar='csv_path',
+                        help='CSV文件路径，可指定多个（如每个台站或每个试验序列一个文件），按给定顺序合并导入')
     parser.add_argument('--host', help='数据库主机')
     parser.add_argument('--port', type=int, help='数据库端口')
     parser.add_argument('--dbname', help='数据库名')
     parser.add_argument('--user', help='数据库用户名')
     parser.add_argument('--password', help='数据库密码')
-    return parser.parse_args()
+    parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的行数')
+    parser.add_argument('--load-method', choices=['copy', 'values'], default='copy',
+                        help='批量写入方式: copy(COPY FROM STDIN) 或 values(多值INSERT)')
+    parser.add_argument('--parser', choices=['columnar', 'row'], default='columnar',
+                        help='CSV解析方式: columnar(按列向量化解析) 或 row(逐行解析)')
+    parser.add_argument('--skip-unchanged', action='store_true',
+                        help='文件内容与上次成功导入的相同时跳过导入（按 sha256 比较）')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='导入多个文件时并行解析和写入的进程数')
+    parser.add_argument('--report', help='每个文件的导入情况（行数、失败数、耗时、行/秒、错误）另存为该CSV文件')
+    return parser.parse_args(argv)
 
 def load_config():
     # 优先当前工作目录
@@ -73,6 +91,12 @@ def get_db_config(args):
         }
     return load_config()
 
+def connect_db(db_config):
+    conn = psycopg2.connect(**db_config)
+    conn.set_client_encoding('UTF8')
+    conn.autocommit = False
+    return conn
+
 def detect_file_encoding(file_path):
     """检测文件编码并转换为PostgreSQL识别的格式"""
     try:
@@ -103,6 +127,52 @@ def detect_file_encoding(file_path):
         return 'GBK'
 
 
+def file_sha256(file_path):
+    """计算文件内容的 sha256，作为运行缓存指纹的一部分"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 与 sql/runCache.sql 中的定义相同，记录 public.standanswer_p_wave_alarm 当前对应的文件
+ANSWER_SOURCE_SQL = """
+CREATE TABLE IF NOT EXISTS public.stat_answer_source (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    file_sha256 text NOT NULL,
+    file_name text,
+    row_count bigint,
+    imported_at timestamp
+)
+"""
+
+
+def loaded_answer_sha256(cursor):
+    """上次成功导入的标准答案文件的 sha256，没有记录时返回 None"""
+    cursor.execute(ANSWER_SOURCE_SQL)
+    cursor.execute("SELECT file_sha256 FROM public.stat_answer_source")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def combined_sha256(file_hashes):
+    """多个文件合并导入时的指纹：按导入顺序组合各文件的 sha256，单个文件时即该文件的 sha256"""
+    if len(file_hashes) == 1:
+        return file_hashes[0]
+    return hashlib.sha256('\n'.join(file_hashes).encode('ascii')).hexdigest()
+
+
+def record_answer_source(cursor, sha256, file_name, row_count):
+    cursor.execute("""
+        INSERT INTO public.stat_answer_source (id, file_sha256, file_name, row_count, imported_at)
+        VALUES (true, %s, %s, %s, now())
+        ON CONFLICT (id) DO UPDATE
+        SET file_sha256 = EXCLUDED.file_sha256, file_name = EXCLUDED.file_name,
+            row_count = EXCLUDED.row_count, imported_at = EXCLUDED.imported_at
+    """, (sha256, file_name, row_count))
+
+
 def parse_time(time_str):
     """解析时间字符串为datetime对象"""
     if not time_str or str(time_str).strip() in ['', 'null', 'None']:
@@ -130,19 +200,23 @@ def parse_time(time_str):
         return None
 
 
+# 干扰波需要置空的地震相关字段
+INTERFERENCE_FIELDS = [
+    'distance_class', 'actual_depth', 'actual_magnitude',
+    'actual_distance', 'actual_latitude', 'actual_longitude',
+    'actual_peak', 'p_wave_index', 'p_wave_time',
+    's_wave_first_index', 's_wave_first_time', 's_wave_first_peak',
+    's_wave_second_index', 's_wave_second_time', 's_wave_second_peak',
+    's_wave_third_index', 's_wave_third_time', 's_wave_third_peak',
+    'azimuth'
+]
+
+
 def clean_data(row):
     """数据清洗：处理干扰波的特殊情况"""
     if 'earthquake_type' in row and row['earthquake_type'] == '干扰波':
         # 将干扰波的地震相关字段设为空值
-        for field in [
-            'distance_class', 'actual_depth', 'actual_magnitude',
-            'actual_distance', 'actual_latitude', 'actual_longitude',
-            'actual_peak', 'p_wave_index', 'p_wave_time',
-            's_wave_first_index', 's_wave_first_time', 's_wave_first_peak',
-            's_wave_second_index', 's_wave_second_time', 's_wave_second_peak',
-            's_wave_third_index', 's_wave_third_time', 's_wave_third_peak',
-            'azimuth'
-        ]:
+        for field in INTERFERENCE_FIELDS:
             if field in row:
                 row[field] = None
 
@@ -154,8 +228,360 @@ def clean_data(row):
     return row
 
 
-def create_table_schema(cursor, full_table_name):
-    """创建表和模式（如果不存在）"""
+def row_to_values(row):
+    """将清洗后的一行转换为插入参数元组"""
+    return (
+        int(row['test_id']) if row['test_id'] and row['test_id'] != '' else None,
+        row['waveform_id'],
+        row['station_name'],
+        row['station_manager'],
+        parse_time(row['start_time']),
+        parse_time(row['send_time']),
+        float(row['duration']) if row['duration'] and row['duration'] != '' else None,
+        parse_time(row['end_time']),
+        row['earthquake_type'],
+        row['distance_class'] if 'distance_class' in row else None,
+        float(row['actual_depth']) if row['actual_depth'] and row['actual_depth'] != '' else None,
+        float(row['actual_magnitude']) if row['actual_magnitude'] and row[
+            'actual_magnitude'] != '' else None,
+        float(row['actual_distance']) if row['actual_distance'] and row[
+            'actual_distance'] != '' else None,
+        float(row['actual_latitude']) if row['actual_latitude'] and row[
+            'actual_latitude'] != '' else None,
+        float(row['actual_longitude']) if row['actual_longitude'] and row[
+            'actual_longitude'] != '' else None,
+        float(row['actual_peak']) if row['actual_peak'] and row['actual_peak'] != '' else None,
+        int(row['p_wave_index']) if row['p_wave_index'] and row['p_wave_index'] != '' else None,
+        parse_time(row['p_wave_time']),
+        int(row['s_wave_first_index']) if row['s_wave_first_index'] and row[
+            's_wave_first_index'] != '' else None,
+        parse_time(row['s_wave_first_time']),
+        float(row['s_wave_first_peak']) if row['s_wave_first_peak'] and row[
+            's_wave_first_peak'] != '' else None,
+        int(row['s_wave_second_index']) if row['s_wave_second_index'] and row[
+            's_wave_second_index'] != '' else None,
+        parse_time(row['s_wave_second_time']),
+        float(row['s_wave_second_peak']) if row['s_wave_second_peak'] and row[
+            's_wave_second_peak'] != '' else None,
+        int(row['s_wave_third_index']) if row['s_wave_third_index'] and row[
+            's_wave_third_index'] != '' else None,
+        parse_time(row['s_wave_third_time']),
+        float(row['s_wave_third_peak']) if row['s_wave_third_peak'] and row[
+            's_wave_third_peak'] != '' else None,
+        float(row['azimuth']) if row['azimuth'] and row['azimuth'] != '' else None
+    )
+
+
+# 标准答案表的写入列，顺序与CSV列一致
+ANSWER_COLUMNS = [
+    'test_id', 'waveform_id', 'station_name', 'station_manager',
+    'start_time', 'send_time', 'duration', 'end_time',
+    'earthquake_type', 'distance_class', 'actual_depth', 'actual_magnitude',
+    'actual_distance', 'actual_latitude', 'actual_longitude', 'actual_peak',
+    'p_wave_index', 'p_wave_time',
+    's_wave_first_index', 's_wave_first_time', 's_wave_first_peak',
+    's_wave_second_index', 's_wave_second_time', 's_wave_second_peak',
+    's_wave_third_index', 's_wave_third_time', 's_wave_third_peak',
+    'azimuth'
+]
+
+
+def format_copy_value(value):
+    """将单个值转换为COPY文本格式的字段"""
+    if value is None:
+        return r'\N'
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    text = str(value)
+    return (text.replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(cursor, full_table_name, rows):
+    """通过 COPY ... FROM STDIN 一次性写入多行"""
+    buffer = io.StringIO()
+    for values in rows:
+        buffer.write('\t'.join(format_copy_value(v) for v in values))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {full_table_name} ({', '.join(ANSWER_COLUMNS)}) FROM STDIN WITH (FORMAT text)",
+        buffer
+    )
+
+
+def insert_rows_values(cursor, full_table_name, rows):
+    """通过多值INSERT写入多行"""
+    execute_values(
+        cursor,
+        f"INSERT INTO {full_table_name} ({', '.join(ANSWER_COLUMNS)}) VALUES %s",
+        rows,
+        page_size=1000
+    )
+
+
+def insert_rows_individually(conn, cursor, full_table_name, chunk):
+    """逐条插入以定位问题行，返回 (成功数, 失败数)"""
+    insert_sql = (
+        f"INSERT INTO {full_table_name} ({', '.join(ANSWER_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(ANSWER_COLUMNS))})"
+    )
+    success_count = 0
+    error_count = 0
+    for line_no, values in chunk:
+        try:
+            cursor.execute(insert_sql, values)
+            conn.commit()
+            success_count += 1
+        except Exception as e:
+            logger.error("单行插入错误 (第%d行): %s", line_no, str(e))
+            conn.rollback()
+            error_count += 1
+    return success_count, error_count
+
+
+def load_chunk(conn, cursor, full_table_name, chunk, method):
+    """
+    写入一个数据块，chunk 为 [(CSV行号, 参数元组), ...]。
+    失败时依次降级为 execute_values 和逐条插入。
+    返回 (成功数, 失败数, 后续数据块使用的写入方式)
+    """
+    first_line, last_line = chunk[0][0], chunk[-1][0]
+    rows = [values for _, values in chunk]
+
+    if method == 'copy':
+        try:
+            copy_rows(cursor, full_table_name, rows)
+            conn.commit()
+            return len(rows), 0, method
+        except Exception as e:
+            conn.rollback()
+            logger.warning("COPY写入失败 (第%d-%d行)，改用execute_values: %s", first_line, last_line, str(e))
+
+    try:
+        insert_rows_values(cursor, full_table_name, rows)
+        conn.commit()
+        # COPY失败而多值INSERT成功，说明当前连接不支持COPY，后续数据块不再尝试COPY
+        return len(rows), 0, 'values'
+    except Exception as e:
+        conn.rollback()
+        logger.error("批量插入错误 (第%d-%d行): %s", first_line, last_line, str(e))
+
+    # 逐条插入以识别问题行
+    success_count, error_count = insert_rows_individually(conn, cursor, full_table_name, chunk)
+    return success_count, error_count, method
+
+
+# 按列解析时各列的类型
+INT_COLUMNS = ['test_id', 'p_wave_index', 's_wave_first_index', 's_wave_second_index', 's_wave_third_index']
+FLOAT_COLUMNS = [
+    'duration', 'actual_depth', 'actual_magnitude', 'actual_distance',
+    'actual_latitude', 'actual_longitude', 'actual_peak',
+    's_wave_first_peak', 's_wave_second_peak', 's_wave_third_peak', 'azimuth'
+]
+TIME_COLUMNS = [
+    'start_time', 'send_time', 'end_time', 'p_wave_time',
+    's_wave_first_time', 's_wave_second_time', 's_wave_third_time'
+]
+# 依次尝试的时间格式，与 parse_time 支持的格式一致
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y%m%d %H:%M:%S', '%Y/%m/%d %H:%M:%S']
+
+
+def parse_time_column(series):
+    """
+    向量化多格式时间解析：每种格式只处理前面格式未能解析的值。
+    返回 (解析结果, 无法识别的值的掩码)
+    """
+    result = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    pending = series.notna()
+    for fmt in TIME_FORMATS:
+        if not pending.any():
+            break
+        parsed = pd.to_datetime(series[pending], format=fmt, errors='coerce')
+        result[pending] = parsed
+        pending &= result.isna()
+    return result, pending
+
+
+def parse_numeric_column(series):
+    """整列直接转换为浮点数，只有列中存在非法值时才退回到逐值容错解析"""
+    try:
+        return series.astype('float64')
+    except (TypeError, ValueError):
+        return pd.to_numeric(series, errors='coerce')
+
+
+def parse_answer_frame(raw):
+    """
+    将一块原始字符串列转换为类型化的列，索引为CSV行号。
+    数值无法解析的行被剔除并记录行号，时间无法识别时与逐行解析一样置空并告警。
+    返回 (类型化的DataFrame, 被剔除的行数)
+    """
+    frame = raw.copy()
+
+    # 空白字符串视为空值
+    stripped = frame.apply(lambda col: col.str.strip())
+    frame = frame.mask(stripped == '')
+    stripped = stripped.mask(stripped == '')
+
+    # 干扰波的地震相关字段整体置空
+    interference = frame['earthquake_type'] == '干扰波'
+    frame.loc[interference, INTERFERENCE_FIELDS] = np.nan
+    stripped.loc[interference, INTERFERENCE_FIELDS] = np.nan
+
+    bad_rows = pd.Series(False, index=frame.index)
+    for col in INT_COLUMNS + FLOAT_COLUMNS:
+        parsed = parse_numeric_column(stripped[col])
+        invalid = stripped[col].notna() & parsed.isna()
+        if col in INT_COLUMNS:
+            invalid |= parsed.notna() & (parsed % 1 != 0)
+            parsed = parsed.where(~invalid).astype('Int64')
+        for line_no in invalid[invalid].index:
+            logger.error("处理行错误 (第%d行): 列 %s 的值无效: %r", line_no, col, raw.at[line_no, col])
+        bad_rows |= invalid
+        frame[col] = parsed
+
+    for col in TIME_COLUMNS:
+        parsed, invalid = parse_time_column(stripped[col])
+        for line_no in invalid[invalid].index:
+            logger.warning("无法识别的时间格式 (第%d行, 列 %s): %s", line_no, col, stripped.at[line_no, col])
+        frame[col] = parsed
+
+    return frame.loc[~bad_rows, ANSWER_COLUMNS], int(bad_rows.sum())
+
+
+def iter_answer_frames(csv_path, encoding, chunk_size):
+    """分块读取标准答案CSV并按列解析，逐块产出 (类型化的DataFrame, 被剔除的行数)"""
+    reader = pd.read_csv(
+        csv_path,
+        encoding=encoding,
+        encoding_errors='replace',
+        header=None,
+        skiprows=1,
+        names=ANSWER_COLUMNS,
+        index_col=False,
+        dtype=str,
+        keep_default_na=False,
+        chunksize=chunk_size
+    )
+    next_line = 2  # 从第2行开始（跳过标题）
+    for raw in reader:
+        raw.index = pd.RangeIndex(next_line, next_line + len(raw))
+        next_line += len(raw)
+        yield parse_answer_frame(raw)
+
+
+def copy_frame(cursor, full_table_name, frame):
+    """将类型化的DataFrame整体序列化为CSV并通过 COPY 写入"""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, header=False, index=False, na_rep='', date_format='%Y-%m-%d %H:%M:%S.%f')
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {full_table_name} ({', '.join(ANSWER_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+
+def frame_to_rows(frame):
+    """将类型化的DataFrame转换为插入参数元组列表"""
+    columns = []
+    for col in ANSWER_COLUMNS:
+        if col in TIME_COLUMNS:
+            values = [None if pd.isna(v) else v.to_pydatetime() for v in frame[col]]
+        elif col in INT_COLUMNS:
+            values = [None if pd.isna(v) else int(v) for v in frame[col]]
+        else:
+            values = [None if pd.isna(v) else v for v in frame[col].tolist()]
+        columns.append(values)
+    return list(zip(*columns))
+
+
+def load_frame(conn, cursor, full_table_name, frame, method):
+    """
+    写入一块类型化的数据，优先整体COPY；失败时转为参数元组，
+    沿用 load_chunk 的降级和逐行定位逻辑。返回值与 load_chunk 相同
+    """
+    if frame.empty:
+        return 0, 0, method
+    if method == 'copy':
+        try:
+            copy_frame(cursor, full_table_name, frame)
+            conn.commit()
+            return len(frame), 0, method
+        except Exception as e:
+            conn.rollback()
+            logger.warning("COPY写入失败 (第%d-%d行)，改用execute_values: %s",
+                           frame.index[0], frame.index[-1], str(e))
+
+    chunk = list(zip(frame.index.tolist(), frame_to_rows(frame)))
+    loaded, failed, next_method = load_chunk(conn, cursor, full_table_name, chunk, 'values')
+    if failed:
+        # 数据本身有错误行，不代表COPY不可用
+        next_method = method
+    return loaded, failed, next_method
+
+
+def import_columnar(conn, cursor, full_table_name, csv_path, encoding, batch_size, load_method):
+    """按列解析并写入，返回 (有效行数, 成功数, 失败数, 最终写入方式)"""
+    total_count = 0
+    success_count = 0
+    error_count = 0
+    for frame, bad_count in iter_answer_frames(csv_path, encoding, batch_size):
+        total_count += len(frame)
+        error_count += bad_count
+        loaded, failed, load_method = load_frame(conn, cursor, full_table_name, frame, load_method)
+        success_count += loaded
+        error_count += failed
+        logger.info("已导入 %d 条记录 (总: %d)", loaded, success_count)
+    return total_count, success_count, error_count, load_method
+
+
+def import_rows(conn, cursor, full_table_name, csv_path, encoding, batch_size, load_method):
+    """逐行解析并写入，返回 (有效行数, 成功数, 失败数, 最终写入方式)"""
+    with open(csv_path, 'r', encoding=encoding, errors='replace') as f:
+        # 创建CSV阅读器
+        reader = csv.DictReader(f, fieldnames=ANSWER_COLUMNS)
+
+        # 跳过标题行
+        next(reader)
+
+        # 处理批处理
+        chunk = []
+        total_count = 0
+        success_count = 0
+        error_count = 0
+
+        for row_num, row in enumerate(reader, start=2):  # 从第2行开始（跳过标题）
+            try:
+                # 清洗和转换数据
+                row = clean_data(row)
+                chunk.append((row_num, row_to_values(row)))
+                total_count += 1
+            except Exception as e:
+                logger.error("处理行错误 (第%d行): %s | 行内容: %s", row_num, str(e), str(row))
+                error_count += 1
+                continue
+
+            # 执行批量写入
+            if len(chunk) >= batch_size:
+                loaded, failed, load_method = load_chunk(conn, cursor, full_table_name, chunk, load_method)
+                success_count += loaded
+                error_count += failed
+                logger.info("已导入 %d 条记录 (总: %d)", loaded, success_count)
+                chunk = []
+
+        # 处理剩余批处理
+        if chunk:
+            loaded, failed, load_method = load_chunk(conn, cursor, full_table_name, chunk, load_method)
+            success_count += loaded
+            error_count += failed
+            logger.info("导入最后 %d 条记录", loaded)
+
+    return total_count, success_count, error_count, load_method
+
+
+def create_table_schema(cursor, full_table_name, unlogged=False):
+    """创建表和模式（如果不存在），unlogged 为 True 时建为不写 WAL 的表（用于合并前的单文件中间表）"""
     try:
         # 分离模式名和表名
         schema_name, table_name = full_table_name.split('.') if '.' in full_table_name else ('public', full_table_name)
@@ -171,7 +597,7 @@ def create_table_schema(cursor, full_table_name):
         # 创建表结构
         create_table_sql = f"""
         
-        CREATE TABLE  {full_table_name} (
+        CREATE {'UNLOGGED ' if unlogged else ''}TABLE  {full_table_name} (
             id SERIAL PRIMARY KEY,
             test_id INTEGER NOT NULL,
             waveform_id VARCHAR(20) NOT NULL,
@@ -271,231 +697,251 @@ def create_table_schema(cursor, full_table_name):
 
 
 
-
-
 # 完整表名
 FULL_TABLE_NAME = 'public.standanswer_p_wave_alarm'
+# 导入先写入该表并建好索引，校验通过后在一个事务中删除原表并把它改名为 FULL_TABLE_NAME，
+# 导入过程中原表保持可查询，导入失败时原表不受影响
+STAGING_TABLE_NAME = FULL_TABLE_NAME + '_staging'
+# (索引名, 列)，在暂存表上以 <索引名>_staging 创建，替换原表时改回原名
+ANSWER_INDEXES = [
+    ('idx_pwave_alarm_test_id', 'test_id'),
+    ('idx_pwave_alarm_station', 'station_name'),
+    ('idx_pwave_alarm_start_time', 'start_time'),
+    ('idx_pwave_alarm_type', 'earthquake_type'),
+]
+# 每个文件的导入情况，对应 --report 输出的列
+REPORT_COLUMNS = ['file', 'encoding', 'rows', 'loaded', 'failed', 'seconds', 'rows_per_second', 'load_method', 'error']
+
+
+def part_table_name(index):
+    """多个文件并行导入时第 index 个文件的中间表"""
+    return f"{FULL_TABLE_NAME}_part{index}"
+
+
+def load_answer_file(conn, csv_path, full_table_name, args, create_table):
+    """
+    将一个CSV文件写入 full_table_name，create_table 为 True 时先建为 UNLOGGED 表。
+    返回该文件的导入情况（字典，键为 REPORT_COLUMNS），出错时 error 不为空
+    """
+    report = dict.fromkeys(REPORT_COLUMNS)
+    report.update(file=csv_path, rows=0, loaded=0, failed=0, load_method=args.load_method)
+    start = time.time()
+    cursor = conn.cursor()
+    try:
+        if create_table and not create_table_schema(cursor, full_table_name, unlogged=True):
+            raise RuntimeError(f"无法创建中间表 {full_table_name}")
+        conn.commit()
+
+        logger.info("检测CSV文件编码: %s", csv_path)
+        encoding = detect_file_encoding(csv_path)
+        report['encoding'] = encoding
+        logger.info("开始CSV导入 %s (编码: %s, 解析方式: %s, 写入方式: %s, 每批 %d 行)...",
+                    csv_path, encoding, args.parser, args.load_method, args.batch_size)
+        import_func = import_columnar if args.parser == 'columnar' else import_rows
+        total_count, success_count, error_count, load_method = import_func(
+            conn, cursor, full_table_name, csv_path, encoding, args.batch_size, args.load_method)
+        report.update(rows=total_count, loaded=success_count, failed=error_count, load_method=load_method)
+    except Exception as e:
+        conn.rollback()
+        logger.error("导入文件 %s 出错: %s", csv_path, str(e))
+        report['error'] = str(e).strip()
+    finally:
+        cursor.close()
+    report['seconds'] = round(time.time() - start, 2)
+    report['rows_per_second'] = round(report['loaded'] / report['seconds']) if report['seconds'] > 0 else 0
+    return report
+
+
+def load_answer_file_worker(db_config, log_files, csv_path, full_table_name, args):
+    """进程池中执行的 load_answer_file：使用独立的数据库连接，日志追加到主进程的日志文件并标明文件名"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    handlers = [logging.FileHandler(path, encoding=encoding) for path, encoding in log_files]
+    handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter(
+            f'%(asctime)s - %(levelname)s - [{os.path.basename(csv_path)}] %(message)s'))
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
 
-# CSV文件路径
-#CSV_PATH = os.path.join(os.path.dirname(__file__), 'StandardAnswersFile0612.csv')
-args=parse_args()
-CSV_PATH = args.csv_path
+    try:
+        conn = connect_db(db_config)
+    except Exception as e:
+        logger.error("连接数据库出错: %s", str(e))
+        report = dict.fromkeys(REPORT_COLUMNS)
+        report.update(file=csv_path, rows=0, loaded=0, failed=0, seconds=0, rows_per_second=0,
+                      load_method=args.load_method, error=str(e).strip())
+        return report
+    try:
+        return load_answer_file(conn, csv_path, full_table_name, args, create_table=True)
+    finally:
+        conn.close()
+
+
+def load_answer_files_parallel(db_config, csv_paths, args):
+    """用进程池并行导入多个文件，第 k 个文件写入 part_table_name(k)，按文件顺序返回导入情况"""
+    # 子进程在 Windows 上重新导入本模块，日志文件改为与主进程（或常驻进程当前任务）相同
+    log_files = [(handler.baseFilename, handler.encoding) for handler in logging.getLogger().handlers
+                 if isinstance(handler, logging.FileHandler)]
+    workers = max(1, min(args.workers, len(csv_paths)))
+    logger.info("使用 %d 个进程并行导入 %d 个文件", workers, len(csv_paths))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(load_answer_file_worker, db_config, log_files, csv_path, part_table_name(k), args)
+                   for k, csv_path in enumerate(csv_paths)]
+        return [future.result() for future in futures]
+
+
+def merge_part_tables(cursor, count):
+    """按文件顺序把各文件的中间表写入暂存表，id 与依次导入各文件时相同"""
+    columns = ', '.join(ANSWER_COLUMNS)
+    for k in range(count):
+        cursor.execute(f"""
+            INSERT INTO {STAGING_TABLE_NAME} ({columns})
+            SELECT {columns} FROM {part_table_name(k)} ORDER BY id
+        """)
+        cursor.execute(f"DROP TABLE {part_table_name(k)}")
 
 
+def drop_import_tables(conn, part_count):
+    """导入失败时删除暂存表和中间表，原表保持不变"""
+    try:
+        conn.rollback()
+        cursor = conn.cursor()
+        for k in range(part_count):
+            cursor.execute(f"DROP TABLE IF EXISTS {part_table_name(k)}")
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE_NAME}")
+        conn.commit()
+        cursor.close()
+    except Exception as e:
+        logger.error("删除暂存表时出错: %s", str(e))
+
 
-# 主函数
-def main():
-    logger.info(f"收到命令行参数: {sys.argv}")
+def swap_staging_table(cursor):
+    """删除原表并把暂存表及其主键、序列和索引改为原名，与记录导入文件在同一个事务中执行"""
+    schema_name, table_name = FULL_TABLE_NAME.split('.')
+    staging_name = STAGING_TABLE_NAME.split('.')[1]
+    cursor.execute(f"DROP TABLE IF EXISTS {FULL_TABLE_NAME}")
+    cursor.execute(f"ALTER TABLE {STAGING_TABLE_NAME} RENAME TO {table_name}")
+    cursor.execute(f"ALTER INDEX {schema_name}.{staging_name}_pkey RENAME TO {table_name}_pkey")
+    cursor.execute(f"ALTER SEQUENCE {schema_name}.{staging_name}_id_seq RENAME TO {table_name}_id_seq")
+    for index_name, _ in ANSWER_INDEXES:
+        cursor.execute(f"ALTER INDEX {schema_name}.{index_name}_staging RENAME TO {index_name}")
+
+
+def log_file_reports(reports):
+    logger.info("各文件导入情况:")
+    for report in reports:
+        logger.info("  %s: 有效行 %d, 成功 %d, 失败 %d, 耗时 %.2f 秒 (%d 行/秒, 写入方式: %s)%s",
+                    report['file'], report['rows'], report['loaded'], report['failed'], report['seconds'],
+                    report['rows_per_second'], report['load_method'],
+                    f", 错误: {report['error']}" if report['error'] else "")
+
+
+def write_report(report_path, reports):
+    with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(reports)
+    logger.info("导入报告已保存到 %s", report_path)
+
+
+# 主函数，conn 由常驻进程 StatWorker.py 传入时复用该连接，导入结束后不关闭
+def main(args, conn=None):
+    logger.info(f"收到命令行参数: {sys.argv if conn is None else vars(args)}")
     logger.info("=== 开始导入P波警报数据到 %s ===", FULL_TABLE_NAME)
     start_time = time.time()
+    csv_paths = args.csv_paths
+    parallel = len(csv_paths) > 1
+    own_conn = conn is None
+    swapped = False
 
     try:
-        # 加载数据库配置
+        # 加载数据库配置，并行导入的子进程使用同一配置各自连接
         logger.info("加载数据库配置...")
         DB_CONFIG = get_db_config(args)
-
-        # 连接数据库
-        logger.info("连接数据库...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.set_client_encoding('UTF8')
-        conn.autocommit = False
+        if own_conn:
+            # 连接数据库
+            logger.info("连接数据库...")
+            conn = connect_db(DB_CONFIG)
         cursor = conn.cursor()
 
-        # 确保表结构存在
-        logger.info("验证表结构是否存在...")
-        if not create_table_schema(cursor, FULL_TABLE_NAME):
+        file_hashes = [file_sha256(csv_path) for csv_path in csv_paths]
+        for csv_path, sha256 in zip(csv_paths, file_hashes):
+            logger.info("标准答案文件 %s sha256: %s", csv_path, sha256)
+        answer_sha256 = combined_sha256(file_hashes)
+        if args.skip_unchanged and loaded_answer_sha256(cursor) == answer_sha256:
+            cursor.execute(f"SELECT COUNT(*) FROM {FULL_TABLE_NAME}")
+            final_count = cursor.fetchone()[0]
+            conn.commit()
+            logger.info("文件内容与上次导入的相同，跳过导入，数据库中记录数: %d", final_count)
+            return True, final_count
+
+        # 先写入暂存表，原表在替换之前保持可查询
+        logger.info("创建暂存表 %s...", STAGING_TABLE_NAME)
+        if not create_table_schema(cursor, STAGING_TABLE_NAME):
             logger.error("无法继续导入，表结构创建失败")
             return False, 0
-
         conn.commit()
 
-        # 检测文件编码
-        logger.info("检测CSV文件编码...")
-        encoding = detect_file_encoding(CSV_PATH)
-        logger.info("将使用编码: %s", encoding)
-
-        # 准备插入SQL
-        insert_sql = f"""
-        INSERT INTO {FULL_TABLE_NAME} (
-            test_id, waveform_id, station_name, station_manager,
-            start_time, send_time, duration, end_time,
-            earthquake_type, distance_class, actual_depth, actual_magnitude,
-            actual_distance, actual_latitude, actual_longitude, actual_peak,
-            p_wave_index, p_wave_time,
-            s_wave_first_index, s_wave_first_time, s_wave_first_peak,
-            s_wave_second_index, s_wave_second_time, s_wave_second_peak,
-            s_wave_third_index, s_wave_third_time, s_wave_third_peak,
-            azimuth
-        ) VALUES (
-            %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s, %s, %s, %s,
-            %s, %s,
-            %s, %s, %s,
-            %s, %s, %s,
-            %s, %s, %s,
-            %s
-        )
-        """
-
-        # 使用CSV导入
-        logger.info("开始CSV导入...")
-        with open(CSV_PATH, 'r', encoding=encoding, errors='replace') as f:
-            # 创建CSV阅读器
-            reader = csv.DictReader(f, fieldnames=[
-                'test_id', 'waveform_id', 'station_name', 'station_manager',
-                'start_time', 'send_time', 'duration', 'end_time',
-                'earthquake_type', 'distance_class', 'actual_depth', 'actual_magnitude',
-                'actual_distance', 'actual_latitude', 'actual_longitude', 'actual_peak',
-                'p_wave_index', 'p_wave_time',
-                's_wave_first_index', 's_wave_first_time', 's_wave_first_peak',
-                's_wave_second_index', 's_wave_second_time', 's_wave_second_peak',
-                's_wave_third_index', 's_wave_third_time', 's_wave_third_peak',
-                'azimuth'
-            ])
-
-            # 跳过标题行
-            next(reader)
-
-            # 处理批处理
-            batch = []
-            batch_size = 500
-            total_count = 0
-            success_count = 0
-            error_count = 0
-
-            for row_num, row in enumerate(reader, start=2):  # 从第2行开始（跳过标题）
-                try:
-                    # 清洗和转换数据
-                    row = clean_data(row)
-
-                    # 准备参数值
-                    values = (
-                        int(row['test_id']) if row['test_id'] and row['test_id'] != '' else None,
-                        row['waveform_id'],
-                        row['station_name'],
-                        row['station_manager'],
-                        parse_time(row['start_time']),
-                        parse_time(row['send_time']),
-                        float(row['duration']) if row['duration'] and row['duration'] != '' else None,
-                        parse_time(row['end_time']),
-                        row['earthquake_type'],
-                        row['distance_class'] if 'distance_class' in row else None,
-                        float(row['actual_depth']) if row['actual_depth'] and row['actual_depth'] != '' else None,
-                        float(row['actual_magnitude']) if row['actual_magnitude'] and row[
-                            'actual_magnitude'] != '' else None,
-                        float(row['actual_distance']) if row['actual_distance'] and row[
-                            'actual_distance'] != '' else None,
-                        float(row['actual_latitude']) if row['actual_latitude'] and row[
-                            'actual_latitude'] != '' else None,
-                        float(row['actual_longitude']) if row['actual_longitude'] and row[
-                            'actual_longitude'] != '' else None,
-                        float(row['actual_peak']) if row['actual_peak'] and row['actual_peak'] != '' else None,
-                        int(row['p_wave_index']) if row['p_wave_index'] and row['p_wave_index'] != '' else None,
-                        parse_time(row['p_wave_time']),
-                        int(row['s_wave_first_index']) if row['s_wave_first_index'] and row[
-                            's_wave_first_index'] != '' else None,
-                        parse_time(row['s_wave_first_time']),
-                        float(row['s_wave_first_peak']) if row['s_wave_first_peak'] and row[
-                            's_wave_first_peak'] != '' else None,
-                        int(row['s_wave_second_index']) if row['s_wave_second_index'] and row[
-                            's_wave_second_index'] != '' else None,
-                        parse_time(row['s_wave_second_time']),
-                        float(row['s_wave_second_peak']) if row['s_wave_second_peak'] and row[
-                            's_wave_second_peak'] != '' else None,
-                        int(row['s_wave_third_index']) if row['s_wave_third_index'] and row[
-                            's_wave_third_index'] != '' else None,
-                        parse_time(row['s_wave_third_time']),
-                        float(row['s_wave_third_peak']) if row['s_wave_third_peak'] and row[
-                            's_wave_third_peak'] != '' else None,
-                        float(row['azimuth']) if row['azimuth'] and row['azimuth'] != '' else None
-                    )
-
-                    batch.append(values)
-                    total_count += 1
-
-                    # 执行批量插入
-                    if len(batch) >= batch_size:
-                        try:
-                            # 批量插入
-                            for item in batch:
-                                cursor.execute(insert_sql, item)
-
-                            conn.commit()
-                            success_count += len(batch)
-                            logger.info("已导入 %d 条记录 (总: %d)", len(batch), success_count)
-                            batch = []
-                        except Exception as e:
-                            logger.error("批量插入错误: %s", str(e))
-                            conn.rollback()
-
-                            # 尝试逐条插入以识别问题行
-                            temp_batch = batch[:]  # 保存当前批处理
-                            batch = []  # 清空批处理
-
-                            for item in temp_batch:
-                                try:
-                                    cursor.execute(insert_sql, item)
-                                    conn.commit()
-                                    success_count += 1
-                                except Exception as e2:
-                                    logger.error("单行插入错误 (第%d行): %s",
-                                                 row_num - len(temp_batch) + temp_batch.index(item) + 1, str(e2))
-                                    error_count += 1
-                                    conn.rollback()
-
-                except Exception as e:
-                    logger.error("处理行错误 (第%d行): %s | 行内容: %s", row_num, str(e), str(row))
-                    error_count += 1
-                    continue
-
-            # 处理剩余批处理
-            if batch:
-                try:
-                    for item in batch:
-                        cursor.execute(insert_sql, item)
-                    conn.commit()
-                    success_count += len(batch)
-                    logger.info("导入最后 %d 条记录", len(batch))
-                except Exception as e:
-                    logger.error("最后一批插入错误: %s", str(e))
-                    conn.rollback()
-                    error_count += len(batch)
-
-        # 创建索引
-        try:
-            logger.info("创建索引...")
-            cursor.execute(f"""
-                CREATE INDEX IF NOT EXISTS idx_pwave_alarm_test_id ON {FULL_TABLE_NAME}(test_id);
-                CREATE INDEX IF NOT EXISTS idx_pwave_alarm_station ON {FULL_TABLE_NAME}(station_name);
-                CREATE INDEX IF NOT EXISTS idx_pwave_alarm_start_time ON {FULL_TABLE_NAME}(start_time);
-                CREATE INDEX IF NOT EXISTS idx_pwave_alarm_type ON {FULL_TABLE_NAME}(earthquake_type);
-            """)
+        load_start = time.time()
+        if parallel:
+            reports = load_answer_files_parallel(DB_CONFIG, csv_paths, args)
+        else:
+            reports = [load_answer_file(conn, csv_paths[0], STAGING_TABLE_NAME, args, create_table=False)]
+        failed_files = [report['file'] for report in reports if report['error']]
+        if failed_files:
+            log_file_reports(reports)
+            logger.error("以下文件导入出错，保留原表: %s", ", ".join(failed_files))
+            return False, 0
+        if parallel:
+            logger.info("按文件顺序合并到暂存表...")
+            merge_part_tables(cursor, len(csv_paths))
             conn.commit()
-            logger.info("索引创建完成")
-        except Exception as e:
-            logger.error("创建索引时出错: %s", str(e))
-            conn.rollback()
+        load_elapsed = time.time() - load_start
 
-        # 验证结果
-        elapsed_time = time.time() - start_time
-        cursor.execute(f"SELECT COUNT(*) FROM {FULL_TABLE_NAME}")
+        # 在暂存表上创建索引，替换前完成，查询原表不受影响
+        logger.info("创建索引...")
+        for index_name, column in ANSWER_INDEXES:
+            cursor.execute(f"CREATE INDEX {index_name}_staging ON {STAGING_TABLE_NAME}({column})")
+        conn.commit()
+        logger.info("索引创建完成")
+
+        # 校验暂存表行数与各文件成功写入的行数之和一致
+        total_count = sum(report['rows'] for report in reports)
+        success_count = sum(report['loaded'] for report in reports)
+        error_count = sum(report['failed'] for report in reports)
+        cursor.execute(f"SELECT COUNT(*) FROM {STAGING_TABLE_NAME}")
         final_count = cursor.fetchone()[0]
+        if final_count != success_count:
+            logger.error("暂存表记录数 %d 与成功导入数 %d 不一致，保留原表", final_count, success_count)
+            return False, 0
+        if success_count == 0:
+            logger.error("没有成功导入任何记录，请检查数据和日志，保留原表")
+            return False, 0
 
+        # 一个事务中替换原表并记录导入的文件，其他连接只会看到替换前或替换后的完整数据
+        cursor.execute(ANSWER_SOURCE_SQL)
+        swap_staging_table(cursor)
+        record_answer_source(cursor, answer_sha256,
+                             '; '.join(os.path.basename(csv_path) for csv_path in csv_paths), final_count)
+        conn.commit()
+        swapped = True
+
+        elapsed_time = time.time() - start_time
         logger.info("=== 导入完成 ===")
+        if parallel:
+            log_file_reports(reports)
         logger.info("CSV总行数: %d", total_count)
         logger.info("成功导入: %d (成功率: %.2f%%)", success_count,
                     (success_count / total_count) * 100 if total_count > 0 else 0)
         logger.info("失败记录: %d", error_count)
         logger.info("数据库中记录数: %d", final_count)
+        logger.info("写入耗时: %.2f 秒 (%.0f 行/秒, 写入方式: %s)", load_elapsed,
+                    success_count / load_elapsed if load_elapsed > 0 else 0,
+                    ', '.join(sorted({report['load_method'] for report in reports})))
         logger.info("执行时间: %.2f 秒", elapsed_time)
-
-        if success_count >0:
-            return True,success_count
-        else:
-            logger.error("没有成功导入任何记录，请检查数据和日志")
-            return False,0
+        return True, success_count
 
     except Exception as e:
         logger.error("致命错误: %s", str(e))
@@ -504,21 +950,33 @@ def main():
         return False, 0
 
     finally:
+        if 'reports' in locals() and args.report:
+            try:
+                write_report(args.report, reports)
+            except OSError as e:
+                logger.error("保存导入报告时出错: %s", str(e))
+        if not swapped and conn is not None and not conn.closed:
+            drop_import_tables(conn, len(csv_paths) if parallel else 0)
         try:
             if 'cursor' in locals():
                 cursor.close()
-            if 'conn' in locals():
+            if own_conn and conn is not None:
                 conn.close()
                 logger.info("数据库连接已关闭")
+            elif conn is not None and not conn.closed:
+                # 复用的连接留在空闲状态，出错时未提交的事务回滚
+                conn.rollback()
         except Exception as e:
             logger.error("关闭连接时出错: %s", str(e))
 
 
 if __name__ == "__main__":
-    success, row_count = main()
+    # 打包为 exe 后进程池的子进程也从本入口启动
+    multiprocessing.freeze_support()
+    success, row_count = main(parse_args())
     if success:
         logger.info("=== P波警报数据导入成功! ===")
         sys.exit(0)
     else:
         logger.error("=== 导入失败，请查看日志 ===")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
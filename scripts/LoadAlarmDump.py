@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+把 pg_dump 导出的报警表文件（如 test_tables.sql）并行导入到指定模式
+
+这类文件通常在 Windows 上用 pg_dump > 文件 生成，是带 BOM 的 UTF-16、CRLF 换行，表名带原模式名（gtdzyj.）。
+用 psql 恢复只能单线程，还要先转换编码，也不能换到界面中选择的模式。本脚本：
+  1. 按 BOM 判断编码，边读边解码，不在磁盘上生成转换后的文件
+  2. 把两张报警表的建表、注释、COPY 和约束语句中的原模式名换成 --schema
+  3. 先执行建表语句，COPY 数据段按 --chunk-mb 切成整行的数据块，由 --workers 个连接并行 COPY 写入
+  4. 数据全部写入后再执行主键、索引等导出文件末尾的语句（pg_dump 本来就把它们放在数据之后），两张表各用一个连接同时执行，
+     最后 ANALYZE
+其它表、OWNER TO 和 GRANT 等语句跳过。日志 load_alarm_dump.log 中按表输出行数、字符数、耗时和吞吐量。
+"""
+import argparse
+import codecs
+import io
+import logging
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from SqlPipeline import get_db_config
+
+logger = logging.getLogger(__name__)
+
+ALARM_TABLES = ['station_p_wave_alarm', 'station_s_wave_alarm']
+
+# 文件开头的 BOM 与对应的解码方式，没有 BOM 时使用 --encoding
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 引用报警表（可带模式名、可加引号）的位置，用于筛选和改写语句
+ALARM_TABLE_REF = re.compile(r'(?:"?(\w+)"?\.)?"?\b(' + '|'.join(ALARM_TABLES) + r')\b"?')
+COPY_HEADER = re.compile(r'^COPY\s+(\S+)\s.*FROM stdin;\s*$', re.I)
+# 恢复时不执行的语句：属主、权限和关闭 search_path（改写后的语句都带模式名，search_path 由本脚本设置）
+SKIPPED_STATEMENT = re.compile(r"\bOWNER\s+TO\b|^\s*(GRANT|REVOKE)\b|set_config\('search_path'", re.I)
+PRE_DATA = re.compile(r'^\s*CREATE\s+TABLE\b', re.I)
+# 执行出错时只记录警告的语句
+OPTIONAL_STATEMENT = re.compile(r'^\s*(SET\s|COMMENT\s+ON\b)', re.I)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="并行导入 pg_dump 导出的报警表文件")
+    parser.add_argument('dump_path', help='pg_dump 导出的 .sql 文件')
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='导入到的模式，不存在时创建')
+    parser.add_argument('--workers', type=int, default=4, help='并行 COPY 的连接数')
+    parser.add_argument('--chunk-mb', type=float, default=8, help='每次 COPY 的数据块大小（按解码后的字符数计，单位百万）')
+    parser.add_argument('--encoding', default='utf-8', help='文件没有 BOM 时使用的编码')
+    parser.add_argument('--replace', action='store_true', help='目标模式中已有报警表时先删除（默认报错退出）')
+    parser.add_argument('--no-analyze', action='store_true', help='导入后不执行 ANALYZE')
+    return parser.parse_args()
+
+
+def detect_encoding(path, default):
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    return default
+
+
+class DumpReader:
+    """按块读取并解码导出文件；语句部分逐行返回，COPY 数据段按整行成块返回"""
+
+    def __init__(self, f, block_chars=1 << 22):
+        self.f = f
+        self.block_chars = block_chars
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        block = self.f.read(self.block_chars)
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def readline(self):
+        while True:
+            end = self.buffer.find('\n', self.pos)
+            if end >= 0:
+                line = self.buffer[self.pos:end + 1]
+                self.pos = end + 1
+                return line
+            if not self.fill():
+                line = self.buffer[self.pos:]
+                self.pos = len(self.buffer)
+                return line
+
+    def copy_chunks(self, chunk_chars):
+        """返回数据段中不少于 chunk_chars 个字符的整行数据块，读到行首的结束标记 \\. 为止"""
+        while True:
+            if self.buffer.startswith('\\.\n', self.pos) or (self.eof and self.buffer[self.pos:] == '\\.'):
+                self.pos = min(self.pos + 3, len(self.buffer))
+                return
+            end = self.buffer.find('\n\\.\n', self.pos)
+            if end >= 0:
+                yield self.buffer[self.pos:end + 1]
+                self.pos = end + 1
+                continue
+            last = self.buffer.rfind('\n', self.pos)
+            if last >= self.pos and (last + 1 - self.pos >= chunk_chars or self.eof):
+                yield self.buffer[self.pos:last + 1]
+                self.pos = last + 1
+                continue
+            if not self.fill() and self.buffer[self.pos:] != '\\.':
+                raise ValueError("COPY 数据段没有结束标记 \\.，文件可能不完整")
+
+
+def read_statement(reader, first_line):
+    """从 first_line 开始读完一条以分号结尾的语句"""
+    lines = [first_line]
+    while not first_line.rstrip().endswith(';'):
+        first_line = reader.readline()
+        if not first_line:
+            break
+        lines.append(first_line)
+    return ''.join(lines).strip()
+
+
+def retarget(statement, schema):
+    """把语句中对报警表的引用改为 schema 下的同名表"""
+    return ALARM_TABLE_REF.sub(lambda m: f"{schema}.{m.group(2)}", statement)
+
+
+class CopyWorkers:
+    """每个线程持有一个连接，从队列中取 (COPY语句, 数据块) 写入，每块单独提交"""
+
+    def __init__(self, db_config, workers):
+        self.queue = queue.Queue(maxsize=workers * 2)
+        self.errors = []
+        self.threads = []
+        for i in range(workers):
+            conn = psycopg2.connect(**db_config)
+            conn.autocommit = True
+            conn.set_client_encoding('UTF8')
+            with conn.cursor() as cursor:
+                # 中途失败时整体重新导入，不需要每块都等待 WAL 落盘
+                cursor.execute("SET synchronous_commit TO off")
+            thread = threading.Thread(target=self.run, args=(conn,), name=f"copy-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def run(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                while True:
+                    item = self.queue.get()
+                    if item is None:
+                        return
+                    if self.errors:
+                        continue
+                    copy_sql, data = item
+                    try:
+                        cursor.copy_expert(copy_sql, io.BytesIO(data.encode('utf-8')))
+                    except psycopg2.Error as e:
+                        self.errors.append(e)
+        finally:
+            conn.close()
+
+    def put(self, copy_sql, data):
+        if self.errors:
+            raise self.errors[0]
+        self.queue.put((copy_sql, data))
+
+    def join(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def abort(self):
+        """出错时丢弃队列中剩余的数据块并关闭连接"""
+        self.errors.append(RuntimeError("导入中止"))
+        for _ in self.threads:
+            self.queue.put(None)
+
+
+def prepare_schema(cursor, schema, replace):
+    cursor.execute("CREATE SCHEMA IF NOT EXISTS " + schema)
+    cursor.execute("SELECT relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                   "WHERE n.nspname = %s AND c.relname = ANY(%s)", (schema, ALARM_TABLES))
+    existing = [row[0] for row in cursor.fetchall()]
+    if existing and not replace:
+        raise RuntimeError(f"模式 {schema} 中已有 {', '.join(existing)}，如需覆盖请加 --replace")
+    for table in existing:
+        cursor.execute(f"DROP TABLE {schema}.{table} CASCADE")
+        logger.info("已删除原有的 %s.%s", schema, table)
+
+
+def run_post_data(db_config, schema, table, statements, analyze):
+    """在单独的连接中执行一张表数据之后的语句（主键、索引等）"""
+    conn = psycopg2.connect(**db_config)
+    try:
+        with conn.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+                logger.info("%s", ' '.join(statement.split())[:120])
+            if analyze:
+                cursor.execute(f"ANALYZE {schema}.{table}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main(args):
+    db_config = get_db_config(args)
+    encoding = detect_encoding(args.dump_path, args.encoding)
+    chunk_chars = int(args.chunk_mb * 1000000)
+    logger.info("导入 %s（编码 %s）到模式 %s，%d 个连接并行 COPY", args.dump_path, encoding, args.schema, args.workers)
+
+    conn = psycopg2.connect(**db_config)
+    cursor = conn.cursor()
+    start = time.perf_counter()
+    post_data = {}
+    stats = {}
+    skipped = 0
+    workers = None
+    try:
+        prepare_schema(cursor, args.schema, args.replace)
+        conn.commit()
+        workers = CopyWorkers(db_config, args.workers)
+        # newline=None：CRLF 在解码时统一为 \n，COPY 数据中的回车都已转义为 \r，不受影响
+        with open(args.dump_path, encoding=encoding, newline=None) as f:
+            reader = DumpReader(f)
+            while True:
+                line = reader.readline()
+                if not line:
+                    break
+                if not line.strip() or line.startswith('--'):
+                    continue
+                header = COPY_HEADER.match(line)
+                if header:
+                    copy_sql = retarget(line.strip().rstrip(';'), args.schema)
+                    table = ALARM_TABLE_REF.search(header.group(1))
+                    if not table:
+                        logger.info("跳过 %s 的数据", header.group(1))
+                        for _ in reader.copy_chunks(chunk_chars):
+                            pass
+                        continue
+                    table = table.group(2)
+                    table_start = time.perf_counter()
+                    rows = chars = 0
+                    for data in reader.copy_chunks(chunk_chars):
+                        rows += data.count('\n')
+                        chars += len(data)
+                        workers.put(copy_sql, data)
+                    stats[table] = (rows, chars)
+                    logger.info("%s: 已读取 %d 行，%.1f M字符，读取耗时 %.2f 秒", table, rows, chars / 1e6,
+                                time.perf_counter() - table_start)
+                    continue
+                statement = read_statement(reader, line)
+                table = ALARM_TABLE_REF.search(statement)
+                if SKIPPED_STATEMENT.search(statement) or not (table or statement.upper().startswith('SET ')):
+                    skipped += 1
+                elif OPTIONAL_STATEMENT.match(statement):
+                    # 如 17 版 pg_dump 输出的 SET transaction_timeout 旧版本服务器不认识，
+                    # 或注释中的中文在转码时损坏，与 psql 一样记录后继续
+                    try:
+                        cursor.execute(retarget(statement, args.schema))
+                        conn.commit()
+                    except psycopg2.Error as e:
+                        conn.rollback()
+                        logger.warning("忽略出错的语句 %s: %s", ' '.join(statement.split())[:80], str(e).strip())
+                elif PRE_DATA.match(statement):
+                    cursor.execute(retarget(statement, args.schema))
+                    conn.commit()
+                else:
+                    post_data.setdefault(table.group(2), []).append(retarget(statement, args.schema))
+        workers.join()
+        workers = None
+        load_seconds = time.perf_counter() - start
+        for table, (rows, chars) in stats.items():
+            logger.info("%s: %d 行，%.1f M字符", table, rows, chars / 1e6)
+        total_rows = sum(s[0] for s in stats.values())
+        total_chars = sum(s[1] for s in stats.values())
+        logger.info("数据写入完成: %d 行，耗时 %.2f 秒，%.0f 行/秒，%.1f M字符/秒", total_rows, load_seconds,
+                    total_rows / load_seconds, total_chars / 1e6 / load_seconds)
+
+        index_start = time.perf_counter()
+        # 同一张表上的语句依次执行（ADD PRIMARY KEY 与 CREATE INDEX 的锁互相冲突），不同的表同时执行
+        tables = list(dict.fromkeys(list(stats) + list(post_data)))
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, len(tables)))) as executor:
+            list(executor.map(lambda t: run_post_data(db_config, args.schema, t, post_data.get(t, []),
+                                                      not args.no_analyze), tables))
+        logger.info("约束和索引 %d 条%s，耗时 %.2f 秒；跳过 %d 条无关语句", sum(map(len, post_data.values())),
+                    '' if args.no_analyze else '及 ANALYZE', time.perf_counter() - index_start, skipped)
+        for table in stats:
+            cursor.execute(f"SELECT COUNT(*) FROM {args.schema}.{table}")
+            count = cursor.fetchone()[0]
+            if count != stats[table][0]:
+                raise RuntimeError(f"{table} 表中有 {count} 行，与文件中的 {stats[table][0]} 行不一致")
+        elapsed = time.perf_counter() - start
+        logger.info("导入完成，总耗时 %.2f 秒，%.0f 行/秒", elapsed, total_rows / elapsed)
+    finally:
+        if workers is not None:
+            workers.abort()
+            logger.warning("已写入的数据不完整，请加 --replace 重新导入")
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('load_alarm_dump.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        main(parse_args())
+    except (psycopg2.Error, RuntimeError, ValueError, OSError) as e:
+        logger.error("导入报警表出错: %s", str(e).strip())
+        sys.exit(1)
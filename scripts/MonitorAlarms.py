@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+不经过界面的实时监测
+
+与界面中“实时监测”按钮相同：执行 monitorTables.sql，调用 public.stat_monitor_start() 在报警表上安装触发器，
+之后每收到一次 stat_alarm_new 通知，再等待 --batch-ms 毫秒把这段时间内的写入合成一批，调用 public.stat_monitor_apply()
+只重新匹配新报警所在的窗口，输出刷新后的传输时延和漏报统计。需要先执行过一次查询（界面或 SqlPipeline.py，非事务模式）。
+按 Ctrl+C 退出时删除触发器，统计表保持最后一批的结果。
+"""
+import argparse
+import logging
+import select
+import sys
+import time
+
+import psycopg2
+
+from SqlPipeline import SQL_DIR, get_db_config, load_stage, set_search_path
+
+logger = logging.getLogger(__name__)
+
+# (统计表, 输出的列)，与界面中实时刷新的输入框对应
+MONITORED_TABLES = [
+    ('P_send_time', '总数, 合格数, 合格率, 是否达标, 平均值, 最大值, 最小值'),
+    ('P_warning_miss', '总数, 漏报数, 漏报率, 是否达标'),
+    ('S_40gal_send_time', '总数, 合格数, 合格率, 是否达标, 平均值, 最大值, 最小值'),
+    ('S_80gal_send_time', '总数, 合格数, 合格率, 是否达标, 平均值, 最大值, 最小值'),
+    ('S_120gal_send_time', '总数, 合格数, 合格率, 是否达标, 平均值, 最大值, 最小值'),
+    ('S_warning_miss', '总数, 漏报数, 漏报率, 是否达标'),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="实时监测报警表，按批刷新传输时延和漏报统计")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='报警表所在模式')
+    parser.add_argument('--batch-ms', type=int, default=1000, help='收到通知后等待多久再处理，期间的写入合成一批')
+    parser.add_argument('--idle-seconds', type=float, default=30,
+                        help='超过该时间没有通知时也处理一次队列，防止通知丢失（如连接重建期间的写入）')
+    parser.add_argument('--sql-dir', default=SQL_DIR, help='SQL文件所在目录')
+    return parser.parse_args()
+
+
+def wait_batch(conn, batch_seconds, idle_seconds):
+    """等待第一条通知，再等 batch_seconds 让同一批写入的通知到齐，返回收到的通知数（超时为0）"""
+    if not select.select([conn], [], [], idle_seconds)[0]:
+        return 0
+    deadline = time.monotonic() + batch_seconds
+    while True:
+        conn.poll()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        select.select([conn], [], [], remaining)
+    received = len(conn.notifies)
+    conn.notifies.clear()
+    return received
+
+
+def log_results(cursor):
+    for table, columns in MONITORED_TABLES:
+        cursor.execute(f"SELECT {columns} FROM public.{table}")
+        for row in cursor.fetchall():
+            logger.info("%s: %s", table, ", ".join(f"{name.strip()}={value}" for name, value in zip(columns.split(','), row)))
+
+
+def main(args):
+    conn = psycopg2.connect(**get_db_config(args))
+    conn.autocommit = True
+    cursor = conn.cursor()
+    set_search_path(cursor, args.schema)
+    _, statements = load_stage('实时监测', 'monitorTables.sql', args.sql_dir)
+    for statement in statements:
+        cursor.execute(statement)
+    # 先监听再安装触发器，启动过程中写入的报警不会漏掉通知
+    cursor.execute("LISTEN stat_alarm_new")
+    start = time.perf_counter()
+    cursor.execute("SELECT public.stat_monitor_start()")
+    logger.info("已在模式 %s 上启动实时监测，首批: %s，耗时 %.0f ms", args.schema, cursor.fetchone()[0],
+                (time.perf_counter() - start) * 1000)
+    log_results(cursor)
+    try:
+        while True:
+            received = wait_batch(conn, args.batch_ms / 1000, args.idle_seconds)
+            start = time.perf_counter()
+            cursor.execute("SELECT public.stat_monitor_apply()")
+            result = cursor.fetchone()[0]
+            if result == 'idle':
+                continue
+            logger.info("收到 %d 条通知，本批 %s，耗时 %.0f ms", received, result, (time.perf_counter() - start) * 1000)
+            log_results(cursor)
+    except KeyboardInterrupt:
+        logger.info("停止实时监测")
+    finally:
+        cursor.execute("SELECT public.stat_monitor_stop()")
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('monitor_alarms.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        main(parse_args())
+    except psycopg2.Error as e:
+        logger.error("实时监测出错: %s", str(e).strip())
+        sys.exit(1)
@@ -0,0 +1,854 @@
+# -*- coding: utf-8 -*-
+"""
+离线统计引擎
+
+把标准答案和两张报警表（只取本次测试覆盖的时间段）一次读入类型化的 NumPy 数组，可另存为 .npz 数据集，
+之后不再访问数据库：窗口匹配用排序后的 searchsorted 完成，震中偏差等对比结果按列向量化计算，
+得到与统计SQL相同的统计表（P_send_time ... S_peak_deviation、latency_percentiles、latency_histogram）和数据明细 details。
+
+窗口匹配和对比结果与阈值无关，只计算一次；修改传输时延、判别时间、震中偏差、震级偏差、峰值偏差等阈值后
+重新计分只是对已算好的列做比较和计数（--sweep 逐个取值重新计分并输出耗时），修改 40/80/120gal 阈值时重新匹配S波窗口。
+--cross-check 以默认阈值计算后与 public 下最近一次查询生成的统计表和数据明细逐项比较。
+
+数值与 PostgreSQL 一致：double precision 转 numeric 时取15位有效数字，ROUND 为四舍五入（远离零），
+时间差为微秒差舍入到毫秒，平均值、比率按整数精确计算，分位数与 percentile_disc 取同一行。
+"""
+import argparse
+import io
+import logging
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from SqlPipeline import PUBLISHED_TABLES, get_db_config, set_search_path
+
+logger = logging.getLogger(__name__)
+
+NAT = np.iinfo(np.int64).min  # 时间列以自 1970-01-01 起的微秒整数保存，NULL 记为该值
+EPOCH = datetime(1970, 1, 1)
+
+# 读入的列：(列, 类型)，类型 time 为微秒整数，float 为 double precision，int 为整数，str 为文本
+STAND_COLUMNS = [
+    ('id', 'int'), ('test_id', 'int'), ('waveform_id', 'str'), ('station_name', 'str'),
+    ('earthquake_type', 'str'), ('send_time', 'time'), ('end_time', 'time'),
+    ('actual_magnitude', 'float'), ('actual_distance', 'float'), ('actual_latitude', 'float'),
+    ('actual_longitude', 'float'), ('actual_peak', 'float'), ('azimuth', 'float'),
+    ('p_wave_time', 'time'), ('s_wave_first_time', 'time'), ('s_wave_second_time', 'time'),
+    ('s_wave_third_time', 'time'),
+]
+P_ALARM_COLUMNS = [
+    ('jk_time', 'time'), ('rcv_jktime', 'time'), ('source_longitude', 'float'), ('source_latitude', 'float'),
+    ('epi_dist', 'float'), ('azi_angle', 'float'), ('earthquake_level', 'float'),
+]
+S_ALARM_COLUMNS = [('jk_time', 'time'), ('rcv_jktime', 'time'), ('x_acc_value', 'float')]
+
+DATASET_TABLES = {
+    'stand': STAND_COLUMNS,
+    'p': P_ALARM_COLUMNS,
+    's': S_ALARM_COLUMNS,
+}
+
+# 默认阈值与统计SQL一致；epicenter 为 60/100km 两档，gal 为 S波窗口的实际峰值下限和 80/120gal 两档报警
+DEFAULT_THRESHOLDS = {
+    'p_send': 0.1,
+    'p_judge': 3,
+    'epicenter': (60, 100),
+    'epicenter_max': 300,
+    'magnitude': 1,
+    's_send': 0.1,
+    's_judge': 0.5,
+    'peak_percent': 5,
+    'gal': (40, 80, 120),
+}
+
+# 阈值影响的统计表，--sweep 时只输出这些表
+THRESHOLD_TABLES = {
+    'p_send': ['P_send_time'],
+    'p_judge': ['P_judge_time'],
+    'epicenter': ['P_epicenter_deviation'],
+    'epicenter_max': ['P_epicenter_deviation'],
+    'magnitude': ['P_mag_deviation'],
+    's_send': ['S_40gal_send_time', 'S_80gal_send_time', 'S_120gal_send_time'],
+    's_judge': ['S_40gal_judge_time', 'S_80gal_judge_time', 'S_120gal_judge_time'],
+    'peak_percent': ['S_peak_deviation'],
+    'gal': ['S_40gal_send_time', 'S_80gal_send_time', 'S_120gal_send_time', 'S_warning_miss',
+            'S_peak_deviation', 'S_40gal_judge_time', 'S_80gal_judge_time', 'S_120gal_judge_time'],
+}
+
+# 直方图区间上限（秒），与 compareStats.sql 相同
+SEND_BOUNDS = ['0.05', '0.1', '0.2', '0.5', '1', '2', '5']
+P_JUDGE_BOUNDS = ['0.5', '1', '2', '3', '5', '10', '20']
+S_JUDGE_BOUNDS = ['0.1', '0.2', '0.5', '1', '2', '5', '10']
+PERCENTILES = [0.5, 0.95, 0.99]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="离线统计引擎：读入一次数据，在本进程内完成窗口匹配和统计")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='报警表所在模式')
+    parser.add_argument('--dataset', help='从之前 --save 的 .npz 数据集读入，不连接数据库')
+    parser.add_argument('--save', help='把读入的数据另存为 .npz 数据集')
+    parser.add_argument('--output-dir', help='把统计表和数据明细写入该目录（每张表一个CSV）')
+    parser.add_argument('--cross-check', action='store_true',
+                        help='与 public 下最近一次查询的统计表和数据明细逐项比较，不一致时返回1（使用默认阈值）')
+    parser.add_argument('--sweep', action='append', default=[], metavar='NAME=V1,V2,...',
+                        help='逐个取值重新计分并输出受影响的统计表和耗时，两档的阈值用冒号分隔，如 epicenter=50:100,60:100')
+    parser.add_argument('--p-send', type=float, default=DEFAULT_THRESHOLDS['p_send'], help='P波预警传输时间阈值（秒）')
+    parser.add_argument('--p-judge', type=float, default=DEFAULT_THRESHOLDS['p_judge'], help='P波首报判别时间阈值（秒）')
+    parser.add_argument('--epicenter', type=float, nargs=2, default=DEFAULT_THRESHOLDS['epicenter'],
+                        help='震中位置偏差的两档阈值（km）')
+    parser.add_argument('--epicenter-max', type=float, default=DEFAULT_THRESHOLDS['epicenter_max'],
+                        help='震中位置偏差最大值上限（km）')
+    parser.add_argument('--magnitude', type=float, default=DEFAULT_THRESHOLDS['magnitude'], help='震级偏差阈值')
+    parser.add_argument('--s-send', type=float, default=DEFAULT_THRESHOLDS['s_send'], help='阈值报警传输时延阈值（秒）')
+    parser.add_argument('--s-judge', type=float, default=DEFAULT_THRESHOLDS['s_judge'], help='阈值报警判别时延阈值（秒）')
+    parser.add_argument('--peak-percent', type=float, default=DEFAULT_THRESHOLDS['peak_percent'],
+                        help='阈值报警峰值偏差百分比阈值')
+    parser.add_argument('--gal', type=float, nargs=3, default=DEFAULT_THRESHOLDS['gal'],
+                        help='S波窗口的实际峰值下限和两档报警加速度阈值（gal）')
+    return parser.parse_args()
+
+
+# ---------- 与 PostgreSQL 一致的数值规则 ----------
+
+def numeric_text(value):
+    """double precision 转 numeric 时的取值（15位有效数字）"""
+    return Decimal('%.15g' % value)
+
+
+def round_half_away(numerator, denominator):
+    """整数比值四舍五入（远离零）到整数"""
+    sign = -1 if (numerator < 0) != (denominator < 0) else 1
+    numerator, denominator = abs(numerator), abs(denominator)
+    return sign * ((2 * numerator + denominator) // (2 * denominator))
+
+
+def decimal_from_units(units, digits):
+    """以 10^-digits 为单位的整数转为该精度的 Decimal，与 numeric 的输出相同（零不带符号）"""
+    units = int(units)
+    text = f"{abs(units) // 10 ** digits}" + (f".{abs(units) % 10 ** digits:0{digits}d}" if digits else '')
+    return Decimal(('-' if units < 0 else '') + text)
+
+
+def to_decimal(value, digits):
+    """已按 digits 位舍入的 float 转为 Decimal，NULL 返回 None"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return decimal_from_units(round(value * 10 ** digits), digits)
+
+
+def pg_round(values, digits, percent=False, exact=None):
+    """
+    ROUND(x::numeric, digits)，percent 为 True 时为 ROUND(x::numeric * 100, digits)。
+    向量化舍入；距舍入边界过近的值改用 15 位有效数字的 Decimal 精确舍入（exact 给出时先用它按标准库数学函数重新计算 x）。
+    返回舍入后的 float64（即对应 numeric 值最接近的 double），NULL 为 NaN
+    """
+    values = np.asarray(values, dtype='float64')
+    shift = digits + (2 if percent else 0)
+    with np.errstate(invalid='ignore'):
+        scaled = np.abs(values) * 10.0 ** shift
+        units = np.floor(scaled + 0.5)
+        near = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near):
+        value = exact(i) if exact is not None else values[i]
+        units[i] = int(abs(numeric_text(value)).scaleb(shift).quantize(Decimal(1), ROUND_HALF_UP))
+    return np.copysign(units, values) / 10.0 ** digits
+
+
+def epoch_seconds(later, earlier):
+    """ROUND(EXTRACT(EPOCH FROM later - earlier), 3)：微秒差舍入到毫秒，返回秒，任一为 NULL 时为 NaN"""
+    valid = (later != NAT) & (earlier != NAT)
+    diff = np.where(valid, later - earlier, 0)
+    ms = np.sign(diff) * ((np.abs(diff) + 500) // 1000)
+    return np.where(valid, ms / 1000.0, np.nan)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """与 P_compare_result 中的 Haversine 公式逐项相同（radians 为乘以 pi/180，power(x, 2) 为 x*x）"""
+    rad = math.pi / 180
+    a = np.sin((lat1 - lat2) / 2 * rad) ** 2 + np.cos(lat2 * rad) * np.cos(lat1 * rad) * np.sin((lon1 - lon2) / 2 * rad) ** 2
+    return 2 * 6371 * np.arcsin(np.sqrt(a))
+
+
+def haversine_km_exact(lat1, lon1, lat2, lon2):
+    """标准库数学函数（与数据库服务端使用的 C 库相同）计算的单个值，用于舍入边界附近的复核"""
+    rad = math.pi / 180
+    a = (math.pow(math.sin((lat1 - lat2) / 2 * rad), 2)
+         + math.cos(lat2 * rad) * math.cos(lat1 * rad) * math.pow(math.sin((lon1 - lon2) / 2 * rad), 2))
+    return 2 * 6371 * math.asin(math.sqrt(a))
+
+
+def exact_avg(values, digits):
+    """ROUND(avg(x), 3)，x 为 digits 位小数的 numeric；没有非空值时返回 None"""
+    valid = values[~np.isnan(values)]
+    if not len(valid):
+        return None
+    total = int(np.rint(valid * 10 ** digits).astype('int64').sum())
+    return decimal_from_units(round_half_away(total * 10 ** (3 - digits), len(valid)), 3)
+
+
+def ratio_percent(count, total):
+    """ROUND(100.0 * count / total, 2)，total 为 0 时返回 None"""
+    if not total:
+        return None
+    return decimal_from_units(round_half_away(count * 10000, total), 2)
+
+
+def percent_text(count, total):
+    """合格率等比率列：ROUND(...) || '%'，total 为 0 时为 'NAN%'"""
+    ratio = ratio_percent(count, total)
+    return 'NAN%' if ratio is None else f"{ratio}%"
+
+
+def judge(condition, total):
+    """是否达标列：总数为 0 时为 NULL"""
+    if not total:
+        return None
+    return '是' if condition else '否'
+
+
+def column_max(values, digits):
+    valid = values[~np.isnan(values)]
+    return to_decimal(float(valid.max()), digits) if len(valid) else None
+
+
+def column_min(values, digits):
+    valid = values[~np.isnan(values)]
+    return to_decimal(float(valid.min()), digits) if len(valid) else None
+
+
+def percentile_disc(values, digits):
+    """percentile_disc(ARRAY[0.5, 0.95, 0.99])：取第 ceil(p*n) 行，没有非空值时为 NULL"""
+    valid = np.sort(values[~np.isnan(values)])
+    if not len(valid):
+        return [None] * len(PERCENTILES)
+    return [to_decimal(float(valid[max(1, math.ceil(p * len(valid))) - 1]), digits) for p in PERCENTILES]
+
+
+def count_le(values, threshold):
+    with np.errstate(invalid='ignore'):
+        return int(np.count_nonzero(values <= threshold))
+
+
+def count_lt(values, threshold):
+    with np.errstate(invalid='ignore'):
+        return int(np.count_nonzero(values < threshold))
+
+
+def label(value):
+    """阈值在统计项目名称中的写法，默认阈值时与统计SQL中的名称相同"""
+    return format(float(value), 'g')
+
+
+# ---------- 数据读入 ----------
+
+def copy_query(cursor, query, columns, params=None):
+    """COPY (query) TO STDOUT 读入为各列的 NumPy 数组"""
+    buffer = io.StringIO()
+    cursor.copy_expert(cursor.mogrify(f"COPY ({query}) TO STDOUT WITH (FORMAT csv)", params).decode(), buffer)
+    buffer.seek(0)
+    frame = pd.read_csv(buffer, header=None, names=[name for name, _ in columns],
+                        dtype={name: str for name, _ in columns}, keep_default_na=False, na_values=[''])
+    return {name: convert_column(frame[name], kind) for name, kind in columns}
+
+
+def convert_column(series, kind):
+    if kind == 'time':
+        times = pd.to_datetime(series, format='ISO8601').to_numpy('datetime64[us]').view('int64')
+        return np.where(series.isna().to_numpy(), NAT, times)
+    if kind == 'float':
+        return series.astype('float64').to_numpy()
+    if kind == 'int':
+        return series.astype('int64').to_numpy()
+    return series.fillna('').to_numpy(dtype=str)
+
+
+def load_dataset(cursor, schema):
+    """读入标准答案和报警表中本次测试覆盖时间段内的报警（与匹配SQL中的时间段条件相同）"""
+    set_search_path(cursor, schema)
+    stand_names = ', '.join(name for name, _ in STAND_COLUMNS)
+    dataset = {'stand': copy_query(cursor, f"SELECT {stand_names} FROM public.standanswer_p_wave_alarm ORDER BY id",
+                                   STAND_COLUMNS)}
+    send_time = dataset['stand']['send_time']
+    if not len(send_time):
+        raise RuntimeError("标准答案表为空，请先导入标准答案")
+    next_send = next_send_times(send_time, dataset['stand']['end_time'])
+    low = EPOCH + timedelta(microseconds=int(send_time.min()))
+    high = EPOCH + timedelta(microseconds=int(next_send.max()))
+    for key, table, columns in (('p', 'station_p_wave_alarm', P_ALARM_COLUMNS),
+                                ('s', 'station_s_wave_alarm', S_ALARM_COLUMNS)):
+        names = ', '.join(name for name, _ in columns)
+        dataset[key] = copy_query(cursor, f"SELECT {names} FROM {table} WHERE jk_time BETWEEN %s AND %s",
+                                  columns, (low, high))
+    return dataset
+
+
+def save_dataset(dataset, path):
+    np.savez_compressed(path, **{f"{table}__{name}": values
+                                 for table, columns in dataset.items() for name, values in columns.items()})
+
+
+def read_dataset(path):
+    with np.load(path) as data:
+        return {table: {name: data[f"{table}__{name}"] for name, _ in columns}
+                for table, columns in DATASET_TABLES.items()}
+
+
+def next_send_times(send_time, end_time):
+    """LEAD(send_time) OVER (ORDER BY send_time)，最后一个窗口为 end_time；send_time 相同时按 id 顺序"""
+    order = np.argsort(send_time, kind='stable')
+    next_send = np.empty_like(send_time)
+    next_send[order[:-1]] = send_time[order[1:]]
+    next_send[order[-1]] = end_time[order[-1]]
+    return next_send
+
+
+def sorted_alarms(alarms):
+    """按 jk_time 排序（jk_time 相同时保持读入顺序）"""
+    order = np.argsort(alarms['jk_time'], kind='stable')
+    return {name: values[order] for name, values in alarms.items()}
+
+
+def window_ranges(jk_time, low, high):
+    """每个窗口 [low, high]（两端都包含）在按 jk_time 排序的报警中的下标范围 [start, end)"""
+    start = np.searchsorted(jk_time, low, side='left')
+    end = np.maximum(np.searchsorted(jk_time, high, side='right'), start)
+    return start, end
+
+
+def first_matching(mask, start, end):
+    """每个窗口内第一个满足 mask 的报警下标，没有时为 -1"""
+    positions = np.flatnonzero(mask)
+    k = np.searchsorted(positions, start, side='left')
+    candidate = positions[np.minimum(k, len(positions) - 1)] if len(positions) else np.zeros_like(start)
+    found = (k < len(positions)) & (candidate < end)
+    return np.where(found, candidate, -1)
+
+
+def window_max(values, start, end):
+    """每个窗口内的最大值（忽略 NULL），空窗口为 NaN"""
+    if not len(values):
+        return np.full(len(start), np.nan)
+    padded = np.append(values, np.nan)
+    bounds = np.empty(2 * len(start), dtype='int64')
+    bounds[0::2] = start
+    bounds[1::2] = end
+    result = np.fmax.reduceat(padded, bounds)[0::2]
+    return np.where(end > start, result, np.nan)
+
+
+def take(values, index, missing):
+    """按下标取值，下标为 -1 时为 missing"""
+    if not len(values):
+        return np.full(len(index), missing, dtype=values.dtype if missing is NAT else 'float64')
+    return np.where(index >= 0, values[np.maximum(index, 0)], missing)
+
+
+# ---------- 匹配和统计 ----------
+
+class OfflineStatEngine:
+    """窗口匹配和对比结果按列保存在内存中，score 以给定阈值生成统计表，details 生成数据明细"""
+
+    def __init__(self, dataset):
+        self.stand = dataset['stand']
+        self.p_alarms = sorted_alarms(dataset['p'])
+        self.s_alarms = sorted_alarms(dataset['s'])
+        self.next_send = next_send_times(self.stand['send_time'], self.stand['end_time'])
+        self.p = self.match_p()
+        self.s = None
+        self.gal = None
+
+    def match_p(self):
+        """P_matched_details 和 P_compare_result：每个窗口内 jk_time 最早的P波报警"""
+        stand, alarms = self.stand, self.p_alarms
+        start, end = window_ranges(alarms['jk_time'], stand['send_time'], self.next_send)
+        first = np.where(end > start, start, -1)
+        p = {
+            'first_jk_time': take(alarms['jk_time'], first, NAT),
+            'first_rcv_jktime': take(alarms['rcv_jktime'], first, NAT),
+        }
+        for name in ('source_longitude', 'source_latitude', 'epi_dist', 'azi_angle', 'earthquake_level'):
+            p[name] = pg_round(take(alarms[name], first, np.nan), 3)
+
+        p['p_warning_miss'] = p['first_jk_time'] == NAT
+        p['magnitude_diff'] = pg_round(np.abs(p['earthquake_level'] - stand['actual_magnitude']), 2)
+        lat, lon = p['source_latitude'], p['source_longitude']
+        actual_lat, actual_lon = stand['actual_latitude'], stand['actual_longitude']
+        with np.errstate(invalid='ignore'):
+            distance = haversine_km(lat, lon, actual_lat, actual_lon)
+        p['epicenter_deviation_km'] = pg_round(
+            distance, 3, exact=lambda i: haversine_km_exact(lat[i], lon[i], actual_lat[i], actual_lon[i]))
+        p['p_wave_judge_time'] = epoch_seconds(p['first_rcv_jktime'], stand['p_wave_time'])
+        p['p_wave_judge_time_sta'] = epoch_seconds(p['first_jk_time'], stand['p_wave_time'])
+        p['epi_dist_diff'] = pg_round(np.abs(p['epi_dist'] - stand['actual_distance']), 3)
+        p['azi_angle_diff'] = pg_round(np.abs(p['azi_angle'] - stand['azimuth']), 3)
+        p['p_send_time'] = epoch_seconds(p['first_rcv_jktime'], p['first_jk_time'])
+        return p
+
+    def match_s(self, gal):
+        """S_matched_details 和 S_compare_result：实际峰值不低于 gal[0] 的窗口，首报、gal[1]/gal[2] 首报和最大峰值"""
+        if self.gal == tuple(gal):
+            return
+        stand, alarms = self.stand, self.s_alarms
+        with np.errstate(invalid='ignore'):
+            rows = np.flatnonzero(stand['actual_peak'] >= gal[0])
+        start, end = window_ranges(alarms['jk_time'], stand['send_time'][rows], self.next_send[rows])
+        first = np.where(end > start, start, -1)
+        s = {
+            'rows': rows,
+            'first_jk_time': take(alarms['jk_time'], first, NAT),
+            'first_rcv_jktime': take(alarms['rcv_jktime'], first, NAT),
+            'wave_peak': pg_round(window_max(alarms['x_acc_value'], start, end), 3),
+        }
+        for prefix, threshold in (('gal80', gal[1]), ('gal120', gal[2])):
+            with np.errstate(invalid='ignore'):
+                index = first_matching(alarms['x_acc_value'] >= threshold, start, end)
+            s[f'{prefix}_jk_time'] = take(alarms['jk_time'], index, NAT)
+            s[f'{prefix}_rcv_jktime'] = take(alarms['rcv_jktime'], index, NAT)
+
+        s['s_warning_miss'] = s['first_jk_time'] == NAT
+        s1, s2, s3 = (stand[name][rows] for name in ('s_wave_first_time', 's_wave_second_time', 's_wave_third_time'))
+        s['swave_judge_time'] = epoch_seconds(s['first_rcv_jktime'], s1)
+        s['swave_judge_time_station'] = epoch_seconds(s['first_jk_time'], s1)
+        s['gal80_judge_time'] = epoch_seconds(s['gal80_rcv_jktime'], s2)
+        s['gal80_judge_time_station'] = epoch_seconds(s['gal80_jk_time'], s2)
+        s['gal120_judge_time'] = epoch_seconds(s['gal120_rcv_jktime'], s3)
+        s['gal120_judge_time_station'] = epoch_seconds(s['gal120_jk_time'], s3)
+        actual_peak = stand['actual_peak'][rows]
+        deviation = np.abs(actual_peak - s['wave_peak'])
+        s['peak_deviation'] = pg_round(deviation, 3)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            s['peak_deviation_percent'] = pg_round(np.where(actual_peak != 0, deviation / actual_peak, np.nan),
+                                                   2, percent=True)
+        s['s_send_time'] = epoch_seconds(s['first_rcv_jktime'], s['first_jk_time'])
+        s['gal80_send_time'] = epoch_seconds(s['gal80_rcv_jktime'], s['gal80_jk_time'])
+        s['gal120_send_time'] = epoch_seconds(s['gal120_rcv_jktime'], s['gal120_jk_time'])
+        self.s, self.gal = s, tuple(gal)
+
+    def score(self, thresholds):
+        """按 summaryTables.sql 生成各统计表，返回 {表名: DataFrame}，顺序与 PUBLISHED_TABLES 相同"""
+        t = thresholds
+        self.match_s(t['gal'])
+        p, s = self.p, self.s
+        g40, g80, g120 = (label(g) for g in t['gal'])
+        p_total = len(self.stand['id'])
+        s_total = len(s['rows'])
+        tables = {}
+
+        p_send_le = count_le(p['p_send_time'], t['p_send'])
+        tables['P_send_time'] = [{
+            '项目': f"P波预警传输时间统计≤{label(t['p_send'])}s",
+            '总数': p_total,
+            '合格数': p_send_le,
+            '合格率': percent_text(p_send_le, p_total),
+            '标准': '≥95%',
+            '是否达标': judge(p_send_le * 100 >= 95 * p_total, p_total),
+            '最大值': column_max(p['p_send_time'], 3),
+            '最小值': column_min(p['p_send_time'], 3),
+            '平均值': exact_avg(p['p_send_time'], 3),
+        }]
+
+        epicenter = p['epicenter_deviation_km']
+        near, far = (label(km) for km in t['epicenter'])
+        near_count, far_count = (count_le(epicenter, km) for km in t['epicenter'])
+        epicenter_max = column_max(epicenter, 3)
+        tables['P_epicenter_deviation'] = [{
+            '项目': 'P波预警震中位置偏差',
+            '总数': p_total,
+            f'偏差≤{near}km组数': near_count if p_total else None,
+            f'偏差≤{near}km占比': percent_text(near_count, p_total),
+            f'偏差≤{near}km占比标准': '≥60%',
+            f'是否达标({near}km)': judge(p_total and ratio_percent(near_count, p_total) >= 60, p_total),
+            f'偏差≤{far}km组数': far_count if p_total else None,
+            f'偏差≤{far}km占比': percent_text(far_count, p_total),
+            f'偏差≤{far}km占比标准': '≥80%',
+            f'是否达标({far}km)': judge(p_total and ratio_percent(far_count, p_total) >= 80, p_total),
+            '偏差最大值': epicenter_max,
+            f"最大值不超过{label(t['epicenter_max'])}km":
+                '是' if epicenter_max is not None and epicenter_max <= Decimal(str(t['epicenter_max'])) else '否',
+        }]
+
+        judge_le = count_le(p['p_wave_judge_time_sta'], t['p_judge'])
+        tables['P_judge_time'] = [{
+            '项目': f"台站首报P波预警判别时间≤{label(t['p_judge'])}秒",
+            '总数': p_total,
+            '合格数': judge_le,
+            '合格率': percent_text(judge_le, p_total),
+            '标准': '≥90%',
+            '是否达标': judge(judge_le * 10 >= 9 * p_total, p_total),
+            '平均值': exact_avg(p['p_wave_judge_time_sta'], 3),
+        }]
+
+        mag_le = count_le(p['magnitude_diff'], t['magnitude'])
+        tables['P_mag_deviation'] = [{
+            '项目': f"P波预警震级偏差≤{label(t['magnitude'])}",
+            '总数': p_total,
+            '合格数': mag_le,
+            '合格率': percent_text(mag_le, p_total),
+            '标准': '≥95%',
+            # 与统计SQL相同，按舍入后的合格率 ≥50 判定
+            '是否达标': judge(p_total and ratio_percent(mag_le, p_total) >= 50, p_total),
+            '偏差平均值': exact_avg(p['magnitude_diff'], 2),
+        }]
+
+        p_miss = int(np.count_nonzero(p['p_warning_miss']))
+        tables['P_warning_miss'] = [{
+            '项目': 'P波预警漏报',
+            '总数': p_total,
+            '漏报数': p_miss,
+            '漏报率': percent_text(p_miss, p_total),
+            '标准': '≤5%',
+            '是否达标': judge(p_miss * 100 <= 5 * p_total, p_total),
+        }]
+
+        s_send_lt = count_lt(s['s_send_time'], t['s_send'])
+        tables['S_40gal_send_time'] = [{
+            '项目': f"阈值报警传输时延≤{label(t['s_send'])}s({g40}gal)",
+            '总数': s_total,
+            '合格数': s_send_lt,
+            '合格率': percent_text(s_send_lt, s_total),
+            '标准': '95%',
+            '是否达标': judge(s_send_lt * 100 >= 95 * s_total, s_total),
+            '平均值': exact_avg(s['s_send_time'], 3),
+            '最大值': column_max(s['s_send_time'], 3),
+            '最小值': column_min(s['s_send_time'], 3),
+        }]
+        # 与统计SQL相同：80/120gal 的合格数和是否达标按 ≤ 统计，合格率按 < 统计
+        for name, prefix, gal in (('S_80gal_send_time', 'gal80', g80), ('S_120gal_send_time', 'gal120', g120)):
+            values = s[f'{prefix}_send_time']
+            count = int(np.count_nonzero(~np.isnan(values)))
+            le, lt = count_le(values, t['s_send']), count_lt(values, t['s_send'])
+            tables[name] = [{
+                '项目': f"阈值报警传输时延≤{label(t['s_send'])}s({gal}gal)",
+                '总数': count,
+                '合格数': le,
+                '合格率': percent_text(lt, count),
+                '标准': '95%',
+                '是否达标': judge(le * 100 >= 95 * count, count),
+                '平均值': exact_avg(values, 3),
+                '最大值': column_max(values, 3),
+                '最小值': column_min(values, 3),
+            }]
+
+        s_miss = int(np.count_nonzero(s['s_warning_miss']))
+        tables['S_warning_miss'] = [{
+            '项目': 'S波预警漏报',
+            '总数': s_total,
+            '漏报数': s_miss,
+            '漏报率': percent_text(s_miss, s_total),
+            '标准': '≤0%',
+            '是否达标': judge(s_miss == 0, s_total),
+        }]
+
+        before = s['first_jk_time'] != NAT
+        p_first = p['first_jk_time'][s['rows']]
+        tables['s_alarm_before_p'] = [{
+            '项目': '先报警后预警',
+            '先报警后预警数量': int(np.count_nonzero(before & (p_first != NAT) & (p_first > s['first_jk_time']))),
+        }]
+
+        for name, column, gal, use_count in (
+                ('S_40gal_judge_time', 'swave_judge_time_station', g40, False),
+                ('S_80gal_judge_time', 'gal80_judge_time_station', g80, True),
+                ('S_120gal_judge_time', 'gal120_judge_time_station', g120, True)):
+            values = s[column]
+            # 40gal 以全部S波窗口为总数，80/120gal 以有判别时延的窗口为总数
+            total = int(np.count_nonzero(~np.isnan(values))) if use_count else s_total
+            le = count_le(values, t['s_judge'])
+            tables[name] = [{
+                '项目': f"阈值报警判别时延≤{label(t['s_judge'])}s({gal}gal)",
+                '总数': total,
+                '合格数': le,
+                '合格率': percent_text(le, total),
+                '标准': '≥70%',
+                '是否达标': judge(le * 10 >= 7 * total, total),
+                '平均值': exact_avg(values, 3),
+                '最大值': column_max(values, 3),
+                '最小值': column_min(values, 3),
+            }]
+
+        peak_le = count_le(s['peak_deviation_percent'], t['peak_percent'])
+        peak_max = column_max(s['peak_deviation_percent'], 2)
+        tables['S_peak_deviation'] = [{
+            '项目': f"阈值报警最大偏差≤{label(t['peak_percent'])}%",
+            '总数': s_total,
+            '合格数': peak_le,
+            '合格率': percent_text(peak_le, s_total),
+            '标准': '≥95%',
+            '是否达标': judge(peak_le * 100 >= 95 * s_total, s_total),
+            '最大偏差': None if peak_max is None else f"{peak_max}%",
+        }]
+
+        metrics = [
+            ('P波预警传输时延', p['p_send_time'], SEND_BOUNDS),
+            ('P波预警首报判别时间', p['p_wave_judge_time_sta'], P_JUDGE_BOUNDS),
+            (f'阈值报警传输时延({g40}gal)', s['s_send_time'], SEND_BOUNDS),
+            (f'阈值报警传输时延({g80}gal)', s['gal80_send_time'], SEND_BOUNDS),
+            (f'阈值报警传输时延({g120}gal)', s['gal120_send_time'], SEND_BOUNDS),
+            (f'阈值报警判别时延({g40}gal)', s['swave_judge_time_station'], S_JUDGE_BOUNDS),
+            (f'阈值报警判别时延({g80}gal)', s['gal80_judge_time_station'], S_JUDGE_BOUNDS),
+            (f'阈值报警判别时延({g120}gal)', s['gal120_judge_time_station'], S_JUDGE_BOUNDS),
+        ]
+        tables['latency_percentiles'] = []
+        tables['latency_histogram'] = []
+        for metric, values, bounds in metrics:
+            samples = int(np.count_nonzero(~np.isnan(values)))
+            pct = percentile_disc(values, 3)
+            tables['latency_percentiles'].append({
+                '项目': '时延分位数', '指标': metric, '样本数': samples,
+                'P50': pct[0], 'P95': pct[1], 'P99': pct[2], '最大值': column_max(values, 3),
+            })
+            cumulative = [count_le(values, float(bound)) for bound in bounds] + [samples]
+            for i in range(len(bounds) + 1):
+                if i == 0:
+                    interval = f'≤{bounds[0]}s'
+                elif i == len(bounds):
+                    interval = f'>{bounds[-1]}s'
+                else:
+                    interval = f'({bounds[i - 1]}, {bounds[i]}]s'
+                count = cumulative[i] - (cumulative[i - 1] if i else 0)
+                tables['latency_histogram'].append({
+                    '项目': '时延分布直方图', '指标': metric, '序号': i + 1, '区间': interval,
+                    '数量': count, '占比': percent_text(count, samples),
+                })
+
+        return {name: pd.DataFrame(tables[name], dtype=object) for name in PUBLISHED_TABLES if name in tables}
+
+    def details(self, gal):
+        """按 detailsTables.sql 生成数据明细，列名与 public.details 相同（未加引号的别名中的字母为小写）"""
+        self.match_s(gal)
+        stand, p, s = self.stand, self.p, self.s
+        n = len(stand['id'])
+
+        def s_column(name, missing=np.nan):
+            values = np.full(n, missing, dtype='int64' if missing is NAT else 'float64')
+            values[s['rows']] = s[name]
+            return values
+
+        def decimals(values, digits):
+            return [to_decimal(float(v), digits) for v in values]
+
+        def times(values):
+            return [None if v == NAT else EPOCH + timedelta(microseconds=int(v)) for v in values]
+
+        def floats(values):
+            return [None if math.isnan(v) else float(v) for v in values]
+
+        s_miss = np.zeros(n, dtype=bool)
+        has_s = np.zeros(n, dtype=bool)
+        s_miss[s['rows']] = s['s_warning_miss']
+        has_s[s['rows']] = True
+        s_first = s_column('first_jk_time', NAT)
+        before = (p['first_jk_time'] != NAT) & (s_first != NAT) & (p['first_jk_time'] > s_first)
+        columns = {
+            '实验编号': [int(v) for v in stand['test_id']],
+            '波形编号': list(stand['waveform_id']),
+            '波形发送时间': times(stand['send_time']),
+            '波形结束时间': times(stand['end_time']),
+            '台站编码': list(stand['station_name']),
+            '波形类型': list(stand['earthquake_type']),
+            '漏报s波': ['1' if miss else None for miss in s_miss],
+            '漏报p波': ['xs_hp' if b else ('1' if miss else None) for b, miss in zip(before, p['p_warning_miss'])],
+            '实际震级': floats(stand['actual_magnitude']),
+            '首报震级': decimals(p['earthquake_level'], 3),
+            '震级偏差': decimals(p['magnitude_diff'], 2),
+            '实际经度': floats(stand['actual_longitude']),
+            '实际纬度': floats(stand['actual_latitude']),
+            '首报经度': decimals(p['source_longitude'], 3),
+            '首报纬度': decimals(p['source_latitude'], 3),
+            '震中偏差(km)': decimals(p['epicenter_deviation_km'], 3),
+            'P波预警判别时间(s)': decimals(p['p_wave_judge_time'], 3),
+            'P波判别预警时间-台站(s)': decimals(p['p_wave_judge_time_sta'], 3),
+            '实际p波初至时间': times(stand['p_wave_time']),
+            'p波报警时间': times(p['first_rcv_jktime']),
+            '实际峰值(gal)': floats(stand['actual_peak']),
+            '首报峰值(gal)': decimals(s_column('wave_peak'), 3),
+            '峰值偏差(gal)': decimals(s_column('peak_deviation'), 3),
+            '峰值偏差百分比': decimals(s_column('peak_deviation_percent'), 2),
+            '阈值报警判别时间(s)': decimals(s_column('swave_judge_time'), 3),
+            '阈值判别时间-台站(s)': decimals(s_column('swave_judge_time_station'), 3),
+            '实际震中距(km)': floats(stand['actual_distance']),
+            '首报震中距(km)': decimals(p['epi_dist'], 3),
+            '震中距偏差(km)': decimals(p['epi_dist_diff'], 3),
+            '实际方位角': floats(stand['azimuth']),
+            '首报方位角': decimals(p['azi_angle'], 3),
+            '方位角偏差': decimals(p['azi_angle_diff'], 3),
+            '80gal阈值报警判别时间(s)': decimals(s_column('gal80_judge_time'), 3),
+            '80gal阈值报警判别时间-台站(s)': decimals(s_column('gal80_judge_time_station'), 3),
+            '120gal阈值报警判别时间(s)': decimals(s_column('gal120_judge_time'), 3),
+            '120gal阈值报警判别时间-台站(s)': decimals(s_column('gal120_judge_time_station'), 3),
+            'P波预警首报传输时间(s)': decimals(p['p_send_time'], 3),
+            '阈值报警首报传输时间(s)': decimals(s_column('s_send_time'), 3),
+            '80gal阈值报警传输时间(s)': decimals(s_column('gal80_send_time'), 3),
+            '120gal阈值报警传输时间(s)': decimals(s_column('gal120_send_time'), 3),
+        }
+        return pd.DataFrame(columns, dtype=object)
+
+
+# ---------- 输出和校验 ----------
+
+def log_table(name, frame):
+    for row in frame.itertuples(index=False):
+        logger.info("%s: %s", name, ", ".join(f"{column}={value}" for column, value in zip(frame.columns, row)))
+
+
+def normalize(value):
+    """比较用的取值：numeric 按输出文本，double precision 按 repr，时间按 ISO 格式"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def cross_check(cursor, tables, details, max_report=10):
+    """与 public 下的统计表和数据明细逐项比较，返回不一致的项数"""
+    mismatches = 0
+    for name in PUBLISHED_TABLES:
+        frame = details if name == 'details' else tables[name]
+        cursor.execute(f"SELECT * FROM public.{name}")
+        sql_columns = [column.name for column in cursor.description]
+        sql_rows = cursor.fetchall()
+        if sql_columns != list(frame.columns):
+            logger.error("%s 列不一致: SQL %s, 引擎 %s", name, sql_columns, list(frame.columns))
+            mismatches += 1
+            continue
+        if len(sql_rows) != len(frame):
+            logger.error("%s 行数不一致: SQL %d, 引擎 %d", name, len(sql_rows), len(frame))
+            mismatches += 1
+            continue
+        table_mismatches = 0
+        for i, (sql_row, row) in enumerate(zip(sql_rows, frame.itertuples(index=False))):
+            for column, expected, actual in zip(sql_columns, sql_row, row):
+                if normalize(expected) != normalize(actual):
+                    if table_mismatches < max_report:
+                        logger.error("%s 第%d行 %s 不一致: SQL %r, 引擎 %r", name, i + 1, column, expected, actual)
+                    table_mismatches += 1
+        logger.info("%s: %d 行, %s", name, len(sql_rows), f"{table_mismatches} 项不一致" if table_mismatches else "一致")
+        mismatches += table_mismatches
+    return mismatches
+
+
+def parse_sweep(spec, thresholds):
+    """NAME=V1,V2,... 解析为 (阈值名, [取值])，两档和三档的阈值用冒号分隔各档"""
+    name, _, values = spec.partition('=')
+    name = name.strip().replace('-', '_')
+    if name not in thresholds or not values:
+        raise ValueError(f"无效的 --sweep: {spec}，可用的阈值: {', '.join(thresholds)}")
+    parsed = []
+    for value in values.split(','):
+        if isinstance(thresholds[name], tuple):
+            parsed.append(tuple(float(v) for v in value.split(':')))
+            if len(parsed[-1]) != len(thresholds[name]):
+                raise ValueError(f"{name} 需要 {len(thresholds[name])} 个以冒号分隔的值: {value}")
+        else:
+            parsed.append(float(value))
+    return name, parsed
+
+
+def main(args):
+    thresholds = {
+        'p_send': args.p_send, 'p_judge': args.p_judge, 'epicenter': tuple(args.epicenter),
+        'epicenter_max': args.epicenter_max, 'magnitude': args.magnitude, 's_send': args.s_send,
+        's_judge': args.s_judge, 'peak_percent': args.peak_percent, 'gal': tuple(args.gal),
+    }
+    sweeps = [parse_sweep(spec, thresholds) for spec in args.sweep]
+    conn = None
+    if not args.dataset or args.cross_check:
+        conn = psycopg2.connect(**get_db_config(args))
+        conn.set_client_encoding('UTF8')
+    try:
+        start = time.perf_counter()
+        if args.dataset:
+            dataset = read_dataset(args.dataset)
+            logger.info("已读入数据集 %s", args.dataset)
+        else:
+            with conn.cursor() as cursor:
+                dataset = load_dataset(cursor, args.schema)
+            conn.rollback()
+        logger.info("读入 %d 个标准答案窗口、%d 条P波报警、%d 条S波报警，耗时 %.2f 秒", len(dataset['stand']['id']),
+                    len(dataset['p']['jk_time']), len(dataset['s']['jk_time']), time.perf_counter() - start)
+        if args.save:
+            save_dataset(dataset, args.save)
+            logger.info("数据集已保存到 %s", args.save)
+
+        start = time.perf_counter()
+        engine = OfflineStatEngine(dataset)
+        engine.match_s(thresholds['gal'])
+        logger.info("窗口匹配和对比结果耗时 %.1f ms", (time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        tables = engine.score(thresholds)
+        logger.info("计算统计表耗时 %.1f ms", (time.perf_counter() - start) * 1000)
+        for name, frame in tables.items():
+            if name not in ('latency_percentiles', 'latency_histogram'):
+                log_table(name, frame)
+
+        for name, values in sweeps:
+            for value in values:
+                varied = dict(thresholds, **{name: value})
+                start = time.perf_counter()
+                varied_tables = engine.score(varied)
+                logger.info("%s = %s 重新计分耗时 %.1f ms", name, value, (time.perf_counter() - start) * 1000)
+                for table in THRESHOLD_TABLES[name]:
+                    log_table(table, varied_tables[table])
+
+        details = None
+        if args.output_dir or args.cross_check:
+            start = time.perf_counter()
+            details = engine.details(thresholds['gal'])
+            logger.info("生成数据明细 %d 行，耗时 %.1f ms", len(details), (time.perf_counter() - start) * 1000)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            for name, frame in list(tables.items()) + [('details', details)]:
+                frame.to_csv(os.path.join(args.output_dir, f"{name}.csv"), index=False, encoding='utf-8-sig')
+            logger.info("统计表和数据明细已写入 %s", args.output_dir)
+
+        if args.cross_check:
+            if thresholds != DEFAULT_THRESHOLDS:
+                logger.warning("使用了非默认阈值，与统计SQL的结果必然不同")
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT alarm_schema FROM public.stat_watermark")
+                row = cursor.fetchone()
+                if row and row[0] != args.schema and not args.dataset:
+                    logger.warning("最近一次查询使用的模式为 %s，与 --schema %s 不同", row[0], args.schema)
+                mismatches = cross_check(cursor, tables, details)
+            conn.rollback()
+            if mismatches:
+                logger.error("与统计SQL的结果有 %d 项不一致", mismatches)
+                return False
+            logger.info("与统计SQL的结果完全一致")
+        return True
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('offline_stat.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        sys.exit(0 if main(parse_args()) else 1)
+    except (psycopg2.Error, OSError, RuntimeError, ValueError) as e:
+        logger.error("离线统计出错: %s", str(e).strip())
+        sys.exit(1)
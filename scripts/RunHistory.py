@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+运行历史：保存每次统计的结果并比较两次运行
+
+下一次查询会删除上次的统计表，导出的工作簿又只能并排打开比较。save 把统计表和数据明细
+保存为 zstd 压缩的 parquet 文件（每次运行一个目录 <--store>/<运行编号>），run.json 记录报警表所在模式、
+标准答案文件的 sha256、标准答案的时间范围、统计SQL的版本和各表行数；list 列出已保存的运行；
+diff 按 (实验编号, 波形编号) 对齐两次运行的数据明细，全部为列运算，百万行的数据明细也只需数秒：
+  漏报变化   漏报P波 / 漏报S波 取值变化的窗口数，按 基准→本次 分类
+  时延变化   传输时间和判别时间的变化量（本次 - 基准，秒）：变化的窗口数、平均、中位数、P95、最大增减
+  偏差变化   震级、震中、峰值、震中距和方位角偏差的变化量，统计方式同上
+  统计表变化 16张统计表中取值不同的项
+--output 另存为工作簿，其中“变化的窗口”页列出有变化的窗口及其基准和本次的取值。
+SqlPipeline.py 和 BatchEvaluate.py 的 --history-dir 在统计成功后自动保存。
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from BatchEvaluate import STAT_TABLES, comparison_sheet
+from SqlPipeline import SQL_DIR, get_db_config, sql_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE = 'run_history'
+
+KEY_COLUMNS = ['实验编号', '波形编号']
+
+MISS_COLUMNS = ['漏报p波', '漏报s波']
+
+MISS_LABELS = {'': '正常', '1': '漏报', 'xs_hp': 'S波先于P波报警'}
+
+LATENCY_COLUMNS = [
+    'P波预警首报传输时间(s)', '阈值报警首报传输时间(s)', '80gal阈值报警传输时间(s)', '120gal阈值报警传输时间(s)',
+    'P波预警判别时间(s)', '阈值报警判别时间(s)', '80gal阈值报警判别时间(s)', '120gal阈值报警判别时间(s)',
+]
+
+DEVIATION_COLUMNS = ['震级偏差', '震中偏差(km)', '峰值偏差百分比', '震中距偏差(km)', '方位角偏差']
+
+# 统计SQL中时间取到毫秒、偏差取到三位小数，变化量不超过该值视为相同
+TOLERANCE = 0.0005
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="保存统计结果并比较两次运行")
+    parser.add_argument('--store', default=DEFAULT_STORE, help='运行历史目录')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    save = commands.add_parser('save', help='保存当前的统计表和数据明细')
+    save.add_argument('--host', help='数据库主机')
+    save.add_argument('--port', type=int, help='数据库端口')
+    save.add_argument('--dbname', help='数据库名')
+    save.add_argument('--user', help='数据库用户名')
+    save.add_argument('--password', help='数据库密码')
+    save.add_argument('--from-schema', default='public',
+                      help='统计表所在模式，BatchEvaluate.py 的结果模式为 batch_<模式>')
+    save.add_argument('--schema', help='报警表所在模式，默认取 public.stat_watermark 中最近一次统计的模式')
+    save.add_argument('--run-id', help='运行编号，默认为 <时间>_<模式>')
+    save.add_argument('--note', default='', help='备注，例如算法版本')
+    save.add_argument('--sql-dir', default=SQL_DIR, help='SQL文件所在目录')
+
+    commands.add_parser('list', help='列出已保存的运行')
+
+    diff = commands.add_parser('diff', help='比较两次运行')
+    diff.add_argument('base', help='基准运行编号')
+    diff.add_argument('new', help='本次运行编号')
+    diff.add_argument('--output', help='比较结果另存为工作簿')
+    diff.add_argument('--max-rows', type=int, default=10000, help='工作簿中最多列出的变化窗口数')
+    return parser.parse_args()
+
+
+def run_metadata(cursor, from_schema, schema):
+    """报警表所在模式、标准答案文件和时间范围"""
+    if schema is None and from_schema == 'public':
+        cursor.execute("SELECT to_regclass('public.stat_watermark')")
+        if cursor.fetchone()[0] is not None:
+            cursor.execute("SELECT alarm_schema FROM public.stat_watermark")
+            row = cursor.fetchone()
+            schema = row[0] if row else None
+    answer = {}
+    cursor.execute("SELECT to_regclass('public.stat_answer_source')")
+    if cursor.fetchone()[0] is not None:
+        cursor.execute("SELECT file_sha256, file_name FROM public.stat_answer_source")
+        row = cursor.fetchone()
+        if row:
+            answer = {'answer_sha256': row[0], 'answer_file': row[1]}
+    cursor.execute(f"SELECT MIN(波形发送时间), MAX(波形结束时间) FROM {from_schema}.details")
+    start, end = cursor.fetchone()
+    return {
+        'alarm_schema': schema,
+        'answer_sha256': answer.get('answer_sha256'),
+        'answer_file': answer.get('answer_file'),
+        'time_range': [start.isoformat(sep=' ') if start else None, end.isoformat(sep=' ') if end else None],
+    }
+
+
+def save_run(conn, store, from_schema='public', schema=None, run_id=None, note='', sql_dir=SQL_DIR):
+    """在同一快照中把 from_schema 下的统计表和数据明细写为 parquet，返回运行编号"""
+    from ExportResultToExcel import export_table_columnar
+
+    start = time.perf_counter()
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    try:
+        with conn.cursor() as cursor:
+            meta = run_metadata(cursor, from_schema, schema)
+        run_id = run_id or f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{meta['alarm_schema'] or from_schema}"
+        run_dir = os.path.join(store, run_id)
+        if os.path.exists(run_dir):
+            raise ValueError(f"运行 {run_id} 已存在")
+        # 先写入临时目录，全部写完后再改名，中途失败不会留下不完整的运行
+        partial_dir = run_dir + '.partial'
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        os.makedirs(partial_dir)
+        rows = {}
+        for table in STAT_TABLES + ['details']:
+            rows[table] = export_table_columnar(conn, f'{from_schema}.{table}',
+                                                os.path.join(partial_dir, f'{table}.parquet'), 'parquet')
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level='DEFAULT', readonly=False)
+        conn.autocommit = autocommit
+    meta = dict(run_id=run_id, created_at=datetime.now().isoformat(sep=' ', timespec='seconds'),
+                from_schema=from_schema, sql_version=sql_version(sql_dir), note=note, rows=rows, **meta)
+    with open(os.path.join(partial_dir, 'run.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.rename(partial_dir, run_dir)
+    size = sum(os.path.getsize(os.path.join(run_dir, name)) for name in os.listdir(run_dir))
+    logger.info("运行 %s 已保存到 %s：数据明细 %d 行，共 %.1f MB，耗时 %.2f 秒", run_id, run_dir, rows['details'],
+                size / 1e6, time.perf_counter() - start)
+    return run_id
+
+
+def load_meta(store, run_id):
+    path = os.path.join(store, run_id, 'run.json')
+    if not os.path.exists(path):
+        raise ValueError(f"运行 {run_id} 不存在")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def list_runs(store):
+    if not os.path.isdir(store):
+        return []
+    runs = [load_meta(store, name) for name in sorted(os.listdir(store))
+            if os.path.exists(os.path.join(store, name, 'run.json'))]
+    return sorted(runs, key=lambda meta: meta['created_at'])
+
+
+def read_details(store, run_id):
+    import pyarrow.parquet as pq
+
+    path = os.path.join(store, run_id, 'details.parquet')
+    names = pq.read_schema(path).names
+    columns = [c for c in KEY_COLUMNS + ['台站编码'] + MISS_COLUMNS + LATENCY_COLUMNS + DEVIATION_COLUMNS if c in names]
+    return pq.read_table(path, columns=columns).to_pandas()
+
+
+def read_tables(store, run_id):
+    return {table: pd.read_parquet(os.path.join(store, run_id, f'{table}.parquet')) for table in STAT_TABLES}
+
+
+def miss_changes(merged):
+    """漏报列取值变化的窗口数，按 (列, 基准, 本次) 分类"""
+    frames = []
+    for column in MISS_COLUMNS:
+        base = merged[f'{column}_基准'].fillna('')
+        new = merged[f'{column}_本次'].fillna('')
+        changed = base != new
+        counts = pd.DataFrame({'基准': base[changed].map(lambda v: MISS_LABELS.get(v, v)),
+                               '本次': new[changed].map(lambda v: MISS_LABELS.get(v, v))}).value_counts()
+        frames.append(pd.DataFrame({'列': column, '基准': [k[0] for k in counts.index],
+                                    '本次': [k[1] for k in counts.index], '窗口数': counts.values}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def delta_stats(merged, category, columns):
+    """数值列的变化量统计（本次 - 基准），两次都有取值的窗口参与统计"""
+    rows = []
+    for column in columns:
+        base = merged[f'{column}_基准'].to_numpy(dtype=float)
+        new = merged[f'{column}_本次'].to_numpy(dtype=float)
+        both = ~np.isnan(base) & ~np.isnan(new)
+        delta = new[both] - base[both]
+        changed = np.abs(delta) > TOLERANCE
+        rows.append({
+            '类别': category,
+            '列': column,
+            '两次均有值': int(both.sum()),
+            '变化的窗口': int(changed.sum()),
+            '新出现取值': int((np.isnan(base) & ~np.isnan(new)).sum()),
+            '取值消失': int((~np.isnan(base) & np.isnan(new)).sum()),
+            '平均变化': round(float(delta.mean()), 4) if delta.size else None,
+            '中位数变化': round(float(np.median(delta)), 4) if delta.size else None,
+            'P95绝对变化': round(float(np.quantile(np.abs(delta), 0.95)), 4) if delta.size else None,
+            '最大增加': round(float(delta.max()), 4) if delta.size else None,
+            '最大减少': round(float(delta.min()), 4) if delta.size else None,
+        })
+    return pd.DataFrame(rows)
+
+
+def changed_windows(merged, max_rows):
+    """有变化的窗口，只列出有变化的列的基准和本次取值"""
+    changes = {}
+    for column in MISS_COLUMNS:
+        changes[column] = merged[f'{column}_基准'].fillna('') != merged[f'{column}_本次'].fillna('')
+    for column in LATENCY_COLUMNS + DEVIATION_COLUMNS:
+        base = merged[f'{column}_基准'].to_numpy(dtype=float)
+        new = merged[f'{column}_本次'].to_numpy(dtype=float)
+        with np.errstate(invalid='ignore'):
+            changes[column] = (np.isnan(base) != np.isnan(new)) | (np.abs(new - base) > TOLERANCE)
+    any_change = np.logical_or.reduce([np.asarray(mask) for mask in changes.values()])
+    total = int(any_change.sum())
+    rows = merged[any_change].head(max_rows)
+    columns = KEY_COLUMNS + ['台站编码_本次']
+    for column, mask in changes.items():
+        if np.asarray(mask)[any_change].any():
+            columns += [f'{column}_基准', f'{column}_本次']
+    return rows[columns].rename(columns={'台站编码_本次': '台站编码'}), total
+
+
+def diff_runs(store, base_id, new_id, max_rows):
+    """比较两次运行，返回 {页名: DataFrame} 和变化的窗口总数"""
+    base_meta = load_meta(store, base_id)
+    new_meta = load_meta(store, new_id)
+    start = time.perf_counter()
+    base = read_details(store, base_id)
+    new = read_details(store, new_id)
+    read_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for frame in (base, new):
+        duplicated = int(frame.duplicated(KEY_COLUMNS).sum())
+        if duplicated:
+            logger.warning("数据明细中有 %d 行 (实验编号, 波形编号) 重复，按第一行比较", duplicated)
+            frame.drop_duplicates(KEY_COLUMNS, inplace=True)
+    merged = base.merge(new, on=KEY_COLUMNS, how='outer', suffixes=('_基准', '_本次'), indicator=True)
+    side = merged['_merge']
+    both = merged[side == 'both'].reset_index(drop=True)
+    windows = pd.DataFrame([
+        {'项目': '两次都有的窗口', '数量': int((side == 'both').sum())},
+        {'项目': '只在基准中的窗口', '数量': int((side == 'left_only').sum())},
+        {'项目': '只在本次中的窗口', '数量': int((side == 'right_only').sum())},
+    ])
+    misses = miss_changes(both)
+    deltas = pd.concat([delta_stats(both, '时延', LATENCY_COLUMNS), delta_stats(both, '偏差', DEVIATION_COLUMNS)],
+                       ignore_index=True)
+    windows_changed, total = changed_windows(both, max_rows)
+
+    summary = comparison_sheet({base_id: read_tables(store, base_id), new_id: read_tables(store, new_id)},
+                               [base_id, new_id])
+    summary = summary[summary[base_id].astype(str) != summary[new_id].astype(str)]
+    logger.info("读取数据明细 %d / %d 行耗时 %.2f 秒，比较耗时 %.2f 秒", len(base), len(new), read_seconds,
+                time.perf_counter() - start)
+
+    runs = pd.DataFrame([base_meta, new_meta])[['run_id', 'created_at', 'alarm_schema', 'answer_sha256',
+                                                'time_range', 'sql_version', 'note']]
+    runs['time_range'] = runs['time_range'].map(lambda r: ' ~ '.join(str(v) for v in r))
+    if base_meta['answer_sha256'] != new_meta['answer_sha256']:
+        logger.warning("两次运行的标准答案不同")
+    return {
+        '运行': runs,
+        '窗口': windows,
+        '漏报变化': misses,
+        '时延和偏差变化': deltas,
+        '统计表变化': summary,
+        '变化的窗口': windows_changed,
+    }, total
+
+
+def print_sheets(sheets, total):
+    with pd.option_context('display.max_rows', 200, 'display.max_columns', 20, 'display.width', 200,
+                           'display.unicode.east_asian_width', True):
+        for name, frame in sheets.items():
+            if name == '变化的窗口':
+                continue
+            print(f"\n[{name}]")
+            print(frame.to_string(index=False) if not frame.empty else '无')
+    print(f"\n有变化的窗口: {total} 个")
+
+
+def write_workbook(filename, sheets, total):
+    from ExportResultToExcel import autofit_column_width, set_worksheet_font
+
+    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
+        for name, frame in sheets.items():
+            frame.to_excel(writer, sheet_name=name, index=False)
+            ws = writer.sheets[name]
+            autofit_column_width(ws, frame)
+            set_worksheet_font(ws, frame)
+    if total > len(sheets['变化的窗口']):
+        logger.info("工作簿中列出前 %d 个变化的窗口（共 %d 个）", len(sheets['变化的窗口']), total)
+
+
+def main(args):
+    if args.command == 'save':
+        conn = psycopg2.connect(**get_db_config(args))
+        try:
+            save_run(conn, args.store, args.from_schema, args.schema, args.run_id, args.note, args.sql_dir)
+        finally:
+            conn.close()
+    elif args.command == 'list':
+        runs = list_runs(args.store)
+        for meta in runs:
+            print(f"{meta['run_id']:<32}{meta['created_at']:<22}{str(meta['alarm_schema']):<12}"
+                  f"{(meta['answer_sha256'] or '-')[:12]:<14}{' ~ '.join(str(v) for v in meta['time_range']):<50}"
+                  f"{meta['rows']['details']:>10}  {meta['note']}")
+        print(f"共 {len(runs)} 次运行")
+    else:
+        sheets, total = diff_runs(args.store, args.base, args.new, args.max_rows)
+        print_sheets(sheets, total)
+        if args.output:
+            write_workbook(args.output, sheets, total)
+            logger.info("比较结果已写入 %s", args.output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('run_history.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    try:
+        main(parse_args())
+    except (psycopg2.Error, OSError, ValueError) as e:
+        logger.error("运行历史出错: %s", str(e).strip())
+        sys.exit(1)
@@ -0,0 +1,444 @@
+# -*- coding: utf-8 -*-
+"""
+不经过界面执行统计SQL
+
+阶段划分、执行顺序和 search_path 与界面中“查询”“按时间查询”按钮一致（统计表阶段在界面中并发执行，这里按顺序执行），
+语句同样按分号拆分，单条语句失败时记录错误并继续执行后续语句（事务模式下停止并回滚）。供基准测试等脚本复用，也可直接在命令行运行。
+"""
+import argparse
+import configparser
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sql')
+
+# (阶段名, SQL文件)，与 StatFromDB::onQuerryButtonClicked 一致
+QUERY_STAGES = [
+    ('标准答案匹配', 'waveInfoTables.sql'),
+    ('对比结果', 'compareTables.sql'),
+    ('统计汇总', 'compareStats.sql'),
+    ('统计表', 'summaryTables.sql'),
+    ('数据明细', 'detailsTables.sql'),
+]
+
+INCREMENTAL_WAVE_INFO = 'incrementalWaveInfo.sql'
+
+# 数据明细浏览用的索引，不影响统计结果，不计入 sql_version；事务模式下在发布之后创建
+DETAILS_INDEXES = ('数据明细索引', 'detailsIndexes.sql')
+
+RUN_CACHE = 'runCache.sql'
+
+# 服务端执行：各阶段的语句保存在数据库中，由 public.stat_run_pipeline 执行，与 SqlPipelineWorker::runServerSide 一致
+SERVER_PIPELINE = 'serverPipeline.sql'
+
+# 事务模式：中间表改建为会话临时表，不写 WAL，也不在 public 下反复删建；统计表和数据明细同样先建在会话中，
+# 全部语句成功后在同一事务的最后发布到 public，与 StatFromDB::buildQueryStages 一致
+SESSION_TABLES = [
+    'stand_answer', 'P_matched_details', 'S_matched_details', 'stat_watermark',
+    'P_compare_result', 'S_compare_result', 'p_compare_stats', 's_compare_stats',
+]
+
+PUBLISHED_TABLES = [
+    'P_send_time', 'P_epicenter_deviation', 'P_judge_time', 'P_mag_deviation', 'P_warning_miss',
+    'S_40gal_send_time', 'S_80gal_send_time', 'S_120gal_send_time', 'S_warning_miss', 's_alarm_before_p',
+    'S_40gal_judge_time', 'S_80gal_judge_time', 'S_120gal_judge_time', 'S_peak_deviation',
+    'latency_percentiles', 'latency_histogram', 'details',
+]
+
+SESSION_TABLE_REF = re.compile(r'\bpublic\.(' + '|'.join(SESSION_TABLES + PUBLISHED_TABLES) + r')\b', re.I)
+
+SESSION_TABLE_CREATE = re.compile(r'^\s*CREATE\s+TABLE\s+pg_temp\.(\w+)', re.I | re.M)
+
+
+# 字符串、带引号的标识符、注释和 $tag$ 函数体作为整体跳过，其中的分号不拆分，与 SqlPipelineWorker::splitStatements 相同
+SQL_TOKEN = re.compile(r"""'[^']*'|"[^"]*"|--[^\n]*|/\*.*?\*/|(\$(?:[A-Za-z_]\w*)?\$).*?\1|;""", re.S)
+
+
+def split_statements(sql):
+    """按分号拆分SQL文件中的语句，只含注释的片段不作为语句"""
+    statements = []
+    start = 0
+    for match in SQL_TOKEN.finditer(sql):
+        if match.group() == ';':
+            statements.append(sql[start:match.start()].strip())
+            start = match.end()
+    statements.append(sql[start:].strip())
+    return [statement for statement in statements if statement_label(statement)]
+
+
+def statement_label(statement):
+    """取语句中第一行非注释内容"""
+    for line in statement.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('--'):
+            return line if len(line) <= 60 else line[:60] + '...'
+    return ''
+
+
+def load_stage(name, filename, sql_dir=SQL_DIR):
+    with open(os.path.join(sql_dir, filename), encoding='utf-8') as f:
+        return name, split_statements(f.read())
+
+
+def query_stages(sql_dir=SQL_DIR, incremental=False):
+    stages = []
+    for name, filename in QUERY_STAGES:
+        if incremental and filename == 'waveInfoTables.sql':
+            filename = INCREMENTAL_WAVE_INFO
+        stages.append(load_stage(name, filename, sql_dir))
+    return stages
+
+
+def sql_version(sql_dir=SQL_DIR):
+    """统计SQL的版本：全量统计各SQL文件中语句的 md5，与 StatFromDB::runSqlVersion 相同"""
+    statements = [statement for _, stage_statements in query_stages(sql_dir) for statement in stage_statements]
+    return hashlib.md5('\n;\n'.join(statements).encode('utf-8')).hexdigest()
+
+
+def run_cache_stage(version, max_entries=20, max_age_days=30, sql_dir=SQL_DIR):
+    """全量统计后追加的阶段：建立运行缓存并保存本次的统计表，与 StatFromDB::buildQueryStages 一致"""
+    name, statements = load_stage('运行缓存', RUN_CACHE, sql_dir)
+    return name, statements + [f"SELECT public.stat_run_cache_save('{version}', {int(max_entries)}, {int(max_age_days)})"]
+
+
+def restore_cached_run(cursor, version):
+    """标准答案和报警表都没有变化时用运行缓存覆盖统计表、匹配结果和数据明细，返回指纹；未命中返回 None"""
+    try:
+        cursor.execute("SELECT public.stat_run_fingerprint(%s)", (version,))
+        fingerprint = cursor.fetchone()[0]
+        if fingerprint is None:
+            return None
+        cursor.execute("SELECT public.stat_run_cache_restore(%s)", (fingerprint,))
+        return fingerprint if cursor.fetchone()[0] else None
+    except psycopg2.Error as e:
+        # 尚未建立运行缓存
+        logger.info("运行缓存查询失败: %s", str(e).strip())
+        cursor.connection.rollback()
+        return None
+
+
+def transactional_stages(stages, target='public'):
+    """事务模式的阶段：表名改为 pg_temp 下的同名表，临时表不会被自动分析，中间表建好后随即 ANALYZE；最后追加发布阶段
+
+    target 为发布统计表和数据明细的模式，多模式批量评估时各模式的结果发布到各自的结果模式
+    """
+    session_tables = {table.lower() for table in SESSION_TABLES}
+    result = []
+    for name, statements in stages:
+        rewritten = []
+        for statement in statements:
+            statement = SESSION_TABLE_REF.sub(r'pg_temp.\1', statement)
+            rewritten.append(statement)
+            created = SESSION_TABLE_CREATE.search(statement)
+            if created and created.group(1).lower() in session_tables:
+                rewritten.append(f'ANALYZE pg_temp.{created.group(1)}')
+        result.append((name, rewritten))
+    publish = []
+    for table in PUBLISHED_TABLES:
+        publish += [f'DROP TABLE IF EXISTS {target}.{table}', f'CREATE TABLE {target}.{table} AS TABLE pg_temp.{table}']
+    result.append(('发布结果', publish))
+    return result
+
+
+def time_query_stages(verify=True, sql_dir=SQL_DIR):
+    """与 StatFromDB::onTimeQuerryButtonClicked 一致：创建首报表和统计函数（已存在时跳过），再刷新首报表"""
+    return [
+        load_stage('地震编号首报表', 'idMatchedTables.sql', sql_dir),
+        ('刷新首报表', [f"SELECT public.stat_refresh_id_matched({'true' if verify else 'false'})"]),
+    ]
+
+
+def time_range_send_time(cursor, start, end):
+    """调用 public.stat_time_range_send_time 取四项传输时间统计，同一时间段的结果由数据库缓存"""
+    cursor.execute(
+        "SELECT 类别, 项目, 总数, 合格数, 合格率, 标准, 是否达标, 平均值, 最大值, 最小值 "
+        "FROM public.stat_time_range_send_time(%s::timestamp, %s::timestamp)", (start, end))
+    return cursor.fetchall()
+
+
+def set_search_path(cursor, schema):
+    cursor.execute(f"SET search_path TO {'public' if schema == 'public' else schema + ', public'}")
+
+
+def can_run_incremental(cursor):
+    """与 StatFromDB::canRunIncremental 相同：水位线须由当前模式生成，且水位线以内的报警没有被补录或删除"""
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM public.stat_watermark w
+            WHERE w.alarm_schema = current_schema()
+            AND (SELECT COUNT(jk_time) FROM station_p_wave_alarm WHERE jk_time <= w.p_jk_time) = w.p_count
+            AND (SELECT COUNT(jk_time) FROM station_s_wave_alarm WHERE jk_time <= w.s_jk_time) = w.s_count
+        """)
+        return cursor.fetchone()[0] > 0
+    except psycopg2.Error as e:
+        logger.info("水位线查询失败: %s", str(e).strip())
+        return False
+
+
+def run_stages(conn, schema, stages, transactional=False):
+    """在 autocommit 连接上依次执行各阶段，返回每条语句的 (阶段, 序号, 首行, 耗时ms, 影响行数, 是否成功, 错误信息)
+
+    transactional 为 True 时全部语句在同一事务中执行，任一语句失败即停止并回滚，public 下保持上次的结果
+    """
+    conn.autocommit = not transactional
+    records = []
+    failed = False
+    with conn.cursor() as cursor:
+        set_search_path(cursor, schema)
+        for name, statements in stages:
+            if failed:
+                break
+            stage_start = time.perf_counter()
+            for index, statement in enumerate(statements, 1):
+                start = time.perf_counter()
+                error = ''
+                try:
+                    cursor.execute(statement)
+                    rows = cursor.rowcount
+                except psycopg2.Error as e:
+                    # 与界面一致，不中断，继续执行后续语句
+                    error = str(e).strip()
+                    rows = -1
+                    logger.error("%s 第%d条语句执行失败: %s", name, index, error)
+                    # 事务已中止，后续语句无法执行
+                    failed = transactional
+                elapsed_ms = int((time.perf_counter() - start) * 1000)
+                records.append({
+                    'stage': name,
+                    'index': index,
+                    'label': statement_label(statement),
+                    'elapsed_ms': elapsed_ms,
+                    'rows': rows,
+                    'ok': not error,
+                    'error': error,
+                })
+                if failed:
+                    break
+            logger.info("%s 完成，耗时 %.2f 秒", name, time.perf_counter() - stage_start)
+    if transactional:
+        if failed:
+            conn.rollback()
+            logger.error("事务已回滚，public 下的统计表保持上次的结果")
+        else:
+            conn.commit()
+    return records
+
+
+def pipeline_variant(incremental=False, transactional=False, run_cache=False):
+    """服务端保存语句的变体名，与 StatFromDB::buildQueryStages 相同"""
+    return 'query' + ('_incremental' if incremental else '') + ('_tx' if transactional else '') + ('_cache' if run_cache else '')
+
+
+def pipeline_version(install_statements, stages):
+    """serverPipeline.sql 和各阶段语句的 md5，与 SqlPipelineWorker::installServerSide 相同"""
+    parts = install_statements + [f'{name}\n{statement}' for name, statements in stages for statement in statements]
+    return hashlib.md5('\n;\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def install_server_pipeline(conn, stages, variant, sql_dir=SQL_DIR):
+    """服务端保存的语句版本与本地不同时重新写入，返回是否写入"""
+    _, install_statements = load_stage('服务端执行', SERVER_PIPELINE, sql_dir)
+    version = pipeline_version(install_statements, stages)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        try:
+            cursor.execute("SELECT public.stat_pipeline_version(%s)", (variant,))
+            installed = cursor.fetchone()[0]
+        except psycopg2.Error:
+            # 尚未创建 stat_pipeline_statement
+            installed = None
+        if installed == version:
+            return False
+        for statement in install_statements:
+            cursor.execute(statement)
+        items = [{'stage': name, 'index': index, 'label': statement_label(statement), 'sql': statement}
+                 for name, statements in stages for index, statement in enumerate(statements, 1)]
+        cursor.execute("SELECT public.stat_pipeline_install(%s, %s, %s::jsonb)",
+                       (variant, version, json.dumps(items, ensure_ascii=False)))
+        logger.info("已将 %d 条统计语句写入服务端（%s，版本 %s）", cursor.fetchone()[0], variant, version)
+    return True
+
+
+def run_server_side(conn, schema, stages, variant, transactional=False, sql_dir=SQL_DIR):
+    """由 public.stat_run_pipeline 在服务端执行各阶段，返回的执行记录与 run_stages 相同
+
+    事务模式一次调用执行全部阶段，遇到失败的语句即停止并回滚；非事务模式每个阶段调用一次、各自提交，
+    单条语句失败时只回滚该语句，public 下的结果表只在所属阶段执行期间被锁定
+    """
+    install_server_pipeline(conn, stages, variant, sql_dir)
+    conn.autocommit = not transactional
+    start = time.perf_counter()
+    rows = []
+    with conn.cursor() as cursor:
+        for stage in [None] if transactional else [name for name, _ in stages]:
+            cursor.execute("SELECT stage, statement_index, label, elapsed_ms, rows_affected, ok, error "
+                           "FROM public.stat_run_pipeline(%s, %s, %s, %s)", (variant, schema, transactional, stage))
+            rows += cursor.fetchall()
+    records = [{
+        'stage': stage,
+        'index': index,
+        'label': label,
+        'elapsed_ms': elapsed_ms,
+        'rows': rows_affected,
+        'ok': ok,
+        'error': error or '',
+    } for stage, index, label, elapsed_ms, rows_affected, ok, error in rows]
+    for record in records:
+        if not record['ok']:
+            logger.error("%s 第%d条语句执行失败: %s", record['stage'], record['index'], record['error'])
+    for name, seconds in stage_seconds(records).items():
+        logger.info("%s 完成，耗时 %.2f 秒", name, seconds)
+    if transactional:
+        if any(not record['ok'] for record in records):
+            conn.rollback()
+            logger.error("事务已回滚，public 下的统计表保持上次的结果")
+        else:
+            conn.commit()
+    logger.info("服务端执行 %d 条语句，耗时 %.2f 秒", len(records), time.perf_counter() - start)
+    return records
+
+
+def stage_seconds(records):
+    """按阶段汇总耗时（秒），保持阶段顺序"""
+    totals = {}
+    for record in records:
+        totals[record['stage']] = totals.get(record['stage'], 0) + record['elapsed_ms'] / 1000
+    return totals
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="不经过界面执行统计SQL")
+    parser.add_argument('--host', help='数据库主机')
+    parser.add_argument('--port', type=int, help='数据库端口')
+    parser.add_argument('--dbname', help='数据库名')
+    parser.add_argument('--user', help='数据库用户名')
+    parser.add_argument('--password', help='数据库密码')
+    parser.add_argument('--schema', default='public', help='报警表所在模式')
+    parser.add_argument('--incremental', action='store_true', help='水位线有效时只重新匹配变化的窗口')
+    parser.add_argument('--time-range', nargs=2, metavar=('START', 'END'),
+                        help='执行按时间查询并输出结果，时间格式 "YYYY-MM-DD HH:MM:SS.mmm"')
+    parser.add_argument('--transactional', action='store_true',
+                        help='在一个事务中执行，中间表建为会话临时表，成功后才发布统计表和数据明细，失败时保留上次的结果')
+    parser.add_argument('--run-cache', action='store_true',
+                        help='标准答案和报警表都没有变化时直接恢复上次的统计表、匹配结果和数据明细，否则统计后写入运行缓存')
+    parser.add_argument('--cache-max-entries', type=int, default=20, help='运行缓存保留的最多记录数')
+    parser.add_argument('--cache-max-age-days', type=int, default=30, help='运行缓存记录超过该天数未使用即淘汰')
+    parser.add_argument('--server-side', action='store_true',
+                        help='统计语句保存在数据库中（版本变化时重新写入），事务模式一次调用执行全部阶段，否则每个阶段调用一次，减少网络往返')
+    parser.add_argument('--history-dir', help='统计成功后把统计表和数据明细保存到该运行历史目录（见 RunHistory.py）')
+    parser.add_argument('--sql-dir', default=SQL_DIR, help='SQL文件所在目录')
+    return parser.parse_args()
+
+
+def load_config():
+    # 优先当前工作目录
+    config_path = os.path.join(os.getcwd(), 'config.ini')
+    if not os.path.exists(config_path):
+        # 兼容未打包时
+        config_path = os.path.join(os.path.dirname(sys.argv[0]), 'config.ini')
+    if not os.path.exists(config_path):
+        raise FileNotFoundError("config.ini 未找到")
+    try:
+        config = configparser.ConfigParser()
+        config.read(config_path, encoding='utf-8')
+        if 'database' not in config:
+            logger.error("配置文件中缺少 [database] 部分")
+            raise KeyError("缺少 [database] 部分")
+        db = config['database']
+        db_config = {
+            'host': db.get('host', 'localhost'),
+            'port': db.getint('port', 5432),
+            'dbname': db.get('dbname'),
+            'user': db.get('user'),
+            'password': db.get('password')
+        }
+        missing = [key for key in ['dbname', 'user'] if not db_config[key]]
+        if missing:
+            logger.error("配置文件中缺少必要的数据库信息: %s", ", ".join(missing))
+            raise ValueError("缺少必要的数据库配置")
+        logger.info("已成功加载数据库配置")
+        return db_config
+    except Exception as e:
+        logger.error("加载配置文件时出错: %s", str(e))
+        raise
+
+
+def get_db_config(args):
+    if args.host and args.port and args.dbname and args.user and args.password:
+        return {
+            'host': args.host,
+            'port': args.port,
+            'dbname': args.dbname,
+            'user': args.user,
+            'password': args.password
+        }
+    return load_config()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('sql_pipeline.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+    args = parse_args()
+    conn = psycopg2.connect(**get_db_config(args))
+    try:
+        if args.time_range:
+            stages = time_query_stages(sql_dir=args.sql_dir)
+        else:
+            incremental = False
+            if args.incremental and args.transactional:
+                # 增量统计要在 public 下的中间表上修改
+                logger.info("事务模式不使用增量统计，执行全量统计")
+            elif args.incremental:
+                with conn.cursor() as cursor:
+                    set_search_path(cursor, args.schema)
+                    incremental = can_run_incremental(cursor)
+                conn.commit()
+                if not incremental:
+                    logger.info("水位线不存在或已失效，执行全量统计")
+            stages = query_stages(args.sql_dir, incremental)
+            if args.transactional:
+                stages = transactional_stages(stages)
+            stages.append(load_stage(*DETAILS_INDEXES, args.sql_dir))
+            if args.run_cache:
+                version = sql_version(args.sql_dir)
+                with conn.cursor() as cursor:
+                    set_search_path(cursor, args.schema)
+                    fingerprint = restore_cached_run(cursor, version)
+                conn.commit()
+                if fingerprint:
+                    logger.info("标准答案和报警数据未变化，已从运行缓存恢复统计表（指纹 %s）", fingerprint)
+                    sys.exit(0)
+                stages.append(run_cache_stage(version, args.cache_max_entries, args.cache_max_age_days, args.sql_dir))
+        if args.server_side and not args.time_range:
+            variant = pipeline_variant(incremental, args.transactional, args.run_cache)
+            records = run_server_side(conn, args.schema, stages, variant, args.transactional, args.sql_dir)
+        else:
+            records = run_stages(conn, args.schema, stages, args.transactional and not args.time_range)
+        failed = [record for record in records if not record['ok']]
+        logger.info("共执行 %d 条语句，失败 %d 条", len(records), len(failed))
+        if args.history_dir and not args.time_range and not failed:
+            from RunHistory import save_run
+            save_run(conn, args.history_dir, schema=args.schema, sql_dir=args.sql_dir)
+        if args.time_range:
+            with conn.cursor() as cursor:
+                for row in time_range_send_time(cursor, *args.time_range):
+                    logger.info("%s: 总数 %s, 合格数 %s, 合格率 %s, 是否达标 %s, 平均值 %s, 最大值 %s, 最小值 %s",
+                                row[1], row[2], row[3], row[4], row[6], row[7], row[8], row[9])
+        sys.exit(1 if failed else 0)
+    finally:
+        conn.close()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+导入/导出常驻进程
+
+界面每次点击导入或导出都启动一次 InsertStandAnswerToDb.exe / ExportResultToExcel.exe，每次都要重新启动解释器、
+导入 pandas、sqlalchemy、openpyxl、chardet 并重新连接数据库。本进程启动时导入这两个脚本，之后在本机 TCP 端口上
+接收任务，数据库连接在任务之间保留复用。
+
+协议：每行一个 JSON 请求，返回一行 JSON 应答
+  请求 {"job": "import" | "export" | "ping" | "shutdown", "args": [与命令行相同的参数], "cwd": "工作目录", "token": "..."}
+  应答 {"ok": true/false, "exit_code": 0/1, "elapsed_ms": 任务耗时, "log": "本次任务的日志"}
+启动后在标准输出打印 "READY <端口>"；设置环境变量 STAT_WORKER_TOKEN 时请求须带相同的 token。
+任务按收到的顺序逐个执行，日志仍写入各脚本原来的日志文件（位于任务的工作目录），另在 stat_worker.log 中记录每个任务的耗时。
+"""
+import argparse
+import io
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+# 先于两个脚本配置日志，它们模块级的 basicConfig 不再生效，日志文件改为按任务添加
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('stat_worker.log', encoding='utf-8'),
+        logging.StreamHandler(sys.stderr)
+    ]
+)
+logger = logging.getLogger(__name__)
+
+start_time = time.time()
+import ExportResultToExcel
+import InsertStandAnswerToDb
+IMPORT_ELAPSED = time.time() - start_time
+
+# 任务名: 对应脚本原来的日志文件
+JOB_LOGS = {
+    'import': 'p_wave_import.log',
+    'export': 'export_result.log',
+}
+
+LOG_FORMAT = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="导入/导出常驻进程")
+    parser.add_argument('--port', type=int, default=0, help='监听的本机端口，0 表示由系统分配')
+    parser.add_argument('--parent-stdin', action='store_true',
+                        help='标准输入关闭时退出（由界面启动时使用，界面退出后本进程随之结束）')
+    return parser.parse_args()
+
+
+def config_key(db_config):
+    return (db_config['host'], db_config['port'], db_config['dbname'], db_config['user'], db_config['password'])
+
+
+class StatWorker:
+    def __init__(self):
+        self.token = os.environ.get('STAT_WORKER_TOKEN', '')
+        self.import_conns = {}
+        self.export_engines = {}
+        self.job_count = 0
+
+    def import_conn(self, db_config):
+        key = config_key(db_config)
+        conn = self.import_conns.get(key)
+        if conn is None or conn.closed:
+            logger.info("建立导入使用的数据库连接 %s:%s/%s", db_config['host'], db_config['port'], db_config['dbname'])
+            conn = InsertStandAnswerToDb.connect_db(db_config)
+            self.import_conns[key] = conn
+        return conn
+
+    def export_engine(self, db_config, workers):
+        key = config_key(db_config) + (workers,)
+        engine = self.export_engines.get(key)
+        if engine is None:
+            logger.info("建立导出使用的连接池 %s:%s/%s，%d 个连接", db_config['host'], db_config['port'],
+                        db_config['dbname'], workers + 1)
+            engine = ExportResultToExcel.create_db_engine(db_config, workers, pre_ping=True)
+            self.export_engines[key] = engine
+        return engine
+
+    def run_import(self, argv):
+        args = InsertStandAnswerToDb.parse_args(argv)
+        db_config = InsertStandAnswerToDb.get_db_config(args)
+        conn = self.import_conn(db_config)
+        success, _ = InsertStandAnswerToDb.main(args, conn)
+        if not success and conn.closed:
+            # 复用的连接已被服务端断开（如数据库重启），重新连接后再执行一次；导入会重建表，可以重复执行
+            logger.warning("数据库连接已断开，重新连接后重试导入")
+            success, _ = InsertStandAnswerToDb.main(args, self.import_conn(db_config))
+        return success
+
+    def run_export(self, argv):
+        args = ExportResultToExcel.parse_args(argv)
+        db_config = ExportResultToExcel.get_db_config(args)
+        return ExportResultToExcel.main(args, self.export_engine(db_config, max(1, args.workers)))
+
+    def handle(self, request):
+        job = request.get('job')
+        if self.token and request.get('token') != self.token:
+            return {'ok': False, 'exit_code': 1, 'elapsed_ms': 0, 'log': '无效的 token'}
+        if job in ('ping', 'shutdown'):
+            return {'ok': True, 'exit_code': 0, 'elapsed_ms': 0, 'log': ''}
+        if job not in JOB_LOGS:
+            return {'ok': False, 'exit_code': 1, 'elapsed_ms': 0, 'log': f'未知任务: {job}'}
+
+        self.job_count += 1
+        cwd = request.get('cwd') or os.getcwd()
+        previous_cwd = os.getcwd()
+        capture = io.StringIO()
+        handlers = [logging.StreamHandler(capture)]
+        root = logging.getLogger()
+        started = time.perf_counter()
+        success = False
+        try:
+            os.chdir(cwd)
+            handlers.append(logging.FileHandler(JOB_LOGS[job], encoding='utf-8'))
+            for handler in handlers:
+                handler.setFormatter(LOG_FORMAT)
+                root.addHandler(handler)
+            argv = [str(arg) for arg in request.get('args', [])]
+            success = self.run_import(argv) if job == 'import' else self.run_export(argv)
+        except SystemExit:
+            # 参数解析失败时 argparse 调用 sys.exit，错误信息已写到标准错误
+            logger.error("任务 %s 的参数无效: %s", job, request.get('args'))
+        except Exception as e:
+            logger.exception("任务 %s 执行出错: %s", job, e)
+        finally:
+            for handler in handlers:
+                root.removeHandler(handler)
+                handler.close()
+            os.chdir(previous_cwd)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info("第 %d 个任务 %s %s，耗时 %.0f ms", self.job_count, job, "成功" if success else "失败", elapsed_ms)
+        return {'ok': success, 'exit_code': 0 if success else 1, 'elapsed_ms': round(elapsed_ms, 1),
+                'log': capture.getvalue()}
+
+    def serve_client(self, client):
+        with client, client.makefile('rwb') as stream:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except ValueError as e:
+                    response = {'ok': False, 'exit_code': 1, 'elapsed_ms': 0, 'log': f'请求格式错误: {e}'}
+                    request = {}
+                else:
+                    response = self.handle(request)
+                stream.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                stream.flush()
+                if request.get('job') == 'shutdown' and response.get('ok', True):
+                    return False
+        return True
+
+    def close(self):
+        for conn in self.import_conns.values():
+            if not conn.closed:
+                conn.close()
+        for engine in self.export_engines.values():
+            engine.dispose()
+
+
+def watch_parent_stdin():
+    # 界面持有本进程的标准输入，界面退出（包括异常退出）时读到 EOF
+    sys.stdin.read()
+    logger.info("界面已退出，常驻进程结束")
+    os._exit(0)
+
+
+def main(args):
+    worker = StatWorker()
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', args.port))
+    server.listen(1)
+    port = server.getsockname()[1]
+    if args.parent_stdin:
+        threading.Thread(target=watch_parent_stdin, daemon=True).start()
+    logger.info("常驻进程已启动，监听 127.0.0.1:%d，导入模块耗时 %.2f 秒", port, IMPORT_ELAPSED)
+    print(f"READY {port}", flush=True)
+    try:
+        while True:
+            client, _ = server.accept()
+            try:
+                if not worker.serve_client(client):
+                    logger.info("收到 shutdown，常驻进程结束")
+                    break
+            except OSError as e:
+                logger.warning("客户端连接异常: %s", e)
+    finally:
+        server.close()
+        worker.close()
+
+
+if __name__ == "__main__":
+    # 多文件导入使用进程池，打包为 exe 后子进程也从本入口启动
+    multiprocessing.freeze_support()
+    main(parse_args())
@@ -0,0 +1,164 @@
+--统计汇总：每张对比结果表只扫描一次，得到各统计表所需的计数、极值，以及各项时延的 P50/P95/P99 分位数和直方图，
+--summaryTables.sql 中的统计表只从汇总结果取值，不再各自重新扫描对比结果表；两张汇总表互不依赖，在界面中并发生成
+--直方图：<指标>_bounds 为各区间上限（秒），<指标>_le[i] 为 ≤ 第i个上限的个数，各区间个数在 latency_histogram 中相减得到
+
+--P波对比结果汇总
+DROP TABLE IF EXISTS public.p_compare_stats;
+
+CREATE TABLE public.p_compare_stats AS
+SELECT
+    count(*) AS total,
+    --传输时延
+    count(*) FILTER (WHERE p_send_time <= 0.1) AS send_le_100ms,
+    max(p_send_time) AS send_max,
+    min(p_send_time) AS send_min,
+    avg(p_send_time) AS send_avg,
+    count(p_send_time) AS send_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY p_send_time) AS send_pct,
+    ARRAY[0.05, 0.1, 0.2, 0.5, 1, 2, 5]::numeric[] AS send_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE p_send_time <= 0.05),
+        count(*) FILTER (WHERE p_send_time <= 0.1),
+        count(*) FILTER (WHERE p_send_time <= 0.2),
+        count(*) FILTER (WHERE p_send_time <= 0.5),
+        count(*) FILTER (WHERE p_send_time <= 1),
+        count(*) FILTER (WHERE p_send_time <= 2),
+        count(*) FILTER (WHERE p_send_time <= 5)
+    ] AS send_le,
+    --震中位置偏差
+    SUM(CASE WHEN epicenter_deviation_km <= 60 THEN 1 ELSE 0 END) AS epicenter_le_60km,
+    SUM(CASE WHEN epicenter_deviation_km <= 100 THEN 1 ELSE 0 END) AS epicenter_le_100km,
+    MAX(epicenter_deviation_km) AS epicenter_max,
+    --首报判别时间
+    count(*) FILTER (WHERE p_wave_judge_time_sta <= 3) AS judge_le_3s,
+    avg(p_wave_judge_time_sta) AS judge_avg,
+    max(p_wave_judge_time_sta) AS judge_max,
+    count(p_wave_judge_time_sta) AS judge_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY p_wave_judge_time_sta) AS judge_pct,
+    ARRAY[0.5, 1, 2, 3, 5, 10, 20]::numeric[] AS judge_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 0.5),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 1),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 2),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 3),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 5),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 10),
+        count(*) FILTER (WHERE p_wave_judge_time_sta <= 20)
+    ] AS judge_le,
+    --震级偏差
+    count(*) FILTER (WHERE magnitude_diff <= 1) AS mag_le_1,
+    avg(magnitude_diff) AS mag_avg
+FROM public.p_compare_result;
+
+--S波对比结果汇总：40/80/120gal传输时延和判别时延
+--注意80/120gal传输时延的合格数按 ≤0.1 统计、合格率按 <0.1 统计，与原统计表保持一致
+DROP TABLE IF EXISTS public.s_compare_stats;
+
+CREATE TABLE public.s_compare_stats AS
+SELECT
+    count(*) AS total,
+    --40gal传输时延
+    count(*) FILTER (WHERE s_send_time < 0.1) AS send_lt_100ms,
+    avg(s_send_time) AS send_avg,
+    max(s_send_time) AS send_max,
+    min(s_send_time) AS send_min,
+    count(s_send_time) AS send_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY s_send_time) AS send_pct,
+    ARRAY[0.05, 0.1, 0.2, 0.5, 1, 2, 5]::numeric[] AS send_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE s_send_time <= 0.05),
+        count(*) FILTER (WHERE s_send_time <= 0.1),
+        count(*) FILTER (WHERE s_send_time <= 0.2),
+        count(*) FILTER (WHERE s_send_time <= 0.5),
+        count(*) FILTER (WHERE s_send_time <= 1),
+        count(*) FILTER (WHERE s_send_time <= 2),
+        count(*) FILTER (WHERE s_send_time <= 5)
+    ] AS send_le,
+    --80gal传输时延
+    count(*) FILTER (WHERE gal80_send_time <= 0.1) AS gal80_send_le_100ms,
+    count(*) FILTER (WHERE gal80_send_time < 0.1) AS gal80_send_lt_100ms,
+    avg(gal80_send_time) AS gal80_send_avg,
+    max(gal80_send_time) AS gal80_send_max,
+    min(gal80_send_time) AS gal80_send_min,
+    count(gal80_send_time) AS gal80_send_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY gal80_send_time) AS gal80_send_pct,
+    ARRAY[0.05, 0.1, 0.2, 0.5, 1, 2, 5]::numeric[] AS gal80_send_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE gal80_send_time <= 0.05),
+        count(*) FILTER (WHERE gal80_send_time <= 0.1),
+        count(*) FILTER (WHERE gal80_send_time <= 0.2),
+        count(*) FILTER (WHERE gal80_send_time <= 0.5),
+        count(*) FILTER (WHERE gal80_send_time <= 1),
+        count(*) FILTER (WHERE gal80_send_time <= 2),
+        count(*) FILTER (WHERE gal80_send_time <= 5)
+    ] AS gal80_send_le,
+    --120gal传输时延
+    count(*) FILTER (WHERE gal120_send_time <= 0.1) AS gal120_send_le_100ms,
+    count(*) FILTER (WHERE gal120_send_time < 0.1) AS gal120_send_lt_100ms,
+    avg(gal120_send_time) AS gal120_send_avg,
+    max(gal120_send_time) AS gal120_send_max,
+    min(gal120_send_time) AS gal120_send_min,
+    count(gal120_send_time) AS gal120_send_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY gal120_send_time) AS gal120_send_pct,
+    ARRAY[0.05, 0.1, 0.2, 0.5, 1, 2, 5]::numeric[] AS gal120_send_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE gal120_send_time <= 0.05),
+        count(*) FILTER (WHERE gal120_send_time <= 0.1),
+        count(*) FILTER (WHERE gal120_send_time <= 0.2),
+        count(*) FILTER (WHERE gal120_send_time <= 0.5),
+        count(*) FILTER (WHERE gal120_send_time <= 1),
+        count(*) FILTER (WHERE gal120_send_time <= 2),
+        count(*) FILTER (WHERE gal120_send_time <= 5)
+    ] AS gal120_send_le,
+    --40gal判别时延
+    count(*) FILTER (WHERE swave_judge_time_station <= 0.5) AS judge_le_500ms,
+    avg(swave_judge_time_station) AS judge_avg,
+    max(swave_judge_time_station) AS judge_max,
+    min(swave_judge_time_station) AS judge_min,
+    count(swave_judge_time_station) AS judge_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY swave_judge_time_station) AS judge_pct,
+    ARRAY[0.1, 0.2, 0.5, 1, 2, 5, 10]::numeric[] AS judge_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE swave_judge_time_station <= 0.1),
+        count(*) FILTER (WHERE swave_judge_time_station <= 0.2),
+        count(*) FILTER (WHERE swave_judge_time_station <= 0.5),
+        count(*) FILTER (WHERE swave_judge_time_station <= 1),
+        count(*) FILTER (WHERE swave_judge_time_station <= 2),
+        count(*) FILTER (WHERE swave_judge_time_station <= 5),
+        count(*) FILTER (WHERE swave_judge_time_station <= 10)
+    ] AS judge_le,
+    --80gal判别时延
+    count(*) FILTER (WHERE gal80_judge_time_station <= 0.5) AS gal80_judge_le_500ms,
+    avg(gal80_judge_time_station) AS gal80_judge_avg,
+    max(gal80_judge_time_station) AS gal80_judge_max,
+    min(gal80_judge_time_station) AS gal80_judge_min,
+    count(gal80_judge_time_station) AS gal80_judge_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY gal80_judge_time_station) AS gal80_judge_pct,
+    ARRAY[0.1, 0.2, 0.5, 1, 2, 5, 10]::numeric[] AS gal80_judge_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE gal80_judge_time_station <= 0.1),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 0.2),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 0.5),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 1),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 2),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 5),
+        count(*) FILTER (WHERE gal80_judge_time_station <= 10)
+    ] AS gal80_judge_le,
+    --120gal判别时延
+    count(*) FILTER (WHERE gal120_judge_time_station <= 0.5) AS gal120_judge_le_500ms,
+    avg(gal120_judge_time_station) AS gal120_judge_avg,
+    max(gal120_judge_time_station) AS gal120_judge_max,
+    min(gal120_judge_time_station) AS gal120_judge_min,
+    count(gal120_judge_time_station) AS gal120_judge_count,
+    percentile_disc(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY gal120_judge_time_station) AS gal120_judge_pct,
+    ARRAY[0.1, 0.2, 0.5, 1, 2, 5, 10]::numeric[] AS gal120_judge_bounds,
+    ARRAY[
+        count(*) FILTER (WHERE gal120_judge_time_station <= 0.1),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 0.2),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 0.5),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 1),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 2),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 5),
+        count(*) FILTER (WHERE gal120_judge_time_station <= 10)
+    ] AS gal120_judge_le
+FROM public.s_compare_result;
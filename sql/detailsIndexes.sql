@@ -0,0 +1,21 @@
+-- 数据明细浏览用的索引：按 (实验编号, 波形编号) 分页，过滤和排序的列在前、分页键在后，
+-- 每一页都只在索引上定位并顺序读取一页的行。事务模式下数据明细发布到 public 时不带索引，因此在发布之后执行
+CREATE INDEX IF NOT EXISTS idx_details_key ON public.details (实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_p_miss ON public.details (漏报P波, 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_s_miss ON public.details (漏报S波, 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_send_time ON public.details (波形发送时间, 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_epicenter ON public.details ("震中偏差(km)", 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_magnitude ON public.details (震级偏差, 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_peak_percent ON public.details (峰值偏差百分比, 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_p_send ON public.details ("P波预警首报传输时间(s)", 实验编号, 波形编号);
+
+CREATE INDEX IF NOT EXISTS idx_details_s_send ON public.details ("阈值报警首报传输时间(s)", 实验编号, 波形编号);
+
+ANALYZE public.details;
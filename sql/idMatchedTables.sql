@@ -1,95 +1,272 @@
--- 刷新 id_matched_p_wave_info 表：只保留 earth_id, jk_time, rcv_jktime, send_time
-DROP TABLE IF EXISTS public.id_matched_p_wave_info;
-
-CREATE TABLE public.id_matched_p_wave_info AS
-SELECT t.earth_id, t.jk_time, t.rcv_jktime, ROUND(
-        EXTRACT(
-            EPOCH
-            FROM (t.rcv_jktime - t.jk_time)
-        ), 3
-    ) AS send_time
-FROM (
-        SELECT *, ROW_NUMBER() OVER (
-                PARTITION BY
-                    earth_id
-                ORDER BY jk_time ASC
-            ) AS rn
-        FROM station_p_wave_alarm
-    ) t
-WHERE
-    t.rn = 1;
-
--- 刷新 id_matched_s_wave_info 表：包含三组 jk_time/rcv_jktime 及三组 send_time
-DROP TABLE IF EXISTS public.id_matched_s_wave_info;
-
-CREATE TABLE public.id_matched_s_wave_info AS
-SELECT
-    s.earth_id,
-    -- 最早 jk_time 和 rcv_jktime
-    first_row.jk_time AS jk_time,
-    first_row.rcv_jktime AS rcv_jktime,
-    ROUND(
-        EXTRACT(
-            EPOCH
-            FROM (
-                    first_row.rcv_jktime - first_row.jk_time
-                )
-        ),
-        3
-    ) AS send_time,
-    -- x_acc_value≥80 最早 jk_time 和 rcv_jktime
-    gal80_row.jk_time AS gal80_jk_time,
-    gal80_row.rcv_jktime AS gal80_rcv_jktime,
-    ROUND(
-        EXTRACT(
-            EPOCH
-            FROM (
-                    gal80_row.rcv_jktime - gal80_row.jk_time
-                )
-        ),
-        3
-    ) AS gal80_send_time,
-    -- x_acc_value≥120 最早 jk_time 和 rcv_jktime
-    gal120_row.jk_time AS gal120_jk_time,
-    gal120_row.rcv_jktime AS gal120_rcv_jktime,
-    ROUND(
-        EXTRACT(
-            EPOCH
-            FROM (
-                    gal120_row.rcv_jktime - gal120_row.jk_time
-                )
-        ),
-        3
-    ) AS gal120_send_time
-FROM (
-        SELECT DISTINCT
-            earth_id
-        FROM station_s_wave_alarm
-    ) s
-    LEFT JOIN LATERAL (
-        SELECT jk_time, rcv_jktime
-        FROM station_s_wave_alarm
-        WHERE
-            earth_id = s.earth_id
-        ORDER BY jk_time ASC
-        LIMIT 1
-    ) first_row ON TRUE
-    LEFT JOIN LATERAL (
-        SELECT jk_time, rcv_jktime
-        FROM station_s_wave_alarm
-        WHERE
-            earth_id = s.earth_id
-            AND x_acc_value >= 80
-        ORDER BY jk_time ASC
-        LIMIT 1
-    ) gal80_row ON TRUE
-    LEFT JOIN LATERAL (
-        SELECT jk_time, rcv_jktime
-        FROM station_s_wave_alarm
-        WHERE
-            earth_id = s.earth_id
-            AND x_acc_value >= 120
-        ORDER BY jk_time ASC
-        LIMIT 1
-    ) gal120_row ON TRUE;
+-- 按地震编号（earth_id）汇总的首报表只在首次按时间查询时创建，之后由 public.stat_refresh_id_matched() 增量维护，
+-- 按时间查询调用 public.stat_time_range_send_time(开始, 结束) 直接返回四项传输时间统计，不再删表重建
+-- id_matched_p_wave_info：每个 earth_id 的P波首报 earth_id, jk_time, rcv_jktime, send_time
+CREATE TABLE IF NOT EXISTS public.id_matched_p_wave_info (
+    earth_id varchar,
+    jk_time timestamp,
+    rcv_jktime timestamp,
+    send_time numeric
+);
 
+-- id_matched_s_wave_info：每个 earth_id 的S波首报及80/120gal首报
+CREATE TABLE IF NOT EXISTS public.id_matched_s_wave_info (
+    earth_id varchar,
+    jk_time timestamp,
+    rcv_jktime timestamp,
+    send_time numeric,
+    gal80_jk_time timestamp,
+    gal80_rcv_jktime timestamp,
+    gal80_send_time numeric,
+    gal120_jk_time timestamp,
+    gal120_rcv_jktime timestamp,
+    gal120_send_time numeric
+);
+
+CREATE INDEX IF NOT EXISTS idx_id_matched_p_wave_info_jk_time ON public.id_matched_p_wave_info (jk_time);
+
+CREATE INDEX IF NOT EXISTS idx_id_matched_p_wave_info_earth_id ON public.id_matched_p_wave_info (earth_id);
+
+CREATE INDEX IF NOT EXISTS idx_id_matched_s_wave_info_jk_time ON public.id_matched_s_wave_info (jk_time);
+
+CREATE INDEX IF NOT EXISTS idx_id_matched_s_wave_info_earth_id ON public.id_matched_s_wave_info (earth_id);
+
+-- 上次刷新时两张报警表的最大 jk_time 和行数，与 stat_watermark 的用法相同
+CREATE TABLE IF NOT EXISTS public.stat_id_matched_watermark (
+    alarm_schema text,
+    p_jk_time timestamp,
+    p_count bigint,
+    s_jk_time timestamp,
+    s_count bigint,
+    updated_at timestamp
+);
+
+-- 按 (开始, 结束) 缓存的统计结果，首报表有变化时清空
+CREATE TABLE IF NOT EXISTS public.stat_time_range_cache (
+    range_start timestamp NOT NULL,
+    range_end timestamp NOT NULL,
+    序号 integer NOT NULL,
+    类别 text,
+    项目 text,
+    总数 bigint,
+    合格数 bigint,
+    合格率 text,
+    标准 text,
+    是否达标 text,
+    平均值 numeric,
+    最大值 numeric,
+    最小值 numeric,
+    PRIMARY KEY (range_start, range_end, 序号)
+);
+
+-- 刷新首报表：水位线有效时只重算水位线之后出现过报警的 earth_id，否则全量重建。
+-- verify 为 false 时跳过补录/删除检查（两次 COUNT），只检查是否有新报警，用于同一会话中的连续查询。
+-- 返回 unchanged / incremental / full
+CREATE OR REPLACE FUNCTION public.stat_refresh_id_matched(verify boolean DEFAULT true)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    w public.stat_id_matched_watermark%ROWTYPE;
+    valid boolean;
+    p_mark timestamp;
+    p_total bigint;
+    s_mark timestamp;
+    s_total bigint;
+BEGIN
+    SELECT * INTO w FROM public.stat_id_matched_watermark LIMIT 1;
+    valid := FOUND AND w.alarm_schema = current_schema();
+    IF valid AND verify THEN
+        valid := (SELECT COUNT(jk_time) FROM station_p_wave_alarm WHERE jk_time <= w.p_jk_time) = w.p_count
+            AND (SELECT COUNT(jk_time) FROM station_s_wave_alarm WHERE jk_time <= w.s_jk_time) = w.s_count;
+    END IF;
+    IF valid
+        AND NOT EXISTS (SELECT 1 FROM station_p_wave_alarm WHERE jk_time > COALESCE(w.p_jk_time, '-infinity'))
+        AND NOT EXISTS (SELECT 1 FROM station_s_wave_alarm WHERE jk_time > COALESCE(w.s_jk_time, '-infinity')) THEN
+        RETURN 'unchanged';
+    END IF;
+
+    -- 先记下新水位线，之后写入的报警留给下次刷新
+    SELECT MAX(jk_time), COUNT(jk_time) INTO p_mark, p_total FROM station_p_wave_alarm;
+    SELECT MAX(jk_time), COUNT(jk_time) INTO s_mark, s_total FROM station_s_wave_alarm;
+
+    DROP TABLE IF EXISTS pg_temp.stat_changed_earth_id;
+    IF valid THEN
+        CREATE TEMP TABLE stat_changed_earth_id AS
+        SELECT earth_id FROM station_p_wave_alarm WHERE jk_time > COALESCE(w.p_jk_time, '-infinity')
+        UNION
+        SELECT earth_id FROM station_s_wave_alarm WHERE jk_time > COALESCE(w.s_jk_time, '-infinity');
+    ELSE
+        TRUNCATE public.id_matched_p_wave_info, public.id_matched_s_wave_info;
+        CREATE TEMP TABLE stat_changed_earth_id AS
+        SELECT earth_id FROM station_p_wave_alarm
+        UNION
+        SELECT earth_id FROM station_s_wave_alarm;
+    END IF;
+
+    DELETE FROM public.id_matched_p_wave_info i
+    USING stat_changed_earth_id c
+    WHERE i.earth_id = c.earth_id OR (i.earth_id IS NULL AND c.earth_id IS NULL);
+
+    DELETE FROM public.id_matched_s_wave_info i
+    USING stat_changed_earth_id c
+    WHERE i.earth_id = c.earth_id OR (i.earth_id IS NULL AND c.earth_id IS NULL);
+
+    -- P波：每个 earth_id 取 jk_time 最早的一条；earth_id 为空的报警也作为一组，取其中最早的一条
+    INSERT INTO public.id_matched_p_wave_info
+    SELECT DISTINCT ON (p.earth_id)
+        p.earth_id, p.jk_time, p.rcv_jktime,
+        ROUND(EXTRACT(EPOCH FROM (p.rcv_jktime - p.jk_time)), 3)
+    FROM station_p_wave_alarm p
+    WHERE p.earth_id IN (SELECT earth_id FROM stat_changed_earth_id)
+    ORDER BY p.earth_id, p.jk_time;
+
+    INSERT INTO public.id_matched_p_wave_info
+    SELECT p.earth_id, p.jk_time, p.rcv_jktime,
+        ROUND(EXTRACT(EPOCH FROM (p.rcv_jktime - p.jk_time)), 3)
+    FROM station_p_wave_alarm p
+    WHERE p.earth_id IS NULL
+        AND EXISTS (SELECT 1 FROM stat_changed_earth_id WHERE earth_id IS NULL)
+    ORDER BY p.jk_time
+    LIMIT 1;
+
+    -- S波：按 earth_id 一次聚合得出首报及80/120gal首报
+    INSERT INTO public.id_matched_s_wave_info
+    SELECT
+        earth_id,
+        jk_time,
+        rcv_jktime,
+        ROUND(EXTRACT(EPOCH FROM (rcv_jktime - jk_time)), 3),
+        gal80_jk_time,
+        gal80_rcv_jktime,
+        ROUND(EXTRACT(EPOCH FROM (gal80_rcv_jktime - gal80_jk_time)), 3),
+        gal120_jk_time,
+        gal120_rcv_jktime,
+        ROUND(EXTRACT(EPOCH FROM (gal120_rcv_jktime - gal120_jk_time)), 3)
+    FROM (
+            SELECT
+                earth_id,
+                MIN(jk_time) AS jk_time,
+                (ARRAY_AGG(rcv_jktime ORDER BY jk_time))[1] AS rcv_jktime,
+                MIN(jk_time) FILTER (WHERE x_acc_value >= 80) AS gal80_jk_time,
+                (ARRAY_AGG(rcv_jktime ORDER BY jk_time) FILTER (WHERE x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+                MIN(jk_time) FILTER (WHERE x_acc_value >= 120) AS gal120_jk_time,
+                (ARRAY_AGG(rcv_jktime ORDER BY jk_time) FILTER (WHERE x_acc_value >= 120))[1] AS gal120_rcv_jktime
+            FROM station_s_wave_alarm
+            WHERE earth_id IN (SELECT earth_id FROM stat_changed_earth_id)
+            GROUP BY earth_id
+        ) s;
+
+    -- earth_id 为空的S波报警不属于任何地震，只保留一行空值
+    INSERT INTO public.id_matched_s_wave_info (earth_id)
+    SELECT NULL
+    WHERE EXISTS (SELECT 1 FROM stat_changed_earth_id WHERE earth_id IS NULL)
+        AND EXISTS (SELECT 1 FROM station_s_wave_alarm WHERE earth_id IS NULL);
+
+    DROP TABLE pg_temp.stat_changed_earth_id;
+    IF NOT valid THEN
+        ANALYZE public.id_matched_p_wave_info;
+        ANALYZE public.id_matched_s_wave_info;
+    END IF;
+
+    DELETE FROM public.stat_id_matched_watermark;
+    INSERT INTO public.stat_id_matched_watermark
+    VALUES (current_schema(), p_mark, p_total, s_mark, s_total, now()::timestamp);
+    DELETE FROM public.stat_time_range_cache;
+    RETURN CASE WHEN valid THEN 'incremental' ELSE 'full' END;
+END
+$$;
+
+-- 按时间查询：统计首报 jk_time 落在 [range_start, range_end] 内的地震，依次返回
+-- P波传输时间和S波40/80/120gal传输时延四行，类别与原 time_filtered_* 表名后缀一致。
+-- 口径与原 timeFilteredResult.sql 逐项相同；结果写入 stat_time_range_cache，同一时间段再次查询直接读取
+CREATE OR REPLACE FUNCTION public.stat_time_range_send_time(range_start timestamp, range_end timestamp)
+RETURNS TABLE (
+    类别 text,
+    项目 text,
+    总数 bigint,
+    合格数 bigint,
+    合格率 text,
+    标准 text,
+    是否达标 text,
+    平均值 numeric,
+    最大值 numeric,
+    最小值 numeric
+)
+LANGUAGE plpgsql
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM public.stat_time_range_cache c WHERE c.range_start = $1 AND c.range_end = $2) THEN
+        INSERT INTO public.stat_time_range_cache (range_start, range_end, 序号, 类别, 项目, 总数, 合格数, 合格率, 标准, 是否达标, 平均值, 最大值, 最小值)
+        SELECT $1, $2, 1, 'p', 'P波预警传输时间统计≤0.1s',
+            COUNT(*),
+            COUNT(*) FILTER (WHERE send_time <= 0.1),
+            COALESCE(ROUND(100.0 * COUNT(*) FILTER (WHERE send_time <= 0.1) / NULLIF(COUNT(*), 0), 2) || '%', 'NaN%'),
+            '≥95%',
+            CASE
+                WHEN NULLIF(COUNT(*), 0) IS NULL THEN 'NULL'
+                WHEN COUNT(*) FILTER (WHERE send_time <= 0.1)::numeric / NULLIF(COUNT(*), 0)::numeric >= 0.95 THEN '是'
+                ELSE '否'
+            END,
+            ROUND(AVG(send_time), 3),
+            ROUND(MAX(send_time), 3),
+            ROUND(MIN(send_time), 3)
+        FROM public.id_matched_p_wave_info
+        WHERE jk_time >= $1 AND jk_time <= $2
+        UNION ALL
+        SELECT $1, $2, 2, 's_40gal', '阈值报警传输时延≤0.1s(40gal)',
+            COUNT(*),
+            COUNT(*) FILTER (WHERE send_time < 0.1),
+            COALESCE(ROUND(100.0 * COUNT(*) FILTER (WHERE send_time < 0.1) / NULLIF(COUNT(*), 0), 2) || '%', 'NaN%'),
+            '95%',
+            CASE
+                WHEN NULLIF(COUNT(*), 0) IS NULL THEN 'NULL'
+                WHEN COUNT(*) FILTER (WHERE send_time < 0.1)::numeric / NULLIF(COUNT(*), 0)::numeric >= 0.95 THEN '是'
+                ELSE '否'
+            END,
+            ROUND(AVG(send_time)::NUMERIC, 3),
+            MAX(send_time),
+            MIN(send_time)
+        FROM public.id_matched_s_wave_info
+        WHERE jk_time >= $1 AND jk_time <= $2
+        UNION ALL
+        SELECT $1, $2, 3, 's_80gal', '阈值报警传输时延≤0.1s(80gal)',
+            COUNT(gal80_send_time),
+            COUNT(*) FILTER (WHERE gal80_send_time <= 0.1),
+            COALESCE(ROUND(100.0 * COUNT(*) FILTER (WHERE gal80_send_time < 0.1) / NULLIF(COUNT(gal80_send_time), 0), 2) || '%', 'NaN%'),
+            '95%',
+            CASE
+                WHEN NULLIF(COUNT(gal80_send_time), 0) IS NULL THEN 'NULL'
+                WHEN COUNT(*) FILTER (WHERE gal80_send_time <= 0.1)::numeric / NULLIF(COUNT(gal80_send_time), 0)::numeric >= 0.95 THEN '是'
+                ELSE '否'
+            END,
+            ROUND(AVG(gal80_send_time)::numeric, 3),
+            MAX(gal80_send_time),
+            MIN(gal80_send_time)
+        FROM public.id_matched_s_wave_info
+        WHERE jk_time >= $1 AND jk_time <= $2 AND gal80_send_time IS NOT NULL
+        UNION ALL
+        SELECT $1, $2, 4, 's_120gal', '阈值报警传输时延≤0.1s(120gal)',
+            COUNT(gal120_send_time),
+            COUNT(*) FILTER (WHERE gal120_send_time <= 0.1),
+            COALESCE(ROUND(100.0 * COUNT(*) FILTER (WHERE gal120_send_time < 0.1) / NULLIF(COUNT(gal120_send_time), 0), 2) || '%', 'NaN%'),
+            '95%',
+            CASE
+                WHEN NULLIF(COUNT(gal120_send_time), 0) IS NULL THEN 'NULL'
+                WHEN COUNT(*) FILTER (WHERE gal120_send_time <= 0.1)::numeric / NULLIF(COUNT(gal120_send_time), 0)::numeric >= 0.95 THEN '是'
+                ELSE '否'
+            END,
+            ROUND(AVG(gal120_send_time)::numeric, 3),
+            MAX(gal120_send_time),
+            MIN(gal120_send_time)
+        FROM public.id_matched_s_wave_info
+        WHERE jk_time >= $1 AND jk_time <= $2 AND gal120_send_time IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN QUERY
+    SELECT c.类别, c.项目, c.总数, c.合格数, c.合格率, c.标准, c.是否达标, c.平均值, c.最大值, c.最小值
+    FROM public.stat_time_range_cache c
+    WHERE c.range_start = $1 AND c.range_end = $2
+    ORDER BY c.序号;
+END
+$$;
@@ -0,0 +1,206 @@
+-- 增量统计：只重新匹配新增或发生变化的标准答案窗口
+-- 需要先执行过一次 waveInfoTables.sql（生成 public.stat_watermark），否则应执行全量统计
+-- 以下情况窗口需要重新匹配：
+--   1. 标准答案新增，或任一字段（含 next_send_time）发生变化
+--   2. 窗口内出现 jk_time 大于水位线的新 P/S 波报警
+-- 已删除的标准答案对应的匹配结果一并删除
+
+-- 重新导入标准答案会重建表，需补回 next_send_time 列
+ALTER TABLE public.standanswer_p_wave_alarm
+ADD COLUMN IF NOT EXISTS next_send_time timestamp;
+
+WITH
+    next_times AS (
+        SELECT id, LEAD(send_time) OVER (
+                ORDER BY send_time
+            ) AS next_send_time, end_time
+        FROM public.standanswer_p_wave_alarm
+    )
+UPDATE public.standanswer_p_wave_alarm t
+SET
+    next_send_time = COALESCE(n.next_send_time, n.end_time)
+FROM next_times n
+WHERE
+    t.id = n.id
+    AND t.next_send_time IS DISTINCT FROM COALESCE(n.next_send_time, n.end_time);
+
+-- 先记下本次的水位线再匹配：匹配过程中写入的报警留给下次统计（jk_time 更大的由增量统计重新匹配，
+-- 更小的使水位线以内的行数不符、下次执行全量统计），不会被计入水位线却没有匹配
+DROP TABLE IF EXISTS pg_temp.stat_watermark_new;
+
+CREATE TEMP TABLE stat_watermark_new AS
+SELECT p.p_jk_time, p.p_count, s.s_jk_time, s.s_count
+FROM (
+        SELECT MAX(jk_time) AS p_jk_time, COUNT(jk_time) AS p_count
+        FROM station_p_wave_alarm
+    ) p,
+    (
+        SELECT MAX(jk_time) AS s_jk_time, COUNT(jk_time) AS s_count
+        FROM station_s_wave_alarm
+    ) s;
+
+DROP TABLE IF EXISTS pg_temp.stand_answer_new;
+
+CREATE TEMP TABLE stand_answer_new AS
+SELECT
+    id,
+    test_id,
+    waveform_id,
+    station_name,
+    station_manager,
+    start_time,
+    send_time,
+    end_time,
+    duration,
+    earthquake_type,
+    distance_class actual_depth,
+    actual_magnitude,
+    actual_distance,
+    actual_latitude,
+    actual_longitude,
+    actual_peak,
+    p_wave_index,
+    p_wave_time,
+    s_wave_first_index,
+    s_wave_first_time,
+    s_wave_first_peak,
+    s_wave_second_index,
+    s_wave_second_time,
+    s_wave_second_peak,
+    s_wave_third_index,
+    s_wave_third_time,
+    s_wave_third_peak,
+    azimuth,
+    next_send_time
+FROM public.standanswer_p_wave_alarm;
+
+DROP TABLE IF EXISTS pg_temp.stat_dirty_window;
+
+CREATE TEMP TABLE stat_dirty_window AS
+-- 新增或变化的标准答案
+SELECT n.id
+FROM stand_answer_new n
+    LEFT JOIN public.stand_answer o ON o.id = n.id
+WHERE
+    o.id IS NULL
+    OR ROW(n.*) IS DISTINCT FROM ROW(o.*)
+UNION
+-- 窗口内有新P波报警
+SELECT n.id
+FROM
+    public.stat_watermark w
+    INNER JOIN station_p_wave_alarm p ON p.jk_time > COALESCE(w.p_jk_time, '-infinity')
+    INNER JOIN stand_answer_new n ON p.jk_time BETWEEN n.send_time AND n.next_send_time
+UNION
+-- 窗口内有新S波报警
+SELECT n.id
+FROM
+    public.stat_watermark w
+    INNER JOIN station_s_wave_alarm s ON s.jk_time > COALESCE(w.s_jk_time, '-infinity')
+    INNER JOIN stand_answer_new n ON s.jk_time BETWEEN n.send_time AND n.next_send_time;
+
+-- 删除需要重新匹配以及已不存在的窗口
+DELETE FROM public.stand_answer o
+WHERE
+    o.id IN (SELECT id FROM stat_dirty_window)
+    OR NOT EXISTS (SELECT 1 FROM stand_answer_new n WHERE n.id = o.id);
+
+DELETE FROM public.P_matched_details o
+WHERE
+    o.id IN (SELECT id FROM stat_dirty_window)
+    OR NOT EXISTS (SELECT 1 FROM stand_answer_new n WHERE n.id = o.id);
+
+DELETE FROM public.S_matched_details o
+WHERE
+    o.id IN (SELECT id FROM stat_dirty_window)
+    OR NOT EXISTS (SELECT 1 FROM stand_answer_new n WHERE n.id = o.id);
+
+INSERT INTO public.stand_answer
+SELECT n.*
+FROM stand_answer_new n
+    INNER JOIN stat_dirty_window dirty ON dirty.id = n.id;
+
+INSERT INTO public.P_matched_details
+SELECT
+    stand.id,
+    stand.send_time,
+    stand.next_send_time,
+    p_min.jk_time AS first_jk_time,
+    p_min.rcv_jktime AS first_rcv_jktime,
+    p_min.sta_code,
+    p_min.device_code,
+    p_min.source_longitude,
+    p_min.source_latitude,
+    p_min.epi_dist,
+    p_min.azi_angle,
+    p_min.earthquake_level
+FROM public.stand_answer stand
+    INNER JOIN stat_dirty_window dirty ON dirty.id = stand.id
+    LEFT JOIN LATERAL (
+        SELECT
+            jk_time, rcv_jktime, sta_code, device_code, ROUND(source_longitude::numeric, 3) AS source_longitude, ROUND(source_latitude::numeric, 3) AS source_latitude, ROUND(epi_dist::numeric, 3) AS epi_dist, ROUND(azi_angle::numeric, 3) AS azi_angle, ROUND(earthquake_level::numeric, 3) AS earthquake_level
+        FROM station_p_wave_alarm p
+        WHERE
+            p.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            -- 需要重新匹配的窗口覆盖的时间段，与 waveInfoTables.sql 相同
+            AND p.jk_time BETWEEN (SELECT MIN(n.send_time) FROM stand_answer_new n INNER JOIN stat_dirty_window d ON d.id = n.id)
+                AND (SELECT MAX(n.next_send_time) FROM stand_answer_new n INNER JOIN stat_dirty_window d ON d.id = n.id)
+        ORDER BY jk_time ASC
+        LIMIT 1
+    ) p_min ON TRUE
+ORDER BY stand.id;
+
+INSERT INTO public.S_matched_details
+SELECT
+    stand.id,
+    stand.send_time,
+    stand.next_send_time,
+    s_agg.*
+FROM
+    public.stand_answer stand
+    INNER JOIN stat_dirty_window dirty ON dirty.id = stand.id
+    -- 每个窗口单独聚合，首报、80/120gal首报和峰值在同一次聚合中得出；报警表按 jk_time 分区时，
+    -- 每个窗口只探查所在的分区（普通连接时规划器不计运行时分区裁剪，会改为物化全部分区后逐行比较）
+    LEFT JOIN LATERAL (
+        SELECT
+            MIN(s.jk_time) AS first_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time))[1] AS first_rcv_jktime,
+            -- 80gal首次达到的jk_time和rcv_jktime
+            MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 80) AS gal80_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+            -- 120gal首次达到的jk_time和rcv_jktime
+            MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 120) AS gal120_jk_time,
+            (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 120))[1] AS gal120_rcv_jktime,
+            (ARRAY_AGG(s.sta_code ORDER BY s.jk_time))[1] AS sta_code,
+            (ARRAY_AGG(s.device_code ORDER BY s.jk_time))[1] AS device_code,
+            ROUND(MAX(s.x_acc_value)::NUMERIC, 3) AS wave_peak
+        FROM station_s_wave_alarm s
+        WHERE
+            s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            -- 需要重新匹配的窗口覆盖的时间段，与 waveInfoTables.sql 相同
+            AND s.jk_time BETWEEN (SELECT MIN(n.send_time) FROM stand_answer_new n INNER JOIN stat_dirty_window d ON d.id = n.id)
+                AND (SELECT MAX(n.next_send_time) FROM stand_answer_new n INNER JOIN stat_dirty_window d ON d.id = n.id)
+    ) s_agg ON TRUE
+WHERE
+    stand.actual_peak >= 40
+ORDER BY stand.id;
+
+DROP TABLE IF EXISTS pg_temp.stand_answer_new;
+
+DROP TABLE IF EXISTS pg_temp.stat_dirty_window;
+
+-- 记录本次匹配的水位线，增量统计据此判断哪些窗口需要重新匹配
+DROP TABLE IF EXISTS public.stat_watermark;
+
+CREATE TABLE public.stat_watermark AS
+SELECT
+    current_schema() AS alarm_schema,
+    (SELECT MAX(send_time) FROM public.stand_answer) AS max_send_time,
+    w.p_jk_time,
+    w.p_count,
+    w.s_jk_time,
+    w.s_count,
+    now() AS updated_at
+FROM stat_watermark_new w;
+
+DROP TABLE IF EXISTS pg_temp.stat_watermark_new;
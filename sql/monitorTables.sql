@@ -0,0 +1,526 @@
+-- 实时监测：两张报警表上的语句级触发器把每次写入的 jk_time 范围记入 public.stat_monitor_queue，并在通道 stat_alarm_new 上发出通知；
+-- 监测端收到通知后攒一批调用 public.stat_monitor_apply()：只重新匹配新报警所在的标准答案窗口，按窗口新旧贡献之差更新累计量，
+-- 再由累计量改写传输时延和漏报统计表（P_send_time、S_40gal/80gal/120gal_send_time、P_warning_miss、S_warning_miss），不重新执行统计SQL。
+-- 须先执行过一次查询；标准答案变化、其余统计表、对比结果和数据明细仍以查询为准。
+-- 监测不推进 stat_watermark，之后的增量统计仍会重新匹配这些窗口
+
+-- 待处理的写入：每条 INSERT/COPY 语句一行
+CREATE TABLE IF NOT EXISTS public.stat_monitor_queue (
+    seq bigserial PRIMARY KEY,
+    alarm_kind char(1) NOT NULL,
+    alarm_schema text NOT NULL,
+    min_jk_time timestamp,
+    max_jk_time timestamp,
+    row_count bigint,
+    queued_at timestamp DEFAULT clock_timestamp()
+);
+
+-- 监测状态：触发器所在的模式和已处理的批次
+CREATE TABLE IF NOT EXISTS public.stat_monitor_state (
+    alarm_schema text,
+    started_at timestamp,
+    batches bigint,
+    alarms bigint,
+    last_batch_at timestamp
+);
+
+-- 触发器函数：以表所有者的权限写入队列，写报警的用户不需要 public 下的权限；
+-- 同一事务中相同通道和内容的通知只发送一次，逐条写入的报警在提交时合并为一次通知
+CREATE OR REPLACE FUNCTION public.stat_monitor_enqueue()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = pg_catalog, public
+AS $$
+BEGIN
+    INSERT INTO public.stat_monitor_queue (alarm_kind, alarm_schema, min_jk_time, max_jk_time, row_count)
+    SELECT TG_ARGV[0], TG_TABLE_SCHEMA, MIN(jk_time), MAX(jk_time), COUNT(*)
+    FROM new_alarms
+    HAVING COUNT(jk_time) > 0;
+    IF FOUND THEN
+        PERFORM pg_notify('stat_alarm_new', TG_ARGV[0]);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- 汇总 pg_temp.stat_monitor_dirty 中各窗口的贡献：旧贡献从 stat_monitor_window 取出记为 -1，重新计算的记为 +1，
+-- 两者之差累加到 stat_monitor_totals，再改写统计表。口径与 compareTables.sql、compareStats.sql、summaryTables.sql 相同
+CREATE OR REPLACE FUNCTION public.stat_monitor_merge()
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    windows bigint;
+    rescan boolean;
+BEGIN
+    DROP TABLE IF EXISTS pg_temp.stat_monitor_delta;
+    CREATE TEMP TABLE stat_monitor_delta AS
+    SELECT -1 AS sign, w.*
+    FROM public.stat_monitor_window w
+        INNER JOIN stat_monitor_dirty dirty ON dirty.id = w.id;
+
+    DELETE FROM public.stat_monitor_window w
+    USING stat_monitor_dirty dirty
+    WHERE w.id = dirty.id;
+
+    INSERT INTO public.stat_monitor_window
+    SELECT
+        stand.id,
+        CASE WHEN pmd.first_jk_time IS NULL THEN 1 ELSE 0 END AS p_miss,
+        ROUND(EXTRACT(EPOCH FROM (pmd.first_rcv_jktime - pmd.first_jk_time))::numeric, 3) AS p_send_time,
+        -- S波只统计 actual_peak ≥ 40 的窗口，即 S_matched_details 中的窗口
+        CASE WHEN smd.id IS NULL THEN 0 ELSE 1 END AS s_window,
+        CASE WHEN smd.id IS NOT NULL AND smd.first_jk_time IS NULL THEN 1 ELSE 0 END AS s_miss,
+        ROUND(EXTRACT(EPOCH FROM (smd.first_rcv_jktime - smd.first_jk_time))::numeric, 3) AS s_send_time,
+        ROUND(EXTRACT(EPOCH FROM (smd.gal80_rcv_jktime - smd.gal80_jk_time))::numeric, 3) AS gal80_send_time,
+        ROUND(EXTRACT(EPOCH FROM (smd.gal120_rcv_jktime - smd.gal120_jk_time))::numeric, 3) AS gal120_send_time
+    FROM public.stand_answer stand
+        INNER JOIN stat_monitor_dirty dirty ON dirty.id = stand.id
+        LEFT JOIN public.P_matched_details pmd ON pmd.id = stand.id
+        LEFT JOIN public.S_matched_details smd ON smd.id = stand.id;
+
+    INSERT INTO stat_monitor_delta
+    SELECT 1, w.*
+    FROM public.stat_monitor_window w
+        INNER JOIN stat_monitor_dirty dirty ON dirty.id = w.id;
+    GET DIAGNOSTICS windows = ROW_COUNT;
+
+    -- 计数和求和按差值累加；被替换的旧值恰为当前最大/最小值时无法按差值得出，改为重新扫描 stat_monitor_window
+    SELECT EXISTS (
+        SELECT 1
+        FROM stat_monitor_delta d, public.stat_monitor_totals t
+        WHERE d.sign = -1
+            AND (d.p_send_time IN (t.p_send_max, t.p_send_min)
+                OR d.s_send_time IN (t.s_send_max, t.s_send_min)
+                OR d.gal80_send_time IN (t.gal80_send_max, t.gal80_send_min)
+                OR d.gal120_send_time IN (t.gal120_send_max, t.gal120_send_min))
+    ) INTO rescan;
+
+    UPDATE public.stat_monitor_totals t
+    SET
+        p_total = t.p_total + d.p_total,
+        p_miss = t.p_miss + d.p_miss,
+        p_send_count = t.p_send_count + d.p_send_count,
+        p_send_sum = t.p_send_sum + d.p_send_sum,
+        p_send_le_100ms = t.p_send_le_100ms + d.p_send_le_100ms,
+        s_total = t.s_total + d.s_total,
+        s_miss = t.s_miss + d.s_miss,
+        s_send_count = t.s_send_count + d.s_send_count,
+        s_send_sum = t.s_send_sum + d.s_send_sum,
+        s_send_lt_100ms = t.s_send_lt_100ms + d.s_send_lt_100ms,
+        gal80_send_count = t.gal80_send_count + d.gal80_send_count,
+        gal80_send_sum = t.gal80_send_sum + d.gal80_send_sum,
+        gal80_send_le_100ms = t.gal80_send_le_100ms + d.gal80_send_le_100ms,
+        gal80_send_lt_100ms = t.gal80_send_lt_100ms + d.gal80_send_lt_100ms,
+        gal120_send_count = t.gal120_send_count + d.gal120_send_count,
+        gal120_send_sum = t.gal120_send_sum + d.gal120_send_sum,
+        gal120_send_le_100ms = t.gal120_send_le_100ms + d.gal120_send_le_100ms,
+        gal120_send_lt_100ms = t.gal120_send_lt_100ms + d.gal120_send_lt_100ms,
+        p_send_max = GREATEST(t.p_send_max, d.p_send_max),
+        p_send_min = LEAST(t.p_send_min, d.p_send_min),
+        s_send_max = GREATEST(t.s_send_max, d.s_send_max),
+        s_send_min = LEAST(t.s_send_min, d.s_send_min),
+        gal80_send_max = GREATEST(t.gal80_send_max, d.gal80_send_max),
+        gal80_send_min = LEAST(t.gal80_send_min, d.gal80_send_min),
+        gal120_send_max = GREATEST(t.gal120_send_max, d.gal120_send_max),
+        gal120_send_min = LEAST(t.gal120_send_min, d.gal120_send_min),
+        updated_at = now()::timestamp
+    FROM (
+            SELECT
+                COALESCE(SUM(sign), 0) AS p_total,
+                COALESCE(SUM(sign * p_miss), 0) AS p_miss,
+                COALESCE(SUM(sign) FILTER (WHERE p_send_time IS NOT NULL), 0) AS p_send_count,
+                COALESCE(SUM(sign * p_send_time), 0) AS p_send_sum,
+                COALESCE(SUM(sign) FILTER (WHERE p_send_time <= 0.1), 0) AS p_send_le_100ms,
+                COALESCE(SUM(sign * s_window), 0) AS s_total,
+                COALESCE(SUM(sign * s_miss), 0) AS s_miss,
+                COALESCE(SUM(sign) FILTER (WHERE s_send_time IS NOT NULL), 0) AS s_send_count,
+                COALESCE(SUM(sign * s_send_time), 0) AS s_send_sum,
+                COALESCE(SUM(sign) FILTER (WHERE s_send_time < 0.1), 0) AS s_send_lt_100ms,
+                COALESCE(SUM(sign) FILTER (WHERE gal80_send_time IS NOT NULL), 0) AS gal80_send_count,
+                COALESCE(SUM(sign * gal80_send_time), 0) AS gal80_send_sum,
+                COALESCE(SUM(sign) FILTER (WHERE gal80_send_time <= 0.1), 0) AS gal80_send_le_100ms,
+                COALESCE(SUM(sign) FILTER (WHERE gal80_send_time < 0.1), 0) AS gal80_send_lt_100ms,
+                COALESCE(SUM(sign) FILTER (WHERE gal120_send_time IS NOT NULL), 0) AS gal120_send_count,
+                COALESCE(SUM(sign * gal120_send_time), 0) AS gal120_send_sum,
+                COALESCE(SUM(sign) FILTER (WHERE gal120_send_time <= 0.1), 0) AS gal120_send_le_100ms,
+                COALESCE(SUM(sign) FILTER (WHERE gal120_send_time < 0.1), 0) AS gal120_send_lt_100ms,
+                MAX(p_send_time) FILTER (WHERE sign = 1) AS p_send_max,
+                MIN(p_send_time) FILTER (WHERE sign = 1) AS p_send_min,
+                MAX(s_send_time) FILTER (WHERE sign = 1) AS s_send_max,
+                MIN(s_send_time) FILTER (WHERE sign = 1) AS s_send_min,
+                MAX(gal80_send_time) FILTER (WHERE sign = 1) AS gal80_send_max,
+                MIN(gal80_send_time) FILTER (WHERE sign = 1) AS gal80_send_min,
+                MAX(gal120_send_time) FILTER (WHERE sign = 1) AS gal120_send_max,
+                MIN(gal120_send_time) FILTER (WHERE sign = 1) AS gal120_send_min
+            FROM stat_monitor_delta
+        ) d;
+
+    IF rescan THEN
+        UPDATE public.stat_monitor_totals t
+        SET
+            p_send_max = w.p_send_max,
+            p_send_min = w.p_send_min,
+            s_send_max = w.s_send_max,
+            s_send_min = w.s_send_min,
+            gal80_send_max = w.gal80_send_max,
+            gal80_send_min = w.gal80_send_min,
+            gal120_send_max = w.gal120_send_max,
+            gal120_send_min = w.gal120_send_min
+        FROM (
+                SELECT
+                    MAX(p_send_time) AS p_send_max,
+                    MIN(p_send_time) AS p_send_min,
+                    MAX(s_send_time) AS s_send_max,
+                    MIN(s_send_time) AS s_send_min,
+                    MAX(gal80_send_time) AS gal80_send_max,
+                    MIN(gal80_send_time) AS gal80_send_min,
+                    MAX(gal120_send_time) AS gal120_send_max,
+                    MIN(gal120_send_time) AS gal120_send_min
+                FROM public.stat_monitor_window
+            ) w;
+    END IF;
+
+    DROP TABLE pg_temp.stat_monitor_delta;
+
+    -- 改写统计表，各列与 summaryTables.sql 相同
+    DELETE FROM public.P_send_time;
+    INSERT INTO public.P_send_time
+    SELECT
+        'P波预警传输时间统计≤0.1s',
+        p_total,
+        p_send_le_100ms,
+        COALESCE(ROUND(100.0 * p_send_le_100ms / NULLIF(p_total, 0), 2) || '%', 'NAN%'),
+        '≥95%',
+        CASE
+            WHEN NULLIF(p_total, 0) IS NULL THEN NULL
+            WHEN p_send_le_100ms::numeric / NULLIF(p_total, 0)::numeric >= 0.95 THEN '是'
+            ELSE '否'
+        END,
+        ROUND(p_send_max, 3),
+        ROUND(p_send_min, 3),
+        ROUND(p_send_sum / NULLIF(p_send_count, 0), 3)
+    FROM public.stat_monitor_totals;
+
+    DELETE FROM public.P_warning_miss;
+    INSERT INTO public.P_warning_miss
+    SELECT
+        'P波预警漏报',
+        p_total,
+        p_miss,
+        COALESCE(ROUND(p_miss::numeric / NULLIF(p_total, 0)::numeric * 100, 2) || '%', 'NAN%'),
+        '≤5%',
+        CASE
+            WHEN NULLIF(p_total, 0) IS NULL THEN NULL
+            WHEN p_miss::numeric / NULLIF(p_total, 0)::numeric * 100 <= 5 THEN '是'
+            ELSE '否'
+        END
+    FROM public.stat_monitor_totals;
+
+    DELETE FROM public.S_40gal_send_time;
+    INSERT INTO public.S_40gal_send_time
+    SELECT
+        '阈值报警传输时延≤0.1s(40gal)',
+        s_total,
+        s_send_lt_100ms,
+        COALESCE(ROUND(100.0 * s_send_lt_100ms / NULLIF(s_total, 0), 2) || '%', 'NAN%'),
+        '95%',
+        CASE
+            WHEN NULLIF(s_total, 0) IS NULL THEN NULL
+            WHEN s_send_lt_100ms::numeric / NULLIF(s_total, 0)::numeric >= 0.95 THEN '是'
+            ELSE '否'
+        END,
+        ROUND(s_send_sum / NULLIF(s_send_count, 0), 3),
+        s_send_max,
+        s_send_min
+    FROM public.stat_monitor_totals;
+
+    DELETE FROM public.S_80gal_send_time;
+    INSERT INTO public.S_80gal_send_time
+    SELECT
+        '阈值报警传输时延≤0.1s(80gal)',
+        gal80_send_count,
+        gal80_send_le_100ms,
+        COALESCE(ROUND(100.0 * gal80_send_lt_100ms / NULLIF(gal80_send_count, 0), 2) || '%', 'NAN%'),
+        '95%',
+        CASE
+            WHEN NULLIF(gal80_send_count, 0) IS NULL THEN NULL
+            WHEN gal80_send_le_100ms::numeric / NULLIF(gal80_send_count, 0)::numeric >= 0.95 THEN '是'
+            ELSE '否'
+        END,
+        ROUND(gal80_send_sum / NULLIF(gal80_send_count, 0), 3),
+        gal80_send_max,
+        gal80_send_min
+    FROM public.stat_monitor_totals;
+
+    DELETE FROM public.S_120gal_send_time;
+    INSERT INTO public.S_120gal_send_time
+    SELECT
+        '阈值报警传输时延≤0.1s(120gal)',
+        gal120_send_count,
+        gal120_send_le_100ms,
+        COALESCE(ROUND(100.0 * gal120_send_lt_100ms / NULLIF(gal120_send_count, 0), 2) || '%', 'NAN%'),
+        '95%',
+        CASE
+            WHEN NULLIF(gal120_send_count, 0) IS NULL THEN NULL
+            WHEN gal120_send_le_100ms::numeric / NULLIF(gal120_send_count, 0)::numeric >= 0.95 THEN '是'
+            ELSE '否'
+        END,
+        ROUND(gal120_send_sum / NULLIF(gal120_send_count, 0), 3),
+        gal120_send_max,
+        gal120_send_min
+    FROM public.stat_monitor_totals;
+
+    DELETE FROM public.S_warning_miss;
+    INSERT INTO public.S_warning_miss
+    SELECT
+        'S波预警漏报',
+        s_total,
+        s_miss,
+        COALESCE(ROUND(s_miss::numeric / NULLIF(s_total, 0)::numeric * 100, 2) || '%', 'NAN%'),
+        '≤0%',
+        CASE
+            WHEN NULLIF(s_total, 0) IS NULL THEN NULL
+            WHEN s_miss::numeric / NULLIF(s_total, 0)::numeric <= 0 THEN '是'
+            ELSE '否'
+        END
+    FROM public.stat_monitor_totals;
+
+    RETURN windows;
+END
+$$;
+
+-- 处理一批写入：取出队列中当前模式的全部记录，重新匹配与其 jk_time 范围重叠的窗口，更新累计量和统计表。
+-- 在通道 stat_monitor_updated 上通知本批的窗口数，返回 idle 或 "<写入行数> alarms, <窗口数> windows"
+CREATE OR REPLACE FUNCTION public.stat_monitor_apply()
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    state public.stat_monitor_state%ROWTYPE;
+    batch_alarms bigint;
+    batch_windows bigint;
+BEGIN
+    -- 同时只允许一个监测端处理，第二个等待前一批提交后再取队列
+    LOCK TABLE public.stat_monitor_state IN SHARE ROW EXCLUSIVE MODE;
+    SELECT * INTO state FROM public.stat_monitor_state LIMIT 1;
+    IF NOT FOUND OR state.alarm_schema IS DISTINCT FROM current_schema() THEN
+        RAISE EXCEPTION '实时监测未在模式 % 上启动，请先调用 public.stat_monitor_start()', current_schema();
+    END IF;
+
+    DROP TABLE IF EXISTS pg_temp.stat_monitor_batch;
+    CREATE TEMP TABLE stat_monitor_batch AS
+    WITH consumed AS (
+        DELETE FROM public.stat_monitor_queue
+        RETURNING *
+    )
+    SELECT * FROM consumed WHERE alarm_schema = current_schema();
+    SELECT COALESCE(SUM(row_count), 0) INTO batch_alarms FROM stat_monitor_batch;
+    IF batch_alarms = 0 THEN
+        DROP TABLE pg_temp.stat_monitor_batch;
+        RETURN 'idle';
+    END IF;
+
+    -- 新报警所在的窗口；按写入的 jk_time 范围判断，逐条或按时间顺序写入时只涉及最近的一两个窗口
+    DROP TABLE IF EXISTS pg_temp.stat_monitor_dirty;
+    CREATE TEMP TABLE stat_monitor_dirty AS
+    SELECT DISTINCT stand.id
+    FROM public.stand_answer stand
+        INNER JOIN stat_monitor_batch b ON stand.send_time <= b.max_jk_time
+        AND stand.next_send_time >= b.min_jk_time;
+
+    -- 与 incrementalWaveInfo.sql 相同的匹配，只针对上述窗口
+    DELETE FROM public.P_matched_details o
+    USING stat_monitor_dirty dirty
+    WHERE o.id = dirty.id;
+
+    DELETE FROM public.S_matched_details o
+    USING stat_monitor_dirty dirty
+    WHERE o.id = dirty.id;
+
+    INSERT INTO public.P_matched_details
+    SELECT
+        stand.id,
+        stand.send_time,
+        stand.next_send_time,
+        p_min.jk_time AS first_jk_time,
+        p_min.rcv_jktime AS first_rcv_jktime,
+        p_min.sta_code,
+        p_min.device_code,
+        p_min.source_longitude,
+        p_min.source_latitude,
+        p_min.epi_dist,
+        p_min.azi_angle,
+        p_min.earthquake_level
+    FROM public.stand_answer stand
+        INNER JOIN stat_monitor_dirty dirty ON dirty.id = stand.id
+        LEFT JOIN LATERAL (
+            SELECT
+                jk_time, rcv_jktime, sta_code, device_code, ROUND(source_longitude::numeric, 3) AS source_longitude, ROUND(source_latitude::numeric, 3) AS source_latitude, ROUND(epi_dist::numeric, 3) AS epi_dist, ROUND(azi_angle::numeric, 3) AS azi_angle, ROUND(earthquake_level::numeric, 3) AS earthquake_level
+            FROM station_p_wave_alarm p
+            WHERE
+                p.jk_time BETWEEN stand.send_time AND stand.next_send_time
+            ORDER BY jk_time ASC
+            LIMIT 1
+        ) p_min ON TRUE
+    ORDER BY stand.id;
+
+    INSERT INTO public.S_matched_details
+    SELECT
+        stand.id,
+        stand.send_time,
+        stand.next_send_time,
+        s_agg.*
+    FROM
+        public.stand_answer stand
+        INNER JOIN stat_monitor_dirty dirty ON dirty.id = stand.id
+        LEFT JOIN LATERAL (
+            SELECT
+                MIN(s.jk_time) AS first_jk_time,
+                (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time))[1] AS first_rcv_jktime,
+                MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 80) AS gal80_jk_time,
+                (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 80))[1] AS gal80_rcv_jktime,
+                MIN(s.jk_time) FILTER (WHERE s.x_acc_value >= 120) AS gal120_jk_time,
+                (ARRAY_AGG(s.rcv_jktime ORDER BY s.jk_time) FILTER (WHERE s.x_acc_value >= 120))[1] AS gal120_rcv_jktime,
+                (ARRAY_AGG(s.sta_code ORDER BY s.jk_time))[1] AS sta_code,
+                (ARRAY_AGG(s.device_code ORDER BY s.jk_time))[1] AS device_code,
+                ROUND(MAX(s.x_acc_value)::NUMERIC, 3) AS wave_peak
+            FROM station_s_wave_alarm s
+            WHERE
+                s.jk_time BETWEEN stand.send_time AND stand.next_send_time
+        ) s_agg ON TRUE
+    WHERE
+        stand.actual_peak >= 40
+    ORDER BY stand.id;
+
+    batch_windows := public.stat_monitor_merge();
+
+    UPDATE public.stat_monitor_state
+    SET
+        batches = batches + 1,
+        alarms = alarms + batch_alarms,
+        last_batch_at = now()::timestamp;
+
+    DROP TABLE pg_temp.stat_monitor_batch;
+    DROP TABLE pg_temp.stat_monitor_dirty;
+    PERFORM pg_notify('stat_monitor_updated', batch_windows::text);
+    RETURN batch_alarms || ' alarms, ' || batch_windows || ' windows';
+END
+$$;
+
+-- 在当前模式的两张报警表上安装触发器，由现有的匹配结果重建各窗口的贡献和累计量，
+-- 上次查询之后（stat_watermark 之后）写入的报警作为第一批立即处理。重复调用即重新开始
+CREATE OR REPLACE FUNCTION public.stat_monitor_start()
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    p_mark timestamp;
+    p_total bigint;
+    s_mark timestamp;
+    s_total bigint;
+BEGIN
+    -- 事务模式的查询不在 public 下保留中间表，监测需要普通模式查询留下的匹配结果和水位线
+    IF to_regclass('public.stat_watermark') IS NULL OR to_regclass('public.P_matched_details') IS NULL
+        OR to_regclass('public.S_matched_details') IS NULL OR to_regclass('public.P_send_time') IS NULL THEN
+        RAISE EXCEPTION '尚未生成统计结果，请先执行一次查询';
+    END IF;
+    SELECT p_jk_time, p_count, s_jk_time, s_count INTO p_mark, p_total, s_mark, s_total
+    FROM public.stat_watermark
+    WHERE alarm_schema = current_schema();
+    IF NOT FOUND THEN
+        RAISE EXCEPTION '统计结果不是由模式 % 生成的，请先执行一次查询', current_schema();
+    END IF;
+    PERFORM public.stat_monitor_stop();
+
+    EXECUTE format('DROP TRIGGER IF EXISTS stat_monitor_enqueue ON %I.station_p_wave_alarm', current_schema());
+    EXECUTE format('DROP TRIGGER IF EXISTS stat_monitor_enqueue ON %I.station_s_wave_alarm', current_schema());
+    EXECUTE format('CREATE TRIGGER stat_monitor_enqueue AFTER INSERT ON %I.station_p_wave_alarm '
+        'REFERENCING NEW TABLE AS new_alarms FOR EACH STATEMENT EXECUTE FUNCTION public.stat_monitor_enqueue(%L)',
+        current_schema(), 'p');
+    EXECUTE format('CREATE TRIGGER stat_monitor_enqueue AFTER INSERT ON %I.station_s_wave_alarm '
+        'REFERENCING NEW TABLE AS new_alarms FOR EACH STATEMENT EXECUTE FUNCTION public.stat_monitor_enqueue(%L)',
+        current_schema(), 's');
+    INSERT INTO public.stat_monitor_state VALUES (current_schema(), now()::timestamp, 0, 0, NULL);
+
+    -- 上次查询之后写入的报警；水位线以内的报警被补录或删除时（与 StatFromDB::canRunIncremental 的检查相同），
+    -- 无法确定变化的窗口，全部报警作为第一批
+    IF (SELECT COUNT(jk_time) FROM station_p_wave_alarm WHERE jk_time <= p_mark) <> p_total THEN
+        p_mark := NULL;
+    END IF;
+    IF (SELECT COUNT(jk_time) FROM station_s_wave_alarm WHERE jk_time <= s_mark) <> s_total THEN
+        s_mark := NULL;
+    END IF;
+    INSERT INTO public.stat_monitor_queue (alarm_kind, alarm_schema, min_jk_time, max_jk_time, row_count)
+    SELECT 'p', current_schema(), MIN(jk_time), MAX(jk_time), COUNT(*)
+    FROM station_p_wave_alarm
+    WHERE jk_time > COALESCE(p_mark, '-infinity')
+    HAVING COUNT(*) > 0
+    UNION ALL
+    SELECT 's', current_schema(), MIN(jk_time), MAX(jk_time), COUNT(*)
+    FROM station_s_wave_alarm
+    WHERE jk_time > COALESCE(s_mark, '-infinity')
+    HAVING COUNT(*) > 0;
+
+    DROP TABLE IF EXISTS public.stat_monitor_window;
+    CREATE TABLE public.stat_monitor_window (
+        id integer PRIMARY KEY,
+        p_miss integer,
+        p_send_time numeric,
+        s_window integer,
+        s_miss integer,
+        s_send_time numeric,
+        gal80_send_time numeric,
+        gal120_send_time numeric
+    );
+
+    DROP TABLE IF EXISTS public.stat_monitor_totals;
+    CREATE TABLE public.stat_monitor_totals AS
+    SELECT
+        0::bigint AS p_total, 0::bigint AS p_miss,
+        0::bigint AS p_send_count, 0::numeric AS p_send_sum, 0::bigint AS p_send_le_100ms,
+        NULL::numeric AS p_send_max, NULL::numeric AS p_send_min,
+        0::bigint AS s_total, 0::bigint AS s_miss,
+        0::bigint AS s_send_count, 0::numeric AS s_send_sum, 0::bigint AS s_send_lt_100ms,
+        NULL::numeric AS s_send_max, NULL::numeric AS s_send_min,
+        0::bigint AS gal80_send_count, 0::numeric AS gal80_send_sum,
+        0::bigint AS gal80_send_le_100ms, 0::bigint AS gal80_send_lt_100ms,
+        NULL::numeric AS gal80_send_max, NULL::numeric AS gal80_send_min,
+        0::bigint AS gal120_send_count, 0::numeric AS gal120_send_sum,
+        0::bigint AS gal120_send_le_100ms, 0::bigint AS gal120_send_lt_100ms,
+        NULL::numeric AS gal120_send_max, NULL::numeric AS gal120_send_min,
+        now()::timestamp AS updated_at;
+
+    -- 全部窗口按现有匹配结果计入累计量
+    DROP TABLE IF EXISTS pg_temp.stat_monitor_dirty;
+    CREATE TEMP TABLE stat_monitor_dirty AS
+    SELECT id FROM public.stand_answer;
+    PERFORM public.stat_monitor_merge();
+    DROP TABLE pg_temp.stat_monitor_dirty;
+
+    RETURN public.stat_monitor_apply();
+END
+$$;
+
+-- 删除触发器并清空队列，统计表保持监测停止时的结果
+CREATE OR REPLACE FUNCTION public.stat_monitor_stop()
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    state public.stat_monitor_state%ROWTYPE;
+BEGIN
+    FOR state IN SELECT * FROM public.stat_monitor_state LOOP
+        IF to_regclass(format('%I.station_p_wave_alarm', state.alarm_schema)) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS stat_monitor_enqueue ON %I.station_p_wave_alarm', state.alarm_schema);
+        END IF;
+        IF to_regclass(format('%I.station_s_wave_alarm', state.alarm_schema)) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS stat_monitor_enqueue ON %I.station_s_wave_alarm', state.alarm_schema);
+        END IF;
+    END LOOP;
+    DELETE FROM public.stat_monitor_state;
+    DELETE FROM public.stat_monitor_queue;
+    RETURN 'stopped';
+END
+$$;
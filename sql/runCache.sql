@@ -0,0 +1,180 @@
+-- 运行缓存：标准答案文件内容、报警表所在模式和两张报警表的状态都没有变化时，直接取上次的统计结果，不再重新导入和统计
+-- 指纹 = md5(统计SQL版本 | 标准答案文件sha256 | 模式 | P波报警最大jk_time和增删改计数 | S波报警最大jk_time和增删改计数)
+-- 增删改计数取自 pg_stat_user_tables 的 n_tup_ins/n_tup_upd/n_tup_del（分区表为各分区之和），不扫描报警表；
+-- 计数由各会话定期上报，刚提交的修改可能数秒后才计入，统计信息被重置（pg_stat_reset）后不再命中
+-- public.stat_answer_source 由 InsertStandAnswerToDb.py 在导入成功后写入
+CREATE TABLE IF NOT EXISTS public.stat_answer_source (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    file_sha256 text NOT NULL,
+    file_name text,
+    row_count bigint,
+    imported_at timestamp
+);
+
+-- summary 按表名保存 ExportResultToExcel.py 导出的16张统计表的全部行；
+-- run_tables 为一并保存的匹配结果、对比结果、水位线和数据明细，副本在 stat_run_cache_tables 模式下，表名为 <指纹>_<表名>
+CREATE TABLE IF NOT EXISTS public.stat_run_cache (
+    fingerprint text PRIMARY KEY,
+    sql_version text,
+    answer_sha256 text,
+    alarm_schema text,
+    p_changes text,
+    p_max_jk_time timestamp,
+    s_changes text,
+    s_max_jk_time timestamp,
+    summary jsonb NOT NULL,
+    run_tables text[],
+    created_at timestamp NOT NULL DEFAULT now(),
+    last_used_at timestamp NOT NULL DEFAULT now()
+);
+
+-- 早期版本建立的缓存表没有以下列，其中的记录不含数据明细等表，不再命中
+ALTER TABLE public.stat_run_cache ADD COLUMN IF NOT EXISTS p_changes text;
+ALTER TABLE public.stat_run_cache ADD COLUMN IF NOT EXISTS s_changes text;
+ALTER TABLE public.stat_run_cache ADD COLUMN IF NOT EXISTS run_tables text[];
+
+CREATE SCHEMA IF NOT EXISTS stat_run_cache_tables;
+
+-- 命中时除统计表外一并恢复的表：实时监测、增量统计、数据明细浏览和运行历史都读取这些表
+CREATE OR REPLACE FUNCTION public.stat_run_cache_run_tables()
+RETURNS text[]
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT ARRAY['stand_answer', 'p_matched_details', 's_matched_details', 'stat_watermark',
+        'p_compare_result', 's_compare_result', 'p_compare_stats', 's_compare_stats', 'details'];
+$$;
+
+-- 报警表（分区表为其各分区）自统计信息重置以来的插入/更新/删除行数；pg_partition_tree 对普通表不返回行
+CREATE OR REPLACE FUNCTION public.stat_alarm_changes(alarm_table text)
+RETURNS text
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT concat_ws('/', SUM(pg_stat_get_tuples_inserted(t.relid)), SUM(pg_stat_get_tuples_updated(t.relid)),
+        SUM(pg_stat_get_tuples_deleted(t.relid)))
+    FROM (
+        SELECT to_regclass(alarm_table) AS relid
+        UNION
+        SELECT relid FROM pg_partition_tree(to_regclass(alarm_table))
+    ) t;
+$$;
+
+-- 按当前 search_path 下的报警表计算指纹，尚未通过脚本导入标准答案时返回 NULL
+CREATE OR REPLACE FUNCTION public.stat_run_fingerprint(sql_version text)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    answer text;
+    p_max timestamp;
+    s_max timestamp;
+BEGIN
+    SELECT file_sha256 INTO answer FROM public.stat_answer_source;
+    IF answer IS NULL THEN
+        RETURN NULL;
+    END IF;
+    -- 按 jk_time 索引只读取最大值（见 CreateAlarmIndexes.py）
+    SELECT MAX(jk_time) INTO p_max FROM station_p_wave_alarm;
+    SELECT MAX(jk_time) INTO s_max FROM station_s_wave_alarm;
+    RETURN md5(concat_ws('|', sql_version, answer, current_schema(),
+        public.stat_alarm_changes('station_p_wave_alarm'), p_max,
+        public.stat_alarm_changes('station_s_wave_alarm'), s_max));
+END;
+$$;
+
+-- 统计完成后保存统计表、匹配结果和数据明细，并按保存天数和条数淘汰旧记录。
+-- 事务模式下中间表为会话临时表，优先从 pg_temp 复制
+CREATE OR REPLACE FUNCTION public.stat_run_cache_save(sql_version text, max_entries integer DEFAULT 20, max_age_days integer DEFAULT 30)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    run_fingerprint text := public.stat_run_fingerprint(sql_version);
+    snapshot jsonb := '{}';
+    table_rows jsonb;
+    table_name text;
+    source regclass;
+    evicted record;
+BEGIN
+    IF run_fingerprint IS NULL THEN
+        RETURN NULL;
+    END IF;
+    FOREACH table_name IN ARRAY public.stat_run_cache_run_tables() LOOP
+        IF COALESCE(to_regclass('pg_temp.' || table_name), to_regclass('public.' || table_name)) IS NULL THEN
+            RAISE NOTICE '% 不存在，本次结果不写入运行缓存', table_name;
+            RETURN NULL;
+        END IF;
+    END LOOP;
+    FOREACH table_name IN ARRAY ARRAY[
+        'p_send_time', 'p_epicenter_deviation', 'p_judge_time', 'p_mag_deviation', 'p_warning_miss',
+        's_40gal_send_time', 's_80gal_send_time', 's_120gal_send_time', 's_warning_miss', 's_alarm_before_p',
+        's_40gal_judge_time', 's_80gal_judge_time', 's_120gal_judge_time', 's_peak_deviation',
+        'latency_percentiles', 'latency_histogram'
+    ] LOOP
+        EXECUTE format('SELECT COALESCE(jsonb_agg(to_jsonb(t)), ''[]'') FROM public.%I t', table_name) INTO table_rows;
+        snapshot := snapshot || jsonb_build_object(table_name, table_rows);
+    END LOOP;
+    FOREACH table_name IN ARRAY public.stat_run_cache_run_tables() LOOP
+        source := COALESCE(to_regclass('pg_temp.' || table_name), to_regclass('public.' || table_name));
+        EXECUTE format('DROP TABLE IF EXISTS stat_run_cache_tables.%I', run_fingerprint || '_' || table_name);
+        EXECUTE format('CREATE TABLE stat_run_cache_tables.%I AS TABLE %s', run_fingerprint || '_' || table_name, source);
+    END LOOP;
+
+    INSERT INTO public.stat_run_cache (fingerprint, sql_version, answer_sha256, alarm_schema,
+        p_changes, p_max_jk_time, s_changes, s_max_jk_time, summary, run_tables)
+    SELECT run_fingerprint, sql_version, a.file_sha256, current_schema(),
+        public.stat_alarm_changes('station_p_wave_alarm'), (SELECT MAX(jk_time) FROM station_p_wave_alarm),
+        public.stat_alarm_changes('station_s_wave_alarm'), (SELECT MAX(jk_time) FROM station_s_wave_alarm),
+        snapshot, public.stat_run_cache_run_tables()
+    FROM public.stat_answer_source a
+    ON CONFLICT (fingerprint) DO UPDATE
+    SET summary = EXCLUDED.summary, run_tables = EXCLUDED.run_tables, created_at = now(), last_used_at = now();
+
+    FOR evicted IN
+        DELETE FROM public.stat_run_cache
+        WHERE last_used_at < now() - make_interval(days => max_age_days)
+            OR fingerprint IN (
+                SELECT c.fingerprint FROM public.stat_run_cache c
+                ORDER BY c.last_used_at DESC
+                OFFSET max_entries
+            )
+        RETURNING fingerprint, run_tables
+    LOOP
+        FOREACH table_name IN ARRAY COALESCE(evicted.run_tables, '{}') LOOP
+            EXECUTE format('DROP TABLE IF EXISTS stat_run_cache_tables.%I', evicted.fingerprint || '_' || table_name);
+        END LOOP;
+    END LOOP;
+    RETURN run_fingerprint;
+END;
+$$;
+
+-- 命中时用缓存的行覆盖 public 下的统计表，并用保存的副本重建匹配结果、对比结果、水位线和数据明细，返回是否命中。
+-- 重建的数据明细没有浏览用的索引，由数据明细浏览窗口补建
+CREATE OR REPLACE FUNCTION public.stat_run_cache_restore(run_fingerprint text)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    cached jsonb;
+    saved_tables text[];
+    table_name text;
+BEGIN
+    UPDATE public.stat_run_cache SET last_used_at = now()
+    WHERE fingerprint = run_fingerprint AND run_tables IS NOT NULL
+    RETURNING summary, run_tables INTO cached, saved_tables;
+    IF cached IS NULL THEN
+        RETURN false;
+    END IF;
+    FOREACH table_name IN ARRAY saved_tables LOOP
+        EXECUTE format('DROP TABLE IF EXISTS public.%I', table_name);
+        EXECUTE format('CREATE TABLE public.%I AS TABLE stat_run_cache_tables.%I', table_name, run_fingerprint || '_' || table_name);
+    END LOOP;
+    FOR table_name IN SELECT jsonb_object_keys(cached) LOOP
+        EXECUTE format('DELETE FROM public.%I', table_name);
+        EXECUTE format('INSERT INTO public.%1$I SELECT * FROM jsonb_populate_recordset(NULL::public.%1$I, $1)', table_name)
+        USING cached -> table_name;
+    END LOOP;
+    RETURN true;
+END;
+$$;
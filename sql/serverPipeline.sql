@@ -0,0 +1,107 @@
+-- 服务端执行统计SQL：各阶段的语句按变体（全量/增量、事务模式、运行缓存）保存在 public.stat_pipeline_statement 中，
+-- 查询时调用 public.stat_run_pipeline(变体, 报警表所在模式, 失败时是否停止, 阶段)，不再逐条语句往返：
+-- 事务模式一次调用执行全部阶段；非事务模式每个阶段调用一次、各自提交，结果表上的锁只持续到该阶段结束。
+-- 语句由客户端按 SqlPipelineWorker::splitStatements 拆分后通过 public.stat_pipeline_install 写入，
+-- version 为本文件和各阶段语句的 md5，与客户端计算的版本不同时重新写入；sql_md5 为写入时各语句的 md5，
+-- 语句被改动或行数不全时视为未写入，执行前也逐条核对
+CREATE TABLE IF NOT EXISTS public.stat_pipeline_statement (
+    variant text NOT NULL,
+    seq integer NOT NULL,
+    version text NOT NULL,
+    stage text NOT NULL,
+    statement_index integer NOT NULL,
+    label text NOT NULL,
+    sql text NOT NULL,
+    sql_md5 text,
+    PRIMARY KEY (variant, seq)
+);
+
+ALTER TABLE public.stat_pipeline_statement ADD COLUMN IF NOT EXISTS sql_md5 text;
+
+-- 变体已写入的版本；尚未写入，或有语句与写入时不同、行数不全、版本不一致时返回 NULL
+CREATE OR REPLACE FUNCTION public.stat_pipeline_version(pipeline_variant text)
+RETURNS text
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT CASE
+        WHEN COUNT(*) = MAX(seq) AND COUNT(DISTINCT version) = 1 AND bool_and(md5(sql) IS NOT DISTINCT FROM sql_md5)
+        THEN MIN(version)
+    END
+    FROM public.stat_pipeline_statement
+    WHERE variant = pipeline_variant;
+$$;
+
+-- statements 为 [{"stage": 阶段, "index": 阶段内序号, "label": 首行, "sql": 语句}, ...]，按数组顺序执行；返回写入的语句数
+CREATE OR REPLACE FUNCTION public.stat_pipeline_install(pipeline_variant text, pipeline_version text, statements jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    installed integer;
+BEGIN
+    DELETE FROM public.stat_pipeline_statement WHERE variant = pipeline_variant;
+    INSERT INTO public.stat_pipeline_statement (variant, seq, version, stage, statement_index, label, sql, sql_md5)
+    SELECT pipeline_variant, s.seq, pipeline_version, s.item->>'stage', (s.item->>'index')::integer,
+        s.item->>'label', s.item->>'sql', md5(s.item->>'sql')
+    FROM jsonb_array_elements(statements) WITH ORDINALITY AS s(item, seq);
+    GET DIAGNOSTICS installed = ROW_COUNT;
+    RETURN installed;
+END;
+$$;
+
+-- 早期版本的 stat_run_pipeline 没有 pipeline_stage 参数，保留会使三个参数的调用不唯一
+DROP FUNCTION IF EXISTS public.stat_run_pipeline(text, text, boolean);
+
+-- 在调用方的事务中依次执行变体的语句（pipeline_stage 为 NULL 时为全部阶段，否则只执行该阶段），每条语句一行执行记录，
+-- 与 SqlPipeline.py 的 run_stages 相同：单条语句失败时只回滚该语句并记录错误，stop_on_error 为 false 时继续执行后续语句，
+-- 为 true 时停止（事务模式由调用方回滚）。
+-- search_path 只在本事务内切换到报警表所在模式；取消查询（pg_cancel_backend）不被捕获，整个调用随之中止
+CREATE OR REPLACE FUNCTION public.stat_run_pipeline(pipeline_variant text, alarm_schema text, stop_on_error boolean DEFAULT false,
+    pipeline_stage text DEFAULT NULL)
+RETURNS TABLE (stage text, statement_index integer, label text, elapsed_ms bigint, rows_affected bigint, ok boolean, error text)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    item record;
+    started timestamptz;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM public.stat_pipeline_statement s WHERE s.variant = pipeline_variant) THEN
+        RAISE EXCEPTION '统计语句 % 尚未写入，请先调用 public.stat_pipeline_install()', pipeline_variant;
+    END IF;
+    IF EXISTS (
+        SELECT 1 FROM public.stat_pipeline_statement s
+        WHERE s.variant = pipeline_variant AND md5(s.sql) IS DISTINCT FROM s.sql_md5
+    ) THEN
+        RAISE EXCEPTION '统计语句 % 与写入时不同，请重新调用 public.stat_pipeline_install()', pipeline_variant;
+    END IF;
+    PERFORM set_config('search_path',
+        CASE WHEN alarm_schema = 'public' THEN 'public' ELSE quote_ident(alarm_schema) || ', public' END, true);
+    FOR item IN
+        SELECT s.stage, s.statement_index, s.label, s.sql
+        FROM public.stat_pipeline_statement s
+        WHERE s.variant = pipeline_variant AND (pipeline_stage IS NULL OR s.stage = pipeline_stage)
+        ORDER BY s.seq
+    LOOP
+        stage := item.stage;
+        statement_index := item.statement_index;
+        label := item.label;
+        started := clock_timestamp();
+        BEGIN
+            EXECUTE item.sql;
+            GET DIAGNOSTICS rows_affected = ROW_COUNT;
+            ok := true;
+            error := NULL;
+        EXCEPTION WHEN OTHERS THEN
+            rows_affected := -1;
+            ok := false;
+            error := SQLERRM;
+        END;
+        elapsed_ms := (extract(epoch FROM clock_timestamp() - started) * 1000)::bigint;
+        RETURN NEXT;
+        IF NOT ok AND stop_on_error THEN
+            RETURN;
+        END IF;
+    END LOOP;
+END;
+$$;
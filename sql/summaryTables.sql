@@ -1,34 +1,30 @@
+--统计表：对比结果的计数、极值由 compareStats.sql 一次扫描汇总到 p_compare_stats / s_compare_stats，这里只负责计算比率、判定是否达标
+
 --P波传输时延
 DROP TABLE IF EXISTS public.P_send_time;
 
 CREATE TABLE public.P_send_time AS
 SELECT
     'P波预警传输时间统计≤0.1s' AS "项目",
-    count(*) AS "总数",
-    count(*) FILTER (
-        where p_send_time <= 0.1
-    ) as "合格数",
+    total AS "总数",
+    send_le_100ms as "合格数",
     COALESCE(
         ROUND(
-            100.0 * count(*) FILTER (
-                where p_send_time <= 0.1
-            ) / NULLIF(count(*), 0),
+            100.0 * send_le_100ms / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥95%' AS "标准",
     CASE
-        WHEN NULLIF(count(*), 0) IS NULL THEN NULL
-        WHEN count(*) FILTER (
-            where p_send_time <= 0.1
-        )::numeric / NULLIF(count(*), 0)::numeric >= 0.95 THEN '是'
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
+        WHEN send_le_100ms::numeric / NULLIF(total, 0)::numeric >= 0.95 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    round(max(p_send_time), 3) AS "最大值",
-    round(min(p_send_time), 3) AS "最小值",
-    round(avg(p_send_time), 3) AS "平均值"
-FROM public.p_compare_result;
+    round(send_max, 3) AS "最大值",
+    round(send_min, 3) AS "最小值",
+    round(send_avg, 3) AS "平均值"
+FROM public.p_compare_stats;
 
 --P波预警震中位置偏差
 DROP TABLE IF EXISTS public.P_epicenter_deviation;
@@ -36,51 +32,47 @@ DROP TABLE IF EXISTS public.P_epicenter_deviation;
 CREATE TABLE public.P_epicenter_deviation AS
 SELECT
     'P波预警震中位置偏差' AS "项目",
-    COUNT(*) AS "总数",
-    SUM(
-        CASE WHEN epicenter_deviation_km <= 60 THEN 1 ELSE 0 END
-    ) AS "偏差≤60km组数",
+    total AS "总数",
+    epicenter_le_60km AS "偏差≤60km组数",
     COALESCE(
         ROUND(
-            100.0 * SUM(CASE WHEN epicenter_deviation_km <= 60 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0),
+            100.0 * epicenter_le_60km / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "偏差≤60km占比",
     '≥60%' AS "偏差≤60km占比标准",
     CASE
-        WHEN NULLIF(COUNT(*), 0) IS NULL THEN NULL
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
         WHEN ROUND(
-            100.0 * SUM(CASE WHEN epicenter_deviation_km <= 60 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0),
+            100.0 * epicenter_le_60km / NULLIF(total, 0),
             2
         ) >= 60 THEN '是'
         ELSE '否'
     END AS "是否达标(60km)",
-    SUM(
-        CASE WHEN epicenter_deviation_km <= 100 THEN 1 ELSE 0 END
-    ) AS "偏差≤100km组数",
+    epicenter_le_100km AS "偏差≤100km组数",
     COALESCE(
         ROUND(
-            100.0 * SUM(CASE WHEN epicenter_deviation_km <= 100 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0),
+            100.0 * epicenter_le_100km / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "偏差≤100km占比",
     '≥80%' AS "偏差≤100km占比标准",
     CASE
-        WHEN NULLIF(COUNT(*), 0) IS NULL THEN NULL
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
         WHEN ROUND(
-            100.0 * SUM(CASE WHEN epicenter_deviation_km <= 100 THEN 1 ELSE 0 END) / NULLIF(COUNT(*), 0),
+            100.0 * epicenter_le_100km / NULLIF(total, 0),
             2
         ) >= 80 THEN '是'
         ELSE '否'
     END AS "是否达标(100km)",
-    MAX(epicenter_deviation_km) AS "偏差最大值",
+    epicenter_max AS "偏差最大值",
     CASE
-        WHEN MAX(epicenter_deviation_km) <= 300 THEN '是'
+        WHEN epicenter_max <= 300 THEN '是'
         ELSE '否'
     END AS "最大值不超过300km"
-FROM public.p_compare_result;
+FROM public.p_compare_stats;
 
 --P波预警首报判别时间≤3s
 DROP TABLE IF EXISTS public.P_judge_time;
@@ -88,29 +80,23 @@ DROP TABLE IF EXISTS public.P_judge_time;
 CREATE TABLE public.P_judge_time AS
 SELECT
     '台站首报P波预警判别时间≤3秒' AS "项目",
-    COUNT(*) AS "总数",
-    COUNT(*) FILTER (
-        WHERE p_wave_judge_time_sta <= 3
-    ) AS "合格数",
+    total AS "总数",
+    judge_le_3s AS "合格数",
     COALESCE(
         ROUND(
-            COUNT(*) FILTER (
-                WHERE p_wave_judge_time_sta <= 3
-            )::numeric / NULLIF(COUNT(*), 0)::numeric * 100,
+            judge_le_3s::numeric / NULLIF(total, 0)::numeric * 100,
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥90%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(*), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE p_wave_judge_time_sta <= 3
-        )::numeric / NULLIF(COUNT(*), 0)::numeric >= 0.9 THEN '是'
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
+        WHEN judge_le_3s::numeric / NULLIF(total, 0)::numeric >= 0.9 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(p_wave_judge_time_sta), 3) AS "平均值"
-FROM public.p_compare_result;
+    ROUND(judge_avg, 3) AS "平均值"
+FROM public.p_compare_stats;
 
 --P波预警震级偏差≤1
 DROP TABLE IF EXISTS public.P_mag_deviation;
@@ -118,32 +104,26 @@ DROP TABLE IF EXISTS public.P_mag_deviation;
 CREATE TABLE public.P_mag_deviation AS
 SELECT
     'P波预警震级偏差≤1' AS "项目",
-    count(*) AS "总数",
-    count(*) FILTER (
-        where magnitude_diff <= 1
-    ) as "合格数",
+    total AS "总数",
+    mag_le_1 as "合格数",
     COALESCE(
         ROUND(
-            100.0 * count(*) FILTER (
-                where magnitude_diff <= 1
-            ) / NULLIF(count(*), 0),
+            100.0 * mag_le_1 / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥95%' AS "标准",
     CASE
-        WHEN NULLIF(count(*), 0) IS NULL THEN NULL
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
         WHEN ROUND(
-            100.0 * count(*) FILTER (
-                where magnitude_diff <= 1
-            ) / NULLIF(count(*), 0),
+            100.0 * mag_le_1 / NULLIF(total, 0),
             2
         ) >= 50 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(magnitude_diff), 3) AS "偏差平均值"
-FROM public.p_compare_result;
+    ROUND(mag_avg, 3) AS "偏差平均值"
+FROM public.p_compare_stats;
 
 --P波预警漏报
 DROP TABLE IF EXISTS public.P_warning_miss;
@@ -190,31 +170,25 @@ DROP TABLE IF EXISTS public.S_40gal_send_time;
 CREATE TABLE public.S_40gal_send_time AS
 SELECT
     '阈值报警传输时延≤0.1s(40gal)' AS "项目",
-    COUNT(*) AS "总数",
-    COUNT(*) FILTER (
-        WHERE s_send_time < 0.1
-    ) AS "合格数",
+    total AS "总数",
+    send_lt_100ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE s_send_time < 0.1
-            ) / NULLIF(COUNT(*), 0),
+            100.0 * send_lt_100ms / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '95%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(*), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE s_send_time < 0.1
-        )::numeric / NULLIF(COUNT(*), 0)::numeric >= 0.95 THEN '是'
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
+        WHEN send_lt_100ms::numeric / NULLIF(total, 0)::numeric >= 0.95 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(s_send_time)::NUMERIC, 3) AS "平均值",
-    MAX(s_send_time) AS "最大值",
-    MIN(s_send_time) AS "最小值"
-FROM public.s_compare_result;
+    ROUND(send_avg::NUMERIC, 3) AS "平均值",
+    send_max AS "最大值",
+    send_min AS "最小值"
+FROM public.s_compare_stats;
 
 --阈值报警传输时延≤0.1s(80gal)
 DROP TABLE IF EXISTS public.S_80gal_send_time;
@@ -222,32 +196,25 @@ DROP TABLE IF EXISTS public.S_80gal_send_time;
 CREATE TABLE public.S_80gal_send_time AS
 SELECT
     '阈值报警传输时延≤0.1s(80gal)' AS "项目",
-    COUNT(gal80_send_time) AS "总数",
-    COUNT(*) FILTER (
-        WHERE gal80_send_time <= 0.1
-    ) AS "合格数",
+    gal80_send_count AS "总数",
+    gal80_send_le_100ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE gal80_send_time < 0.1
-            ) / NULLIF(COUNT(gal80_send_time), 0),
+            100.0 * gal80_send_lt_100ms / NULLIF(gal80_send_count, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '95%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(gal80_send_time), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE gal80_send_time <= 0.1
-        )::numeric / NULLIF(COUNT(gal80_send_time), 0)::numeric >= 0.95 THEN '是'
+        WHEN NULLIF(gal80_send_count, 0) IS NULL THEN NULL
+        WHEN gal80_send_le_100ms::numeric / NULLIF(gal80_send_count, 0)::numeric >= 0.95 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(gal80_send_time)::numeric, 3) AS "平均值",
-    MAX(gal80_send_time) AS "最大值",
-    MIN(gal80_send_time) AS "最小值"
-FROM public.s_compare_result
-WHERE gal80_send_time IS NOT NULL;
+    ROUND(gal80_send_avg::numeric, 3) AS "平均值",
+    gal80_send_max AS "最大值",
+    gal80_send_min AS "最小值"
+FROM public.s_compare_stats;
 
 --阈值报警传输时延≤0.1s(120gal)
 DROP TABLE IF EXISTS public.S_120gal_send_time;
@@ -255,32 +222,25 @@ DROP TABLE IF EXISTS public.S_120gal_send_time;
 CREATE TABLE public.S_120gal_send_time AS
 SELECT
     '阈值报警传输时延≤0.1s(120gal)' AS "项目",
-    COUNT(gal120_send_time) AS "总数",
-    COUNT(*) FILTER (
-        WHERE gal120_send_time <= 0.1
-    ) AS "合格数",
+    gal120_send_count AS "总数",
+    gal120_send_le_100ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE gal120_send_time < 0.1
-            ) / NULLIF(COUNT(gal120_send_time), 0),
+            100.0 * gal120_send_lt_100ms / NULLIF(gal120_send_count, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '95%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(gal120_send_time), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE gal120_send_time <= 0.1
-        )::numeric / NULLIF(COUNT(gal120_send_time), 0)::numeric >= 0.95 THEN '是'
+        WHEN NULLIF(gal120_send_count, 0) IS NULL THEN NULL
+        WHEN gal120_send_le_100ms::numeric / NULLIF(gal120_send_count, 0)::numeric >= 0.95 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(gal120_send_time)::numeric, 3) AS "平均值",
-    MAX(gal120_send_time) AS "最大值",
-    MIN(gal120_send_time) AS "最小值"
-FROM public.s_compare_result
-WHERE gal120_send_time IS NOT NULL;
+    ROUND(gal120_send_avg::numeric, 3) AS "平均值",
+    gal120_send_max AS "最大值",
+    gal120_send_min AS "最小值"
+FROM public.s_compare_stats;
 
 --阈值报警漏报
 DROP TABLE IF EXISTS public.S_warning_miss;
@@ -365,31 +325,25 @@ DROP TABLE IF EXISTS public.S_40gal_judge_time;
 CREATE TABLE public.S_40gal_judge_time AS
 SELECT
     '阈值报警判别时延≤0.5s(40gal)' AS "项目",
-    COUNT(*) as "总数",
-    COUNT(*) FILTER (
-        WHERE swave_judge_time_station <= 0.5
-    ) AS "合格数",
+    total as "总数",
+    judge_le_500ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE swave_judge_time_station <= 0.5
-            ) / NULLIF(COUNT(*), 0),
+            100.0 * judge_le_500ms / NULLIF(total, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥70%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(*), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE swave_judge_time_station <= 0.5
-        )::numeric / NULLIF(COUNT(*), 0)::numeric >= 0.7 THEN '是'
+        WHEN NULLIF(total, 0) IS NULL THEN NULL
+        WHEN judge_le_500ms::numeric / NULLIF(total, 0)::numeric >= 0.7 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(swave_judge_time_station), 3) AS "平均值",
-    MAX(swave_judge_time_station) as "最大值",
-    MIN(swave_judge_time_station) as "最小值"
-FROM public.s_compare_result;
+    ROUND(judge_avg, 3) AS "平均值",
+    judge_max as "最大值",
+    judge_min as "最小值"
+FROM public.s_compare_stats;
 
 --阈值报警判别时延≤0.5s(80gal)
 DROP TABLE IF EXISTS public.S_80gal_judge_time;
@@ -397,61 +351,109 @@ DROP TABLE IF EXISTS public.S_80gal_judge_time;
 CREATE TABLE public.S_80gal_judge_time AS
 SELECT
     '阈值报警判别时延≤0.5s(80gal)' AS "项目",
-    COUNT(gal80_judge_time_station) as "总数",
-    COUNT(*) FILTER (
-        WHERE gal80_judge_time_station <= 0.5
-    ) AS "合格数",
+    gal80_judge_count as "总数",
+    gal80_judge_le_500ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE gal80_judge_time_station <= 0.5
-            ) / NULLIF(COUNT(gal80_judge_time_station), 0),
+            100.0 * gal80_judge_le_500ms / NULLIF(gal80_judge_count, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥70%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(gal80_judge_time_station), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE gal80_judge_time_station <= 0.5
-        )::numeric / NULLIF(COUNT(gal80_judge_time_station), 0)::numeric >= 0.7 THEN '是'
+        WHEN NULLIF(gal80_judge_count, 0) IS NULL THEN NULL
+        WHEN gal80_judge_le_500ms::numeric / NULLIF(gal80_judge_count, 0)::numeric >= 0.7 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(gal80_judge_time_station), 3) AS "平均值",
-    MAX(gal80_judge_time_station) as "最大值",
-    MIN(gal80_judge_time_station) as "最小值"
-FROM public.s_compare_result
-WHERE gal80_judge_time_station IS NOT NULL;
+    ROUND(gal80_judge_avg, 3) AS "平均值",
+    gal80_judge_max as "最大值",
+    gal80_judge_min as "最小值"
+FROM public.s_compare_stats;
 
 DROP TABLE IF EXISTS public.S_120gal_judge_time;
 
 CREATE TABLE public.S_120gal_judge_time AS
 SELECT
     '阈值报警判别时延≤0.5s(120gal)' AS "项目",
-    COUNT(gal120_judge_time_station) as "总数",
-    COUNT(*) FILTER (
-        WHERE gal120_judge_time_station <= 0.5
-    ) AS "合格数",
+    gal120_judge_count as "总数",
+    gal120_judge_le_500ms AS "合格数",
     COALESCE(
         ROUND(
-            100.0 * COUNT(*) FILTER (
-                WHERE gal120_judge_time_station <= 0.5
-            ) / NULLIF(COUNT(gal120_judge_time_station), 0),
+            100.0 * gal120_judge_le_500ms / NULLIF(gal120_judge_count, 0),
             2
         ) || '%',
         'NAN%'
     ) AS "合格率",
     '≥70%' AS "标准",
     CASE
-        WHEN NULLIF(COUNT(gal120_judge_time_station), 0) IS NULL THEN NULL
-        WHEN COUNT(*) FILTER (
-            WHERE gal120_judge_time_station <= 0.5
-        )::numeric / NULLIF(COUNT(gal120_judge_time_station), 0)::numeric >= 0.7 THEN '是'
+        WHEN NULLIF(gal120_judge_count, 0) IS NULL THEN NULL
+        WHEN gal120_judge_le_500ms::numeric / NULLIF(gal120_judge_count, 0)::numeric >= 0.7 THEN '是'
         ELSE '否'
     END AS "是否达标",
-    ROUND(AVG(gal120_judge_time_station), 3) AS "平均值",
-    MAX(gal120_judge_time_station) as "最大值",
-    MIN(gal120_judge_time_station) as "最小值"
-FROM public.s_compare_result
-WHERE gal120_judge_time_station IS NOT NULL;
\ No newline at end of file
+    ROUND(gal120_judge_avg, 3) AS "平均值",
+    gal120_judge_max as "最大值",
+    gal120_judge_min as "最小值"
+FROM public.s_compare_stats;
+
+--时延分位数：P50/P95/P99 由 compareStats.sql 在汇总时一并计算（取实际出现的值）
+DROP TABLE IF EXISTS public.latency_percentiles;
+
+CREATE TABLE public.latency_percentiles AS
+SELECT
+    '时延分位数' AS "项目",
+    v.指标 AS "指标",
+    v.样本数 AS "样本数",
+    v.分位数[1] AS "P50",
+    v.分位数[2] AS "P95",
+    v.分位数[3] AS "P99",
+    v.最大值 AS "最大值"
+FROM public.p_compare_stats p
+    CROSS JOIN public.s_compare_stats s
+    CROSS JOIN LATERAL (VALUES
+        (1, 'P波预警传输时延', p.send_count, p.send_pct, p.send_max),
+        (2, 'P波预警首报判别时间', p.judge_count, p.judge_pct, p.judge_max),
+        (3, '阈值报警传输时延(40gal)', s.send_count, s.send_pct, s.send_max),
+        (4, '阈值报警传输时延(80gal)', s.gal80_send_count, s.gal80_send_pct, s.gal80_send_max),
+        (5, '阈值报警传输时延(120gal)', s.gal120_send_count, s.gal120_send_pct, s.gal120_send_max),
+        (6, '阈值报警判别时延(40gal)', s.judge_count, s.judge_pct, s.judge_max),
+        (7, '阈值报警判别时延(80gal)', s.gal80_judge_count, s.gal80_judge_pct, s.gal80_judge_max),
+        (8, '阈值报警判别时延(120gal)', s.gal120_judge_count, s.gal120_judge_pct, s.gal120_judge_max)
+    ) AS v(序号, 指标, 样本数, 分位数, 最大值)
+ORDER BY v.序号;
+
+--时延分布直方图：区间上限和累计个数由 compareStats.sql 在汇总时一并计算，这里相减得到各区间个数，不再扫描对比结果表
+DROP TABLE IF EXISTS public.latency_histogram;
+
+CREATE TABLE public.latency_histogram AS
+SELECT
+    '时延分布直方图' AS "项目",
+    m.指标 AS "指标",
+    b.i AS "序号",
+    CASE
+        WHEN b.i = 1 THEN '≤' || m.上限[1] || 's'
+        WHEN b.i > cardinality(m.上限) THEN '>' || m.上限[b.i - 1] || 's'
+        ELSE '(' || m.上限[b.i - 1] || ', ' || m.上限[b.i] || ']s'
+    END AS "区间",
+    COALESCE(m.累计[b.i], m.样本数) - COALESCE(m.累计[b.i - 1], 0) AS "数量",
+    COALESCE(
+        ROUND(
+            100.0 * (COALESCE(m.累计[b.i], m.样本数) - COALESCE(m.累计[b.i - 1], 0)) / NULLIF(m.样本数, 0),
+            2
+        ) || '%',
+        'NAN%'
+    ) AS "占比"
+FROM public.p_compare_stats p
+    CROSS JOIN public.s_compare_stats s
+    CROSS JOIN LATERAL (VALUES
+        (1, 'P波预警传输时延', p.send_bounds, p.send_le, p.send_count),
+        (2, 'P波预警首报判别时间', p.judge_bounds, p.judge_le, p.judge_count),
+        (3, '阈值报警传输时延(40gal)', s.send_bounds, s.send_le, s.send_count),
+        (4, '阈值报警传输时延(80gal)', s.gal80_send_bounds, s.gal80_send_le, s.gal80_send_count),
+        (5, '阈值报警传输时延(120gal)', s.gal120_send_bounds, s.gal120_send_le, s.gal120_send_count),
+        (6, '阈值报警判别时延(40gal)', s.judge_bounds, s.judge_le, s.judge_count),
+        (7, '阈值报警判别时延(80gal)', s.gal80_judge_bounds, s.gal80_judge_le, s.gal80_judge_count),
+        (8, '阈值报警判别时延(120gal)', s.gal120_judge_bounds, s.gal120_judge_le, s.gal120_judge_count)
+    ) AS m(指标序号, 指标, 上限, 累计, 样本数)
+    CROSS JOIN LATERAL generate_series(1, cardinality(m.上限) + 1) AS b(i)
+ORDER BY m.指标序号, b.i;
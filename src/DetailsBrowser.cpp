@@ -0,0 +1,498 @@
+#include "DetailsBrowser.h"
+#include "SqlPipelineWorker.h"
+#include <QApplication>
+#include <QCheckBox>
+#include <QComboBox>
+#include <QDateTime>
+#include <QDebug>
+#include <QElapsedTimer>
+#include <QHBoxLayout>
+#include <QHeaderView>
+#include <QIntValidator>
+#include <QLabel>
+#include <QLineEdit>
+#include <QPushButton>
+#include <QRegularExpression>
+#include <QSettings>
+#include <QSignalBlocker>
+#include <QSqlDatabase>
+#include <QSqlError>
+#include <QSqlQuery>
+#include <QTableView>
+#include <QVBoxLayout>
+
+// 每行前面额外读取的分页键：实验编号、波形编号、排序列，均转为文本
+static const int keyColumns = 3;
+
+// 与 sql/detailsIndexes.sql 中的索引一一对应，未建索引的列不提供排序
+static const QList<DetailsSortKey> sortKeys = {
+    { "实验编号, 波形编号", "" },
+    { "波形发送时间", "波形发送时间" },
+    { "震中偏差(km)", "震中偏差(km)" },
+    { "震级偏差", "震级偏差" },
+    { "峰值偏差百分比", "峰值偏差百分比" },
+    { "P波预警首报传输时间(s)", "P波预警首报传输时间(s)" },
+    { "阈值报警首报传输时间(s)", "阈值报警首报传输时间(s)" },
+};
+
+// 漏报过滤：(显示名, 列, 值)，列上有 (列, 实验编号, 波形编号) 索引
+struct DetailsMissFilter
+{
+    QString title;
+    QString column;
+    QString value;
+};
+static const QList<DetailsMissFilter> missFilters = {
+    { "漏报P波", "漏报P波", "1" },
+    { "S波先于P波报警", "漏报P波", "xs_hp" },
+    { "漏报S波", "漏报S波", "1" },
+};
+
+static QString quoted(const QString& identifier)
+{
+    return "\"" + QString(identifier).replace("\"", "\"\"") + "\"";
+}
+
+static QString castParameter(const QString& type)
+{
+    return QString("CAST(? AS %1)").arg(type);
+}
+
+DetailsPageModel::DetailsPageModel(QObject* parent)
+    : QAbstractTableModel(parent)
+{
+}
+
+bool DetailsPageModel::loadColumns(QString& error)
+{
+    beginResetModel();
+    names.clear();
+    types.clear();
+    rows.clear();
+    exhausted = true;
+    QSqlQuery query;
+    if (!query.exec("SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = to_regclass('public.details') AND attnum > 0 AND NOT attisdropped ORDER BY attnum")) {
+        error = query.lastError().text();
+    }
+    while (query.next()) {
+        names << query.value(0).toString();
+        types << query.value(1).toString();
+    }
+    endResetModel();
+    if (names.isEmpty() && error.isEmpty()) {
+        error = "数据明细表 public.details 不存在，请先执行查询";
+    }
+    return !names.isEmpty();
+}
+
+QStringList DetailsPageModel::columnNames() const
+{
+    return names;
+}
+
+//列名按不区分大小写查找（SQL 中未加引号的别名如 漏报P波 在表中为 漏报p波），找不到时返回空
+QString DetailsPageModel::columnType(const QString& column) const
+{
+    for (int i = 0; i < names.size(); ++i) {
+        if (names[i].compare(column, Qt::CaseInsensitive) == 0) {
+            return types[i];
+        }
+    }
+    return QString();
+}
+
+void DetailsPageModel::setPageSize(int size)
+{
+    pageSize = qMax(size, 1);
+}
+
+bool DetailsPageModel::isExhausted() const
+{
+    return exhausted;
+}
+
+void DetailsPageModel::setQuery(const QString& newCondition, const QVariantList& values, const QString& newSortColumn, bool newDescending)
+{
+    QElapsedTimer timer;
+    timer.start();
+    beginResetModel();
+    condition = newCondition;
+    conditionValues = values;
+    sortColumn = newSortColumn;
+    descending = newDescending;
+    segment = 0;
+    hasKey = false;
+    lastKeyRows = 0;
+    exhausted = names.isEmpty();
+    rows.clear();
+    QString error;
+    QVector<QVector<QVariant>> page;
+    bool ok = fetchPage(page, pageSize, error);
+    rows = page;
+    if (!ok) {
+        exhausted = true;
+    }
+    endResetModel();
+    emit pageFetched(static_cast<int>(rows.size()), timer.elapsed(), error);
+}
+
+//从上一页最后一行的位置开始：(列...) >= (值...) 由索引直接定位。
+//分页键可能重复（标准答案中同一实验编号、波形编号出现多次），因此不用 >，而是跳过已读取的同键行；
+//再加 ctid 条件区分同键行会让估算的行数过小，执行计划改为全表扫描
+QString DetailsPageModel::keysetCondition(bool withSortColumn, QVariantList& values) const
+{
+    QStringList columns;
+    QStringList parameters;
+    if (withSortColumn) {
+        columns << "d." + quoted(sortColumn);
+        parameters << castParameter(columnType(sortColumn));
+        values << lastSortValue;
+    }
+    columns << "d.实验编号" << "d.波形编号";
+    parameters << castParameter(columnType("实验编号")) << castParameter(columnType("波形编号"));
+    values << lastTestId << lastWaveformId;
+    return QString("(%1) %2 (%3)").arg(columns.join(", "), descending ? "<=" : ">=", parameters.join(", "));
+}
+
+bool DetailsPageModel::fetchPage(QVector<QVector<QVariant>>& page, int limit, QString& error)
+{
+    QSqlDatabase db = QSqlDatabase::database();
+    const QString order = descending ? " DESC" : "";
+    while (page.size() < limit && !exhausted) {
+        QStringList where;
+        QVariantList values;
+        if (!condition.isEmpty()) {
+            where << "(" + condition + ")";
+            values << conditionValues;
+        }
+        QStringList orderBy;
+        bool nullSegment = false;
+        if (!sortColumn.isEmpty()) {
+            // 排序列为空的行在索引中排在最后，升序时作为第二段、降序时作为第一段读取
+            nullSegment = (segment == 0) == descending;
+            where << "d." + quoted(sortColumn) + (nullSegment ? " IS NULL" : " IS NOT NULL");
+            // 空值段也按排序列排序，执行计划才会沿 (排序列, 实验编号, 波形编号) 索引顺序读取
+            orderBy << "d." + quoted(sortColumn) + order;
+        }
+        orderBy << "d.实验编号" + order << "d.波形编号" + order << "d.ctid" + order;
+        int skip = 0;
+        if (hasKey) {
+            where << keysetCondition(!sortColumn.isEmpty() && !nullSegment, values);
+            skip = lastKeyRows;
+        }
+        int requested = limit - static_cast<int>(page.size());
+        QString sql = QString("SELECT CAST(d.实验编号 AS text), CAST(d.波形编号 AS text), %1, d.* "
+            "FROM public.details d%2 ORDER BY %3 LIMIT %4")
+            .arg(sortColumn.isEmpty() ? "NULL" : "CAST(d." + quoted(sortColumn) + " AS text)")
+            .arg(where.isEmpty() ? "" : " WHERE " + where.join(" AND "))
+            .arg(orderBy.join(", "))
+            .arg(requested + skip);
+
+        // 查询正在重建数据明细时不等待表锁，提示稍后刷新
+        db.transaction();
+        QSqlQuery query(db);
+        query.setForwardOnly(true);
+        query.exec("SET LOCAL lock_timeout = '1s'");
+        query.prepare(sql);
+        for (const QVariant& value : values) {
+            query.addBindValue(value);
+        }
+        if (!query.exec()) {
+            error = query.lastError().text();
+            qDebug() << "数据明细分页查询失败: " << error << sql;
+            db.rollback();
+            return false;
+        }
+        int fetched = 0;
+        while (query.next()) {
+            // 同键的行按 ctid 排序，已读取的排在前面
+            if (skip > 0) {
+                --skip;
+                continue;
+            }
+            QVector<QVariant> row;
+            row.reserve(names.size());
+            for (int i = 0; i < names.size(); ++i) {
+                row << query.value(keyColumns + i);
+            }
+            page << row;
+            QString testId = query.value(0).toString();
+            QString waveformId = query.value(1).toString();
+            QString sortValue = query.value(2).toString();
+            bool sameKey = hasKey && testId == lastTestId && waveformId == lastWaveformId && sortValue == lastSortValue;
+            lastKeyRows = sameKey ? lastKeyRows + 1 : 1;
+            lastTestId = testId;
+            lastWaveformId = waveformId;
+            lastSortValue = sortValue;
+            hasKey = true;
+            ++fetched;
+        }
+        db.commit();
+        if (fetched < requested) {
+            if (!sortColumn.isEmpty() && segment == 0) {
+                segment = 1;
+                hasKey = false;
+                lastKeyRows = 0;
+            }
+            else {
+                exhausted = true;
+            }
+        }
+    }
+    return true;
+}
+
+int DetailsPageModel::rowCount(const QModelIndex& parent) const
+{
+    return parent.isValid() ? 0 : static_cast<int>(rows.size());
+}
+
+int DetailsPageModel::columnCount(const QModelIndex& parent) const
+{
+    return parent.isValid() ? 0 : static_cast<int>(names.size());
+}
+
+QVariant DetailsPageModel::data(const QModelIndex& index, int role) const
+{
+    if (!index.isValid() || index.row() >= rows.size()) {
+        return QVariant();
+    }
+    const QVariant& value = rows[index.row()][index.column()];
+    if (role == Qt::DisplayRole) {
+        if (value.metaType().id() == QMetaType::QDateTime) {
+            return value.toDateTime().toString("yyyy-MM-dd HH:mm:ss.zzz");
+        }
+        return value;
+    }
+    if (role == Qt::TextAlignmentRole) {
+        bool numeric = false;
+        value.toString().toDouble(&numeric);
+        return static_cast<int>(Qt::AlignVCenter | (numeric ? Qt::AlignRight : Qt::AlignLeft));
+    }
+    return QVariant();
+}
+
+QVariant DetailsPageModel::headerData(int section, Qt::Orientation orientation, int role) const
+{
+    if (role != Qt::DisplayRole) {
+        return QVariant();
+    }
+    if (orientation == Qt::Horizontal) {
+        return section < names.size() ? QVariant(names[section]) : QVariant();
+    }
+    return section + 1;
+}
+
+bool DetailsPageModel::canFetchMore(const QModelIndex& parent) const
+{
+    return !parent.isValid() && !exhausted;
+}
+
+void DetailsPageModel::fetchMore(const QModelIndex& parent)
+{
+    if (parent.isValid() || exhausted) {
+        return;
+    }
+    QElapsedTimer timer;
+    timer.start();
+    QString error;
+    QVector<QVector<QVariant>> page;
+    bool ok = fetchPage(page, pageSize, error);
+    if (!ok) {
+        exhausted = true;
+    }
+    if (!page.isEmpty()) {
+        beginInsertRows(QModelIndex(), static_cast<int>(rows.size()), static_cast<int>(rows.size() + page.size() - 1));
+        rows << page;
+        endInsertRows();
+    }
+    emit pageFetched(static_cast<int>(rows.size()), timer.elapsed(), error);
+}
+
+DetailsBrowser::DetailsBrowser(QWidget* parent)
+    : QDialog(parent)
+{
+    setWindowTitle("数据明细");
+    resize(1280, 720);
+
+    model = new DetailsPageModel(this);
+    QSettings settings("config.ini", QSettings::IniFormat);
+    model->setPageSize(settings.value("details/page_size", 200).toInt());
+
+    missComboBox = new QComboBox(this);
+    missComboBox->addItem("全部");
+    for (const DetailsMissFilter& filter : missFilters) {
+        missComboBox->addItem(filter.title);
+    }
+    testIdEdit = new QLineEdit(this);
+    testIdEdit->setPlaceholderText("全部");
+    testIdEdit->setValidator(new QIntValidator(testIdEdit));
+    testIdEdit->setMaximumWidth(100);
+    conditionColumnComboBox = new QComboBox(this);
+    conditionOpComboBox = new QComboBox(this);
+    conditionOpComboBox->addItems({ ">", ">=", "<", "<=", "=" });
+    conditionValueEdit = new QLineEdit(this);
+    conditionValueEdit->setMaximumWidth(160);
+    sortComboBox = new QComboBox(this);
+    descendingCheckBox = new QCheckBox("降序", this);
+    QPushButton* applyButton = new QPushButton("查询", this);
+    QPushButton* refreshButton = new QPushButton("刷新", this);
+
+    QHBoxLayout* filterLayout = new QHBoxLayout;
+    filterLayout->addWidget(new QLabel("漏报:", this));
+    filterLayout->addWidget(missComboBox);
+    filterLayout->addWidget(new QLabel("实验编号:", this));
+    filterLayout->addWidget(testIdEdit);
+    filterLayout->addWidget(new QLabel("条件:", this));
+    filterLayout->addWidget(conditionColumnComboBox);
+    filterLayout->addWidget(conditionOpComboBox);
+    filterLayout->addWidget(conditionValueEdit);
+    filterLayout->addWidget(new QLabel("排序:", this));
+    filterLayout->addWidget(sortComboBox);
+    filterLayout->addWidget(descendingCheckBox);
+    filterLayout->addWidget(applyButton);
+    filterLayout->addWidget(refreshButton);
+    filterLayout->addStretch();
+
+    view = new QTableView(this);
+    view->setModel(model);
+    view->setSelectionBehavior(QAbstractItemView::SelectRows);
+    view->setEditTriggers(QAbstractItemView::NoEditTriggers);
+    view->verticalHeader()->setDefaultSectionSize(22);
+    statusLabel = new QLabel(this);
+
+    QVBoxLayout* layout = new QVBoxLayout(this);
+    layout->addLayout(filterLayout);
+    layout->addWidget(view);
+    layout->addWidget(statusLabel);
+
+    connect(applyButton, &QPushButton::clicked, this, &DetailsBrowser::applyQuery);
+    connect(refreshButton, &QPushButton::clicked, this, &DetailsBrowser::reload);
+    connect(testIdEdit, &QLineEdit::returnPressed, this, &DetailsBrowser::applyQuery);
+    connect(conditionValueEdit, &QLineEdit::returnPressed, this, &DetailsBrowser::applyQuery);
+    connect(missComboBox, &QComboBox::currentIndexChanged, this, &DetailsBrowser::applyQuery);
+    connect(sortComboBox, &QComboBox::currentIndexChanged, this, &DetailsBrowser::applyQuery);
+    connect(descendingCheckBox, &QCheckBox::toggled, this, &DetailsBrowser::applyQuery);
+    connect(model, &DetailsPageModel::pageFetched, this, &DetailsBrowser::onPageFetched);
+}
+
+//数据明细由旧版本生成或在事务模式下发布时没有浏览用的索引，打开前补建（已存在时跳过）
+bool DetailsBrowser::ensureIndexes(QString& error)
+{
+    QStringList statements;
+    if (!SqlPipelineWorker::loadStatements(":/StatFromDB/sql/detailsIndexes.sql", statements)) {
+        error = "无法读取 detailsIndexes.sql";
+        return false;
+    }
+    static const QRegularExpression createIndex("^\\s*CREATE\\s+INDEX",
+        QRegularExpression::CaseInsensitiveOption | QRegularExpression::MultilineOption);
+    QSqlQuery query;
+    if (!query.exec("SELECT count(*) FROM pg_indexes WHERE schemaname = 'public' AND tablename = 'details'") || !query.next()) {
+        error = query.lastError().text();
+        return false;
+    }
+    if (query.value(0).toInt() >= statements.filter(createIndex).size()) {
+        return true;
+    }
+    statusLabel->setText("正在为数据明细创建索引...");
+    QApplication::setOverrideCursor(Qt::WaitCursor);
+    QElapsedTimer timer;
+    timer.start();
+    for (const QString& statement : statements) {
+        if (!query.exec(statement)) {
+            error = query.lastError().text();
+            QApplication::restoreOverrideCursor();
+            return false;
+        }
+    }
+    QApplication::restoreOverrideCursor();
+    qDebug() << "数据明细索引已创建，耗时" << timer.elapsed() << "ms";
+    return true;
+}
+
+void DetailsBrowser::reload()
+{
+    QString error;
+    if (!model->loadColumns(error) || !ensureIndexes(error)) {
+        statusLabel->setText("无法读取数据明细: " + error);
+        return;
+    }
+
+    // 重建条件列和排序列的选项，保留当前选择
+    QString conditionColumn = conditionColumnComboBox->currentText();
+    QString sortTitle = sortComboBox->currentText();
+    {
+        QSignalBlocker conditionBlocker(conditionColumnComboBox);
+        QSignalBlocker sortBlocker(sortComboBox);
+        conditionColumnComboBox->clear();
+        conditionColumnComboBox->addItem("（无）");
+        for (const QString& column : model->columnNames()) {
+            QString type = model->columnType(column);
+            if (!type.startsWith("character") && type != "text") {
+                conditionColumnComboBox->addItem(column);
+            }
+        }
+        sortComboBox->clear();
+        for (const DetailsSortKey& key : sortKeys) {
+            if (key.column.isEmpty() || !model->columnType(key.column).isEmpty()) {
+                sortComboBox->addItem(key.title, key.column);
+            }
+        }
+        conditionColumnComboBox->setCurrentIndex(qMax(0, conditionColumnComboBox->findText(conditionColumn)));
+        sortComboBox->setCurrentIndex(qMax(0, sortComboBox->findText(sortTitle)));
+    }
+    applyQuery();
+}
+
+void DetailsBrowser::applyQuery()
+{
+    QStringList conditions;
+    QVariantList values;
+    QStringList columns = model->columnNames();
+    // 按表中的实际列名引用（不区分大小写匹配）
+    auto column = [&columns](const QString& name) {
+        for (const QString& actual : columns) {
+            if (actual.compare(name, Qt::CaseInsensitive) == 0) {
+                return "d." + quoted(actual);
+            }
+        }
+        return "d." + quoted(name);
+    };
+    int miss = missComboBox->currentIndex() - 1;
+    if (miss >= 0 && miss < missFilters.size()) {
+        conditions << column(missFilters[miss].column) + " = ?";
+        values << missFilters[miss].value;
+    }
+    if (!testIdEdit->text().trimmed().isEmpty()) {
+        conditions << column("实验编号") + " = " + castParameter(model->columnType("实验编号"));
+        values << testIdEdit->text().trimmed();
+    }
+    QString conditionColumn = conditionColumnComboBox->currentIndex() > 0 ? conditionColumnComboBox->currentText() : QString();
+    QString conditionValue = conditionValueEdit->text().trimmed();
+    if (!conditionColumn.isEmpty() && !conditionValue.isEmpty()) {
+        conditions << QString("%1 %2 %3").arg(column(conditionColumn), conditionOpComboBox->currentText(),
+            castParameter(model->columnType(conditionColumn)));
+        values << conditionValue;
+    }
+    QString sortColumn = sortComboBox->currentData().toString();
+    for (const QString& actual : columns) {
+        if (!sortColumn.isEmpty() && actual.compare(sortColumn, Qt::CaseInsensitive) == 0) {
+            sortColumn = actual;
+        }
+    }
+    model->setQuery(conditions.join(" AND "), values, sortColumn, descendingCheckBox->isChecked());
+    view->scrollToTop();
+}
+
+void DetailsBrowser::onPageFetched(int rows, qint64 elapsedMs, const QString& error)
+{
+    if (!error.isEmpty()) {
+        statusLabel->setText(QString("读取失败（数据明细可能正在重建，请稍后刷新）: %1").arg(error));
+        return;
+    }
+    statusLabel->setText(QString("已加载 %1 行%2，本页耗时 %3 ms")
+        .arg(rows)
+        .arg(model->isExhausted() ? "（已全部加载）" : "，滚动到底部继续加载")
+        .arg(elapsedMs));
+}
@@ -0,0 +1,100 @@
+#pragma once
+#include <QAbstractTableModel>
+#include <QDialog>
+#include <QString>
+#include <QStringList>
+#include <QVariant>
+#include <QVector>
+
+class QCheckBox;
+class QComboBox;
+class QLabel;
+class QLineEdit;
+class QTableView;
+
+// 可排序的列及其索引见 sql/detailsIndexes.sql，每个索引都是 (排序列, 实验编号, 波形编号)
+struct DetailsSortKey
+{
+    QString title;
+    QString column;     // 为空时按 (实验编号, 波形编号) 排序
+};
+
+// public.details 的分页模型：按 (排序列, 实验编号, 波形编号) 键集分页，
+// 每页从上一页最后一行的位置开始在索引上读取，与已加载的行数无关；视图滚动到底部时由 fetchMore 取下一页
+class DetailsPageModel : public QAbstractTableModel
+{
+    Q_OBJECT
+
+public:
+    explicit DetailsPageModel(QObject* parent = nullptr);
+
+    // 从系统表读取 public.details 的列名和类型，数据明细不存在时返回 false
+    bool loadColumns(QString& error);
+    QStringList columnNames() const;
+    QString columnType(const QString& column) const;
+    // condition 为 WHERE 条件（参数用 ? 占位，值在 values 中），sortColumn 为空时按分页键排序；设置后重新读取第一页
+    void setQuery(const QString& condition, const QVariantList& values, const QString& sortColumn, bool descending);
+    void setPageSize(int size);
+    bool isExhausted() const;
+
+    int rowCount(const QModelIndex& parent = QModelIndex()) const override;
+    int columnCount(const QModelIndex& parent = QModelIndex()) const override;
+    QVariant data(const QModelIndex& index, int role = Qt::DisplayRole) const override;
+    QVariant headerData(int section, Qt::Orientation orientation, int role = Qt::DisplayRole) const override;
+    bool canFetchMore(const QModelIndex& parent) const override;
+    void fetchMore(const QModelIndex& parent) override;
+
+signals:
+    void pageFetched(int rows, qint64 elapsedMs, const QString& error);
+
+private:
+    bool fetchPage(QVector<QVector<QVariant>>& page, int limit, QString& error);
+    QString keysetCondition(bool withSortColumn, QVariantList& values) const;
+
+    QStringList names;
+    QStringList types;
+    QString condition;
+    QVariantList conditionValues;
+    QString sortColumn;
+    bool descending = false;
+    int pageSize = 200;
+    // 按排序列排序时分两段读取：升序先读排序列非空的行、再读为空的行，降序相反，与索引正向/反向扫描的顺序一致
+    int segment = 0;
+    bool exhausted = true;
+    bool hasKey = false;
+    QString lastSortValue;  // 上一页最后一行的排序列、实验编号和波形编号，均为文本，绑定时按列类型转换
+    QString lastTestId;
+    QString lastWaveformId;
+    int lastKeyRows = 0;    // 已读取的行中分页键与最后一行相同的行数，下一页从该键开始读取时跳过这些行
+    QVector<QVector<QVariant>> rows;
+};
+
+// 数据明细浏览窗口：服务端过滤和排序，按页读取，不必导出整张表
+class DetailsBrowser : public QDialog
+{
+    Q_OBJECT
+
+public:
+    explicit DetailsBrowser(QWidget* parent = nullptr);
+
+    // 数据明细重建后调用：补建缺少的索引，重新读取列和第一页
+    void reload();
+
+private slots:
+    void applyQuery();
+    void onPageFetched(int rows, qint64 elapsedMs, const QString& error);
+
+private:
+    bool ensureIndexes(QString& error);
+
+    DetailsPageModel* model = nullptr;
+    QTableView* view = nullptr;
+    QComboBox* missComboBox = nullptr;
+    QLineEdit* testIdEdit = nullptr;
+    QComboBox* conditionColumnComboBox = nullptr;
+    QComboBox* conditionOpComboBox = nullptr;
+    QLineEdit* conditionValueEdit = nullptr;
+    QComboBox* sortComboBox = nullptr;
+    QCheckBox* descendingCheckBox = nullptr;
+    QLabel* statusLabel = nullptr;
+};
@@ -0,0 +1,561 @@
+#include "SqlPipelineWorker.h"
+#include <QCryptographicHash>
+#include <QDebug>
+#include <QDir>
+#include <QElapsedTimer>
+#include <QFile>
+#include <QJsonArray>
+#include <QJsonDocument>
+#include <QMutexLocker>
+#include <QRegularExpression>
+#include <QSqlError>
+#include <QSqlQuery>
+#include <QTextStream>
+#include <QThreadPool>
+#include <algorithm>
+
+static QSqlDatabase addConnection(const SqlConnectionInfo& info, const QString& name)
+{
+    QSqlDatabase db = QSqlDatabase::addDatabase("QPSQL", name);
+    db.setHostName(info.host);
+    db.setPort(info.port);
+    db.setDatabaseName(info.dbName);
+    db.setUserName(info.user);
+    db.setPassword(info.password);
+    db.setConnectOptions("client_encoding=UTF8");
+    return db;
+}
+
+SqlPipelineWorker::SqlPipelineWorker(const SqlConnectionInfo& info, const QList<SqlStage>& stages, QObject* parent)
+    : QObject(parent), info(info), stages(stages)
+{
+    for (const SqlStage& stage : stages) {
+        total += static_cast<int>(stage.statements.size());
+    }
+}
+
+//按分号拆分SQL文件中的语句；字符串、带引号的标识符、注释和 $tag$ 函数体作为整体跳过，其中的分号不拆分
+QStringList SqlPipelineWorker::splitStatements(const QString& sql)
+{
+    static const QRegularExpression token(
+        R"('[^']*'|"[^"]*"|--[^\n]*|/\*.*?\*/|(\$(?:[A-Za-z_]\w*)?\$).*?\1|;)",
+        QRegularExpression::DotMatchesEverythingOption);
+    QStringList pieces;
+    qsizetype start = 0;
+    QRegularExpressionMatchIterator it = token.globalMatch(sql);
+    while (it.hasNext()) {
+        QRegularExpressionMatch match = it.next();
+        if (match.captured() == ";") {
+            pieces << sql.mid(start, match.capturedStart() - start);
+            start = match.capturedEnd();
+        }
+    }
+    pieces << sql.mid(start);
+
+    QStringList statements;
+    for (const QString& piece : pieces) {
+        QString trimmed = piece.trimmed();
+        // 只含注释的片段不作为语句执行
+        if (!statementLabel(trimmed).isEmpty()) {
+            statements << trimmed;
+        }
+    }
+    return statements;
+}
+
+bool SqlPipelineWorker::loadStatements(const QString& path, QStringList& statements)
+{
+    QFile file(path);
+    if (!file.open(QIODevice::ReadOnly | QIODevice::Text)) {
+        qDebug() << "错误,无法打开SQL文件:" << file.fileName();
+        return false;
+    }
+    QTextStream in(&file);
+    statements = splitStatements(in.readAll());
+    file.close();
+    return true;
+}
+
+//取语句中第一行非注释内容，用于界面显示
+QString SqlPipelineWorker::statementLabel(const QString& statement)
+{
+    for (const QString& line : statement.split('\n')) {
+        QString trimmed = line.trimmed();
+        if (trimmed.isEmpty() || trimmed.startsWith("--")) {
+            continue;
+        }
+        return trimmed.length() > 60 ? trimmed.left(60) + "..." : trimmed;
+    }
+    return QString();
+}
+
+int SqlPipelineWorker::statementCount() const
+{
+    return total;
+}
+
+void SqlPipelineWorker::setProfiling(bool explainAnalyze, const QString& reportDir)
+{
+    profiling = true;
+    this->explainAnalyze = explainAnalyze;
+    this->reportDir = reportDir;
+}
+
+void SqlPipelineWorker::setTransactional(bool transactional)
+{
+    this->transactional = transactional;
+}
+
+void SqlPipelineWorker::setServerSide(const QString& variant)
+{
+    serverVariant = variant;
+}
+
+//只有查询、增删改和 CREATE TABLE ... AS 能放在 EXPLAIN ANALYZE 中执行，DROP/ALTER 等照常执行
+bool SqlPipelineWorker::isExplainable(const QString& statement)
+{
+    QStringList lines;
+    for (const QString& line : statement.split('\n')) {
+        QString trimmed = line.trimmed();
+        if (!trimmed.isEmpty() && !trimmed.startsWith("--")) {
+            lines << trimmed;
+        }
+    }
+    static const QRegularExpression pattern(
+        "^(SELECT|INSERT|UPDATE|DELETE|WITH|VALUES)\\b"
+        "|^CREATE\\s+((TEMP|TEMPORARY|UNLOGGED)\\s+)?TABLE\\s+[^(\\s]+\\s+AS\\b",
+        QRegularExpression::CaseInsensitiveOption);
+    return pattern.match(lines.join(' ')).hasMatch();
+}
+
+bool SqlPipelineWorker::openConnection(const QString& name, int& backendPid)
+{
+    {
+        QSqlDatabase db = addConnection(info, name);
+        if (db.open()) {
+            QSqlQuery query(db);
+            query.exec(QString("SET search_path TO %1").arg(info.searchPath));
+            backendPid = 0;
+            if (query.exec("SELECT pg_backend_pid()") && query.next()) {
+                backendPid = query.value(0).toInt();
+            }
+            QMutexLocker locker(&pidMutex);
+            activePids.insert(backendPid);
+            return true;
+        }
+        qDebug() << "工作线程连接数据库失败:" << db.lastError().text();
+    }
+    QSqlDatabase::removeDatabase(name);
+    return false;
+}
+
+void SqlPipelineWorker::closeConnection(const QString& name, int backendPid)
+{
+    {
+        QMutexLocker locker(&pidMutex);
+        activePids.remove(backendPid);
+    }
+    {
+        QSqlDatabase db = QSqlDatabase::database(name, false);
+        db.close();
+    }
+    QSqlDatabase::removeDatabase(name);
+}
+
+bool SqlPipelineWorker::runStatements(const QString& connectionName, const QString& stageName, const QStringList& statements, int firstIndex)
+{
+    QSqlDatabase db = QSqlDatabase::database(connectionName, false);
+    QSqlQuery query(db);
+    bool ok = true;
+    int index = firstIndex;
+    for (const QString& statement : statements) {
+        if (canceled) {
+            break;
+        }
+        StatementProfile profile;
+        profile.stage = stageName;
+        profile.index = index++;
+        profile.label = statementLabel(statement);
+        profile.sql = statement;
+        profile.startedAt = QDateTime::currentDateTime();
+        emit statementStarted(done.load(), total, profile.label);
+        QElapsedTimer timer;
+        timer.start();
+        profile.ok = execStatement(query, statement, profile);
+        profile.elapsedMs = timer.elapsed();
+        if (!profile.ok) {
+            profile.error = query.lastError().text();
+            qDebug() << "错误信息: " << profile.error;
+            ok = false;
+            // 不要 return，继续执行后续语句；事务模式下事务已中止，后续语句无法执行
+        }
+        if (profiling) {
+            QMutexLocker locker(&profileMutex);
+            profiles << profile;
+        }
+        int finishedCount = ++done;
+        emit statementFinished(finishedCount, total, profile.label, profile.elapsedMs, profile.ok, profile.error);
+        if (!ok && transactional) {
+            break;
+        }
+    }
+    return ok;
+}
+
+bool SqlPipelineWorker::execStatement(QSqlQuery& query, const QString& statement, StatementProfile& profile)
+{
+    if (!profiling || !explainAnalyze || !isExplainable(statement)) {
+        bool success = query.exec(statement);
+        if (success && profiling) {
+            profile.rowsAffected = query.isSelect() ? query.size() : query.numRowsAffected();
+        }
+        return success;
+    }
+    // EXPLAIN ANALYZE 会真正执行语句，结果与直接执行相同，只是额外返回执行计划
+    if (!query.exec("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement)) {
+        return false;
+    }
+    if (query.next()) {
+        QJsonArray plans = QJsonDocument::fromJson(query.value(0).toString().toUtf8()).array();
+        profile.plan = plans.isEmpty() ? QJsonObject() : plans.first().toObject();
+        QJsonObject node = profile.plan.value("Plan").toObject();
+        // INSERT/UPDATE/DELETE 的根节点 ModifyTable 不返回行，影响行数取其子节点
+        if (node.value("Node Type").toString() == "ModifyTable" && !node.value("Plans").toArray().isEmpty()) {
+            node = node.value("Plans").toArray().first().toObject();
+        }
+        profile.rowsAffected = qRound64(node.value("Actual Rows").toDouble() * node.value("Actual Loops").toDouble(1));
+    }
+    return true;
+}
+
+bool SqlPipelineWorker::runParallel(const QString& stageName, const QStringList& statements)
+{
+    // 每张统计表由 DROP + CREATE 组成，只读取对比结果表，彼此之间没有依赖
+    QList<QStringList> units;
+    for (const QString& statement : statements) {
+        if (units.isEmpty() || statementLabel(statement).startsWith("DROP", Qt::CaseInsensitive)) {
+            units.append(QStringList());
+        }
+        units.last() << statement;
+    }
+
+    QThreadPool pool;
+    pool.setMaxThreadCount(maxConnections);
+    std::atomic<bool> ok{ true };
+    int firstIndex = 1;
+    for (int i = 0; i < units.size(); ++i) {
+        QStringList unit = units.at(i);
+        pool.start([this, unit, i, firstIndex, &ok, stageName]() {
+            QString name = QString("stat_pipeline_unit_%1").arg(i);
+            int pid = 0;
+            if (!openConnection(name, pid)) {
+                qDebug() << stageName << "第" << i + 1 << "组语句无法执行";
+                done += static_cast<int>(unit.size());
+                ok = false;
+                return;
+            }
+            if (!runStatements(name, stageName, unit, firstIndex)) {
+                ok = false;
+            }
+            closeConnection(name, pid);
+        });
+        firstIndex += static_cast<int>(unit.size());
+    }
+    pool.waitForDone();
+    return ok;
+}
+
+//服务端保存的语句版本与本地不同时重新写入；版本为 serverPipeline.sql 和各阶段语句的 md5，与 SqlPipeline.py 的 pipeline_version 相同
+bool SqlPipelineWorker::installServerSide(const QString& connectionName)
+{
+    QStringList installStatements;
+    if (!loadStatements(":/StatFromDB/sql/serverPipeline.sql", installStatements)) {
+        return false;
+    }
+    QStringList parts = installStatements;
+    QJsonArray items;
+    for (const SqlStage& stage : stages) {
+        int index = 1;
+        for (const QString& statement : stage.statements) {
+            parts << stage.name + "\n" + statement;
+            QJsonObject item;
+            item["stage"] = stage.name;
+            item["index"] = index++;
+            item["label"] = statementLabel(statement);
+            item["sql"] = statement;
+            items.append(item);
+        }
+    }
+    QString version = QCryptographicHash::hash(parts.join("\n;\n").toUtf8(), QCryptographicHash::Md5).toHex();
+
+    QSqlDatabase db = QSqlDatabase::database(connectionName, false);
+    QSqlQuery query(db);
+    query.prepare("SELECT public.stat_pipeline_version(?)");
+    query.addBindValue(serverVariant);
+    // 尚未创建 stat_pipeline_statement 时查询失败，按未写入处理
+    if (query.exec() && query.next() && query.value(0).toString() == version) {
+        return true;
+    }
+    for (const QString& statement : installStatements) {
+        if (!query.exec(statement)) {
+            qDebug() << "创建服务端执行所需的表和函数失败:" << query.lastError().text();
+            return false;
+        }
+    }
+    query.prepare("SELECT public.stat_pipeline_install(?, ?, CAST(? AS jsonb))");
+    query.addBindValue(serverVariant);
+    query.addBindValue(version);
+    query.addBindValue(QString::fromUtf8(QJsonDocument(items).toJson(QJsonDocument::Compact)));
+    if (!query.exec()) {
+        qDebug() << "写入统计语句失败:" << query.lastError().text();
+        return false;
+    }
+    qDebug() << "统计语句已写入服务端:" << serverVariant << version;
+    return true;
+}
+
+//事务模式一次调用执行全部阶段；否则每个阶段调用一次、各自提交，public 下的结果表只在所属阶段执行期间被锁定。
+//返回的每条语句的执行记录与逐条执行时一样发出信号、写入运行报告
+bool SqlPipelineWorker::runServerSide(const QString& connectionName)
+{
+    QSqlDatabase db = QSqlDatabase::database(connectionName, false);
+    QSqlQuery query(db);
+    // 报警表所在模式为 search_path 的第一项
+    QString schema = info.searchPath.section(',', 0, 0).trimmed();
+    QStringList stageNames;
+    if (transactional) {
+        stageNames << QString();
+    }
+    else {
+        for (const SqlStage& stage : stages) {
+            stageNames << stage.name;
+        }
+    }
+    bool ok = true;
+    for (const QString& stageName : stageNames) {
+        if (canceled) {
+            break;
+        }
+        if (!runServerSideCall(query, schema, stageName)) {
+            ok = false;
+        }
+    }
+    return ok;
+}
+
+//调用一次 public.stat_run_pipeline，stageName 为空时执行全部阶段
+bool SqlPipelineWorker::runServerSideCall(QSqlQuery& query, const QString& schema, const QString& stageName)
+{
+    emit statementStarted(done, total, stageName.isEmpty() ? "服务端执行全部阶段" : "服务端执行: " + stageName);
+    QDateTime startedAt = QDateTime::currentDateTime();
+    query.prepare(QString("SELECT stage, statement_index, label, elapsed_ms, rows_affected, ok, error "
+        "FROM public.stat_run_pipeline(?, ?, ?%1)").arg(stageName.isEmpty() ? "" : ", ?"));
+    query.addBindValue(serverVariant);
+    query.addBindValue(schema);
+    query.addBindValue(transactional);
+    if (!stageName.isEmpty()) {
+        query.addBindValue(stageName);
+    }
+    if (!query.exec()) {
+        qDebug() << "服务端执行失败:" << query.lastError().text();
+        return false;
+    }
+    bool ok = true;
+    while (query.next()) {
+        StatementProfile profile;
+        profile.stage = query.value(0).toString();
+        profile.index = query.value(1).toInt();
+        profile.label = query.value(2).toString();
+        profile.startedAt = startedAt;
+        profile.elapsedMs = query.value(3).toLongLong();
+        profile.rowsAffected = query.value(4).toLongLong();
+        profile.ok = query.value(5).toBool();
+        profile.error = query.value(6).toString();
+        startedAt = startedAt.addMSecs(profile.elapsedMs);
+        if (!profile.ok) {
+            qDebug() << "错误信息: " << profile.error;
+            ok = false;
+        }
+        if (profiling) {
+            for (const SqlStage& stage : stages) {
+                if (stage.name == profile.stage && profile.index <= stage.statements.size()) {
+                    profile.sql = stage.statements.at(profile.index - 1);
+                    break;
+                }
+            }
+            QMutexLocker locker(&profileMutex);
+            profiles << profile;
+        }
+        int finishedCount = ++done;
+        emit statementFinished(finishedCount, total, profile.label, profile.elapsedMs, profile.ok, profile.error);
+    }
+    return ok;
+}
+
+void SqlPipelineWorker::run()
+{
+    const QString mainConnection = "stat_pipeline_main";
+    runStartedAt = QDateTime::currentDateTime();
+    int pid = 0;
+    if (!openConnection(mainConnection, pid)) {
+        emit finished(false, false);
+        return;
+    }
+    bool ok = true;
+    // 需要逐条 EXPLAIN ANALYZE 时，或无法写入服务端时，仍由本地逐条执行
+    bool serverSide = !serverVariant.isEmpty() && !(profiling && explainAnalyze);
+    if (serverSide && !installServerSide(mainConnection)) {
+        qDebug() << "无法使用服务端执行，改为逐条执行";
+        serverSide = false;
+    }
+    if (transactional) {
+        QSqlDatabase db = QSqlDatabase::database(mainConnection, false);
+        if (!db.transaction()) {
+            qDebug() << "开启事务失败:" << db.lastError().text();
+            ok = false;
+        }
+    }
+    if (serverSide) {
+        ok = ok && runServerSide(mainConnection);
+    }
+    else {
+        for (const SqlStage& stage : stages) {
+            if (canceled || (!ok && transactional)) {
+                break;
+            }
+            qDebug() << "开始执行:" << stage.name;
+            bool stageOk = stage.parallel && !transactional
+                ? runParallel(stage.name, stage.statements)
+                : runStatements(mainConnection, stage.name, stage.statements);
+            ok = ok && stageOk;
+        }
+    }
+    if (transactional) {
+        QSqlDatabase db = QSqlDatabase::database(mainConnection, false);
+        if (ok && !canceled) {
+            if (!db.commit()) {
+                qDebug() << "提交事务失败:" << db.lastError().text();
+                ok = false;
+            }
+        }
+        else {
+            db.rollback();
+            qDebug() << "事务已回滚，public 下的统计表保持上次的结果";
+        }
+    }
+    closeConnection(mainConnection, pid);
+    if (profiling) {
+        writeReport(ok && !canceled, canceled);
+    }
+    emit finished(ok && !canceled, canceled);
+}
+
+static QString csvField(const QString& value)
+{
+    QString escaped = value;
+    escaped.replace('"', "\"\"");
+    return QString("\"%1\"").arg(escaped);
+}
+
+//写入本次执行的运行报告：JSON 含完整语句和执行计划，CSV 便于用 Excel 查看，供 DiffRunReports.py 比较
+void SqlPipelineWorker::writeReport(bool ok, bool canceled)
+{
+    QList<StatementProfile> records;
+    {
+        QMutexLocker locker(&profileMutex);
+        records = profiles;
+    }
+    QStringList stageOrder;
+    for (const SqlStage& stage : stages) {
+        stageOrder << stage.name;
+    }
+    // 并行阶段的语句完成顺序不固定，按阶段和语句序号排序，保证两次报告可以逐条比较
+    std::stable_sort(records.begin(), records.end(), [&stageOrder](const StatementProfile& a, const StatementProfile& b) {
+        int stageA = stageOrder.indexOf(a.stage);
+        int stageB = stageOrder.indexOf(b.stage);
+        return stageA != stageB ? stageA < stageB : a.index < b.index;
+    });
+
+    QDateTime finishedAt = QDateTime::currentDateTime();
+    QString baseName = QDir(reportDir).filePath("sql_profile_" + runStartedAt.toString("yyyyMMdd_HHmmss"));
+
+    QJsonArray statementArray;
+    for (const StatementProfile& record : records) {
+        QJsonObject item;
+        item["stage"] = record.stage;
+        item["index"] = record.index;
+        item["label"] = record.label;
+        item["sql"] = record.sql;
+        item["started_at"] = record.startedAt.toString(Qt::ISODateWithMs);
+        item["elapsed_ms"] = record.elapsedMs;
+        item["rows"] = record.rowsAffected;
+        item["ok"] = record.ok;
+        item["error"] = record.error;
+        if (!record.plan.isEmpty()) {
+            item["plan"] = record.plan;
+        }
+        statementArray.append(item);
+    }
+    QJsonObject report;
+    report["started_at"] = runStartedAt.toString(Qt::ISODateWithMs);
+    report["finished_at"] = finishedAt.toString(Qt::ISODateWithMs);
+    report["total_ms"] = runStartedAt.msecsTo(finishedAt);
+    report["host"] = info.host;
+    report["database"] = info.dbName;
+    report["search_path"] = info.searchPath;
+    report["explain_analyze"] = explainAnalyze;
+    report["ok"] = ok;
+    report["canceled"] = canceled;
+    report["statements"] = statementArray;
+
+    QFile jsonFile(baseName + ".json");
+    if (!jsonFile.open(QIODevice::WriteOnly | QIODevice::Truncate)) {
+        qDebug() << "无法写入运行报告:" << jsonFile.fileName();
+        return;
+    }
+    jsonFile.write(QJsonDocument(report).toJson(QJsonDocument::Indented));
+    jsonFile.close();
+
+    QFile csvFile(baseName + ".csv");
+    if (csvFile.open(QIODevice::WriteOnly | QIODevice::Truncate | QIODevice::Text)) {
+        QTextStream out(&csvFile);
+        out.setGenerateByteOrderMark(true);
+        out << "stage,index,label,started_at,elapsed_ms,rows,ok,error\n";
+        for (const StatementProfile& record : records) {
+            out << csvField(record.stage) << ',' << record.index << ',' << csvField(record.label) << ','
+                << record.startedAt.toString(Qt::ISODateWithMs) << ',' << record.elapsedMs << ','
+                << record.rowsAffected << ',' << (record.ok ? "true" : "false") << ',' << csvField(record.error) << '\n';
+        }
+        csvFile.close();
+    }
+    qDebug() << "运行报告已写入:" << jsonFile.fileName();
+    emit reportWritten(jsonFile.fileName());
+}
+
+void SqlPipelineWorker::cancel()
+{
+    canceled = true;
+    QList<int> pids;
+    {
+        QMutexLocker locker(&pidMutex);
+        pids = activePids.values();
+    }
+    if (pids.isEmpty()) {
+        return;
+    }
+    const QString name = "stat_pipeline_cancel";
+    {
+        QSqlDatabase db = addConnection(info, name);
+        if (db.open()) {
+            QSqlQuery query(db);
+            for (int pid : pids) {
+                query.exec(QString("SELECT pg_cancel_backend(%1)").arg(pid));
+            }
+            db.close();
+        }
+        else {
+            qDebug() << "取消失败，无法连接数据库:" << db.lastError().text();
+        }
+    }
+    QSqlDatabase::removeDatabase(name);
+}
@@ -0,0 +1,111 @@
+#pragma once
+#include <QObject>
+#include <QDateTime>
+#include <QJsonObject>
+#include <QList>
+#include <QMutex>
+#include <QSet>
+#include <QString>
+#include <QStringList>
+#include <QSqlDatabase>
+#include <QSqlQuery>
+#include <atomic>
+
+// 工作线程建立独立连接所需的信息，search_path 与界面主连接保持一致
+struct SqlConnectionInfo
+{
+    QString host;
+    int port = 5432;
+    QString dbName;
+    QString user;
+    QString password;
+    QString searchPath;
+};
+
+// 一个执行阶段：parallel 为 false 时按顺序执行；
+// 为 true 时按 DROP 语句切分成互不依赖的单元，各单元在独立连接上并发执行
+struct SqlStage
+{
+    QString name;
+    QStringList statements;
+    bool parallel = false;
+};
+
+// 性能分析模式下每条语句的执行记录，写入运行报告
+struct StatementProfile
+{
+    QString stage;
+    int index = 0;          // 语句在所属阶段中的序号，从 1 开始
+    QString label;
+    QString sql;
+    QDateTime startedAt;
+    qint64 elapsedMs = 0;
+    qint64 rowsAffected = -1;
+    bool ok = false;
+    QString error;
+    QJsonObject plan;       // EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) 的结果，未开启时为空
+};
+
+class SqlPipelineWorker : public QObject
+{
+    Q_OBJECT
+
+public:
+    SqlPipelineWorker(const SqlConnectionInfo& info, const QList<SqlStage>& stages, QObject* parent = nullptr);
+
+    static QStringList splitStatements(const QString& sql);
+    static bool loadStatements(const QString& path, QStringList& statements);
+    static QString statementLabel(const QString& statement);
+
+    int statementCount() const;
+    // 开启性能分析：记录每条语句的耗时和影响行数，结束时在 reportDir 下写入 JSON/CSV 运行报告；
+    // explainAnalyze 为 true 时可分析的语句改为通过 EXPLAIN (ANALYZE, BUFFERS) 执行并保存执行计划
+    void setProfiling(bool explainAnalyze, const QString& reportDir);
+    static bool isExplainable(const QString& statement);
+    // 事务模式：所有阶段在主连接的同一事务中按顺序执行（会话临时表只在本连接可见，并行阶段同样按顺序执行），
+    // 任一语句失败或取消即停止并回滚
+    void setTransactional(bool transactional);
+    // 服务端执行：各阶段的语句按 variant 保存在 public.stat_pipeline_statement 中（版本变化或语句被改动时重新写入），
+    // 由 public.stat_run_pipeline 执行：事务模式一次调用执行全部阶段，否则每个阶段调用一次、各自提交；
+    // 并行阶段同样按顺序执行，EXPLAIN ANALYZE 分析时不使用
+    void setServerSide(const QString& variant);
+    // 可在任意线程调用：停止执行后续语句，并对正在执行的语句调用 pg_cancel_backend
+    void cancel();
+
+public slots:
+    void run();
+
+signals:
+    void statementStarted(int done, int total, const QString& label);
+    void statementFinished(int done, int total, const QString& label, qint64 elapsedMs, bool ok, const QString& error);
+    void reportWritten(const QString& path);
+    void finished(bool ok, bool canceled);
+
+private:
+    bool openConnection(const QString& name, int& backendPid);
+    void closeConnection(const QString& name, int backendPid);
+    bool runStatements(const QString& connectionName, const QString& stageName, const QStringList& statements, int firstIndex = 1);
+    bool runParallel(const QString& stageName, const QStringList& statements);
+    bool execStatement(QSqlQuery& query, const QString& statement, StatementProfile& profile);
+    bool installServerSide(const QString& connectionName);
+    bool runServerSide(const QString& connectionName);
+    bool runServerSideCall(QSqlQuery& query, const QString& schema, const QString& stageName);
+    void writeReport(bool ok, bool canceled);
+
+    SqlConnectionInfo info;
+    QList<SqlStage> stages;
+    int total = 0;
+    int maxConnections = 4;
+    std::atomic<int> done{ 0 };
+    std::atomic<bool> canceled{ false };
+    QMutex pidMutex;
+    QSet<int> activePids;
+    bool transactional = false;
+    QString serverVariant;
+    bool profiling = false;
+    bool explainAnalyze = false;
+    QString reportDir;
+    QDateTime runStartedAt;
+    QMutex profileMutex;
+    QList<StatementProfile> profiles;
+};
@@ -12,6 +12,19 @@
 #include<QCoreApplication>
 #include<QMessageBox>
 #include<QSettings>
+#include<QMap>
+#include<QCryptographicHash>
+#include<QDir>
+#include<QRegularExpression>
+#include<QElapsedTimer>
+#include<QFileInfo>
+#include<QHostAddress>
+#include<QJsonArray>
+#include<QJsonDocument>
+#include<QJsonObject>
+#include<QSignalBlocker>
+#include<QUuid>
+#include<memory>
 
 StatFromDB::StatFromDB(QWidget *parent)
     : QMainWindow(parent)
@@ -57,6 +70,33 @@ StatFromDB::StatFromDB(QWidget *parent)
     connect(ui.insertAnswerButton, &QPushButton::clicked, this, &StatFromDB::onInsertAnswerClicked);
 	connect(ui.connectDbButton, &QPushButton::clicked, this, &StatFromDB::onConnectDbButtonClicked);
     connect(ui.exportButton, &QPushButton::clicked, this, &StatFromDB::onExportButtonClicked);
+
+    // 状态栏：执行进度和取消按钮，仅在后台任务运行时显示
+    progressBar = new QProgressBar(this);
+    progressBar->setMaximumWidth(240);
+    progressBar->hide();
+    cancelButton = new QPushButton("取消", this);
+    cancelButton->hide();
+    ui.statusBar->addPermanentWidget(progressBar);
+    ui.statusBar->addPermanentWidget(cancelButton);
+    connect(cancelButton, &QPushButton::clicked, this, &StatFromDB::onCancelButtonClicked);
+
+    // 状态栏：实时监测开关，开启后报警表有新写入时按批刷新传输时延和漏报统计
+    monitorButton = new QPushButton("实时监测", this);
+    monitorButton->setCheckable(true);
+    ui.statusBar->addPermanentWidget(monitorButton);
+    connect(monitorButton, &QPushButton::toggled, this, &StatFromDB::onMonitorButtonToggled);
+    monitorTimer = new QTimer(this);
+    monitorTimer->setSingleShot(true);
+    connect(monitorTimer, &QTimer::timeout, this, &StatFromDB::runMonitorBatch);
+
+    // 状态栏：数据明细浏览，按页读取 public.details，不必导出整张表
+    detailsButton = new QPushButton("数据明细", this);
+    ui.statusBar->addPermanentWidget(detailsButton);
+    connect(detailsButton, &QPushButton::clicked, this, &StatFromDB::onDetailsButtonClicked);
+
+    // 导入/导出常驻进程在启动时预先加载，首次点击时不必等待
+    startStatWorker();
 }
 
 void StatFromDB::onConnectDbButtonClicked() {
@@ -92,6 +132,8 @@ void StatFromDB::onConnectDbButtonClicked() {
 
 void StatFromDB::connectToDatabase(const QString& host, int port, const QString& dbName, const QString& user, const QString& pwd)
 {
+    // 监测的触发器和通知订阅属于当前连接，切换连接前先停止
+    stopMonitor();
     QSqlDatabase db = QSqlDatabase::addDatabase("QPSQL");
     db.setHostName(host);
     db.setPort(port);
@@ -112,9 +154,16 @@ void StatFromDB::connectToDatabase(const QString& host, int port, const QString&
         QString searchPath = (schema == "public") ? "public" : QString("%1, public").arg(schema);
         QSqlQuery query;
 		query.exec(QString("SET search_path TO %1").arg(searchPath));
+        connectionInfo = { host, port, dbName, user, pwd, searchPath };
         dbConnected = true;
         answerImported = false; // 连接数据库后需重新导入标准答案
         hasQueried = false;
+        idMatchedInstalled = false;
+        idMatchedVerified = false;
+        runFingerprint.clear();
+        if (detailsBrowser && detailsBrowser->isVisible()) {
+            detailsBrowser->reload();
+        }
     }
 }
 
@@ -123,7 +172,7 @@ void StatFromDB::fillSchemaComboBox()
     ui.dbSchemaComboBox->clear();
     QSqlQuery query(
         "SELECT schema_name FROM information_schema.schemata "
-        "WHERE schema_name NOT IN ('pg_catalog', 'information_schema','pg_toast') "
+        "WHERE schema_name NOT IN ('pg_catalog', 'information_schema','pg_toast', 'stat_run_cache_tables') "
         "ORDER BY schema_name;"
     );
     while (query.next()) {
@@ -133,9 +182,10 @@ void StatFromDB::fillSchemaComboBox()
 
 void StatFromDB::onSelectAnswerClicked()
 {
-    QString fileName = QFileDialog::getOpenFileName(this, "选择标准答案", "", "所有文件 (*.*)");
-    if (!fileName.isEmpty()) {
-        ui.answerFileTextEdit->setPlainText(fileName);
+    // 可多选，多个文件（如每个台站或试验序列一个文件）按选择顺序合并导入，每行一个
+    QStringList fileNames = QFileDialog::getOpenFileNames(this, "选择标准答案", "", "所有文件 (*.*)");
+    if (!fileNames.isEmpty()) {
+        ui.answerFileTextEdit->setPlainText(fileNames.join("\n"));
     }
 }
 
@@ -144,11 +194,16 @@ void StatFromDB::onInsertAnswerClicked() {
         QMessageBox::warning(this, "错误", "请先连接到数据库！");
         return;
     }
-    QString csvPath = ui.answerFileTextEdit->toPlainText();
+    QStringList csvPaths;
+    for (const QString& line : ui.answerFileTextEdit->toPlainText().split('\n')) {
+        if (!line.trimmed().isEmpty()) {
+            csvPaths << line.trimmed();
+        }
+    }
     QString exeDir = QCoreApplication::applicationDirPath();
     QString scriptPath = QDir(exeDir).filePath("InsertStandAnswerToDb.exe");
     QStringList args;
-    args << csvPath;
+    args << csvPaths;
     bool allFilled = !ui.dbHostEdit->text().trimmed().isEmpty()
         && !ui.dbPortEdit->text().trimmed().isEmpty()
         && !ui.dbNameEdit->text().trimmed().isEmpty()
@@ -161,38 +216,39 @@ void StatFromDB::onInsertAnswerClicked() {
             << "--user" << ui.dbUserEdit->text().trimmed()
             << "--password" << ui.dbPwdEdit->text().trimmed();
     }
-    QProcess process;
-    process.start(scriptPath, args);
-    if (!process.waitForStarted()) {
-        QMessageBox::critical(this, "错误", "无法启动导入进程！");
-        return;
-    }
-    if (!process.waitForFinished(-1)) {
-        QMessageBox::critical(this, "错误", "导入进程未正常结束！");
-        return;
+    // 开启运行缓存时，文件内容与上次导入的相同则不重新导入
+    QSettings settings("config.ini", QSettings::IniFormat);
+    if (settings.value("run_cache/enabled", false).toBool()) {
+        args << "--skip-unchanged";
     }
-    QByteArray stdErr = process.readAllStandardError();
-    QByteArray stdOut = process.readAllStandardOutput();
-    int exitCode = process.exitCode();
-    if (exitCode == 0) {
-        QMessageBox::information(this, "Success", "成功导入标准答案");
-        answerImported = true;
-        hasQueried = false;
-    }
-    else {
-        // 显示详细错误信息
-        QMessageBox::critical(this, "导入标准答案失败",
-            QString("导入失败，请检查文件路径和内容。\n\n标准输出:\n%1\n\n标准错误:\n%2")
-            .arg(QString::fromLocal8Bit(stdOut))
-            .arg(QString::fromLocal8Bit(stdErr)));
-        answerImported = false;
+    if (csvPaths.size() > 1) {
+        args << "--workers" << QString::number(settings.value("import/workers", 4).toInt());
     }
+    runHelperJob("import", scriptPath, args, "正在导入标准答案...",
+        [this](int exitCode, const QByteArray& stdOut, const QByteArray& stdErr) {
+        if (exitCode == 0) {
+            QMessageBox::information(this, "Success", "成功导入标准答案");
+            answerImported = true;
+            hasQueried = false;
+            runFingerprint.clear();
+        }
+        else {
+            // 显示详细错误信息
+            QMessageBox::critical(this, "导入标准答案失败",
+                QString("导入失败，请检查文件路径和内容。\n\n标准输出:\n%1\n\n标准错误:\n%2")
+                .arg(QString::fromLocal8Bit(stdOut))
+                .arg(QString::fromLocal8Bit(stdErr)));
+            answerImported = false;
+        }
+    });
 }
 void StatFromDB::onTimeQuerryButtonClicked() {
     if(!dbConnected) {
         QMessageBox::warning(this, "错误", "请先连接到数据库！");
         return;
 	}
+    // 按时间查询的结果与实时监测刷新的是同一组输入框
+    stopMonitor();
     for (QObject* obj : this->findChildren<QLineEdit*>()) {
         if (obj == ui.dbHostEdit || obj == ui.dbUserEdit || obj==ui.dbNameEdit||obj==ui.dbPortEdit||obj==ui.dbPwdEdit) continue; // 保留不清空的
         static_cast<QLineEdit*>(obj)->clear();
@@ -203,85 +259,55 @@ void StatFromDB::onTimeQuerryButtonClicked() {
     QString startStr = startTime.toString("yyyy-MM-dd HH:mm:ss.zzz");
     QString endStr = endTime.toString("yyyy-MM-dd HH:mm:ss.zzz");
 
-	QFile idMatch(":/StatFromDB/sql/sql/idMatchedTables.sql");
-	QFile timeFilterR(":/StatFromDB/sql/timeFilteredResult.sql");
-	excuteSQL(idMatch);
-    QSqlQuery query;
-    query.exec("DROP TABLE IF EXISTS public.id_matched_p_filtered_by_time;");
-    query.exec("DROP TABLE IF EXISTS public.id_matched_s_filtered_by_time;");
-    query.exec(QString("CREATE TABLE public.id_matched_p_filtered_by_time AS "
-                       "SELECT * FROM public.id_matched_p_wave_info WHERE jk_time >= '%1' AND jk_time <= '%2';")
-		.arg(startStr, endStr));
-    query.exec(QString("CREATE TABLE public.id_matched_s_filtered_by_time AS "
-                       "SELECT * FROM public.id_matched_s_wave_info WHERE jk_time >= '%1' AND jk_time <= '%2';")
-        .arg(startStr, endStr)); 
-
-	excuteSQL(timeFilterR);
-
-    if (!query.exec("SELECT 总数,合格数,合格率,是否达标,平均值,最大值,最小值 FROM public.time_filtered_p_send_time;")) {
-        qDebug() << "time_filtered_p_send_time查询失败: " << query.lastError().text();
-    }
-    else {
-        if (query.next()) {
-            ui.P_send_sum->setText(query.value(0).toString());
-            ui.P_send_le_100->setText(query.value(1).toString());
-            ui.P_send_le_rate->setText(query.value(2).toString());
-            ui.P_send_pass->setText(query.value(3).toString());
-            ui.P_send_avg_t->setText(query.value(4).toString());
-            ui.P_send_max_t->setText(query.value(5).toString());
-            ui.P_send_min_t->setText(query.value(6).toString());
-        }
-    }
-    //s_40gal_send_time
-    if (!query.exec("SELECT 总数,合格数,合格率,是否达标,平均值,最大值,最小值 FROM public.time_filtered_s_40gal_send_time;")) {
-        qDebug() << "time_filtered_s_40gal_send_time查询失败: " << query.lastError().text();
-    }
-    else {
-        if (query.next()) {
-            ui.s_40gal_sendtime_sum->setText(query.value(0).toString());
-            ui.s_40gal_sendtime_le_cnt->setText(query.value(1).toString());
-            ui.s_40gal_sendtime_le_rate->setText(query.value(2).toString());
-            ui.s_40gal_sendtime_pass->setText(query.value(3).toString());
-            ui.s_40gal_sendtime_avg->setText(query.value(4).toString());
-            ui.s_40gal_sendtime_max->setText(query.value(5).toString());
-            ui.s_40gal_sendtime_min->setText(query.value(6).toString());
-        }
-    }
-
-    //s_80gal_send_time
-    if (!query.exec("SELECT 总数,合格数,合格率,是否达标,平均值,最大值,最小值 FROM public.time_filtered_s_80gal_send_time;")) {
-        qDebug() << "time_filtered_s_80gal_send_time查询失败: " << query.lastError().text();
-    }
-    else {
-        if (query.next()) {
-            ui.s_80gal_sendtime_sum->setText(query.value(0).toString());
-            ui.s_80gal_sendtime_le_cnt->setText(query.value(1).toString());
-            ui.s_80gal_sendtime_le_rate->setText(query.value(2).toString());
-            ui.s_80gal_sendtime_pass->setText(query.value(3).toString());
-            ui.s_80gal_sendtime_avg->setText(query.value(4).toString());
-            ui.s_80gal_sendtime_max->setText(query.value(5).toString());
-            ui.s_80gal_sendtime_min->setText(query.value(6).toString());
-        }
-    }
+	// 首报表和统计函数只需创建一次；之后每次只增量刷新首报表，再按时间段调用函数取结果
+	QList<SqlStage> stages;
+	if (!idMatchedInstalled && !appendStage(stages, "地震编号首报表", ":/StatFromDB/sql/idMatchedTables.sql")) {
+		return;
+	}
+	SqlStage refreshStage;
+	refreshStage.name = "刷新首报表";
+	// 连接后第一次查询检查水位线以内的报警是否被补录或删除，之后只检查新增报警
+	refreshStage.statements << QString("SELECT public.stat_refresh_id_matched(%1)").arg(idMatchedVerified ? "false" : "true");
+	stages << refreshStage;
+	startPipeline(stages, [this, startStr, endStr](bool ok) {
+		if (ok) {
+			idMatchedInstalled = true;
+			idMatchedVerified = true;
+		}
+		loadTimeQueryResults(startStr, endStr);
+	});
+}
 
-    //s_120gal_send_time
-    if (!query.exec("SELECT 总数,合格数,合格率,是否达标,平均值,最大值,最小值 FROM public.time_filtered_s_120gal_send_time;")) {
-        qDebug() << "time_filtered_s_120gal_send_time查询失败: " << query.lastError().text();
+void StatFromDB::loadTimeQueryResults(const QString& startStr, const QString& endStr)
+{
+    // 类别 -> 总数,合格数,合格率,是否达标,平均值,最大值,最小值 对应的输入框
+    const QMap<QString, QList<QLineEdit*>> fields = {
+        { "p", { ui.P_send_sum, ui.P_send_le_100, ui.P_send_le_rate, ui.P_send_pass,
+            ui.P_send_avg_t, ui.P_send_max_t, ui.P_send_min_t } },
+        { "s_40gal", { ui.s_40gal_sendtime_sum, ui.s_40gal_sendtime_le_cnt, ui.s_40gal_sendtime_le_rate, ui.s_40gal_sendtime_pass,
+            ui.s_40gal_sendtime_avg, ui.s_40gal_sendtime_max, ui.s_40gal_sendtime_min } },
+        { "s_80gal", { ui.s_80gal_sendtime_sum, ui.s_80gal_sendtime_le_cnt, ui.s_80gal_sendtime_le_rate, ui.s_80gal_sendtime_pass,
+            ui.s_80gal_sendtime_avg, ui.s_80gal_sendtime_max, ui.s_80gal_sendtime_min } },
+        { "s_120gal", { ui.s_120gal_sendtime_sum, ui.s_120gal_sendtime_le_cnt, ui.s_120gal_sendtime_le_rate, ui.s_120gal_sendtime_pass,
+            ui.s_120gal_sendtime_avg, ui.s_120gal_sendtime_max, ui.s_120gal_sendtime_min } },
+    };
+    QSqlQuery query;
+    query.prepare("SELECT 类别,总数,合格数,合格率,是否达标,平均值,最大值,最小值 "
+        "FROM public.stat_time_range_send_time(CAST(? AS timestamp), CAST(? AS timestamp))");
+    query.addBindValue(startStr);
+    query.addBindValue(endStr);
+    if (!query.exec()) {
+        qDebug() << "stat_time_range_send_time查询失败: " << query.lastError().text();
+        return;
     }
-    else {
-        if (query.next()) {
-            ui.s_120gal_sendtime_sum->setText(query.value(0).toString());
-            ui.s_120gal_sendtime_le_cnt->setText(query.value(1).toString());
-            ui.s_120gal_sendtime_le_rate->setText(query.value(2).toString());
-            ui.s_120gal_sendtime_pass->setText(query.value(3).toString());
-            ui.s_120gal_sendtime_avg->setText(query.value(4).toString());
-            ui.s_120gal_sendtime_max->setText(query.value(5).toString());
-            ui.s_120gal_sendtime_min->setText(query.value(6).toString());
+    while (query.next()) {
+        const QList<QLineEdit*> edits = fields.value(query.value(0).toString());
+        for (int i = 0; i < edits.size(); ++i) {
+            edits[i]->setText(query.value(i + 1).toString());
         }
     }
-
-
 }
+
 void StatFromDB::onQuerryButtonClicked()
 {
     if (!dbConnected) {
@@ -292,14 +318,245 @@ void StatFromDB::onQuerryButtonClicked()
         QMessageBox::warning(this, "错误", "请先导入标准答案！");
         return;
     }
-    QSqlQuery query;
 
-	QFile waveinfo(":/StatFromDB/sql/waveInfoTables.sql");
-	QFile summary(":/StatFromDB/sql/summaryTables.sql");
-	QFile details(":/StatFromDB/sql/detailsTables.sql");
-	excuteSQL(waveinfo);
-	excuteSQL(summary);
-	excuteSQL(details);
+	// 开启运行缓存且标准答案文件、报警表都没有变化时，直接恢复上次的统计结果、匹配结果和数据明细
+	QSettings settings("config.ini", QSettings::IniFormat);
+	bool useRunCache = settings.value("run_cache/enabled", false).toBool();
+	if (useRunCache) {
+		QString fingerprint = currentRunFingerprint();
+		if (restoreCachedRun(fingerprint)) {
+			runFingerprint = fingerprint;
+			refreshQueryResults();
+			ui.statusBar->showMessage("标准答案和报警数据未变化，已使用运行缓存中的统计结果", 5000);
+			return;
+		}
+	}
+	runQueryPipeline(useRunCache);
+}
+
+//后台执行全量统计，结束后读取统计结果；开启运行缓存时记录本次结果的指纹
+void StatFromDB::runQueryPipeline(bool useRunCache)
+{
+	QSettings settings("config.ini", QSettings::IniFormat);
+	bool transactional = settings.value("pipeline/transactional", false).toBool();
+	QList<SqlStage> stages;
+	QString variant;
+	if (!buildQueryStages(stages, useRunCache, transactional, variant)) {
+		return;
+	}
+	if (!settings.value("pipeline/server_side", false).toBool()) {
+		variant.clear();
+	}
+	startPipeline(stages, [this, useRunCache](bool ok) {
+		runFingerprint.clear();
+		if (ok && useRunCache) {
+			runFingerprint = currentRunFingerprint();
+			pruneRunCacheDirs();
+		}
+		refreshQueryResults();
+	}, transactional, variant);
+}
+
+//查询执行完或从运行缓存恢复后，读取统计表并刷新依赖匹配结果和数据明细的窗口
+void StatFromDB::refreshQueryResults()
+{
+	loadQueryResults();
+	if (detailsBrowser && detailsBrowser->isVisible()) {
+		detailsBrowser->reload();
+	}
+	// 匹配结果和统计表已重建，实时监测据此重新建立累计量
+	if (monitoring) {
+		startMonitor();
+	}
+}
+
+//事务模式：统计用到的表改为 pg_temp 下的同名会话临时表，中间表不写 WAL，也不在 public 下反复删建；
+//统计表和数据明细全部成功后，在同一事务的最后发布到 public。与 SqlPipeline.py 的 transactional_stages 相同
+static const QStringList sessionTables = {
+	"stand_answer", "P_matched_details", "S_matched_details", "stat_watermark",
+	"P_compare_result", "S_compare_result", "p_compare_stats", "s_compare_stats"
+};
+static const QStringList publishedTables = {
+	"P_send_time", "P_epicenter_deviation", "P_judge_time", "P_mag_deviation", "P_warning_miss",
+	"S_40gal_send_time", "S_80gal_send_time", "S_120gal_send_time", "S_warning_miss", "s_alarm_before_p",
+	"S_40gal_judge_time", "S_80gal_judge_time", "S_120gal_judge_time", "S_peak_deviation",
+	"latency_percentiles", "latency_histogram", "details"
+};
+
+static void toTransactionalStages(QList<SqlStage>& stages)
+{
+	static const QRegularExpression tableRef(
+		QString("\\bpublic\\.(%1)\\b").arg((sessionTables + publishedTables).join('|')),
+		QRegularExpression::CaseInsensitiveOption);
+	static const QRegularExpression tableCreate("^\\s*CREATE\\s+TABLE\\s+pg_temp\\.(\\w+)",
+		QRegularExpression::CaseInsensitiveOption | QRegularExpression::MultilineOption);
+	for (SqlStage& stage : stages) {
+		QStringList statements;
+		for (QString statement : stage.statements) {
+			statement.replace(tableRef, "pg_temp.\\1");
+			statements << statement;
+			// 临时表不会被自动分析，中间表建好后随即 ANALYZE，后续语句才能选对执行计划
+			QRegularExpressionMatch created = tableCreate.match(statement);
+			if (created.hasMatch() && sessionTables.contains(created.captured(1), Qt::CaseInsensitive)) {
+				statements << "ANALYZE pg_temp." + created.captured(1);
+			}
+		}
+		stage.statements = statements;
+		stage.parallel = false;
+	}
+	SqlStage publishStage;
+	publishStage.name = "发布结果";
+	for (const QString& table : publishedTables) {
+		publishStage.statements << QString("DROP TABLE IF EXISTS public.%1").arg(table)
+			<< QString("CREATE TABLE public.%1 AS TABLE pg_temp.%1").arg(table);
+	}
+	stages << publishStage;
+}
+
+//全量统计的各个阶段，开启运行缓存时最后保存统计表；variant 为服务端执行时保存语句的变体名，与 SqlPipeline.py 的 pipeline_variant 相同
+bool StatFromDB::buildQueryStages(QList<SqlStage>& stages, bool useRunCache, bool transactional, QString& variant)
+{
+	// 勾选增量统计且水位线有效时只重新匹配变化的窗口，否则全量重建；增量统计要修改 public 下的中间表，事务模式下不使用
+	QString waveinfoPath = ":/StatFromDB/sql/waveInfoTables.sql";
+	if (ui.incrementalCheckBox->isChecked() && transactional) {
+		qDebug() << "事务模式不使用增量统计，执行全量统计";
+	}
+	else if (ui.incrementalCheckBox->isChecked()) {
+		if (canRunIncremental()) {
+			waveinfoPath = ":/StatFromDB/sql/incrementalWaveInfo.sql";
+			variant = "_incremental";
+		}
+		else {
+			qDebug() << "水位线不存在或已失效，执行全量统计";
+		}
+	}
+	if (!appendStage(stages, "标准答案匹配", waveinfoPath)
+		|| !appendStage(stages, "对比结果", ":/StatFromDB/sql/compareTables.sql")
+		|| !appendStage(stages, "统计汇总", ":/StatFromDB/sql/compareStats.sql", true)
+		|| !appendStage(stages, "统计表", ":/StatFromDB/sql/summaryTables.sql", true)
+		|| !appendStage(stages, "数据明细", ":/StatFromDB/sql/detailsTables.sql")) {
+		return false;
+	}
+	if (transactional) {
+		toTransactionalStages(stages);
+		variant += "_tx";
+	}
+	// 数据明细浏览用的索引建在 public.details 上，事务模式下在发布之后创建
+	if (!appendStage(stages, "数据明细索引", ":/StatFromDB/sql/detailsIndexes.sql")) {
+		return false;
+	}
+	if (useRunCache) {
+		if (!appendStage(stages, "运行缓存", ":/StatFromDB/sql/runCache.sql")) {
+			return false;
+		}
+		QSettings settings("config.ini", QSettings::IniFormat);
+		stages.last().statements << QString("SELECT public.stat_run_cache_save('%1', %2, %3)")
+			.arg(runSqlVersion())
+			.arg(settings.value("run_cache/max_entries", 20).toInt())
+			.arg(settings.value("run_cache/max_age_days", 30).toInt());
+		variant += "_cache";
+	}
+	variant.prepend("query");
+	return true;
+}
+
+//统计SQL的版本：全量统计各SQL文件中语句的 md5，SQL 升级后旧的运行缓存不再命中，与 SqlPipeline.py 的 sql_version 相同
+QString StatFromDB::runSqlVersion()
+{
+	QStringList statements;
+	for (const QString& name : { "waveInfoTables.sql", "compareTables.sql", "compareStats.sql", "summaryTables.sql", "detailsTables.sql" }) {
+		QStringList stageStatements;
+		if (!SqlPipelineWorker::loadStatements(":/StatFromDB/sql/" + name, stageStatements)) {
+			return QString();
+		}
+		statements << stageStatements;
+	}
+	return QCryptographicHash::hash(statements.join("\n;\n").toUtf8(), QCryptographicHash::Md5).toHex();
+}
+
+//按当前标准答案和报警表计算运行指纹；尚未建立运行缓存或未通过脚本导入标准答案时返回空
+QString StatFromDB::currentRunFingerprint()
+{
+	QSqlQuery query;
+	query.prepare("SELECT public.stat_run_fingerprint(?)");
+	query.addBindValue(runSqlVersion());
+	if (!query.exec() || !query.next()) {
+		qDebug() << "运行指纹计算失败: " << query.lastError().text();
+		return QString();
+	}
+	return query.value(0).toString();
+}
+
+//缓存中有该指纹的记录时用其覆盖 public 下的统计表，返回是否命中
+bool StatFromDB::restoreCachedRun(const QString& fingerprint)
+{
+	if (fingerprint.isEmpty()) {
+		return false;
+	}
+	QSqlQuery query;
+	query.prepare("SELECT public.stat_run_cache_restore(?)");
+	query.addBindValue(fingerprint);
+	if (!query.exec() || !query.next()) {
+		qDebug() << "运行缓存恢复失败: " << query.lastError().text();
+		return false;
+	}
+	return query.value(0).toBool();
+}
+
+//导出的工作簿按指纹保存在程序目录的 run_cache 下
+QString StatFromDB::runCacheDir(const QString& fingerprint) const
+{
+	return QDir(QCoreApplication::applicationDirPath()).filePath("run_cache/" + fingerprint);
+}
+
+//缓存中有该指纹导出过的工作簿时复制到程序目录，文件名换成当前时间
+bool StatFromDB::serveCachedWorkbooks(const QString& fingerprint)
+{
+	QDir cacheDir(runCacheDir(fingerprint));
+	QStringList files;
+	for (const QString& prefix : { "统计结果_", "数据明细_" }) {
+		QStringList matched = cacheDir.entryList({ prefix + "*.xlsx" }, QDir::Files, QDir::Name);
+		if (matched.isEmpty()) {
+			return false;
+		}
+		files << matched.last();
+	}
+	QDir exportDir(QCoreApplication::applicationDirPath());
+	QString nowStr = QDateTime::currentDateTime().toString("yyyyMMdd_HHmmss");
+	for (const QString& file : files) {
+		QString target = exportDir.filePath(file.section('_', 0, 0) + "_" + nowStr + ".xlsx");
+		QFile::remove(target);
+		if (!QFile::copy(cacheDir.filePath(file), target)) {
+			qDebug() << "复制缓存的工作簿失败: " << file;
+			return false;
+		}
+	}
+	return true;
+}
+
+//删除已从 stat_run_cache 淘汰的指纹对应的工作簿目录
+void StatFromDB::pruneRunCacheDirs()
+{
+	QSqlQuery query;
+	if (!query.exec("SELECT fingerprint FROM public.stat_run_cache")) {
+		qDebug() << "运行缓存查询失败: " << query.lastError().text();
+		return;
+	}
+	QStringList kept;
+	while (query.next()) {
+		kept << query.value(0).toString();
+	}
+	QDir cacheRoot(QDir(QCoreApplication::applicationDirPath()).filePath("run_cache"));
+	for (const QString& name : cacheRoot.entryList(QDir::Dirs | QDir::NoDotAndDotDot)) {
+		if (!kept.contains(name)) {
+			QDir(cacheRoot.filePath(name)).removeRecursively();
+		}
+	}
+}
+
+void StatFromDB::loadQueryResults()
+{
+    QSqlQuery query;
 	//p_send_time
     if (!query.exec("SELECT 总数,合格数,合格率,是否达标,平均值,最大值,最小值 FROM public.p_send_time;")) {
 		qDebug() << "p_send_time查询失败: " << query.lastError().text();
@@ -528,10 +785,6 @@ void StatFromDB::onExportButtonClicked()
         QMessageBox::warning(this, "提示", "请先点击查询按钮，确保导出的是最新统计结果！");
         return;
     }
-    QString exeDir = QCoreApplication::applicationDirPath();
-    QString scriptPath = QDir(exeDir).filePath("ExportResultToExcel.exe");
-
-    QStringList args;
     QString host = ui.dbHostEdit->text().trimmed();
     QString port = ui.dbPortEdit->text().trimmed();
     QString dbName = ui.dbNameEdit->text().trimmed();
@@ -546,38 +799,88 @@ void StatFromDB::onExportButtonClicked()
         return;
     }
 
-    if (allFilled) {
-        args << "--host" << host
-            << "--port" << port
-            << "--dbname" << dbName
-            << "--user" << user
-            << "--password" << pwd;
-    }
-
-    QProcess process;
-    process.setWorkingDirectory(QCoreApplication::applicationDirPath());
-    process.start(scriptPath,args);
-    if (!process.waitForStarted()) {
-        qDebug() << "Failed to start Python process";
-        QMessageBox::critical(this, "错误", "无法启动Python进程！");
+    // 同一指纹已导出过时直接复制缓存的工作簿
+    // 运行缓存只保存工作簿，导出其他格式时不使用
+    if (!runFingerprint.isEmpty() && exportFormats() == QStringList{ "xlsx" } && serveCachedWorkbooks(runFingerprint)) {
+        QMessageBox::information(this, "导出完成",
+            QString("标准答案和报警数据未变化，已从运行缓存复制统计结果和数据明细。\n\n导出目录：\n%1")
+            .arg(QCoreApplication::applicationDirPath()));
         return;
     }
-    if (!process.waitForFinished(-1)) {
-        qDebug() << "Python process did not finish";
-        QMessageBox::critical(this, "错误", "Python进程未正常结束！");
-        return;
+    exportResults();
+}
+
+//config.ini [export] formats 中列出的导出格式（xlsx、parquet、csv、arrow，逗号或空格分隔），默认只导出工作簿
+QStringList StatFromDB::exportFormats() const
+{
+    QSettings settings("config.ini", QSettings::IniFormat);
+    // 含逗号的值由 QSettings 读为字符串列表
+    QString value = settings.value("export/formats", "xlsx").toStringList().join(' ');
+    QStringList formats;
+    for (const QString& format : value.split(QRegularExpression("[,\\s]+"), Qt::SkipEmptyParts)) {
+        QString name = format.toLower();
+        if (QStringList{ "xlsx", "parquet", "csv", "arrow" }.contains(name) && !formats.contains(name)) {
+            formats << name;
+        }
     }
+    return formats.isEmpty() ? QStringList{ "xlsx" } : formats;
+}
 
-    int exitCode = process.exitCode();
-    if (exitCode == 0) {
-        // 获取导出目录
-        QString exportDir = QCoreApplication::applicationDirPath();
-        QMessageBox::information(this, "导出完成",
-            QString("统计结果和数据明细已成功导出。\n\n导出目录：\n%1").arg(exportDir));
+void StatFromDB::exportResults()
+{
+    QString exeDir = QCoreApplication::applicationDirPath();
+    QString scriptPath = QDir(exeDir).filePath("ExportResultToExcel.exe");
+
+    QStringList args;
+    bool allFilled = !ui.dbHostEdit->text().trimmed().isEmpty()
+        && !ui.dbPortEdit->text().trimmed().isEmpty()
+        && !ui.dbNameEdit->text().trimmed().isEmpty()
+        && !ui.dbUserEdit->text().trimmed().isEmpty()
+        && !ui.dbPwdEdit->text().trimmed().isEmpty();
+    if (allFilled) {
+        args << "--host" << ui.dbHostEdit->text().trimmed()
+            << "--port" << ui.dbPortEdit->text().trimmed()
+            << "--dbname" << ui.dbNameEdit->text().trimmed()
+            << "--user" << ui.dbUserEdit->text().trimmed()
+            << "--password" << ui.dbPwdEdit->text().trimmed();
     }
-    else {
-        QMessageBox::critical(this, "导出失败", "导出失败，请先点击查询统计数据并检查数据库连接配置。");
+    QStringList formats = exportFormats();
+    args << "--format" << formats;
+    if (!runFingerprint.isEmpty()) {
+        args << "--cache-dir" << runCacheDir(runFingerprint);
+    }
+
+    runHelperJob("export", scriptPath, args, "正在导出查询结果...",
+        [this, formats](int exitCode, const QByteArray&, const QByteArray&) {
+        if (exitCode == 0) {
+            // 获取导出目录
+            QString exportDir = QCoreApplication::applicationDirPath();
+            QString exported = formats.contains("xlsx") ? "统计结果和数据明细" : "统计表和数据明细";
+            if (formats != QStringList{ "xlsx" }) {
+                exported += QString("（%1，parquet/csv/arrow 文件位于 导出数据_<时间> 目录）").arg(formats.join("/"));
+            }
+            QMessageBox::information(this, "导出完成",
+                QString("%1已成功导出。\n\n导出目录：\n%2").arg(exported, exportDir));
+        }
+        else {
+            QMessageBox::critical(this, "导出失败", "导出失败，请先点击查询统计数据并检查数据库连接配置。");
+        }
+    }, QCoreApplication::applicationDirPath());
+}
+
+//判断能否增量统计：水位线须由当前模式生成，且水位线以内的报警没有被补录或删除
+bool StatFromDB::canRunIncremental()
+{
+    QSqlQuery query;
+    if (!query.exec(
+        "SELECT COUNT(*) FROM public.stat_watermark w "
+        "WHERE w.alarm_schema = current_schema() "
+        "AND (SELECT COUNT(jk_time) FROM station_p_wave_alarm WHERE jk_time <= w.p_jk_time) = w.p_count "
+        "AND (SELECT COUNT(jk_time) FROM station_s_wave_alarm WHERE jk_time <= w.s_jk_time) = w.s_count;")) {
+        qDebug() << "水位线查询失败: " << query.lastError().text();
+        return false;
     }
+    return query.next() && query.value(0).toInt() > 0;
 }
 
 //执行SQL文件中的所有语句
@@ -602,24 +905,435 @@ void StatFromDB::onExportButtonClicked()
 //    }
 //}
 
-void StatFromDB::excuteSQL(QFile& file) {
-    if (!file.open(QIODevice::ReadOnly | QIODevice::Text)) {
-        qDebug() << "错误,无法打开SQL文件:" << file.fileName();
+//读取SQL资源文件作为一个执行阶段
+bool StatFromDB::appendStage(QList<SqlStage>& stages, const QString& name, const QString& path, bool parallel)
+{
+    SqlStage stage;
+    stage.name = name;
+    stage.parallel = parallel;
+    if (!SqlPipelineWorker::loadStatements(path, stage.statements)) {
+        QMessageBox::critical(this, "错误", QString("无法读取SQL文件：%1").arg(path));
+        return false;
+    }
+    stages << stage;
+    return true;
+}
+
+//在工作线程中执行SQL，界面保持响应，执行结束后回到主线程读取结果
+void StatFromDB::startPipeline(const QList<SqlStage>& stages, std::function<void(bool)> onSuccess, bool transactional, const QString& serverVariant)
+{
+    pipelineThread = new QThread(this);
+    pipelineWorker = new SqlPipelineWorker(connectionInfo, stages);
+    pipelineWorker->setTransactional(transactional);
+    if (!serverVariant.isEmpty()) {
+        pipelineWorker->setServerSide(serverVariant);
+    }
+    pipelineWorker->moveToThread(pipelineThread);
+    connect(pipelineThread, &QThread::started, pipelineWorker, &SqlPipelineWorker::run);
+    connect(pipelineWorker, &SqlPipelineWorker::statementFinished, this, &StatFromDB::onStatementFinished);
+    connect(pipelineWorker, &SqlPipelineWorker::finished, pipelineThread, &QThread::quit);
+    connect(pipelineThread, &QThread::finished, pipelineWorker, &QObject::deleteLater);
+    connect(pipelineThread, &QThread::finished, pipelineThread, &QObject::deleteLater);
+    connect(pipelineWorker, &SqlPipelineWorker::reportWritten, this, [this](const QString& path) {
+        profileReportPath = path;
+    });
+    connect(pipelineWorker, &SqlPipelineWorker::finished, this, [this, onSuccess, transactional](bool ok, bool canceled) {
+        pipelineWorker = nullptr;
+        pipelineThread = nullptr;
+        setBusy(false);
+        QString reportMessage = profileReportPath.isEmpty() ? QString() : "，运行报告：" + profileReportPath;
+        profileReportPath.clear();
+        if (canceled) {
+            ui.statusBar->showMessage((transactional ? "查询已取消，统计表保持上次的结果" : "查询已取消") + reportMessage, 5000);
+            return;
+        }
+        if (!ok && transactional) {
+            ui.statusBar->showMessage("查询失败，已回滚，统计表保持上次的结果，详见调试输出" + reportMessage, 5000);
+        }
+        else {
+            ui.statusBar->showMessage((ok ? "查询完成" : "查询完成，部分语句执行失败，详见调试输出") + reportMessage, 5000);
+        }
+        onSuccess(ok);
+    });
+
+    // config.ini 的 [profiling] 节开启性能分析，运行报告与 export_result.log 放在同一目录
+    QSettings settings("config.ini", QSettings::IniFormat);
+    settings.beginGroup("profiling");
+    if (settings.value("enabled", false).toBool()) {
+        pipelineWorker->setProfiling(settings.value("explain_analyze", false).toBool(), QCoreApplication::applicationDirPath());
+    }
+    settings.endGroup();
+
+    progressBar->setRange(0, pipelineWorker->statementCount());
+    progressBar->setValue(0);
+    setBusy(true, "正在执行查询...");
+    pipelineThread->start();
+}
+
+void StatFromDB::onMonitorButtonToggled(bool checked)
+{
+    if (!checked) {
+        stopMonitor();
+        return;
+    }
+    if (!dbConnected || !hasQueried) {
+        QMessageBox::warning(this, "错误", "请先连接数据库并执行一次查询！");
+        QSignalBlocker blocker(monitorButton);
+        monitorButton->setChecked(false);
+        return;
+    }
+    startMonitor();
+}
+
+//打开数据明细浏览窗口；窗口为非模态，已打开时重新读取第一页
+void StatFromDB::onDetailsButtonClicked()
+{
+    if (!dbConnected) {
+        QMessageBox::warning(this, "错误", "请先连接到数据库！");
+        return;
+    }
+    if (!detailsBrowser) {
+        detailsBrowser = new DetailsBrowser(this);
+    }
+    detailsBrowser->reload();
+    detailsBrowser->show();
+    detailsBrowser->raise();
+    detailsBrowser->activateWindow();
+}
+
+//实时监测：在报警表上安装触发器，由现有匹配结果建立各项累计量；之后报警表每次写入都在 stat_alarm_new 上发出通知，
+//攒够 monitor/batch_ms 后调用 public.stat_monitor_apply() 只重新匹配新报警所在的窗口，不重新执行统计SQL
+void StatFromDB::startMonitor()
+{
+    QSettings settings("config.ini", QSettings::IniFormat);
+    if (settings.value("pipeline/transactional", false).toBool()) {
+        // 事务模式的查询不在 public 下保留匹配结果和水位线
+        QMessageBox::warning(this, "实时监测", "事务模式下无法开启实时监测，请关闭 [pipeline] transactional 后重新查询。");
+        stopMonitor();
+        return;
+    }
+    QList<SqlStage> stages;
+    if (!appendStage(stages, "实时监测", ":/StatFromDB/sql/monitorTables.sql")) {
+        stopMonitor();
+        return;
+    }
+    stages.last().statements << "SELECT public.stat_monitor_start()";
+    // 先订阅再安装触发器，启动过程中写入的报警不会漏掉通知
+    QSqlDriver* driver = QSqlDatabase::database().driver();
+    connect(driver, &QSqlDriver::notification, this, &StatFromDB::onDbNotification, Qt::UniqueConnection);
+    if (!driver->subscribedToNotifications().contains("stat_alarm_new")
+        && !driver->subscribeToNotification("stat_alarm_new")) {
+        qDebug() << "订阅 stat_alarm_new 失败:" << driver->lastError().text();
+        stopMonitor();
+        return;
+    }
+    startPipeline(stages, [this](bool ok) {
+        if (!ok) {
+            stopMonitor();
+            QMessageBox::warning(this, "实时监测", "启动实时监测失败，请先执行一次查询，详见调试输出。");
+            return;
+        }
+        monitoring = true;
+        loadQueryResults();
+        ui.statusBar->showMessage("实时监测已启动，报警表有新写入时自动刷新传输时延和漏报统计", 5000);
+    });
+    connect(pipelineWorker, &SqlPipelineWorker::finished, this, [this](bool, bool canceled) {
+        if (canceled) {
+            stopMonitor();
+        }
+    });
+}
+
+//停止监测：取消订阅并删除触发器，统计表保持最后一批的结果
+void StatFromDB::stopMonitor()
+{
+    {
+        QSignalBlocker blocker(monitorButton);
+        monitorButton->setChecked(false);
+    }
+    monitorTimer->stop();
+    QSqlDriver* driver = QSqlDatabase::database().driver();
+    if (driver && driver->subscribedToNotifications().contains("stat_alarm_new")) {
+        driver->unsubscribeFromNotification("stat_alarm_new");
+    }
+    if (!monitoring) {
         return;
     }
-    QTextStream in(&file);
-    QString sql = in.readAll();
-    file.close();
-    QStringList statements = sql.split(';', Qt::SkipEmptyParts);
+    monitoring = false;
     QSqlQuery query;
-    for (const QString& statement : statements) {
-        QString trimmed = statement.trimmed();
-        if (!trimmed.isEmpty()) {
-            if (!query.exec(trimmed)) {
-                qDebug() << "错误信息: " << query.lastError().text();
-                // 不要 return，继续执行后续语句
+    if (!query.exec("SELECT public.stat_monitor_stop()")) {
+        qDebug() << "stat_monitor_stop 执行失败:" << query.lastError().text();
+    }
+    ui.statusBar->showMessage("实时监测已停止", 5000);
+}
+
+void StatFromDB::onDbNotification(const QString& name, QSqlDriver::NotificationSource source, const QVariant& payload)
+{
+    Q_UNUSED(source);
+    Q_UNUSED(payload);
+    // 一批写入会带来多条通知，第一条到达时开始计时，到时统一处理
+    if (name != "stat_alarm_new" || !monitoring || monitorTimer->isActive()) {
+        return;
+    }
+    QSettings settings("config.ini", QSettings::IniFormat);
+    monitorTimer->start(settings.value("monitor/batch_ms", 1000).toInt());
+}
+
+//在独立线程中处理一批写入，不显示进度、不占用界面按钮；查询等任务或上一批仍在执行时推迟到下一个周期
+void StatFromDB::runMonitorBatch()
+{
+    if (!monitoring) {
+        return;
+    }
+    if (pipelineWorker || monitorThread) {
+        QSettings settings("config.ini", QSettings::IniFormat);
+        monitorTimer->start(settings.value("monitor/batch_ms", 1000).toInt());
+        return;
+    }
+    SqlStage stage;
+    stage.name = "实时监测";
+    stage.statements << "SELECT public.stat_monitor_apply()";
+    monitorThread = new QThread(this);
+    SqlPipelineWorker* worker = new SqlPipelineWorker(connectionInfo, { stage });
+    worker->moveToThread(monitorThread);
+    connect(monitorThread, &QThread::started, worker, &SqlPipelineWorker::run);
+    connect(worker, &SqlPipelineWorker::finished, monitorThread, &QThread::quit);
+    connect(monitorThread, &QThread::finished, worker, &QObject::deleteLater);
+    connect(monitorThread, &QThread::finished, monitorThread, &QObject::deleteLater);
+    connect(worker, &SqlPipelineWorker::statementFinished, this,
+        [](int, int, const QString&, qint64 elapsedMs, bool ok, const QString& error) {
+        qDebug() << QString("实时监测刷新%1，耗时 %2 ms %3").arg(ok ? "完成" : "失败").arg(elapsedMs).arg(error);
+    });
+    connect(worker, &SqlPipelineWorker::finished, this, [this](bool ok, bool) {
+        monitorThread = nullptr;
+        if (ok && monitoring && !pipelineWorker) {
+            loadQueryResults();
+        }
+    });
+    monitorThread->start();
+}
+
+//异步启动导入/导出进程，结束后回调，不阻塞界面
+void StatFromDB::startHelperProcess(const QString& program, const QStringList& args, const QString& message,
+    std::function<void(int, const QByteArray&, const QByteArray&)> onFinished, const QString& workingDirectory)
+{
+    helperProcess = new QProcess(this);
+    if (!workingDirectory.isEmpty()) {
+        helperProcess->setWorkingDirectory(workingDirectory);
+    }
+    auto timer = std::make_shared<QElapsedTimer>();
+    timer->start();
+    connect(helperProcess, &QProcess::finished, this, [this, onFinished, program, timer](int exitCode, QProcess::ExitStatus) {
+        QProcess* process = helperProcess;
+        helperProcess = nullptr;
+        setBusy(false);
+        qDebug() << QString("一次性进程 %1 退出码 %2，耗时 %3 ms").arg(QFileInfo(program).fileName()).arg(exitCode).arg(timer->elapsed());
+        QByteArray stdOut = process->readAllStandardOutput();
+        QByteArray stdErr = process->readAllStandardError();
+        bool canceled = process->property("canceled").toBool();
+        process->deleteLater();
+        if (canceled) {
+            ui.statusBar->showMessage("已取消", 5000);
+            return;
+        }
+        onFinished(exitCode, stdOut, stdErr);
+    });
+    connect(helperProcess, &QProcess::errorOccurred, this, [this, program](QProcess::ProcessError error) {
+        if (error != QProcess::FailedToStart) {
+            return;
+        }
+        qDebug() << "Failed to start process:" << program;
+        helperProcess->deleteLater();
+        helperProcess = nullptr;
+        setBusy(false);
+        QMessageBox::critical(this, "错误", QString("无法启动进程！\n%1").arg(program));
+    });
+
+    progressBar->setRange(0, 0);
+    setBusy(true, message);
+    helperProcess->start(program, args);
+}
+
+//启动常驻的导入/导出进程 StatWorker.exe，进程在标准输出打印 "READY <端口>" 后才接收任务，
+//此前或进程不可用时导入导出仍使用一次性进程
+void StatFromDB::startStatWorker()
+{
+    QSettings settings("config.ini", QSettings::IniFormat);
+    if (workerProcess || !settings.value("worker/enabled", true).toBool()) {
+        return;
+    }
+    QString program = QDir(QCoreApplication::applicationDirPath()).filePath("StatWorker.exe");
+    if (!QFile::exists(program)) {
+        return;
+    }
+    // 任务参数中含数据库密码，只接受带本次生成的 token 的请求
+    workerToken = QUuid::createUuid().toByteArray(QUuid::WithoutBraces);
+    QProcessEnvironment env = QProcessEnvironment::systemEnvironment();
+    env.insert("STAT_WORKER_TOKEN", QString::fromLatin1(workerToken));
+
+    workerProcess = new QProcess(this);
+    workerProcess->setProcessEnvironment(env);
+    workerProcess->setWorkingDirectory(QCoreApplication::applicationDirPath());
+    // 标准错误只是日志的副本，日志已写入 stat_worker.log
+    workerProcess->setStandardErrorFile(QProcess::nullDevice());
+    connect(workerProcess, &QProcess::readyReadStandardOutput, this, [this]() {
+        while (workerProcess->canReadLine()) {
+            QByteArray line = workerProcess->readLine().trimmed();
+            if (line.startsWith("READY ")) {
+                workerPort = line.mid(6).toUShort();
+                qDebug() << "StatWorker ready on port" << workerPort;
             }
         }
+    });
+    auto cleanup = [this]() {
+        workerPort = 0;
+        if (workerProcess) {
+            workerProcess->deleteLater();
+            workerProcess = nullptr;
+        }
+    };
+    connect(workerProcess, &QProcess::finished, this, [cleanup](int exitCode, QProcess::ExitStatus) {
+        qDebug() << "StatWorker exited with code" << exitCode;
+        cleanup();
+    });
+    connect(workerProcess, &QProcess::errorOccurred, this, [cleanup](QProcess::ProcessError error) {
+        if (error == QProcess::FailedToStart) {
+            qDebug() << "Failed to start StatWorker";
+            cleanup();
+        }
+    });
+    // 常驻进程在标准输入关闭时退出，界面异常退出时不会残留
+    workerProcess->start(program, { "--parent-stdin" });
+}
+
+void StatFromDB::stopStatWorker()
+{
+    workerPort = 0;
+    if (!workerProcess) {
+        return;
+    }
+    QProcess* process = workerProcess;
+    workerProcess = nullptr;
+    process->disconnect(this);
+    process->kill();
+    process->waitForFinished(3000);
+    process->deleteLater();
+}
+
+//常驻进程就绪时把任务交给它执行，回调参数与一次性进程相同（任务日志作为标准输出）；
+//常驻进程未就绪或连接失败时改用一次性进程
+void StatFromDB::runHelperJob(const QString& job, const QString& program, const QStringList& args, const QString& message,
+    std::function<void(int, const QByteArray&, const QByteArray&)> onFinished, const QString& workingDirectory)
+{
+    if (workerPort == 0) {
+        // 常驻进程已退出时重新启动，供下一次任务使用
+        startStatWorker();
+        startHelperProcess(program, args, message, onFinished, workingDirectory);
+        return;
+    }
+
+    QJsonObject request;
+    request["job"] = job;
+    request["args"] = QJsonArray::fromStringList(args);
+    request["cwd"] = workingDirectory.isEmpty() ? QDir::currentPath() : workingDirectory;
+    request["token"] = QString::fromLatin1(workerToken);
+    QByteArray payload = QJsonDocument(request).toJson(QJsonDocument::Compact) + '\n';
+
+    auto timer = std::make_shared<QElapsedTimer>();
+    auto response = std::make_shared<QByteArray>();
+    timer->start();
+    workerSocket = new QTcpSocket(this);
+    connect(workerSocket, &QTcpSocket::connected, this, [this, payload]() {
+        workerSocket->write(payload);
+    });
+    connect(workerSocket, &QTcpSocket::readyRead, this, [this, job, onFinished, timer, response]() {
+        response->append(workerSocket->readAll());
+        if (!response->endsWith('\n')) {
+            return;
+        }
+        QTcpSocket* socket = workerSocket;
+        workerSocket = nullptr;
+        socket->disconnect(this);
+        socket->disconnectFromHost();
+        socket->deleteLater();
+        setBusy(false);
+
+        QJsonObject reply = QJsonDocument::fromJson(*response).object();
+        int exitCode = reply.value("exit_code").toInt(1);
+        QString latency = QString("常驻进程任务 %1 退出码 %2，执行耗时 %3 ms，往返耗时 %4 ms")
+            .arg(job).arg(exitCode).arg(reply.value("elapsed_ms").toDouble(), 0, 'f', 0).arg(timer->elapsed());
+        qDebug() << latency;
+        ui.statusBar->showMessage(latency, 5000);
+        onFinished(exitCode, reply.value("log").toString().toLocal8Bit(), QByteArray());
+    });
+    connect(workerSocket, &QTcpSocket::errorOccurred, this,
+        [this, program, args, message, onFinished, workingDirectory](QAbstractSocket::SocketError) {
+        // 没有收到应答就断开：常驻进程不可用，结束它并改用一次性进程重新执行
+        QTcpSocket* socket = workerSocket;
+        workerSocket = nullptr;
+        qDebug() << "StatWorker unavailable:" << socket->errorString();
+        socket->disconnect(this);
+        socket->deleteLater();
+        stopStatWorker();
+        setBusy(false);
+        startHelperProcess(program, args, message, onFinished, workingDirectory);
+    });
+
+    progressBar->setRange(0, 0);
+    setBusy(true, message);
+    workerSocket->connectToHost(QHostAddress::LocalHost, workerPort);
+}
+
+void StatFromDB::setBusy(bool busy, const QString& message)
+{
+    ui.connectDbButton->setEnabled(!busy);
+    ui.insertAnswerButton->setEnabled(!busy);
+    ui.queryButton->setEnabled(!busy);
+    ui.timeQueryButton->setEnabled(!busy);
+    ui.exportButton->setEnabled(!busy);
+    monitorButton->setEnabled(!busy);
+    detailsButton->setEnabled(!busy);
+    progressBar->setVisible(busy);
+    cancelButton->setVisible(busy);
+    cancelButton->setEnabled(busy);
+    if (busy) {
+        ui.statusBar->showMessage(message);
+    }
+}
+
+void StatFromDB::onStatementFinished(int done, int total, const QString& label, qint64 elapsedMs, bool ok, const QString& error)
+{
+    progressBar->setValue(done);
+    QString message = QString("[%1/%2] %3 %4，耗时 %5 ms")
+        .arg(done).arg(total).arg(label, QString(ok ? "完成" : "失败")).arg(elapsedMs);
+    qDebug() << message;
+    if (!ok) {
+        message += "：" + error;
+    }
+    ui.statusBar->showMessage(message);
+}
+
+void StatFromDB::onCancelButtonClicked()
+{
+    cancelButton->setEnabled(false);
+    ui.statusBar->showMessage("正在取消...");
+    if (pipelineWorker) {
+        pipelineWorker->cancel();
+    }
+    else if (helperProcess) {
+        helperProcess->setProperty("canceled", true);
+        helperProcess->kill();
+    }
+    else if (workerSocket) {
+        // 常驻进程中的任务无法单独中止，结束常驻进程，下次导入/导出时重新启动
+        QTcpSocket* socket = workerSocket;
+        workerSocket = nullptr;
+        socket->disconnect(this);
+        socket->abort();
+        socket->deleteLater();
+        stopStatWorker();
+        setBusy(false);
+        ui.statusBar->showMessage("已取消", 5000);
     }
 }
 
@@ -627,4 +1341,24 @@ void StatFromDB::excuteSQL(QFile& file) {
 
 StatFromDB::~StatFromDB()
 {
+    if (monitorThread) {
+        monitorThread->quit();
+        monitorThread->wait();
+    }
+    stopMonitor();
+    if (pipelineWorker) {
+        pipelineWorker->cancel();
+        pipelineThread->quit();
+        pipelineThread->wait();
+    }
+    if (helperProcess) {
+        helperProcess->setProperty("canceled", true);
+        helperProcess->kill();
+        helperProcess->waitForFinished();
+    }
+    if (workerSocket) {
+        workerSocket->disconnect(this);
+        workerSocket->abort();
+    }
+    stopStatWorker();
 }
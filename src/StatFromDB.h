@@ -1,7 +1,18 @@
 #pragma once  
 #include <QtWidgets/QMainWindow>  
 #include "ui_StatFromDB.h"
+#include "SqlPipelineWorker.h"
+#include "DetailsBrowser.h"
 #include<QFile>
+#include<QPointer>
+#include<QProcess>
+#include<QProgressBar>
+#include<QPushButton>
+#include<QSqlDriver>
+#include<QTcpSocket>
+#include<QThread>
+#include<QTimer>
+#include<functional>
 
 class StatFromDB : public QMainWindow
 {
@@ -16,9 +27,54 @@ private:
     bool dbConnected = false;
     bool answerImported = false;
     bool hasQueried = false;
+    bool idMatchedInstalled = false;
+    bool idMatchedVerified = false;
+    QString runFingerprint;         // 当前统计结果对应的运行缓存指纹，未开启运行缓存时为空
+    SqlConnectionInfo connectionInfo;
+    QThread* pipelineThread = nullptr;
+    SqlPipelineWorker* pipelineWorker = nullptr;
+    QProcess* helperProcess = nullptr;
+    QProcess* workerProcess = nullptr;  // 常驻的导入/导出进程 StatWorker.exe
+    quint16 workerPort = 0;             // 常驻进程就绪后监听的端口，为0时使用一次性进程
+    QByteArray workerToken;
+    QTcpSocket* workerSocket = nullptr;
+    QPushButton* monitorButton = nullptr;
+    QPushButton* detailsButton = nullptr;
+    QPointer<DetailsBrowser> detailsBrowser;  // 数据明细浏览窗口，首次打开时创建
+    QTimer* monitorTimer = nullptr;     // 收到第一条新报警通知后计时，到时处理这段时间内的全部写入
+    QThread* monitorThread = nullptr;   // 正在处理一批写入的线程
+    bool monitoring = false;
+    QProgressBar* progressBar = nullptr;
+    QPushButton* cancelButton = nullptr;
+    QString profileReportPath;
     void connectToDatabase(const QString& host, int port, const QString& dbName, const QString& user, const QString& pwd);
     void fillSchemaComboBox();
-    void excuteSQL(QFile& file);
+    bool canRunIncremental();
+    bool appendStage(QList<SqlStage>& stages, const QString& name, const QString& path, bool parallel = false);
+    void runQueryPipeline(bool useRunCache);
+    void refreshQueryResults();
+    bool buildQueryStages(QList<SqlStage>& stages, bool useRunCache, bool transactional, QString& variant);
+    QString runSqlVersion();
+    QString currentRunFingerprint();
+    bool restoreCachedRun(const QString& fingerprint);
+    QString runCacheDir(const QString& fingerprint) const;
+    bool serveCachedWorkbooks(const QString& fingerprint);
+    void pruneRunCacheDirs();
+    QStringList exportFormats() const;
+    void exportResults();
+    void startPipeline(const QList<SqlStage>& stages, std::function<void(bool)> onSuccess, bool transactional = false, const QString& serverVariant = QString());
+    void startHelperProcess(const QString& program, const QStringList& args, const QString& message,
+        std::function<void(int, const QByteArray&, const QByteArray&)> onFinished, const QString& workingDirectory = QString());
+    void startStatWorker();
+    void stopStatWorker();
+    void runHelperJob(const QString& job, const QString& program, const QStringList& args, const QString& message,
+        std::function<void(int, const QByteArray&, const QByteArray&)> onFinished, const QString& workingDirectory = QString());
+    void startMonitor();
+    void stopMonitor();
+    void runMonitorBatch();
+    void setBusy(bool busy, const QString& message = QString());
+    void loadQueryResults();
+    void loadTimeQueryResults(const QString& startStr, const QString& endStr);
 
 
 private slots:
@@ -28,4 +84,9 @@ private slots:
     void onInsertAnswerClicked();
     void onConnectDbButtonClicked();
     void onExportButtonClicked();
+    void onCancelButtonClicked();
+    void onMonitorButtonToggled(bool checked);
+    void onDetailsButtonClicked();
+    void onDbNotification(const QString& name, QSqlDriver::NotificationSource source, const QVariant& payload);
+    void onStatementFinished(int done, int total, const QString& label, qint64 elapsedMs, bool ok, const QString& error);
 };